@@ -1,13 +1,61 @@
+import asyncio
+from contextlib import asynccontextmanager, suppress
+
 import bofire
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
+from routers.campaigns import router as campaigns_router
 from routers.candidates import router as candidates_router
+from routers.proposals import compact_store, get_archive, get_db, watch_queue
 from routers.proposals import router as proposals_router
 from starlette.responses import RedirectResponse
 
+from bofire_candidates_api.capture import CAPTURE_PATH, CaptureMiddleware
+from bofire_candidates_api.compression import CompressionMiddleware
+from bofire_candidates_api.data_models import ProposalStateEnum
+from bofire_candidates_api.metrics import (
+    METRICS_MEDIA_TYPE,
+    Gauge,
+    MetricsMiddleware,
+    registry,
+)
+from bofire_candidates_api.pool import generation_pool
+
 
 APP_VERSION = "0.0.1"
 
-app = FastAPI(title="BoFire Candidates API", version=APP_VERSION, root_path="/")
+PROPOSALS = Gauge("bofire_proposals", "Number of stored proposals by state", ("state",))
+GENERATE_PENDING = Gauge(
+    "bofire_generate_pending",
+    "Number of direct generation requests which are waiting or running",
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    tasks = [
+        asyncio.create_task(watch_queue(get_db())),
+        asyncio.create_task(compact_store(get_db(), get_archive())),
+    ]
+    yield
+    for task in tasks:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    generation_pool.shutdown()
+
+
+app = FastAPI(
+    title="BoFire Candidates API",
+    version=APP_VERSION,
+    root_path="/",
+    lifespan=lifespan,
+)
+# the capture sees the request bodies after their decompression, the metrics
+# see the scope which is passed to the router, the decompression replaces it
+if CAPTURE_PATH is not None:
+    app.add_middleware(CaptureMiddleware, path=CAPTURE_PATH)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(CompressionMiddleware)
 
 
 @app.get("/", include_in_schema=False)
@@ -17,8 +65,27 @@ async def redirect():
 
 app.include_router(candidates_router)
 app.include_router(proposals_router)
+app.include_router(campaigns_router)
 
 
 @app.get("/versions", response_model=dict[str, str])
 def get_versions() -> dict[str, str]:
     return {"bofire_candidates_api": APP_VERSION, "bofire": bofire.__version__}
+
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics() -> Response:
+    """Get the metrics of this API process in the Prometheus text format.
+
+    The queue depth by state is read from the proposal store when the metrics are
+    scraped, the phase durations of the generation pool are those reported by its
+    processes with each finished generation.
+
+    Returns:
+        Response: The metrics.
+    """
+    counts = get_db().count_states()
+    for state in ProposalStateEnum:
+        PROPOSALS.set(counts.get(state, 0), state=state.value)
+    GENERATE_PENDING.set(generation_pool.n_pending)
+    return Response(content=registry.render(), media_type=METRICS_MEDIA_TYPE)
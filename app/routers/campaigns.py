@@ -0,0 +1,203 @@
+import datetime
+from typing import Annotated
+
+from bofire.data_models.dataframes.api import Candidates, Experiments
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from bofire_candidates_api.campaigns import (
+    campaign_locks,
+    generate_campaign_candidates,
+    remove_executed_pendings,
+)
+from bofire_candidates_api.data_models import Campaign, CampaignRequest, load_trusted
+from bofire_candidates_api.store import ProposalStore
+from routers.proposals import get_db
+
+
+router = APIRouter(prefix="/campaigns", tags=["campaigns"])
+
+
+def get_campaign_from_db(campaign_id: int, db: ProposalStore) -> Campaign:
+    """Get a campaign from the database by its ID.
+
+    Args:
+        campaign_id (int): The ID of the campaign to get.
+        db (ProposalStore): The database with the stored campaigns.
+
+    Raises:
+        HTTPException: Status code 404 if the campaign is not found.
+
+    Returns:
+        Campaign: The requested campaign.
+    """
+    dict_campaign = db.get_campaign(campaign_id)
+    if dict_campaign is None:
+        raise HTTPException(status_code=404, detail="Campaign not found")
+    return load_trusted(Campaign, dict_campaign)
+
+
+@router.post("", response_model=Campaign)
+def create_campaign(
+    campaign_request: CampaignRequest,
+    db: Annotated[ProposalStore, Depends(get_db)],  # type: ignore
+) -> Campaign:
+    """Creates a campaign which stores its experiments server-side.
+
+    Args:
+        campaign_request (CampaignRequest): The strategy and the initial experiments.
+        db (Annotated[ProposalStore, Depends]): The database to store the campaign.
+
+    Returns:
+        Campaign: The created campaign.
+    """
+    campaign = Campaign(strategy_data=campaign_request.strategy_data)
+    campaign.id = db.insert_campaign(campaign.model_dump())
+    if campaign_request.experiments is not None:
+        campaign.n_experiments = db.append_experiments(
+            campaign.id, campaign_request.experiments.model_dump()["rows"]
+        )
+    return campaign
+
+
+@router.get("/{campaign_id}", response_model=Campaign)
+def get_campaign(
+    campaign_id: int,
+    db: Annotated[ProposalStore, Depends(get_db)],  # type: ignore
+) -> Campaign:
+    """Get a campaign by its ID, the experiments are not included.
+
+    Args:
+        campaign_id (int): The ID of the campaign to get.
+        db (Annotated[ProposalStore, Depends]): The database with the stored campaigns.
+
+    Returns:
+        Campaign: The requested campaign.
+    """
+    return get_campaign_from_db(campaign_id, db)
+
+
+@router.get("/{campaign_id}/experiments", response_model=Experiments)
+def get_experiments(
+    campaign_id: int,
+    db: Annotated[ProposalStore, Depends(get_db)],  # type: ignore
+) -> Experiments:
+    """Get all experiments of a campaign.
+
+    Args:
+        campaign_id (int): The ID of the campaign.
+        db (Annotated[ProposalStore, Depends]): The database with the stored campaigns.
+
+    Returns:
+        Experiments: The experiments in the order they were appended.
+    """
+    get_campaign_from_db(campaign_id, db)
+    return Experiments(rows=db.get_experiments(campaign_id))
+
+
+@router.post("/{campaign_id}/experiments", response_model=Campaign)
+def append_experiments(
+    campaign_id: int,
+    experiments: Experiments,
+    db: Annotated[ProposalStore, Depends(get_db)],  # type: ignore
+) -> Campaign:
+    """Appends new experiments to a campaign.
+
+    Only the appended experiments are validated and stored. Pending candidates
+    which match the inputs of an appended experiment are removed. The updates of
+    a campaign are serialized by a lock of this process, so a campaign must only
+    be used through a single API process.
+
+    Args:
+        campaign_id (int): The ID of the campaign.
+        experiments (Experiments): The experiments to append.
+        db (Annotated[ProposalStore, Depends]): The database with the stored campaigns.
+
+    Raises:
+        HTTPException: Status code 422 if the experiments do not match the domain.
+
+    Returns:
+        Campaign: The updated campaign.
+    """
+    campaign = get_campaign_from_db(campaign_id, db)
+    if len(experiments.rows) == 0:
+        return campaign
+    try:
+        campaign.strategy_data.domain.validate_experiments(experiments.to_pandas())
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    with campaign_locks[campaign_id]:
+        # re-read the campaign, candidates may have been added to its pendings
+        campaign = get_campaign_from_db(campaign_id, db)
+        campaign.n_experiments = db.append_experiments(
+            campaign_id, experiments.model_dump()["rows"]
+        )
+        campaign.pendings = remove_executed_pendings(campaign.pendings, experiments)
+        campaign.last_updated_at = datetime.datetime.now()
+        db.update_campaign(
+            campaign_id,
+            {
+                "pendings": campaign.pendings,
+                "last_updated_at": campaign.last_updated_at,
+            },
+        )
+    return campaign
+
+
+@router.post("/{campaign_id}/candidates", response_model=Candidates)
+def generate_candidates(
+    campaign_id: int,
+    db: Annotated[ProposalStore, Depends(get_db)],  # type: ignore
+    n_candidates: Annotated[
+        int, Query(gt=0, description="Number of candidates to generate")
+    ] = 1,
+) -> Candidates:
+    """Generate candidates for a campaign.
+
+    The generated candidates are added to the pendings of the campaign until
+    experiments with the same inputs are appended.
+
+    Args:
+        campaign_id (int): The ID of the campaign.
+        db (Annotated[ProposalStore, Depends]): The database with the stored campaigns.
+        n_candidates (int, optional): Number of candidates to generate. Defaults to 1.
+
+    Returns:
+        Candidates: The generated candidates.
+    """
+    with campaign_locks[campaign_id]:
+        campaign = get_campaign_from_db(campaign_id, db)
+        candidates = generate_campaign_candidates(campaign, db, n_candidates)
+        pending_rows = [] if campaign.pendings is None else list(campaign.pendings.rows)
+        db.update_campaign(
+            campaign_id,
+            {
+                "pendings": Candidates(rows=pending_rows + list(candidates.rows)),
+                "last_updated_at": datetime.datetime.now(),
+            },
+        )
+    return candidates
+
+
+@router.delete("/{campaign_id}/pendings", response_model=Campaign)
+def clear_pendings(
+    campaign_id: int,
+    db: Annotated[ProposalStore, Depends(get_db)],  # type: ignore
+) -> Campaign:
+    """Removes all pending candidates of a campaign.
+
+    Args:
+        campaign_id (int): The ID of the campaign.
+        db (Annotated[ProposalStore, Depends]): The database with the stored campaigns.
+
+    Returns:
+        Campaign: The updated campaign.
+    """
+    with campaign_locks[campaign_id]:
+        campaign = get_campaign_from_db(campaign_id, db)
+        campaign.pendings = None
+        campaign.last_updated_at = datetime.datetime.now()
+        db.update_campaign(
+            campaign_id,
+            {"pendings": None, "last_updated_at": campaign.last_updated_at},
+        )
+    return campaign
@@ -1,26 +1,229 @@
+from typing import Annotated, AsyncIterator, List, Optional
+
 from bofire.data_models.dataframes.api import Candidates
-from fastapi import APIRouter
+from fastapi import APIRouter, Body, Header, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
 
-from bofire_candidates_api.data_models import CandidatesRequest
-from bofire_candidates_api.generate import generate_candidates
+from bofire_candidates_api.arrow import (
+    ARROW_MEDIA_TYPE,
+    ArrowRoute,
+    arrow_response,
+    is_arrow,
+    request_experiments,
+)
+from bofire_candidates_api.batch import BatchItem, batch_error, parse_batch
+from bofire_candidates_api.data_models import (
+    BatchError,
+    CandidatesBatchItem,
+    CandidatesRequest,
+    GenerationProfile,
+)
+from bofire_candidates_api.idempotency import deduplication_key, result_cache
+from bofire_candidates_api.pool import generation_pool
+from bofire_candidates_api.profiling import profile_stats_response, profile_store
+from bofire_candidates_api.streaming import (
+    NDJSON_MEDIA_TYPE,
+    candidate_chunks,
+    is_ndjson,
+    ndjson_response,
+)
 
 
-router = APIRouter(prefix="/candidates", tags=["candidates"])
+router = APIRouter(prefix="/candidates", tags=["candidates"], route_class=ArrowRoute)
 
 
-@router.post("/generate", response_model=Candidates)
-def generate(
+@router.post(
+    "/generate",
+    response_model=Candidates,
+    responses={200: {"content": {ARROW_MEDIA_TYPE: {}, NDJSON_MEDIA_TYPE: {}}}},
+)
+async def generate(
     candidate_request: CandidatesRequest,
+    request: Request,
+    response: Response,
+    idempotency_key: Annotated[Optional[str], Header()] = None,
+    dedupe: Annotated[
+        bool, Query(description="Deduplicate requests with the same content")
+    ] = False,
+    timeout: Annotated[
+        Optional[float],
+        Query(gt=0, description="Timeout in seconds, at most `GENERATE_TIMEOUT`"),
+    ] = None,
 ) -> Candidates:
     """Generate candidates using the specified strategy.
 
+    The generation runs in a dedicated process pool which is awaited, so that it
+    does not block the other endpoints. If too many requests are waiting, the
+    request is rejected with status code 429, and if the generation takes longer
+    than `timeout` seconds it fails with status code 504. The timeout is capped by
+    `GENERATE_TIMEOUT`, which is also used if none is given.
+
+    The request can also be sent as Arrow IPC stream, with the experiments as
+    columns and the remaining fields as JSON in the schema metadata. The candidates
+    are returned as Arrow IPC stream if it is accepted by the client. If the client
+    accepts newline delimited JSON, they are streamed in chunks of
+    `NDJSON_CHUNK_SIZE` candidates, one `Candidates` document per line.
+
+    Requests with an `Idempotency-Key` header, or with `dedupe` set, are
+    deduplicated: a duplicate waits for the running computation or gets the
+    stored result, which is flagged by the `Idempotent-Replayed` header.
+
+    If `profile` is set, the generation is profiled and the `Profile-Location`
+    header of the response points to the profile.
+
     Args:
         candidate_request (CandidatesRequest): Request model for generating candidates.
+        request (Request): The request, used for the content negotiation.
+        response (Response): The response, used to flag replayed results.
+        idempotency_key (Optional[str], optional): Key identifying retries of the
+            same request. Defaults to None.
+        dedupe (bool, optional): Whether requests with the same content are
+            deduplicated. Defaults to False.
+        timeout (Optional[float], optional): Timeout of the generation in seconds.
+            Defaults to None which uses `GENERATE_TIMEOUT`.
 
     Returns:
         Candidates: The generated candidates.
     """
-    return generate_candidates(
-        candidate_request=candidate_request,
-        i_start=0,
+    # the validation of large frames would block the event loop
+    experiments = await run_in_threadpool(
+        request_experiments, request, candidate_request
     )
+    key, digest = deduplication_key(
+        candidate_request, idempotency_key, dedupe, experiments
+    )
+    if key is None:
+        candidates, profile = await generation_pool.generate_profiled(
+            candidate_request, experiments, timeout
+        )
+    else:
+        (candidates, profile), replayed = await result_cache.run(
+            key,
+            digest,
+            lambda: generation_pool.generate_profiled(
+                candidate_request, experiments, timeout
+            ),
+        )
+        if replayed:
+            response.headers["Idempotent-Replayed"] = "true"
+    if profile is not None:
+        response.headers["Profile-Location"] = (
+            f"{router.prefix}/profiles/{profile_store.put(profile)}"
+        )
+    if is_arrow(request.headers.get("accept")):
+        return arrow_response(candidates.to_pandas(), headers=response.headers)
+    if is_ndjson(request.headers.get("accept")):
+        return ndjson_response(candidate_chunks(candidates), headers=response.headers)
+    return candidates
+
+
+@router.post(
+    "/generate_batch",
+    response_model=List[CandidatesBatchItem],
+    responses={200: {"content": {NDJSON_MEDIA_TYPE: {}}}},
+)
+async def generate_batch(
+    candidate_requests: Annotated[
+        List[BatchItem],
+        Body(description="Independent requests for generating candidates"),
+    ],
+    request: Request,
+    timeout: Annotated[
+        Optional[float],
+        Query(gt=0, description="Timeout in seconds, at most `GENERATE_TIMEOUT`"),
+    ] = None,
+) -> List[CandidatesBatchItem]:
+    """Generate candidates for a batch of independent requests.
+
+    The experiments and pendings of all requests sharing a domain are validated
+    against it at once. The valid requests are generated in parallel in the
+    process pool, taking a single slot of its queue. Invalid or failing requests
+    do not fail the batch, their errors are returned in place of the candidates.
+
+    If the client accepts newline delimited JSON, every item is sent as a line as
+    soon as it has finished, invalid requests first. The `index` of the items
+    identifies their requests.
+
+    Args:
+        candidate_requests (List[BatchItem]): The requests, each a
+            `CandidatesRequest`.
+        request (Request): The request, used for the content negotiation.
+        timeout (Optional[float], optional): Timeout of the batch in seconds, items
+            which have not finished fail with status code 504. Defaults to None
+            which uses `GENERATE_TIMEOUT`.
+
+    Returns:
+        List[CandidatesBatchItem]: The candidates or the error of each request,
+            in the order of the requests.
+    """
+    parsed = await run_in_threadpool(parse_batch, candidate_requests)
+    valid = [i for i, r in enumerate(parsed) if isinstance(r, CandidatesRequest)]
+    results = generation_pool.iter_batch([parsed[i] for i in valid], timeout=timeout)
+
+    async def items() -> AsyncIterator[CandidatesBatchItem]:
+        for i, error in enumerate(parsed):
+            if isinstance(error, HTTPException):
+                yield CandidatesBatchItem(index=i, error=batch_error(error))
+        async for j, result in results:
+            if isinstance(result, tuple):
+                error = BatchError(status_code=result[0], detail=result[1])
+                yield CandidatesBatchItem(index=valid[j], error=error)
+            else:
+                yield CandidatesBatchItem(index=valid[j], candidates=result)
+
+    if is_ndjson(request.headers.get("accept")):
+        return ndjson_response(items())
+    return sorted([item async for item in items()], key=lambda item: item.index)
+
+
+@router.get("/cache", response_model=dict[str, int])
+def get_cache_stats() -> dict[str, int]:
+    """Get the statistics of the caches of fitted strategies.
+
+    The caches live in the processes of the generation pool, their statistics are
+    summed up as reported with the last generation of each process.
+
+    Returns:
+        dict[str, int]: The number of cached strategies, their approximate size in
+            bytes and the hit, miss and eviction counters.
+    """
+    return generation_pool.cache_stats()
+
+
+@router.get("/profiles/{profile_id}", response_model=GenerationProfile)
+def get_profile(profile_id: str) -> GenerationProfile:
+    """Get the profile of a direct generation.
+
+    The profiles are kept in the API process which ran the request, at most
+    `PROFILE_MAX_ENTRIES` of them.
+
+    Args:
+        profile_id (str): The ID of the profile from the `Profile-Location` header.
+
+    Raises:
+        HTTPException: Status code 404 if the profile is not found.
+
+    Returns:
+        GenerationProfile: The profile.
+    """
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile
+
+
+@router.get(
+    "/profiles/{profile_id}/stats",
+    response_class=Response,
+    responses={200: {"content": {"application/octet-stream": {}}}},
+)
+def get_profile_stats(profile_id: str) -> Response:
+    """Download the pstats data of the profile of a direct generation.
+
+    Args:
+        profile_id (str): The ID of the profile from the `Profile-Location` header.
+
+    Returns:
+        Response: The content of a `.prof` file, which can be loaded by `pstats`.
+    """
+    return profile_stats_response(get_profile(profile_id), profile_id)
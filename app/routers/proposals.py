@@ -1,47 +1,158 @@
+import asyncio
 import datetime
-from typing import Annotated, List
+import logging
+import os
+from functools import partial
+from typing import (
+    Annotated,
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Union,
+)
 
-from bofire.data_models.dataframes.api import Candidates
-from fastapi import APIRouter, Depends, HTTPException
-from tinydb import Query, TinyDB
+from bofire.data_models.constraints.api import ConstraintNotFulfilledError
+from bofire.data_models.dataframes.api import Candidates, Experiments
+from fastapi import (
+    APIRouter,
+    Body,
+    Depends,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+)
+from fastapi.concurrency import run_in_threadpool
 
+from bofire_candidates_api.arrow import (
+    ARROW_MEDIA_TYPE,
+    ArrowRoute,
+    arrow_response,
+    is_arrow,
+    request_experiments,
+)
+from bofire_candidates_api.batch import BatchItem, batch_error, parse_batch
+from bofire_candidates_api.cost import estimate_cost
 from bofire_candidates_api.data_models import (
     CandidatesProposal,
     CandidatesRequest,
+    GenerationProfile,
+    MarkProcessedBatchItem,
+    ProcessedProposal,
+    ProposalsBatchItem,
     ProposalStateEnum,
+    load_trusted,
+    validation_memo,
+)
+from bofire_candidates_api.idempotency import IDEMPOTENCY_TTL, deduplication_key
+from bofire_candidates_api.notifications import Notifier
+from bofire_candidates_api.profiling import profile_stats_response
+from bofire_candidates_api.retention import (
+    ArchiveError,
+    ProposalArchive,
+    RetentionPolicy,
+    compact,
+    parse_retention_ttl,
+)
+from bofire_candidates_api.store import (
+    TERMINAL_STATES,
+    ProposalStore,
+    TimedStore,
+    create_store,
+    parse_tenant_weights,
+)
+from bofire_candidates_api.streaming import (
+    NDJSON_MEDIA_TYPE,
+    SSE_MEDIA_TYPE,
+    encode_event,
+    is_ndjson,
+    ndjson_response,
+    sse_response,
 )
 
 
-router = APIRouter(prefix="/proposals", tags=["proposals"])
+router = APIRouter(prefix="/proposals", tags=["proposals"], route_class=ArrowRoute)
 
 
-DBPATH = "db.json"
+STORE_BACKEND = os.environ.get("PROPOSAL_STORE", "sqlite")
+DBPATH = os.environ.get(
+    "PROPOSAL_DB_PATH", "db.json" if STORE_BACKEND == "tinydb" else "db.sqlite"
+)
 
-db = None
+CLAIM_POLL_INTERVAL = float(os.environ.get("CLAIM_POLL_INTERVAL", 1.0))
+MAX_CLAIM_WAIT = 60.0
+MAX_STATE_WAIT = 60.0
+MAX_EVENTS_DURATION = 3600.0
+# interval of the comments which keep idle event streams open
+EVENTS_KEEPALIVE_INTERVAL = float(os.environ.get("EVENTS_KEEPALIVE_INTERVAL", 15.0))
+LEASE_DURATION = float(os.environ.get("PROPOSAL_LEASE_DURATION", 60.0))
+MAX_CLAIMS = int(os.environ.get("PROPOSAL_MAX_CLAIMS", 3))
+# shares of the tenants in the fair scheduling of claims, e.g. `team-a=2,team-b=1`
+TENANT_WEIGHTS = parse_tenant_weights(os.environ.get("PROPOSAL_TENANT_WEIGHTS", ""))
+# finished and failed proposals are moved to the archive after their time to live,
+# e.g. `FINISHED=86400,FAILED=604800`, or if they are not among the last ones of
+# their tenant, by default all proposals are kept in the store
+RETENTION_POLICY = RetentionPolicy(
+    ttl=parse_retention_ttl(os.environ.get("PROPOSAL_RETENTION_TTL", "")),
+    keep_last=os.environ.get("PROPOSAL_RETENTION_KEEP_LAST"),
+)
+ARCHIVE_PATH = os.environ.get(
+    "PROPOSAL_ARCHIVE_PATH", f"{os.path.splitext(DBPATH)[0]}.archive"
+)
+COMPACTION_INTERVAL = float(os.environ.get("PROPOSAL_COMPACTION_INTERVAL", 3600.0))
 
+db: Optional[ProposalStore] = None
+archive: Optional[ProposalArchive] = None
 
-async def get_db():
-    """Get the database connection.
+proposal_created = Notifier()
+proposal_state_changed = Notifier()
 
-    Yields:
-        TinyDB: The database connection.
+
+def get_db() -> ProposalStore:
+    """Get the proposal store of the current process.
+
+    The store is created on first use and shared by all requests. The duration
+    of its operations is recorded in `STORE_OPERATION_SECONDS`.
+
+    Returns:
+        ProposalStore: The proposal store.
     """
-    # todo: handle caching
-    db = TinyDB(DBPATH, default=str)
-    try:
-        yield db
-    finally:
-        db.close()
+    global db
+    if db is None:
+        db = TimedStore(
+            create_store(STORE_BACKEND, DBPATH, tenant_weights=TENANT_WEIGHTS)
+        )
+    return db
+
+
+def get_archive() -> ProposalArchive:
+    """Get the archive of the expired proposals.
+
+    Returns:
+        ProposalArchive: The archive.
+    """
+    global archive
+    if archive is None:
+        archive = ProposalArchive(ARCHIVE_PATH)
+    return archive
 
 
 def get_proposal_from_db(
-    proposal_id: int, db: Annotated[TinyDB, Depends(get_db)]
+    proposal_id: int, db: Annotated[ProposalStore, Depends(get_db)]
 ) -> CandidatesProposal:  # type: ignore
     """Get a proposal from the database by its ID.
 
+    The stored proposal has been validated when it was created, so the validators
+    which check the data against the domain are skipped.
+
     Args:
         proposal_id (int): The ID of the proposal to get.
-        db (Annotated[TinyDB, Depends]): The database with the stored proposals.
+        db (Annotated[ProposalStore, Depends]): The database with the stored proposals.
 
     Raises:
         HTTPException: Status code 404 if the proposal is not found.
@@ -49,54 +160,447 @@ def get_proposal_from_db(
     Returns:
         CandidatesProposal: The requested proposal.
     """
-    dict_proposal = db.get(doc_id=proposal_id)
+    dict_proposal = db.get(proposal_id)
     if dict_proposal is None:
         raise HTTPException(status_code=404, detail="Proposal not found")
-    return CandidatesProposal(**dict_proposal)
+    return load_trusted(CandidatesProposal, dict_proposal)
+
+
+def raise_lost_claim(proposal_id: int, claim: int, db: ProposalStore) -> None:
+    """Raise the error for a claim which does not hold a proposal (anymore).
+
+    Args:
+        proposal_id (int): The ID of the proposal.
+        claim (int): The claim token which was sent by the worker.
+        db (ProposalStore): The database with the stored proposals.
+
+    Raises:
+        HTTPException: Status code 404 if the proposal is not found, status code 409
+            if the proposal is not claimed or has been claimed again since.
+    """
+    states = db.get_states([proposal_id])
+    if proposal_id not in states:
+        raise HTTPException(status_code=404, detail="Proposal not found")
+    raise HTTPException(
+        status_code=409,
+        detail=f"Proposal is {states[proposal_id].value}, "
+        f"claim {claim} does not hold it",
+    )
 
 
 @router.post("", response_model=CandidatesProposal)
 def create_proposal(
     proposal_request: CandidatesRequest,
-    db: Annotated[TinyDB, Depends(get_db)],  # type: ignore
+    request: Request,
+    response: Response,
+    db: Annotated[ProposalStore, Depends(get_db)],  # type: ignore
+    idempotency_key: Annotated[Optional[str], Header()] = None,
+    dedupe: Annotated[
+        bool, Query(description="Deduplicate requests with the same content")
+    ] = False,
 ) -> CandidatesProposal:
     """Creates a proposal for candidates.
 
+    The request can also be sent as Arrow IPC stream, with the experiments as
+    columns and the remaining fields as JSON in the schema metadata.
+
+    Requests with an `Idempotency-Key` header, or with `dedupe` set, are
+    deduplicated: a duplicate gets the existing proposal instead of a new one,
+    which is flagged by the `Idempotent-Replayed` header. Failed proposals and
+    proposals older than `IDEMPOTENCY_TTL` are not reused.
+
     Args:
         proposal_request (CandidatesRequest): The original request for the proposal.
-        db (Annotated[TinyDB, Depends]): The database to store the proposal.
+        request (Request): The request, used for the content negotiation.
+        response (Response): The response, used to flag replayed proposals.
+        db (Annotated[ProposalStore, Depends]): The database to store the proposal.
+        idempotency_key (Optional[str], optional): Key identifying retries of the
+            same request. Defaults to None.
+        dedupe (bool, optional): Whether requests with the same content are
+            deduplicated. Defaults to False.
+
+    Raises:
+        HTTPException: Status code 422 if the idempotency key was already used
+            for another request.
 
     Returns:
-        CandidatesProposal: The created proposal.
+        CandidatesProposal: The created or the existing proposal.
     """
-    proposal = CandidatesProposal(**proposal_request.model_dump())
-    id = db.insert(proposal.model_dump())
+    experiments = request_experiments(request, proposal_request)
+    if experiments is not None:
+        proposal_request = proposal_request.model_copy(
+            update={
+                "experiments": Experiments.from_pandas(
+                    experiments, proposal_request.strategy_data.domain
+                )
+            }
+        )
+    key, digest = deduplication_key(proposal_request, idempotency_key, dedupe)
+    # the request has been validated, assignments would run the validators again
+    proposal = load_trusted(
+        CandidatesProposal,
+        {
+            **proposal_request.model_dump(),
+            "idempotency_key": key,
+            "request_hash": digest,
+            "cost": estimate_cost(proposal_request),
+        },
+    )
+    if key is None:
+        proposal = proposal.model_copy(update={"id": db.insert(proposal.model_dump())})
+        proposal_created.notify()
+        return proposal
+
+    id, created = db.insert_idempotent(
+        proposal.model_dump(),
+        created_after=proposal.created_at - datetime.timedelta(seconds=IDEMPOTENCY_TTL),
+    )
+    if created:
+        proposal_created.notify()
+        return proposal.model_copy(update={"id": id})
+    existing = get_proposal_from_db(id, db)
+    if existing.request_hash != digest:
+        raise HTTPException(
+            status_code=422,
+            detail="Idempotency-Key was already used for another request",
+        )
+    response.headers["Idempotent-Replayed"] = "true"
+    return existing
+
+
+@router.post("/batch", response_model=List[ProposalsBatchItem])
+def create_proposals(
+    candidate_requests: Annotated[
+        List[BatchItem],
+        Body(description="Independent requests for generating candidates"),
+    ],
+    db: Annotated[ProposalStore, Depends(get_db)],  # type: ignore
+) -> List[ProposalsBatchItem]:
+    """Creates a proposal for each request of a batch.
+
+    The experiments and pendings of all requests sharing a domain are validated
+    against it at once, and the proposals are stored in a single transaction.
+    Invalid requests do not fail the batch, their errors are returned in place of
+    the proposals.
+
+    Args:
+        candidate_requests (List[BatchItem]): The requests, each a
+            `CandidatesRequest`.
+        db (Annotated[ProposalStore, Depends]): The database to store the proposals.
+
+    Returns:
+        List[ProposalsBatchItem]: The created proposal or the error of each
+            request, in the order of the requests.
+    """
+    parsed = parse_batch(candidate_requests)
+    proposals = [
+        load_trusted(
+            CandidatesProposal,
+            {**request.model_dump(), "cost": estimate_cost(request)},
+        )
+        for request in parsed
+        if isinstance(request, CandidatesRequest)
+    ]
+    ids = iter(db.insert_many([proposal.model_dump() for proposal in proposals]))
+    if len(proposals) > 0:
+        proposal_created.notify()
+    proposals = iter(proposals)
+    return [
+        ProposalsBatchItem(error=batch_error(request))
+        if isinstance(request, HTTPException)
+        else ProposalsBatchItem(
+            proposal=next(proposals).model_copy(update={"id": next(ids)})
+        )
+        for request in parsed
+    ]
+
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """Parse the fields of the proposals requested by a search.
 
-    # Update the db entry and proposal with the new ID
-    db.update({"id": id}, doc_ids=[id])
-    updated_proposal = CandidatesProposal(**db.get(doc_id=id))
-    return updated_proposal
+    Args:
+        fields (Optional[str]): Comma separated list of fields.
+
+    Raises:
+        HTTPException: Status code 400 if an unknown field is requested.
+
+    Returns:
+        Optional[List[str]]: The fields, None for all fields.
+    """
+    if fields is None:
+        return None
+    field_list = [f.strip() for f in fields.split(",") if f.strip() != ""]
+    unknown = sorted(set(field_list) - set(CandidatesProposal.model_fields))
+    if len(unknown) > 0:
+        raise HTTPException(status_code=400, detail=f"Unknown fields {unknown}")
+    return field_list
+
+
+def iter_pages(
+    search: Callable[..., List[Dict[str, Any]]], cursor: Optional[int]
+) -> Iterator[Dict[str, Any]]:
+    """Iterate over all proposals found by a search, page by page.
+
+    Args:
+        search (Callable[..., List[Dict[str, Any]]]): Gets a page of proposals
+            after the ID passed as `after_id`.
+        cursor (Optional[int]): ID of the proposal after which to start.
 
+    Yields:
+        Dict[str, Any]: The proposals ordered by their ID.
+    """
+    while True:
+        page = search(after_id=cursor)
+        yield from page
+        if len(page) == 0:
+            return
+        cursor = page[-1]["id"]
 
-@router.get("", response_model=List[CandidatesProposal])
-def get_proposals(db: Annotated[TinyDB, Depends(get_db)]) -> List[CandidatesProposal]:  # type: ignore
-    """Get all proposals from the database.
+
+def page_response(
+    request: Request,
+    response: Response,
+    search: Callable[..., List[Dict[str, Any]]],
+    cursor: Optional[int],
+    limit: int,
+) -> Union[List[Dict[str, Any]], Response]:
+    """Respond with a page of proposals or stream all of them as NDJSON.
 
     Args:
-        db (Annotated[TinyDB, Depends]): The database with the stored proposals.
+        request (Request): The request, used for the content negotiation.
+        response (Response): The response, used to set the pagination header.
+        search (Callable[..., List[Dict[str, Any]]]): Gets a page of proposals
+            after the ID passed as `after_id`.
+        cursor (Optional[int]): ID of the last proposal of the previous page.
+        limit (int): The page size.
 
     Returns:
-        List[CandidatesProposal]: A list of all proposals.
+        Union[List[Dict[str, Any]], Response]: The page or the stream.
     """
-    return [CandidatesProposal(**d) for d in db.all()]
+    if is_ndjson(request.headers.get("accept")):
+        return ndjson_response(iter_pages(search, cursor))
+    proposals = search(after_id=cursor)
+    if len(proposals) == limit:
+        response.headers["X-Next-Cursor"] = str(proposals[-1]["id"])
+    return proposals
+
+
+@router.get(
+    "",
+    response_model=List[Dict[str, Any]],
+    responses={200: {"content": {NDJSON_MEDIA_TYPE: {}}}},
+)
+def get_proposals(
+    request: Request,
+    response: Response,
+    db: Annotated[ProposalStore, Depends(get_db)],  # type: ignore
+    state: Optional[ProposalStateEnum] = None,
+    created_after: Optional[datetime.datetime] = None,
+    created_before: Optional[datetime.datetime] = None,
+    cursor: Annotated[
+        Optional[int],
+        Query(description="ID of the last proposal of the previous page"),
+    ] = None,
+    limit: Annotated[int, Query(ge=1, le=1000, description="Page size")] = 100,
+    fields: Annotated[
+        Optional[str],
+        Query(description="Comma separated list of fields to return, e.g. `id,state`"),
+    ] = None,
+) -> List[Dict[str, Any]]:
+    """Get a page of proposals from the database ordered by their ID.
+
+    The stored proposals are returned as they are, without running the validators
+    of the data models again. If the page is full, the cursor for the next page is
+    returned in the `X-Next-Cursor` header.
+
+    If the client accepts newline delimited JSON, all matching proposals after the
+    cursor are streamed instead of a single page, one proposal per line. They are
+    read from the database in pages of `limit` proposals while they are sent.
+
+    Args:
+        request (Request): The request, used for the content negotiation.
+        response (Response): The response, used to set the pagination header.
+        db (Annotated[ProposalStore, Depends]): The database with the stored proposals.
+        state (Optional[ProposalStateEnum], optional): Only return proposals in this
+            state. Defaults to None.
+        created_after (Optional[datetime.datetime], optional): Only return proposals
+            created at or after this time. Defaults to None.
+        created_before (Optional[datetime.datetime], optional): Only return proposals
+            created before this time. Defaults to None.
+        cursor (Optional[int], optional): ID of the last proposal of the previous
+            page. Defaults to None.
+        limit (int, optional): Maximum number of proposals to return. Defaults to 100.
+        fields (Optional[str], optional): Comma separated list of fields to return.
+            Defaults to None which returns all fields.
+
+    Raises:
+        HTTPException: Status code 400 if an unknown field is requested.
+
+    Returns:
+        List[Dict[str, Any]]: A page of proposals.
+    """
+    search = partial(
+        db.search,
+        state=state,
+        created_after=created_after,
+        created_before=created_before,
+        limit=limit,
+        fields=parse_fields(fields),
+    )
+    return page_response(request, response, search, cursor, limit)
+
+
+@router.get("/states", response_model=Dict[int, ProposalStateEnum])
+def get_states(
+    db: Annotated[ProposalStore, Depends(get_db)],  # type: ignore
+    ids: Annotated[List[int], Query(description="IDs of the proposals")],
+) -> Dict[int, ProposalStateEnum]:
+    """Get the states of several proposals at once.
+
+    Args:
+        db (Annotated[ProposalStore, Depends]): The database with the stored proposals.
+        ids (List[int]): The IDs of the proposals.
+
+    Returns:
+        Dict[int, ProposalStateEnum]: The states by proposal ID, unknown IDs are omitted.
+    """
+    return db.get_states(ids)
+
+
+async def watch_queue(db: ProposalStore) -> None:
+    """Maintain the queue of proposals for the claims waiting in this process.
+
+    Runs as a single background task per process. Every `CLAIM_POLL_INTERVAL`
+    seconds proposals whose lease has expired are put back into the queue, and
+    the waiting claims are woken up if proposals were put back or if proposals
+    created by other API processes are available. Waiting claims therefore do not
+    poll the database themselves. Requests waiting for state changes are woken up
+    as well, so that they see changes made by other API processes.
+
+    Args:
+        db (ProposalStore): The database with the stored proposals.
+    """
+    while True:
+        try:
+            released = await run_in_threadpool(
+                db.requeue_expired, max_claims=MAX_CLAIMS
+            )
+            available = len(released) > 0
+            if available or proposal_state_changed.has_waiters:
+                proposal_state_changed.notify()
+            if not available and proposal_created.has_waiters:
+                created = await run_in_threadpool(
+                    db.search, state=ProposalStateEnum.CREATED, limit=1, fields=["id"]
+                )
+                available = len(created) > 0
+            if available:
+                proposal_created.notify()
+        except Exception as e:
+            logging.error(f"Maintaining the proposal queue failed: {e}")
+        await asyncio.sleep(CLAIM_POLL_INTERVAL)
+
+
+async def compact_store(db: ProposalStore, archive: ProposalArchive) -> None:
+    """Move the expired proposals to the archive in the background.
+
+    Runs as a single background task per process if `RETENTION_POLICY` lets any
+    proposals expire, every `COMPACTION_INTERVAL` seconds starting at startup.
+    Several processes may compact the same store, see `ProposalArchive`.
+
+    Args:
+        db (ProposalStore): The database with the stored proposals.
+        archive (ProposalArchive): The archive of the expired proposals.
+    """
+    if not RETENTION_POLICY.enabled:
+        return
+    while True:
+        try:
+            archived = await run_in_threadpool(compact, db, archive, RETENTION_POLICY)
+            if archived > 0:
+                logging.info(f"Archived {archived} expired proposal(s)")
+        except Exception as e:
+            logging.error(f"Compacting the proposal store failed: {e}")
+        await asyncio.sleep(COMPACTION_INTERVAL)
+
+
+async def claim_from_db(
+    db: ProposalStore,
+    limit: int,
+    wait: float,
+    tags: Optional[List[str]] = None,
+    max_cost: Optional[float] = None,
+) -> List[CandidatesProposal]:
+    """Claim proposals from the database, waiting for new proposals if necessary.
+
+    Waiting claims only try again when they are notified, either of a proposal
+    created in this process or by `watch_queue`, which picks up requeued
+    proposals and proposals created by other API processes.
+
+    Args:
+        db (ProposalStore): The database with the stored proposals.
+        limit (int): Maximum number of proposals to claim.
+        wait (float): Maximum time to wait for proposals in seconds.
+        tags (Optional[List[str]], optional): The capabilities of the worker.
+            Defaults to None.
+        max_cost (Optional[float], optional): The largest estimated cost the
+            worker takes on. Defaults to None which means no limit.
+
+    Returns:
+        List[CandidatesProposal]: The claimed proposals, empty if none became available.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + wait
+    while True:
+        version = proposal_created.version
+        claimed = await run_in_threadpool(
+            db.claim,
+            limit=limit,
+            lease_duration=LEASE_DURATION,
+            tags=tags,
+            max_cost=max_cost,
+        )
+        if len(claimed) > 0:
+            proposal_state_changed.notify()
+        remaining = deadline - loop.time()
+        if len(claimed) > 0 or remaining <= 0:
+            return [load_trusted(CandidatesProposal, d) for d in claimed]
+        await proposal_created.wait(version, timeout=remaining)
 
 
 @router.get("/claim", response_model=CandidatesProposal)
-def claim_proposal(db: Annotated[TinyDB, Depends(get_db)]) -> CandidatesProposal:  # type: ignore
-    """Claims the first proposal in the database which is in the state CREATED.
+async def claim_proposal(
+    db: Annotated[ProposalStore, Depends(get_db)],  # type: ignore
+    wait: Annotated[
+        float, Query(ge=0, le=MAX_CLAIM_WAIT, description="Long-poll timeout in s")
+    ] = 0,
+    tags: Annotated[
+        Optional[List[str]],
+        Query(description="Capabilities of the worker, e.g. gpu"),
+    ] = None,
+    max_cost: Annotated[
+        Optional[float],
+        Query(ge=0, description="Largest estimated cost the worker takes on"),
+    ] = None,
+) -> CandidatesProposal:
+    """Claims the next proposal in the database which is in the state CREATED.
+
+    Proposals of a higher priority are claimed first, within a priority the
+    tenants share the claims by weighted fair queuing, see `ProposalStore`.
+
+    Workers are routed by their capabilities and capacity: proposals which
+    require tags the worker does not advertise, or whose estimated `cost`
+    exceeds `max_cost`, are skipped for this worker. Workers with a small
+    `max_cost` therefore keep processing cheap proposals while expensive ones
+    wait for the unrestricted workers.
 
     Args:
-        db (Annotated[TinyDB, Depends]): The database to store the proposal.
+        db (Annotated[ProposalStore, Depends]): The database to store the proposal.
+        wait (float, optional): Time in seconds to hold the request open until a
+            proposal becomes available. Defaults to 0.
+        tags (Optional[List[str]], optional): Capabilities of the worker.
+            Defaults to None.
+        max_cost (Optional[float], optional): Largest estimated cost the worker
+            takes on. Defaults to None which means no limit.
 
     Raises:
         HTTPException: Status code 404 if no proposals are available to claim.
@@ -104,30 +608,217 @@ def claim_proposal(db: Annotated[TinyDB, Depends(get_db)]) -> CandidatesProposal
     Returns:
         CandidatesProposal: The claimed proposal.
     """
-    query_list = db.search(Query().state == ProposalStateEnum.CREATED)
-    if len(query_list) == 0:
+    claimed = await claim_from_db(db, limit=1, wait=wait, tags=tags, max_cost=max_cost)
+    if len(claimed) == 0:
         raise HTTPException(status_code=404, detail="No proposals to claim")
-    proposal = CandidatesProposal(**query_list[0])
-    db.update(
-        {
-            "state": ProposalStateEnum.CLAIMED,
-            "last_updated_at": datetime.datetime.now(),
-        },
-        doc_ids=[proposal.id],
+    return claimed[0]
+
+
+@router.get("/claim/batch", response_model=List[CandidatesProposal])
+async def claim_proposals(
+    db: Annotated[ProposalStore, Depends(get_db)],  # type: ignore
+    max: Annotated[int, Query(ge=1, description="Maximum number of proposals")] = 1,
+    wait: Annotated[
+        float, Query(ge=0, le=MAX_CLAIM_WAIT, description="Long-poll timeout in s")
+    ] = 0,
+    tags: Annotated[
+        Optional[List[str]],
+        Query(description="Capabilities of the worker, e.g. gpu"),
+    ] = None,
+    max_cost: Annotated[
+        Optional[float],
+        Query(ge=0, description="Largest estimated cost the worker takes on"),
+    ] = None,
+) -> List[CandidatesProposal]:
+    """Claims up to `max` of the next proposals which are in the state CREATED.
+
+    The proposals are chosen and routed in the same way as by `claim_proposal`.
+
+    Args:
+        db (Annotated[ProposalStore, Depends]): The database to store the proposals.
+        max (int, optional): Maximum number of proposals to claim. Defaults to 1.
+        wait (float, optional): Time in seconds to hold the request open until a
+            proposal becomes available. Defaults to 0.
+        tags (Optional[List[str]], optional): Capabilities of the worker.
+            Defaults to None.
+        max_cost (Optional[float], optional): Largest estimated cost the worker
+            takes on. Defaults to None which means no limit.
+
+    Returns:
+        List[CandidatesProposal]: The claimed proposals, empty if none are available.
+    """
+    return await claim_from_db(db, limit=max, wait=wait, tags=tags, max_cost=max_cost)
+
+
+async def state_events(
+    db: ProposalStore, ids: List[int], timeout: float
+) -> AsyncIterator[bytes]:
+    """Stream the state transitions of proposals as Server-Sent Events.
+
+    The current state of every proposal is sent first, then an event is sent
+    whenever one of them changes its state. The states are only read from the
+    store when a change was notified, in this process or, every
+    `CLAIM_POLL_INTERVAL` seconds, by `watch_queue`. The stream ends when all
+    proposals are finished or failed or after the timeout.
+
+    Args:
+        db (ProposalStore): The database with the stored proposals.
+        ids (List[int]): The IDs of the proposals, unknown IDs are ignored.
+        timeout (float): Maximum duration of the stream in seconds.
+
+    Yields:
+        bytes: `state` events with the `id` and `state` of a proposal, and
+            comments which keep the connection open while no state changes.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    sent: Dict[int, ProposalStateEnum] = {}
+    while True:
+        version = proposal_state_changed.version
+        states = await run_in_threadpool(db.get_states, ids)
+        for proposal_id, state in states.items():
+            if sent.get(proposal_id) != state:
+                sent[proposal_id] = state
+                yield encode_event("state", {"id": proposal_id, "state": state})
+        remaining = deadline - loop.time()
+        if all(state in TERMINAL_STATES for state in states.values()) or remaining <= 0:
+            return
+        changed = await proposal_state_changed.wait(
+            version, timeout=min(remaining, EVENTS_KEEPALIVE_INTERVAL)
+        )
+        if not changed:
+            yield b": keep-alive\n\n"
+
+
+@router.get(
+    "/events",
+    response_class=Response,
+    responses={200: {"content": {SSE_MEDIA_TYPE: {}}}},
+)
+def get_events(
+    db: Annotated[ProposalStore, Depends(get_db)],  # type: ignore
+    ids: Annotated[List[int], Query(description="IDs of the proposals")],
+    timeout: Annotated[
+        float,
+        Query(ge=0, le=MAX_EVENTS_DURATION, description="Duration of the stream in s"),
+    ] = MAX_EVENTS_DURATION,
+) -> Response:
+    """Stream the state transitions of several proposals as Server-Sent Events.
+
+    Args:
+        db (Annotated[ProposalStore, Depends]): The database with the stored proposals.
+        ids (List[int]): The IDs of the proposals, unknown IDs are ignored.
+        timeout (float, optional): Maximum duration of the stream in seconds.
+            Defaults to MAX_EVENTS_DURATION.
+
+    Returns:
+        Response: The stream of `state` events, see `state_events`.
+    """
+    return sse_response(state_events(db, ids, timeout))
+
+
+@router.get(
+    "/archive",
+    response_model=List[Dict[str, Any]],
+    responses={200: {"content": {NDJSON_MEDIA_TYPE: {}}}},
+)
+def get_archived_proposals(
+    request: Request,
+    response: Response,
+    archive: Annotated[ProposalArchive, Depends(get_archive)],
+    state: Optional[ProposalStateEnum] = None,
+    created_after: Optional[datetime.datetime] = None,
+    created_before: Optional[datetime.datetime] = None,
+    cursor: Annotated[
+        Optional[int],
+        Query(description="ID of the last proposal of the previous page"),
+    ] = None,
+    limit: Annotated[int, Query(ge=1, le=1000, description="Page size")] = 100,
+    fields: Annotated[
+        Optional[str],
+        Query(description="Comma separated list of fields to return, e.g. `id,state`"),
+    ] = None,
+) -> List[Dict[str, Any]]:
+    """Get a page of the archived proposals ordered by their ID.
+
+    Works like `get_proposals` on the proposals which were moved to the archive
+    by the retention policy. Only the archive segments which can contain the
+    proposals of the page are read, streaming all matching proposals as newline
+    delimited JSON is preferable for exports. A stream is aborted if a segment
+    cannot be read after it started.
+
+    Args:
+        request (Request): The request, used for the content negotiation.
+        response (Response): The response, used to set the pagination header.
+        archive (Annotated[ProposalArchive, Depends]): The archive.
+        state (Optional[ProposalStateEnum], optional): Only return proposals in this
+            state. Defaults to None.
+        created_after (Optional[datetime.datetime], optional): Only return proposals
+            created at or after this time. Defaults to None.
+        created_before (Optional[datetime.datetime], optional): Only return proposals
+            created before this time. Defaults to None.
+        cursor (Optional[int], optional): ID of the last proposal of the previous
+            page. Defaults to None.
+        limit (int, optional): Maximum number of proposals to return. Defaults to 100.
+        fields (Optional[str], optional): Comma separated list of fields to return.
+            Defaults to None which returns all fields.
+
+    Raises:
+        HTTPException: Status code 400 if an unknown field is requested, 503 if the
+            archive cannot be read.
+
+    Returns:
+        List[Dict[str, Any]]: A page of archived proposals.
+    """
+    search = partial(
+        archive.search,
+        state=state,
+        created_after=created_after,
+        created_before=created_before,
+        limit=limit,
+        fields=parse_fields(fields),
     )
-    updated_proposal = CandidatesProposal(**db.get(doc_id=proposal.id))
-    return updated_proposal
+    try:
+        return page_response(request, response, search, cursor, limit)
+    except ArchiveError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+
+@router.get("/archive/{proposal_id}", response_model=CandidatesProposal)
+def get_archived_proposal(
+    proposal_id: int, archive: Annotated[ProposalArchive, Depends(get_archive)]
+) -> CandidatesProposal:
+    """Get an archived proposal by its ID.
+
+    Args:
+        proposal_id (int): The ID of the proposal to get.
+        archive (Annotated[ProposalArchive, Depends]): The archive.
+
+    Raises:
+        HTTPException: Status code 404 if the proposal is not archived, 503 if the
+            archive cannot be read.
+
+    Returns:
+        CandidatesProposal: The archived proposal.
+    """
+    try:
+        document = archive.get(proposal_id)
+    except ArchiveError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    if document is None:
+        raise HTTPException(status_code=404, detail="Archived proposal not found")
+    return load_trusted(CandidatesProposal, document)
 
 
 @router.get("/{proposal_id}", response_model=CandidatesProposal)
 def get_proposal(
-    proposal_id: int, db: Annotated[TinyDB, Depends(get_db)]
+    proposal_id: int, db: Annotated[ProposalStore, Depends(get_db)]
 ) -> CandidatesProposal:  # type: ignore
     """Get a proposal by its ID.
 
     Args:
         proposal_id (int): The ID of the proposal to get.
-        db (Annotated[TinyDB, Depends]): The database with the stored proposals.
+        db (Annotated[ProposalStore, Depends]): The database with the stored proposals.
 
     Returns:
         CandidatesProposal: The requested proposal.
@@ -136,15 +827,22 @@ def get_proposal(
     return proposal
 
 
-@router.get("/{proposal_id}/candidates", response_model=Candidates)
+@router.get(
+    "/{proposal_id}/candidates",
+    response_model=Candidates,
+    responses={200: {"content": {ARROW_MEDIA_TYPE: {}}}},
+)
 def get_candidates(
-    proposal_id: int, db: Annotated[TinyDB, Depends(get_db)]
+    proposal_id: int, request: Request, db: Annotated[ProposalStore, Depends(get_db)]
 ) -> Candidates:  # type: ignore
     """Get the candidates generated by a proposal.
 
+    The candidates are returned as Arrow IPC stream if it is accepted by the client.
+
     Args:
         proposal_id (int): The ID of the proposal to get the candidates from.
-        db (Annotated[TinyDB, Depends]): The database with the stored proposals.
+        request (Request): The request, used for the content negotiation.
+        db (Annotated[ProposalStore, Depends]): The database with the stored proposals.
 
     Raises:
         HTTPException: Status code 404 if the proposal does not contain candidates.
@@ -156,46 +854,216 @@ def get_candidates(
     if proposal.candidates is None:
         raise HTTPException(status_code=404, detail="Candidates not found")
 
+    if is_arrow(request.headers.get("accept")):
+        return arrow_response(proposal.candidates.to_pandas())
     return proposal.candidates
 
 
+@router.get("/{proposal_id}/profile", response_model=GenerationProfile)
+def get_profile(
+    proposal_id: int, db: Annotated[ProposalStore, Depends(get_db)]
+) -> GenerationProfile:  # type: ignore
+    """Get the profile of the generation of a proposal.
+
+    Args:
+        proposal_id (int): The ID of the proposal to get the profile from.
+        db (Annotated[ProposalStore, Depends]): The database with the stored proposals.
+
+    Raises:
+        HTTPException: Status code 404 if the proposal does not contain a profile.
+
+    Returns:
+        GenerationProfile: The profile, stored by the worker if the proposal was
+            created with `profile` set.
+    """
+    proposal = get_proposal_from_db(proposal_id, db)
+    if proposal.generation_profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return proposal.generation_profile
+
+
+@router.get(
+    "/{proposal_id}/profile/stats",
+    response_class=Response,
+    responses={200: {"content": {"application/octet-stream": {}}}},
+)
+def get_profile_stats(
+    proposal_id: int, db: Annotated[ProposalStore, Depends(get_db)]
+) -> Response:  # type: ignore
+    """Download the pstats data of the profile of a proposal.
+
+    Args:
+        proposal_id (int): The ID of the proposal to get the profile from.
+        db (Annotated[ProposalStore, Depends]): The database with the stored proposals.
+
+    Returns:
+        Response: The content of a `.prof` file, which can be loaded by `pstats`.
+    """
+    return profile_stats_response(
+        get_profile(proposal_id, db), f"proposal-{proposal_id}"
+    )
+
+
+@router.post("/{proposal_id}/profile", response_model=ProposalStateEnum)
+def store_profile(
+    proposal_id: int,
+    profile: GenerationProfile,
+    claim: Annotated[
+        int,
+        Query(
+            description="Claim token, the `n_claims` of the proposal as returned "
+            "by the claim"
+        ),
+    ],
+    db: Annotated[ProposalStore, Depends(get_db)],  # type: ignore
+) -> ProposalStateEnum:
+    """Stores the profile of the generation of a claimed proposal.
+
+    Workers send the profile before marking the proposal as processed or failed.
+
+    Args:
+        proposal_id (int): The ID of the proposal which was profiled.
+        profile (GenerationProfile): The profile of the generation.
+        claim (int): The claim token, `n_claims` of the claimed proposal.
+        db (Annotated[ProposalStore, Depends]): The database with the stored proposals.
+
+    Raises:
+        HTTPException: Status code 404 if the proposal is not found.
+        HTTPException: Status code 409 if the proposal is not held by the claim.
+
+    Returns:
+        ProposalStateEnum: The state of the proposal, always CLAIMED.
+    """
+    if not db.update_claimed(
+        proposal_id,
+        claim,
+        {"generation_profile": profile, "last_updated_at": datetime.datetime.now()},
+    ):
+        raise_lost_claim(proposal_id, claim, db)
+    return ProposalStateEnum.CLAIMED
+
+
 @router.get("/{proposal_id}/state", response_model=ProposalStateEnum)
 def get_state(
-    proposal_id: int, db: Annotated[TinyDB, Depends(get_db)]
+    proposal_id: int, db: Annotated[ProposalStore, Depends(get_db)]
 ) -> ProposalStateEnum:  # type: ignore
     """Get the state of a proposal by its ID.
 
     Args:
         proposal_id (int): The ID of the proposal to get the state from.
-        db (Annotated[TinyDB, Depends]): The database with the stored proposals.
+        db (Annotated[ProposalStore, Depends]): The database with the stored proposals.
+
+    Raises:
+        HTTPException: Status code 404 if the proposal is not found.
 
     Returns:
         ProposalStateEnum: The state of the proposal.
     """
-    proposal = get_proposal_from_db(proposal_id, db)
-    return proposal.state
+    states = db.get_states([proposal_id])
+    if proposal_id not in states:
+        raise HTTPException(status_code=404, detail="Proposal not found")
+    return states[proposal_id]
 
 
-@router.post("/{proposal_id}/mark_processed", response_model=ProposalStateEnum)
-def mark_processed(
+@router.get("/{proposal_id}/wait", response_model=ProposalStateEnum)
+async def wait_for_proposal(
     proposal_id: int,
-    candidates: Candidates,
-    db: Annotated[TinyDB, Depends(get_db)],  # type: ignore
+    db: Annotated[ProposalStore, Depends(get_db)],  # type: ignore
+    timeout: Annotated[
+        float, Query(ge=0, le=MAX_STATE_WAIT, description="Long-poll timeout in s")
+    ] = MAX_STATE_WAIT,
 ) -> ProposalStateEnum:
-    """Marks a proposal as processed and stores the candidates.
+    """Wait until a proposal is finished or failed.
+
+    The request is held open and answered as soon as the proposal is marked as
+    processed or failed, instead of polling its state.
 
     Args:
-        proposal_id (int): The ID of the proposal to mark as processed.
+        proposal_id (int): The ID of the proposal.
+        db (Annotated[ProposalStore, Depends]): The database with the stored proposals.
+        timeout (float, optional): Maximum time to wait in seconds. Defaults to
+            MAX_STATE_WAIT.
+
+    Raises:
+        HTTPException: Status code 404 if the proposal is not found.
+
+    Returns:
+        ProposalStateEnum: The state of the proposal, CREATED or CLAIMED if it was
+            not finished within the timeout.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while True:
+        version = proposal_state_changed.version
+        states = await run_in_threadpool(db.get_states, [proposal_id])
+        if proposal_id not in states:
+            raise HTTPException(status_code=404, detail="Proposal not found")
+        remaining = deadline - loop.time()
+        if states[proposal_id] in TERMINAL_STATES or remaining <= 0:
+            return states[proposal_id]
+        await proposal_state_changed.wait(version, timeout=remaining)
+
+
+@router.get(
+    "/{proposal_id}/events",
+    response_class=Response,
+    responses={200: {"content": {SSE_MEDIA_TYPE: {}}}},
+)
+def get_proposal_events(
+    proposal_id: int,
+    db: Annotated[ProposalStore, Depends(get_db)],  # type: ignore
+    timeout: Annotated[
+        float,
+        Query(ge=0, le=MAX_EVENTS_DURATION, description="Duration of the stream in s"),
+    ] = MAX_EVENTS_DURATION,
+) -> Response:
+    """Stream the state transitions of a proposal as Server-Sent Events.
+
+    Args:
+        proposal_id (int): The ID of the proposal.
+        db (Annotated[ProposalStore, Depends]): The database with the stored proposals.
+        timeout (float, optional): Maximum duration of the stream in seconds.
+            Defaults to MAX_EVENTS_DURATION.
+
+    Raises:
+        HTTPException: Status code 404 if the proposal is not found.
+
+    Returns:
+        Response: The stream of `state` events, see `state_events`.
+    """
+    if proposal_id not in db.get_states([proposal_id]):
+        raise HTTPException(status_code=404, detail="Proposal not found")
+    return sse_response(state_events(db, [proposal_id], timeout))
+
+
+def finish_proposal(
+    proposal_id: int, claim: int, candidates: Candidates, db: ProposalStore
+) -> ProposalStateEnum:
+    """Store the candidates of a claimed proposal and mark it as finished.
+
+    A retry of a request which already finished the proposal with the same claim
+    succeeds again, so that workers can safely retry after a lost response.
+
+    Args:
+        proposal_id (int): The ID of the proposal.
+        claim (int): The claim token, `n_claims` of the claimed proposal.
         candidates (Candidates): The candidates generated by the proposal.
-        db (Annotated[TinyDB, Depends]): The database with the stored proposals.
+        db (ProposalStore): The database with the stored proposals.
 
     Raises:
         HTTPException: Status code 400 if the number of candidates does not match the expected number.
+        HTTPException: Status code 404 if the proposal is not found.
+        HTTPException: Status code 409 if the proposal is not held by the claim.
+        HTTPException: Status code 422 if the candidates do not match the domain or violate its constraints.
 
     Returns:
-        ProposalStateEnum: The state of the proposal after marking it as processed.
+        ProposalStateEnum: The state of the proposal, FINISHED.
     """
     proposal = get_proposal_from_db(proposal_id, db)
+    if proposal.n_claims == claim and proposal.state == ProposalStateEnum.FINISHED:
+        return ProposalStateEnum.FINISHED
+    if proposal.state != ProposalStateEnum.CLAIMED or proposal.n_claims != claim:
+        raise_lost_claim(proposal_id, claim, db)
 
     if len(candidates.rows) != proposal.n_candidates:
         raise HTTPException(
@@ -203,33 +1071,186 @@ def mark_processed(
             detail=f"Expected {proposal.n_candidates} candidates, got {len(candidates.rows)}",
         )
 
-    proposal.candidates = candidates
-    proposal.last_updated_at = datetime.datetime.now()
-    proposal.state = ProposalStateEnum.FINISHED
-    db.update(proposal.model_dump(), doc_ids=[proposal_id])
-    return proposal.state
+    domain = proposal.strategy_data.domain
+    try:
+        validation_memo.validate(
+            "candidates",
+            domain,
+            candidates,
+            lambda: domain.validate_candidates(
+                candidates.to_pandas(), only_inputs=True
+            ),
+        )
+    except (ValueError, ConstraintNotFulfilledError) as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    if not db.update_claimed(
+        proposal_id,
+        claim,
+        {
+            "candidates": candidates,
+            "last_updated_at": datetime.datetime.now(),
+            "lease_expires_at": None,
+            "state": ProposalStateEnum.FINISHED,
+        },
+    ):
+        raise_lost_claim(proposal_id, claim, db)
+    proposal_state_changed.notify()
+    return ProposalStateEnum.FINISHED
+
+
+@router.post("/mark_processed/batch", response_model=List[MarkProcessedBatchItem])
+def mark_processed_batch(
+    processed: Annotated[
+        List[ProcessedProposal],
+        Body(description="Candidates of the processed proposals"),
+    ],
+    db: Annotated[ProposalStore, Depends(get_db)],  # type: ignore
+) -> List[MarkProcessedBatchItem]:
+    """Marks several proposals as processed in one request.
+
+    Each proposal is marked as in `mark_processed`, independently of the others:
+    the errors of single proposals, e.g. a lost claim, are returned in place of
+    their state and do not fail the batch.
+
+    Args:
+        processed (List[ProcessedProposal]): The candidates and claim tokens of the
+            proposals.
+        db (Annotated[ProposalStore, Depends]): The database with the stored proposals.
+
+    Returns:
+        List[MarkProcessedBatchItem]: The state or the error of each proposal, in
+            the order of the request.
+    """
+    items = []
+    for item in processed:
+        try:
+            state = finish_proposal(item.id, item.claim, item.candidates, db)
+            items.append(MarkProcessedBatchItem(id=item.id, state=state))
+        except HTTPException as e:
+            items.append(MarkProcessedBatchItem(id=item.id, error=batch_error(e)))
+    return items
+
+
+@router.post("/{proposal_id}/mark_processed", response_model=ProposalStateEnum)
+def mark_processed(
+    proposal_id: int,
+    candidates: Candidates,
+    claim: Annotated[
+        int,
+        Query(
+            description="Claim token, the `n_claims` of the proposal as returned "
+            "by the claim"
+        ),
+    ],
+    db: Annotated[ProposalStore, Depends(get_db)],  # type: ignore
+) -> ProposalStateEnum:
+    """Marks a proposal as processed and stores the candidates.
+
+    Only the worker holding the claim of the proposal can mark it as processed.
+    Repeating the request with the same claim succeeds again.
+
+    Args:
+        proposal_id (int): The ID of the proposal to mark as processed.
+        candidates (Candidates): The candidates generated by the proposal.
+        claim (int): The claim token, `n_claims` of the claimed proposal.
+        db (Annotated[ProposalStore, Depends]): The database with the stored proposals.
+
+    Raises:
+        HTTPException: Status code 400 if the number of candidates does not match the expected number.
+        HTTPException: Status code 409 if the proposal is not held by the claim.
+        HTTPException: Status code 422 if the candidates do not match the domain or violate its constraints.
+
+    Returns:
+        ProposalStateEnum: The state of the proposal after marking it as processed.
+    """
+    return finish_proposal(proposal_id, claim, candidates, db)
 
 
 @router.post("/{proposal_id}/mark_failed", response_model=ProposalStateEnum)
 def mark_failed(
     proposal_id: int,
     error_message: dict[str, str],
-    db: Annotated[TinyDB, Depends(get_db)],  # type: ignore
+    claim: Annotated[
+        int,
+        Query(
+            description="Claim token, the `n_claims` of the proposal as returned "
+            "by the claim"
+        ),
+    ],
+    db: Annotated[ProposalStore, Depends(get_db)],  # type: ignore
 ) -> ProposalStateEnum:
     """Marks a proposal as failed and stores the error message.
 
+    Only the worker holding the claim of the proposal can mark it as failed.
+    Repeating the request with the same claim succeeds again.
+
     Args:
         proposal_id (int): The ID of the proposal to mark as failed.
         error_message (dict[str, str]): The error message for the failed proposal.
-        db (Annotated[TinyDB, Depends]): The database with the stored proposals.
+        claim (int): The claim token, `n_claims` of the claimed proposal.
+        db (Annotated[ProposalStore, Depends]): The database with the stored proposals.
+
+    Raises:
+        HTTPException: Status code 404 if the proposal is not found.
+        HTTPException: Status code 409 if the proposal is not held by the claim.
 
     Returns:
         ProposalStateEnum: The state of the proposal after marking it as failed.
     """
-    proposal = get_proposal_from_db(proposal_id, db)
+    if db.update_claimed(
+        proposal_id,
+        claim,
+        {
+            "last_updated_at": datetime.datetime.now(),
+            "lease_expires_at": None,
+            "state": ProposalStateEnum.FAILED,
+            "error_message": error_message["msg"],
+        },
+    ):
+        proposal_state_changed.notify()
+        return ProposalStateEnum.FAILED
+    proposal = db.get(proposal_id)
+    if (
+        proposal is None
+        or proposal["n_claims"] != claim
+        or proposal["state"] != ProposalStateEnum.FAILED
+    ):
+        raise_lost_claim(proposal_id, claim, db)
+    return ProposalStateEnum.FAILED
+
+
+@router.post("/{proposal_id}/heartbeat", response_model=ProposalStateEnum)
+def heartbeat(
+    proposal_id: int,
+    claim: Annotated[
+        int,
+        Query(
+            description="Claim token, the `n_claims` of the proposal as returned "
+            "by the claim"
+        ),
+    ],
+    db: Annotated[ProposalStore, Depends(get_db)],  # type: ignore
+) -> ProposalStateEnum:
+    """Renews the lease of a claimed proposal.
+
+    Workers have to call this endpoint more often than every
+    `PROPOSAL_LEASE_DURATION` seconds while processing a proposal, otherwise the
+    proposal is put back into the queue. Once the proposal has been put back, the
+    lease can no longer be renewed with the old claim.
 
-    proposal.last_updated_at = datetime.datetime.now()
-    proposal.state = ProposalStateEnum.FAILED
-    proposal.error_message = error_message["msg"]
-    db.update(proposal.model_dump(), doc_ids=[proposal_id])
-    return proposal.state
+    Args:
+        proposal_id (int): The ID of the proposal to renew the lease for.
+        claim (int): The claim token, `n_claims` of the claimed proposal.
+        db (Annotated[ProposalStore, Depends]): The database with the stored proposals.
+
+    Raises:
+        HTTPException: Status code 404 if the proposal is not found.
+        HTTPException: Status code 409 if the proposal is not held by the claim.
+
+    Returns:
+        ProposalStateEnum: The state of the proposal, always CLAIMED.
+    """
+    if not db.renew_lease(proposal_id, claim, lease_duration=LEASE_DURATION):
+        raise_lost_claim(proposal_id, claim, db)
+    return ProposalStateEnum.CLAIMED
@@ -0,0 +1,330 @@
+import argparse
+import datetime
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.join(os.path.dirname(BENCHMARKS_DIR), "app")
+WORKER_DIR = os.path.join(os.path.dirname(BENCHMARKS_DIR), "worker")
+
+SCENARIOS = ["generate", "roundtrip", "list"]
+STATISTICS = ["mean", "p50", "p90", "p99", "max"]
+
+
+def create_client(store: str, db_dir: str):
+    """Create a client of the app running in this process.
+
+    The proposal store is configured through the environment before the app is
+    imported, so that the benchmark does not touch the store of a running server.
+
+    Args:
+        store (str): The backend of the proposal store.
+        db_dir (str): The directory of the proposal store.
+
+    Returns:
+        TestClient: The client, to be used as context manager.
+    """
+    os.environ["PROPOSAL_STORE"] = store
+    os.environ["PROPOSAL_DB_PATH"] = os.path.join(
+        db_dir, "db.json" if store == "tinydb" else "db.sqlite"
+    )
+    sys.path.insert(0, APP_DIR)
+    from fastapi.testclient import TestClient
+
+    from app import app
+
+    return TestClient(app)
+
+
+def check(response):
+    if response.status_code != 200:
+        raise RuntimeError(
+            f"{response.request.method} {response.request.url} failed with status "
+            f"code {response.status_code}: {response.text}"
+        )
+    return response
+
+
+def benchmark_workload(client, workload, args: argparse.Namespace) -> list:
+    """Run the scenarios of a benchmark on a workload.
+
+    Args:
+        client (TestClient): The client of the app.
+        workload (Workload): The workload.
+        args (argparse.Namespace): The options of the run.
+
+    Returns:
+        List[BenchmarkResult]: The result of each scenario.
+    """
+    from bofire_candidates_api.benchmark import BenchmarkResult, measure
+    from bofire_candidates_api.pool import generation_pool
+
+    headers = {"Content-Type": "application/json"}
+    results = []
+
+    def record(scenario, latency):
+        results.append(
+            BenchmarkResult(
+                scenario=scenario,
+                workload=workload.name,
+                n_experiments=workload.n_experiments,
+                latency=latency,
+            )
+        )
+        print(
+            f"{scenario:>10} {workload.name:>12} {workload.n_experiments:>5}  "
+            f"p50 {latency.p50:.4f}s  p90 {latency.p90:.4f}s  "
+            f"p99 {latency.p99:.4f}s  {latency.throughput:.2f}/s",
+            flush=True,
+        )
+
+    if "generate" in args.scenarios:
+        # a new seed per request, so that no fitted strategy is reused from the
+        # cache and every generation fits the model, the first requests warm up
+        # the processes of the pool
+        n_warmup = generation_pool.size
+        strategy_data = workload.request.strategy_data
+        bodies = [
+            workload.request.model_copy(
+                update={
+                    "strategy_data": strategy_data.model_copy(
+                        update={"seed": strategy_data.seed + i}
+                    )
+                }
+            ).model_dump_json()
+            for i in range(n_warmup + args.generate_repeats)
+        ]
+
+        def generate(i):
+            check(
+                client.post("/candidates/generate", content=bodies[i], headers=headers)
+            )
+
+        measure(generate, n_warmup, concurrency=n_warmup)
+        record(
+            "generate",
+            measure(
+                lambda i: generate(n_warmup + i),
+                args.generate_repeats,
+                args.concurrency,
+            ),
+        )
+
+    body = workload.request.model_dump_json()
+    candidates = workload.candidates.model_dump_json()
+    created_ids = []
+
+    def roundtrip(i):
+        proposal = check(client.post("/proposals", content=body, headers=headers))
+        created_ids.append(proposal.json()["id"])
+        claimed = check(client.get("/proposals/claim")).json()
+        check(
+            client.post(
+                f"/proposals/{claimed['id']}/mark_processed",
+                params={"claim": claimed["n_claims"]},
+                content=candidates,
+                headers=headers,
+            )
+        )
+
+    if "roundtrip" in args.scenarios or "list" in args.scenarios:
+        latency = measure(roundtrip, args.repeats, args.concurrency)
+        if "roundtrip" in args.scenarios:
+            record("roundtrip", latency)
+
+    if "list" in args.scenarios:
+        # the page of the proposals created by the round trips
+        params = {"cursor": min(created_ids) - 1, "limit": args.repeats}
+        record(
+            "list",
+            measure(
+                lambda i: check(client.get("/proposals", params=params)),
+                args.repeats,
+                args.concurrency,
+            ),
+        )
+    return results
+
+
+def run(args: argparse.Namespace) -> None:
+    from bofire_candidates_api.benchmark import (
+        BenchmarkRun,
+        create_workload,
+        environment,
+        git_commit,
+    )
+
+    benchmark_run = BenchmarkRun(
+        commit=git_commit(),
+        created_at=datetime.datetime.now(tz=datetime.timezone.utc),
+        environment=environment(),
+        config={k: v for k, v in vars(args).items() if k not in ("command", "func")},
+    )
+    with tempfile.TemporaryDirectory() as db_dir:
+        with create_client(args.store, db_dir) as client:
+            for name in args.workloads:
+                for n_experiments in args.n_experiments:
+                    workload = create_workload(
+                        name, n_experiments, args.strategy, args.n_candidates
+                    )
+                    benchmark_run.results.extend(
+                        benchmark_workload(client, workload, args)
+                    )
+
+    with open(args.output, "w") as f:
+        f.write(benchmark_run.model_dump_json(indent=2))
+    print(f"results written to {args.output}")
+
+
+def compare(args: argparse.Namespace) -> None:
+    from bofire_candidates_api.benchmark import BenchmarkRun, compare
+
+    runs = []
+    for path in (args.baseline, args.current):
+        with open(path) as f:
+            runs.append(BenchmarkRun.model_validate_json(f.read()))
+    baseline, current = runs
+    print(f"baseline {baseline.commit}, current {current.commit}")
+
+    regressions = 0
+    for comparison in compare(baseline, current, args.statistic):
+        regressed = comparison.ratio > args.threshold
+        regressions += regressed
+        print(
+            f"{comparison.scenario:>10} {comparison.workload:>12} "
+            f"{comparison.n_experiments:>5}  {comparison.baseline:.4f}s -> "
+            f"{comparison.current:.4f}s  x{comparison.ratio:.2f}"
+            + ("  REGRESSION" if regressed else "")
+        )
+    if regressions > 0:
+        sys.exit(f"{regressions} results regressed by more than x{args.threshold}")
+
+
+def replay(args: argparse.Namespace) -> None:
+    from bofire_candidates_api.benchmark import environment, git_commit
+    from bofire_candidates_api.capture import read_capture
+    from bofire_candidates_api.replay import Replay, summarize_replay
+
+    captured = read_capture(args.capture)
+    # local workers process the proposals of the replay
+    workers = [
+        subprocess.Popen(
+            [sys.executable, WORKER_DIR],
+            env={**os.environ, "BACKEND_URL": args.url},
+        )
+        for _ in range(args.workers)
+    ]
+    try:
+        start = time.perf_counter()
+        replayed = Replay(
+            url=args.url,
+            speed=args.speed,
+            max_in_flight=args.max_in_flight,
+            poll_interval=args.poll_interval,
+            timeout=args.timeout,
+        ).run(captured)
+        elapsed = time.perf_counter() - start
+    finally:
+        for worker in workers:
+            worker.terminate()
+        for worker in workers:
+            worker.wait()
+
+    summaries = summarize_replay(replayed, elapsed)
+    for path, timings in summaries.items():
+        for name, summary in timings.items():
+            print(
+                f"{path:>28} {name:>12}  n {summary.n:>5}  p50 {summary.p50:.4f}s  "
+                f"p90 {summary.p90:.4f}s  p99 {summary.p99:.4f}s"
+            )
+    print(f"replayed {len(replayed)} requests in {elapsed:.1f}s")
+
+    report = {
+        "commit": git_commit(),
+        "created_at": datetime.datetime.now(tz=datetime.timezone.utc).isoformat(),
+        "environment": environment(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("command", "func")},
+        "elapsed": elapsed,
+        "summaries": {
+            path: {name: s.model_dump() for name, s in timings.items()}
+            for path, timings in summaries.items()
+        },
+        "requests": [r.model_dump() for r in replayed],
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"report written to {args.output}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="benchmarks",
+        description="Benchmark the candidates API in-process on BoFire benchmark "
+        "domains.",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Run the benchmarks")
+    run_parser.add_argument(
+        "--workloads",
+        nargs="+",
+        default=["himmelblau", "hartmann6", "constrained", "categorical"],
+    )
+    run_parser.add_argument("--n-experiments", nargs="+", type=int, default=[10, 50])
+    run_parser.add_argument(
+        "--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS
+    )
+    run_parser.add_argument("--strategy", choices=["random", "sobo"], default="sobo")
+    run_parser.add_argument("--n-candidates", type=int, default=1)
+    run_parser.add_argument("--repeats", type=int, default=50)
+    run_parser.add_argument("--generate-repeats", type=int, default=5)
+    run_parser.add_argument("--concurrency", type=int, default=1)
+    run_parser.add_argument("--store", choices=["sqlite", "tinydb"], default="sqlite")
+    run_parser.add_argument("--output", default="benchmark.json")
+    run_parser.set_defaults(func=run)
+
+    compare_parser = commands.add_parser(
+        "compare", help="Compare the results of two runs"
+    )
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--statistic", choices=STATISTICS, default="p50")
+    compare_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.2,
+        help="Ratio of the statistics above which a result counts as regression",
+    )
+    compare_parser.set_defaults(func=compare)
+
+    replay_parser = commands.add_parser(
+        "replay", help="Replay captured requests against a running API"
+    )
+    replay_parser.add_argument("capture", help="JSONL file written by the capture")
+    replay_parser.add_argument("--url", default="http://localhost:8000")
+    replay_parser.add_argument(
+        "--speed",
+        type=float,
+        default=1.0,
+        help="Factor of the captured rate, 0 sends as fast as possible",
+    )
+    replay_parser.add_argument("--max-in-flight", type=int, default=64)
+    replay_parser.add_argument(
+        "--workers", type=int, default=0, help="Number of local workers to start"
+    )
+    replay_parser.add_argument("--poll-interval", type=float, default=1.0)
+    replay_parser.add_argument("--timeout", type=float, default=600.0)
+    replay_parser.add_argument("--output", default="replay.json")
+    replay_parser.set_defaults(func=replay)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
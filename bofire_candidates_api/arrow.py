@@ -0,0 +1,210 @@
+import json
+from typing import Any, Callable, Coroutine, Dict, Mapping, Optional, Tuple
+
+import pandas as pd
+from bofire.data_models.base import BaseModel
+from fastapi import HTTPException, Request, Response
+from fastapi.routing import APIRoute
+
+from bofire_candidates_api.data_models import VALIDATION_SECONDS, CandidatesRequest
+
+
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+# key of the schema metadata which holds the JSON part of a message
+DOCUMENT_KEY = b"bofire_candidates_api.document"
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc  # noqa: F401
+    except ImportError:
+        raise HTTPException(
+            status_code=415,
+            detail="The Arrow IPC format requires pyarrow to be installed",
+        )
+    return pyarrow
+
+
+def encode_frame(
+    frame: Optional[pd.DataFrame], document: Optional[Dict[str, Any]] = None
+) -> bytes:
+    """Encode a data frame as Arrow IPC stream.
+
+    Args:
+        frame (Optional[pd.DataFrame]): The data frame, None encodes an empty table.
+        document (Optional[Dict[str, Any]], optional): JSON compatible document
+            which is stored in the schema metadata. Defaults to None.
+
+    Returns:
+        bytes: The Arrow IPC stream.
+    """
+    pa = _pyarrow()
+    if frame is None:
+        table = pa.table({})
+    else:
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+    if document is not None:
+        table = table.replace_schema_metadata({DOCUMENT_KEY: json.dumps(document)})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def decode_frame(
+    body: bytes,
+) -> Tuple[Optional[pd.DataFrame], Optional[Dict[str, Any]]]:
+    """Decode an Arrow IPC stream into a data frame.
+
+    Args:
+        body (bytes): The Arrow IPC stream.
+
+    Raises:
+        HTTPException: Status code 400 if the body is not a valid Arrow IPC stream.
+
+    Returns:
+        Tuple[Optional[pd.DataFrame], Optional[Dict[str, Any]]]: The data frame,
+            None for a table without columns, and the document of the metadata.
+    """
+    pa = _pyarrow()
+    try:
+        table = pa.ipc.open_stream(body).read_all()
+    except pa.ArrowInvalid as e:
+        raise HTTPException(status_code=400, detail=f"Invalid Arrow IPC stream: {e}")
+    metadata = table.schema.metadata or {}
+    document = json.loads(metadata[DOCUMENT_KEY]) if DOCUMENT_KEY in metadata else None
+    if table.num_columns == 0:
+        return None, document
+    return table.replace_schema_metadata(None).to_pandas(), document
+
+
+def encode_request(model: BaseModel, experiments: Optional[pd.DataFrame]) -> bytes:
+    """Encode a request for sending it in the Arrow IPC format.
+
+    The experiments are sent as columns, the remaining fields of the request
+    are sent as JSON in the schema metadata.
+
+    Args:
+        model (BaseModel): The request without experiments.
+        experiments (Optional[pd.DataFrame]): The experiments.
+
+    Returns:
+        bytes: The Arrow IPC stream.
+    """
+    return encode_frame(experiments, model.model_dump(mode="json"))
+
+
+def is_arrow(media_type: Optional[str]) -> bool:
+    """Check whether a content type or an accept header names the Arrow format.
+
+    Args:
+        media_type (Optional[str]): The header value.
+
+    Returns:
+        bool: True if the Arrow IPC stream format is requested.
+    """
+    return media_type is not None and ARROW_MEDIA_TYPE in media_type
+
+
+def arrow_response(
+    frame: pd.DataFrame, headers: Optional[Mapping[str, str]] = None
+) -> Response:
+    """Create a response which contains a data frame as Arrow IPC stream.
+
+    Args:
+        frame (pd.DataFrame): The data frame.
+        headers (Optional[Mapping[str, str]], optional): Additional headers of the
+            response. Defaults to None.
+
+    Returns:
+        Response: The response.
+    """
+    response = Response(content=encode_frame(frame), media_type=ARROW_MEDIA_TYPE)
+    for key, value in (headers or {}).items():
+        if key.lower() not in ("content-length", "content-type"):
+            response.headers[key] = value
+    return response
+
+
+def request_frame(request: Request) -> Optional[pd.DataFrame]:
+    """Get the data frame which was sent in the Arrow body of a request.
+
+    Args:
+        request (Request): The request.
+
+    Returns:
+        Optional[pd.DataFrame]: The data frame, None for JSON requests.
+    """
+    return getattr(request.state, "frame", None)
+
+
+def request_experiments(
+    request: Request, candidate_request: CandidatesRequest
+) -> Optional[pd.DataFrame]:
+    """Get and validate the experiments which were sent in an Arrow body.
+
+    Args:
+        request (Request): The request.
+        candidate_request (CandidatesRequest): The JSON document of the request.
+
+    Raises:
+        HTTPException: Status code 400 if the experiments were also sent within the
+            document and status code 422 if they do not match the domain.
+
+    Returns:
+        Optional[pd.DataFrame]: The validated experiments, None for JSON requests.
+    """
+    frame = request_frame(request)
+    if frame is None:
+        return None
+    if candidate_request.experiments is not None:
+        raise HTTPException(
+            status_code=400,
+            detail="Experiments must be sent either as columns or in the document",
+        )
+    try:
+        with VALIDATION_SECONDS.time(kind="experiments"):
+            return candidate_request.strategy_data.domain.validate_experiments(frame)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+class ArrowRequest(Request):
+    """Request with an Arrow IPC body, which is presented as its JSON document.
+
+    The data frame of the body is kept in `request.state.frame`, so that it is
+    handed to pandas without building Python objects per row.
+    """
+
+    async def body(self) -> bytes:
+        if not hasattr(self, "_body"):
+            frame, document = decode_frame(await super().body())
+            self.state.frame = frame
+            self._body = json.dumps(document or {}).encode()
+        return self._body
+
+
+class ArrowRoute(APIRoute):
+    """Route which accepts Arrow IPC bodies in addition to JSON bodies."""
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        original_route_handler = super().get_route_handler()
+
+        async def route_handler(request: Request) -> Response:
+            if is_arrow(request.headers.get("content-type")):
+                _pyarrow()
+                headers = [
+                    (k, v) for k, v in request.scope["headers"] if k != b"content-type"
+                ]
+                request = ArrowRequest(
+                    {
+                        **request.scope,
+                        "headers": headers + [(b"content-type", b"application/json")],
+                    },
+                    request.receive,
+                )
+            return await original_route_handler(request)
+
+        return route_handler
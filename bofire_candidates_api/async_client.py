@@ -0,0 +1,362 @@
+import asyncio
+from typing import TYPE_CHECKING, Dict, List, Literal, Optional, Union
+
+from bofire.data_models.dataframes.api import Candidates
+from pydantic import BaseModel, Field, PrivateAttr, field_validator
+
+from bofire_candidates_api.compression import supported_encodings
+from bofire_candidates_api.data_models import (
+    TRUSTED,
+    CandidatesProposal,
+    GenerationProfile,
+    MarkProcessedBatchItem,
+    ProcessedProposal,
+    ProposalStateEnum,
+    load_trusted_json,
+)
+from bofire_candidates_api.worker import (
+    CLAIM_TIMEOUT_MARGIN,
+    RETRY_STATUSES,
+    _batch_items_adapter,
+    _proposals_adapter,
+    check_claim,
+    claim_query,
+    encode_body,
+)
+
+
+if TYPE_CHECKING:
+    import httpx
+
+
+def _httpx():
+    try:
+        import httpx
+    except ImportError:
+        return None
+    return httpx
+
+
+class AsyncClient(BaseModel):
+    """Asynchronous variant of the `Client` of the BoFire candidates API.
+
+    The client keeps a pool of connections to the API alive and should be closed
+    with `aclose` or used as an async context manager. Like the `Client`, requests
+    which can safely be repeated are retried with exponential backoff after
+    transient errors, claims are only retried if they could not be sent.
+
+    Requires the `async` extra.
+    """
+
+    url: str = "http://localhost:8000"
+    compression: Optional[Literal["gzip", "zstd"]] = "gzip"
+    retries: int = Field(default=3, ge=0)
+    backoff_factor: float = Field(default=0.5, ge=0)
+    pool_maxsize: int = Field(default=10, gt=0)
+    _client: Optional["httpx.AsyncClient"] = PrivateAttr(default=None)
+
+    @field_validator("compression")
+    @classmethod
+    def validate_compression(cls, compression: Optional[str]) -> Optional[str]:
+        """Validate that the compression of request bodies is available.
+
+        Raises:
+            ValueError: If httpx is not installed or zstd is chosen but zstandard
+                is not installed.
+        """
+        if _httpx() is None:
+            raise ValueError("The AsyncClient requires the `async` extra")
+        if compression is not None and compression not in supported_encodings():
+            raise ValueError(
+                f"Compression {compression} requires the `compression` extra"
+            )
+        return compression
+
+    @property
+    def client(self) -> "httpx.AsyncClient":
+        """The HTTP client, created on first use."""
+        if self._client is None:
+            httpx = _httpx()
+            self._client = httpx.AsyncClient(
+                base_url=self.url,
+                headers=self.headers,
+                timeout=None,
+                limits=httpx.Limits(
+                    max_connections=self.pool_maxsize,
+                    max_keepalive_connections=self.pool_maxsize,
+                ),
+                # the transport only retries failed connections
+                transport=httpx.AsyncHTTPTransport(retries=self.retries),
+            )
+        return self._client
+
+    async def aclose(self):
+        """Close the connections of the client."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def __aenter__(self) -> "AsyncClient":
+        return self
+
+    async def __aexit__(self, *args):
+        await self.aclose()
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        """Get the headers for the API requests.
+
+        Returns:
+            dict: The headers for the API requests.
+        """
+        return {"accept": "application/json", "Content-Type": "application/json"}
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        content: Optional[bytes] = None,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None,
+        idempotent: bool = True,
+    ) -> "httpx.Response":
+        """Send a request to the API.
+
+        Idempotent requests are repeated up to `retries` times after read errors
+        and the status codes in `RETRY_STATUSES`, waiting `backoff_factor * 2**n`
+        seconds before the n-th repetition.
+
+        Args:
+            method (str): The HTTP method.
+            path (str): The endpoint to send the request to.
+            content (Optional[bytes], optional): The body. Defaults to None.
+            headers (Optional[Dict[str, str]], optional): Additional headers.
+                Defaults to None.
+            timeout (Optional[float], optional): Timeout of the request in seconds.
+                Defaults to None.
+            idempotent (bool, optional): Whether the request can be repeated after
+                it reached the API. Defaults to True.
+
+        Returns:
+            httpx.Response: The response from the API, the last one if all
+                repetitions failed.
+        """
+        httpx = _httpx()
+        attempts = self.retries + 1 if idempotent else 1
+        for attempt in range(attempts):
+            if attempt > 0:
+                await asyncio.sleep(self.backoff_factor * 2 ** (attempt - 1))
+            try:
+                response = await self.client.request(
+                    method, path, content=content, headers=headers, timeout=timeout
+                )
+            except (httpx.ReadError, httpx.RemoteProtocolError):
+                if attempt == attempts - 1:
+                    raise
+                continue
+            if response.status_code not in RETRY_STATUSES:
+                break
+        return response
+
+    async def get(
+        self, path: str, timeout: Optional[float] = None, idempotent: bool = True
+    ) -> "httpx.Response":
+        """Send a GET request to the API.
+
+        Args:
+            path (str): The enpoint to send the request to.
+            timeout (Optional[float], optional): Timeout of the request in seconds.
+                Defaults to None.
+            idempotent (bool, optional): Whether the request can be repeated after
+                it reached the API. Defaults to True.
+
+        Returns:
+            httpx.Response: The response from the API.
+        """
+        return await self.request("GET", path, timeout=timeout, idempotent=idempotent)
+
+    async def post(
+        self, path: str, request_body: Union[Dict, List, BaseModel]
+    ) -> "httpx.Response":
+        """Send a POST request to the API.
+
+        The body is serialized and compressed by `encode_body`.
+
+        Args:
+            path (str): The endpoint to send the request to.
+            request_body (Union[Dict, List, BaseModel]): The body of the request.
+
+        Returns:
+            httpx.Response: The response from the API.
+        """
+        data, headers = encode_body(request_body, self.compression)
+        return await self.request("POST", path, content=data, headers=headers)
+
+    async def get_version(self) -> str:
+        """Get the version of the API.
+
+        Returns:
+            str: The version of the API.
+        """
+        response = await self.get("/versions")
+        return response.json()
+
+    async def claim_proposal(
+        self,
+        wait: float = 0,
+        tags: Optional[List[str]] = None,
+        max_cost: Optional[float] = None,
+    ) -> Optional[CandidatesProposal]:
+        """Claim a proposal from the API.
+
+        Args:
+            wait (float, optional): Time in seconds the API holds the request open
+                until a proposal becomes available. Defaults to 0.
+            tags (Optional[List[str]], optional): Capabilities of the worker, only
+                proposals which require none but these are claimed. Defaults to None.
+            max_cost (Optional[float], optional): Largest estimated cost the worker
+                takes on. Defaults to None which means no limit.
+
+        Returns:
+            Optional[CandidatesProposal]: The claimed proposal.
+        """
+        response = await self.get(
+            f"/proposals/claim?{claim_query(wait, tags, max_cost)}",
+            timeout=wait + CLAIM_TIMEOUT_MARGIN,
+            idempotent=False,
+        )
+        if response.status_code == 404:
+            return None
+        return load_trusted_json(CandidatesProposal, response.content)
+
+    async def claim_proposals(
+        self,
+        max: int,
+        wait: float = 0,
+        tags: Optional[List[str]] = None,
+        max_cost: Optional[float] = None,
+    ) -> List[CandidatesProposal]:
+        """Claim several proposals from the API in one request.
+
+        Args:
+            max (int): The maximum number of proposals to claim.
+            wait (float, optional): Time in seconds the API holds the request open
+                until a proposal becomes available. Defaults to 0.
+            tags (Optional[List[str]], optional): Capabilities of the worker, only
+                proposals which require none but these are claimed. Defaults to None.
+            max_cost (Optional[float], optional): Largest estimated cost the worker
+                takes on. Defaults to None which means no limit.
+
+        Returns:
+            List[CandidatesProposal]: The claimed proposals.
+        """
+        response = await self.get(
+            f"/proposals/claim/batch?{claim_query(wait, tags, max_cost, max)}",
+            timeout=wait + CLAIM_TIMEOUT_MARGIN,
+            idempotent=False,
+        )
+        return _proposals_adapter.validate_json(response.content, context=TRUSTED)
+
+    async def mark_processed(
+        self, proposal_id: int, claim: int, candidates: Candidates
+    ) -> ProposalStateEnum:
+        """Mark a proposal as processed in the API.
+
+        Args:
+            proposal_id (int): The ID of the proposal to mark as processed.
+            claim (int): The claim token, `n_claims` of the claimed proposal.
+            candidates (Candidates): The candidates generated by the proposal.
+
+        Raises:
+            ClaimLostError: If the proposal is no longer held by the claim.
+
+        Returns:
+            ProposalStateEnum: The state of the proposal after marking it as processed.
+        """
+        response = await self.post(
+            f"/proposals/{proposal_id}/mark_processed?claim={claim}",
+            request_body=candidates,
+        )
+        return ProposalStateEnum(check_claim(response).json())
+
+    async def mark_processed_batch(
+        self, processed: List[ProcessedProposal]
+    ) -> List[MarkProcessedBatchItem]:
+        """Mark several proposals as processed in the API with one request.
+
+        Args:
+            processed (List[ProcessedProposal]): The candidates and claim tokens of
+                the proposals.
+
+        Raises:
+            httpx.HTTPStatusError: If the API rejected the batch.
+
+        Returns:
+            List[MarkProcessedBatchItem]: The state or the error of each proposal.
+        """
+        response = await self.post(
+            "/proposals/mark_processed/batch", request_body=processed
+        )
+        response.raise_for_status()
+        return _batch_items_adapter.validate_json(response.content)
+
+    async def heartbeat(self, proposal_id: int, claim: int) -> ProposalStateEnum:
+        """Renew the lease of a claimed proposal in the API.
+
+        Args:
+            proposal_id (int): The ID of the proposal which is processed.
+            claim (int): The claim token, `n_claims` of the claimed proposal.
+
+        Raises:
+            ClaimLostError: If the proposal is no longer held by the claim.
+
+        Returns:
+            ProposalStateEnum: The state of the proposal, CLAIMED.
+        """
+        response = await self.post(
+            f"/proposals/{proposal_id}/heartbeat?claim={claim}", request_body={}
+        )
+        return ProposalStateEnum(check_claim(response).json())
+
+    async def store_profile(
+        self, proposal_id: int, claim: int, profile: GenerationProfile
+    ) -> ProposalStateEnum:
+        """Store the profile of the generation of a proposal in the API.
+
+        Args:
+            proposal_id (int): The ID of the profiled proposal.
+            claim (int): The claim token, `n_claims` of the claimed proposal.
+            profile (GenerationProfile): The profile of the generation.
+
+        Raises:
+            ClaimLostError: If the proposal is no longer held by the claim.
+
+        Returns:
+            ProposalStateEnum: The state of the proposal, CLAIMED.
+        """
+        response = await self.post(
+            f"/proposals/{proposal_id}/profile?claim={claim}", request_body=profile
+        )
+        return ProposalStateEnum(check_claim(response).json())
+
+    async def mark_failed(
+        self, proposal_id: int, claim: int, error_message: str
+    ) -> ProposalStateEnum:
+        """Mark a proposal as failed in the API.
+
+        Args:
+            proposal_id (int): The ID of the proposal to mark as failed.
+            claim (int): The claim token, `n_claims` of the claimed proposal.
+            error_message (str): The error message to store.
+
+        Raises:
+            ClaimLostError: If the proposal is no longer held by the claim.
+
+        Returns:
+            ProposalStateEnum: The state of the proposal after marking it as failed.
+        """
+        response = await self.post(
+            f"/proposals/{proposal_id}/mark_failed?claim={claim}",
+            request_body={"msg": error_message},
+        )
+        return ProposalStateEnum(check_claim(response).json())
@@ -0,0 +1,143 @@
+import os
+from collections import defaultdict
+from functools import partial
+from typing import Annotated, Any, Callable, Dict, List, Union
+
+import pandas as pd
+from bofire.data_models.constraints.api import ConstraintNotFulfilledError
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from pydantic import ValidationError, WithJsonSchema
+
+from bofire_candidates_api.data_models import (
+    BatchError,
+    CandidatesRequest,
+    load_trusted,
+)
+
+
+BATCH_MAX_SIZE = int(os.environ.get("BATCH_MAX_SIZE", 1000))
+
+# items of a batch body, they are parsed one by one by `parse_batch` so that an
+# invalid item does not fail the batch, the schema documents them as requests
+BatchItem = Annotated[
+    Dict[str, Any],
+    WithJsonSchema({"$ref": "#/components/schemas/CandidatesRequest"}),
+]
+
+
+def batch_error(error: HTTPException) -> BatchError:
+    """Convert the error of a batch item into its response model.
+
+    Args:
+        error (HTTPException): The error of the item.
+
+    Returns:
+        BatchError: The status code and detail of the error.
+    """
+    return BatchError(status_code=error.status_code, detail=error.detail)
+
+
+def _validate_group(
+    items: Dict[int, pd.DataFrame], validate: Callable[[pd.DataFrame], Any]
+) -> Dict[int, HTTPException]:
+    """Validate the frames of several items against their shared domain.
+
+    Frames with the same columns are validated together in a single call. The
+    checks of the domain work row by row, except for the ones on empty frames and
+    unique labcodes, so a combined frame without errors implies that each frame is
+    valid. Frames with different columns are validated one by one, since
+    concatenating them would fill a column missing from one frame with NaN and
+    hide its error. The frames are also validated one by one to find the invalid
+    items if the combined validation fails.
+
+    Args:
+        items (Dict[int, pd.DataFrame]): The frames keyed by the index of the item.
+        validate (Callable[[pd.DataFrame], Any]): Validates a frame against the
+            shared domain, raises if it is invalid.
+
+    Returns:
+        Dict[int, HTTPException]: The errors keyed by the index of the item.
+    """
+    frames = list(items.values())
+    if (
+        len(frames) > 1
+        and all(len(frame) > 0 for frame in frames)
+        and all(frame.columns.equals(frames[0].columns) for frame in frames)
+    ):
+        try:
+            validate(pd.concat(frames, ignore_index=True))
+            return {}
+        except (ValueError, ConstraintNotFulfilledError):
+            pass
+    errors = {}
+    for i, frame in items.items():
+        try:
+            validate(frame)
+        except (ValueError, ConstraintNotFulfilledError) as e:
+            errors[i] = HTTPException(status_code=422, detail=str(e))
+    return errors
+
+
+def parse_batch(
+    items: List[Dict[str, Any]],
+) -> List[Union[CandidatesRequest, HTTPException]]:
+    """Parse and validate the items of a batch of candidate requests.
+
+    The items are parsed without their domain validators first. Then the
+    experiments and pendings of all items sharing a domain are validated against
+    it at once, instead of once per item.
+
+    Args:
+        items (List[Dict[str, Any]]): The JSON documents of the requests.
+
+    Raises:
+        HTTPException: Status code 413 if the batch has more than `BATCH_MAX_SIZE`
+            items.
+
+    Returns:
+        List[Union[CandidatesRequest, HTTPException]]: The validated request or
+            the error of each item.
+    """
+    if len(items) > BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch has {len(items)} items, at most {BATCH_MAX_SIZE} are allowed",
+        )
+    results: List[Union[CandidatesRequest, HTTPException]] = []
+    groups: Dict[str, List[int]] = defaultdict(list)
+    for i, item in enumerate(items):
+        try:
+            request = load_trusted(CandidatesRequest, item)
+        except ValidationError as e:
+            results.append(
+                HTTPException(
+                    status_code=422,
+                    detail=jsonable_encoder(e.errors(include_url=False)),
+                )
+            )
+            continue
+        results.append(request)
+        groups[request.strategy_data.domain.model_dump_json()].append(i)
+
+    for indices in groups.values():
+        domain = results[indices[0]].strategy_data.domain
+        errors = _validate_group(
+            {
+                i: results[i].experiments.to_pandas()
+                for i in indices
+                if results[i].experiments is not None
+            },
+            domain.validate_experiments,
+        )
+        pendings_errors = _validate_group(
+            {
+                i: results[i].pendings.to_pandas()
+                for i in indices
+                if results[i].pendings is not None and i not in errors
+            },
+            partial(domain.validate_candidates, only_inputs=True),
+        )
+        for i, error in {**errors, **pendings_errors}.items():
+            results[i] = error
+    return results
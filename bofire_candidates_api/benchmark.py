@@ -0,0 +1,287 @@
+import datetime
+import os
+import platform
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import bofire
+import bofire.strategies.api as strategies
+import numpy as np
+import pandas as pd
+from bofire.benchmarks.api import Ackley, Hartmann, Himmelblau
+from bofire.data_models.constraints.api import LinearInequalityConstraint
+from bofire.data_models.dataframes.api import Candidates, Experiments
+from bofire.data_models.domain.api import Domain
+from bofire.data_models.strategies.api import RandomStrategy, SoboStrategy
+from pydantic import BaseModel, Field
+
+from bofire_candidates_api.data_models import CandidatesRequest
+
+
+# seed of the sampled experiments, so that the workloads are the same for every run
+BENCHMARK_SEED = 42
+
+STRATEGIES = {"random": RandomStrategy, "sobo": SoboStrategy}
+
+
+def _constrained_hartmann() -> Tuple[Domain, Callable[[pd.DataFrame], pd.DataFrame]]:
+    bench = Hartmann(dim=6)
+    domain = Domain(
+        inputs=bench.domain.inputs,
+        outputs=bench.domain.outputs,
+        constraints=[
+            LinearInequalityConstraint(
+                features=["x_0", "x_1", "x_2"], coefficients=[1, 1, 1], rhs=1.0
+            )
+        ],
+    )
+    return domain, bench.f
+
+
+def _benchmark(
+    create: Callable[[], Any],
+) -> Callable[[], Tuple[Domain, Callable[[pd.DataFrame], pd.DataFrame]]]:
+    def domain_and_function():
+        bench = create()
+        return bench.domain, bench.f
+
+    return domain_and_function
+
+
+# domains of the workloads and the functions which evaluate their experiments
+WORKLOADS: Dict[
+    str, Callable[[], Tuple[Domain, Callable[[pd.DataFrame], pd.DataFrame]]]
+] = {
+    "himmelblau": _benchmark(Himmelblau),
+    "hartmann6": _benchmark(lambda: Hartmann(dim=6)),
+    "constrained": _constrained_hartmann,
+    "categorical": _benchmark(lambda: Ackley(categorical=True, dim=4)),
+}
+
+
+class Workload(BaseModel):
+    """A candidate generation request of a benchmark."""
+
+    name: str = Field(description="Name of the workload, a key of `WORKLOADS`")
+    n_experiments: int = Field(description="Number of experiments of the request")
+    request: CandidatesRequest = Field(description="The request")
+    candidates: Candidates = Field(
+        description="Valid candidates for the request, used to mark its proposals "
+        "as processed"
+    )
+
+
+def create_workload(
+    name: str,
+    n_experiments: int,
+    strategy: str = "sobo",
+    n_candidates: int = 1,
+    seed: int = BENCHMARK_SEED,
+) -> Workload:
+    """Create a workload with experiments sampled from a benchmark domain.
+
+    The experiments are sampled with the random strategy, so that they fulfill
+    the constraints of the domain, and evaluated with the benchmark function.
+
+    Args:
+        name (str): The name of the workload, a key of `WORKLOADS`.
+        n_experiments (int): The number of experiments.
+        strategy (str, optional): The strategy of the request, a key of
+            `STRATEGIES`. Defaults to "sobo".
+        n_candidates (int, optional): The number of candidates to generate.
+            Defaults to 1.
+        seed (int, optional): The seed of the sampled experiments. Defaults to
+            BENCHMARK_SEED.
+
+    Raises:
+        ValueError: If the workload or the strategy is unknown.
+
+    Returns:
+        Workload: The workload.
+    """
+    if name not in WORKLOADS:
+        raise ValueError(f"Unknown workload {name}, choose from {list(WORKLOADS)}")
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown strategy {strategy}, choose from {list(STRATEGIES)}")
+    domain, f = WORKLOADS[name]()
+    sampler = strategies.map(RandomStrategy(domain=domain, seed=seed))
+    experiments = f(sampler.ask(n_experiments), return_complete=True)
+    candidates = sampler.ask(n_candidates)[domain.inputs.get_keys()]
+    return Workload(
+        name=name,
+        n_experiments=n_experiments,
+        request=CandidatesRequest(
+            strategy_data=STRATEGIES[strategy](domain=domain, seed=seed),
+            n_candidates=n_candidates,
+            experiments=Experiments.from_pandas(experiments, domain),
+        ),
+        candidates=Candidates.from_pandas(candidates, domain),
+    )
+
+
+class LatencySummary(BaseModel):
+    """Latency percentiles and throughput of repeated calls."""
+
+    n: int = Field(description="Number of calls")
+    mean: float = Field(description="Mean latency in seconds")
+    p50: float = Field(description="Median latency in seconds")
+    p90: float = Field(description="90th percentile of the latency in seconds")
+    p99: float = Field(description="99th percentile of the latency in seconds")
+    max: float = Field(description="Maximum latency in seconds")
+    throughput: float = Field(description="Calls per second of wall time")
+
+
+def summarize(latencies: Sequence[float], elapsed: float) -> LatencySummary:
+    """Summarize the latencies of repeated calls.
+
+    Args:
+        latencies (Sequence[float]): The latency of each call in seconds.
+        elapsed (float): The wall time of all calls in seconds.
+
+    Returns:
+        LatencySummary: The summary.
+    """
+    p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+    return LatencySummary(
+        n=len(latencies),
+        mean=float(np.mean(latencies)),
+        p50=float(p50),
+        p90=float(p90),
+        p99=float(p99),
+        max=float(np.max(latencies)),
+        throughput=len(latencies) / elapsed,
+    )
+
+
+def measure(
+    call: Callable[[int], Any], repeats: int, concurrency: int = 1
+) -> LatencySummary:
+    """Measure the latency of repeated calls.
+
+    Args:
+        call (Callable[[int], Any]): The function to measure, called with the index
+            of the repetition.
+        repeats (int): The number of calls.
+        concurrency (int, optional): The number of concurrent calls. Defaults to 1.
+
+    Returns:
+        LatencySummary: The summary of the latencies.
+    """
+
+    def timed(i: int) -> float:
+        start = time.perf_counter()
+        call(i)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    if concurrency == 1:
+        latencies = [timed(i) for i in range(repeats)]
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            latencies = list(executor.map(timed, range(repeats)))
+    return summarize(latencies, time.perf_counter() - start)
+
+
+class BenchmarkResult(BaseModel):
+    """Result of a scenario of a benchmark run on a workload."""
+
+    scenario: str = Field(description="The measured operation")
+    workload: str = Field(description="Name of the workload")
+    n_experiments: int = Field(description="Number of experiments of the workload")
+    latency: LatencySummary = Field(description="Latency and throughput")
+
+    @property
+    def key(self) -> Tuple[str, str, int]:
+        return self.scenario, self.workload, self.n_experiments
+
+
+class BenchmarkRun(BaseModel):
+    """Results of a benchmark run and the environment they were measured in."""
+
+    commit: Optional[str] = Field(
+        default=None, description="Git commit of the benchmarked code"
+    )
+    created_at: datetime.datetime = Field(description="Start of the run")
+    environment: Dict[str, str] = Field(description="Versions and platform")
+    config: Dict[str, Any] = Field(description="Options of the run")
+    results: List[BenchmarkResult] = Field(default=[], description="The results")
+
+
+def git_commit() -> Optional[str]:
+    """Get the checked out commit of this package, flagged with `-dirty` if there
+    are uncommitted changes.
+
+    Returns:
+        Optional[str]: The commit, None if it cannot be determined.
+    """
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty", "--abbrev=40"],
+            capture_output=True,
+            check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment() -> Dict[str, str]:
+    """Describe the environment of a benchmark run.
+
+    Returns:
+        Dict[str, str]: The versions of Python and BoFire and the platform.
+    """
+    return {
+        "python": platform.python_version(),
+        "bofire": bofire.__version__,
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+    }
+
+
+class BenchmarkComparison(BaseModel):
+    """Change of a latency statistic between two benchmark runs."""
+
+    scenario: str = Field(description="The measured operation")
+    workload: str = Field(description="Name of the workload")
+    n_experiments: int = Field(description="Number of experiments of the workload")
+    baseline: float = Field(description="Statistic of the baseline run")
+    current: float = Field(description="Statistic of the current run")
+    ratio: float = Field(description="Current divided by baseline")
+
+
+def compare(
+    baseline: BenchmarkRun, current: BenchmarkRun, statistic: str = "p50"
+) -> List[BenchmarkComparison]:
+    """Compare the results which two benchmark runs have in common.
+
+    Args:
+        baseline (BenchmarkRun): The baseline run, e.g. of the main branch.
+        current (BenchmarkRun): The run to compare with the baseline.
+        statistic (str, optional): The field of `LatencySummary` to compare.
+            Defaults to "p50".
+
+    Returns:
+        List[BenchmarkComparison]: The comparisons in the order of the current run.
+    """
+    baseline_results = {result.key: result for result in baseline.results}
+    comparisons = []
+    for result in current.results:
+        if result.key not in baseline_results:
+            continue
+        before = getattr(baseline_results[result.key].latency, statistic)
+        after = getattr(result.latency, statistic)
+        comparisons.append(
+            BenchmarkComparison(
+                scenario=result.scenario,
+                workload=result.workload,
+                n_experiments=result.n_experiments,
+                baseline=before,
+                current=after,
+                ratio=after / before if before > 0 else float("inf"),
+            )
+        )
+    return comparisons
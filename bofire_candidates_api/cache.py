@@ -0,0 +1,162 @@
+import hashlib
+import json
+import os
+import pickle
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import pandas as pd
+from bofire.data_models.base import BaseModel
+from bofire.strategies.strategy import Strategy
+
+
+def canonical_hash(*models: Optional[BaseModel]) -> str:
+    """Compute a hash of data models which is independent of the key order.
+
+    Args:
+        *models (Optional[BaseModel]): The data models to hash, None is allowed.
+
+    Returns:
+        str: The hex digest of the hash.
+    """
+    payload = [None if m is None else m.model_dump(mode="json") for m in models]
+    return hashlib.sha256(
+        json.dumps(payload, sort_keys=True, separators=(",", ":")).encode()
+    ).hexdigest()
+
+
+def frame_hash(frame: pd.DataFrame) -> str:
+    """Compute a hash of the columns and the values of a data frame.
+
+    Args:
+        frame (pd.DataFrame): The data frame.
+
+    Returns:
+        str: The hex digest of the hash.
+    """
+    hasher = hashlib.sha256(json.dumps(list(map(str, frame.columns))).encode())
+    hasher.update(pd.util.hash_pandas_object(frame, index=False).values.tobytes())
+    return hasher.hexdigest()
+
+
+def approximate_size(strategy: Strategy) -> int:
+    """Estimate the memory used by a fitted strategy.
+
+    The size of the pickled strategy is used as estimate, if the strategy cannot
+    be pickled the memory of its experiments is used instead.
+
+    Args:
+        strategy (Strategy): The strategy.
+
+    Returns:
+        int: The approximate size in bytes.
+    """
+    try:
+        return len(pickle.dumps(strategy))
+    except Exception:
+        if strategy.experiments is None:
+            return 0
+        return int(strategy.experiments.memory_usage(deep=True).sum())
+
+
+class StrategyCache:
+    """Process-local LRU cache of fitted strategies.
+
+    Strategies are checked out of the cache with `pop` and returned with `put`
+    after use, so that a fitted strategy is never used by two requests at the
+    same time. The cache is bounded by the number of entries and by the
+    approximate memory of the stored strategies. The size of a strategy is
+    estimated once, when it is stored for the first time.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: Optional[int] = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, Tuple[Strategy, int]] = OrderedDict()
+        self._sizes: weakref.WeakKeyDictionary[Strategy, int] = (
+            weakref.WeakKeyDictionary()
+        )
+        self._lock = threading.Lock()
+        self.n_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def pop(self, key: str) -> Optional[Strategy]:
+        """Check out a fitted strategy from the cache.
+
+        Args:
+            key (str): The cache key.
+
+        Returns:
+            Optional[Strategy]: The fitted strategy or None on a cache miss.
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.n_bytes -= entry[1]
+            return entry[0]
+
+    def put(self, key: str, strategy: Strategy) -> None:
+        """Store a fitted strategy, evicting the least recently used ones.
+
+        Args:
+            key (str): The cache key.
+            strategy (Strategy): The fitted strategy.
+        """
+        if self.max_entries <= 0:
+            return
+        size = self._sizes.get(strategy)
+        if size is None:
+            size = approximate_size(strategy)
+            self._sizes[strategy] = size
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.n_bytes -= previous[1]
+            self._entries[key] = (strategy, size)
+            self.n_bytes += size
+            while len(self._entries) > self.max_entries or (
+                self.max_bytes is not None and self.n_bytes > self.max_bytes
+            ):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.n_bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Remove all strategies from the cache."""
+        with self._lock:
+            self._entries.clear()
+            self.n_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Get the statistics of the cache.
+
+        Returns:
+            Dict[str, Any]: The number of entries, their approximate size and the
+                hit, miss and eviction counters.
+        """
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.n_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+strategy_cache = StrategyCache(
+    max_entries=int(os.environ.get("STRATEGY_CACHE_MAX_ENTRIES", 16)),
+    max_bytes=int(os.environ.get("STRATEGY_CACHE_MAX_BYTES", 512 * 1024**2)),
+)
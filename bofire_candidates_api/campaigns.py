@@ -0,0 +1,113 @@
+import os
+import threading
+from collections import defaultdict
+from typing import Dict, Optional, Tuple
+
+import bofire.strategies.api as strategies
+from bofire.data_models.dataframes.api import Candidates, Experiments
+from bofire.data_models.dataframes.dataframes import Row
+from fastapi import HTTPException
+
+from bofire_candidates_api import warm_start
+from bofire_candidates_api.cache import StrategyCache
+from bofire_candidates_api.data_models import Campaign
+from bofire_candidates_api.store import ProposalStore
+
+
+# fitted strategies of the campaigns, keyed by the campaign ID
+campaign_strategies = StrategyCache(
+    max_entries=int(os.environ.get("CAMPAIGN_CACHE_MAX_ENTRIES", 16)),
+    max_bytes=int(os.environ.get("CAMPAIGN_CACHE_MAX_BYTES", 512 * 1024**2)),
+)
+
+# serializes the updates of a campaign within this process, they do not protect
+# campaigns which are shared by several API processes, e.g. `uvicorn --workers N`
+campaign_locks: Dict[int, threading.Lock] = defaultdict(threading.Lock)
+
+
+def input_key(row: Row) -> Tuple:
+    """Get a hashable representation of the input values of a row.
+
+    Args:
+        row (Row): The experiment or candidate row.
+
+    Returns:
+        Tuple: The sorted input values, floats are rounded to 8 decimals.
+    """
+    return tuple(
+        sorted(
+            (k, round(v, 8) if isinstance(v, float) else v)
+            for k, v in row.inputs.items()
+        )
+    )
+
+
+def remove_executed_pendings(
+    pendings: Optional[Candidates], experiments: Experiments
+) -> Optional[Candidates]:
+    """Remove the pending candidates which have been executed.
+
+    Args:
+        pendings (Optional[Candidates]): The pending candidates.
+        experiments (Experiments): The executed experiments.
+
+    Returns:
+        Optional[Candidates]: The pendings without a matching experiment.
+    """
+    if pendings is None:
+        return None
+    executed = {input_key(row) for row in experiments.rows}
+    rows = [row for row in pendings.rows if input_key(row) not in executed]
+    return Candidates(rows=rows) if len(rows) > 0 else None
+
+
+def generate_campaign_candidates(
+    campaign: Campaign,
+    db: ProposalStore,
+    n_candidates: int,
+    cache: StrategyCache = campaign_strategies,
+) -> Candidates:
+    """Generate candidates for a campaign.
+
+    The fitted strategy of the campaign is kept in a cache, so that only the
+    experiments appended since the last call have to be loaded and told to the
+    strategy. The single task GPs of the strategy start their hyperparameter
+    optimization from the previous fit.
+
+    Args:
+        campaign (Campaign): The campaign.
+        db (ProposalStore): The store with the experiments of the campaign.
+        n_candidates (int): Number of candidates to generate.
+        cache (StrategyCache, optional): The cache of fitted campaign strategies.
+            Defaults to the process-local campaign cache.
+
+    Returns:
+        Candidates: The generated candidates.
+    """
+    key = f"campaign-{campaign.id}"
+    strategy = cache.pop(key)
+    with warm_start.warm_started():
+        if strategy is None or strategy.num_experiments > campaign.n_experiments:
+            strategy = strategies.map(campaign.strategy_data)
+
+        rows = db.get_experiments(campaign.id, start=strategy.num_experiments)
+        if len(rows) > 0:
+            strategy.tell(Experiments(rows=rows).to_pandas())
+
+    if campaign.pendings is None:
+        strategy.reset_candidates()
+    else:
+        strategy.set_candidates(campaign.pendings.to_pandas())
+
+    try:
+        df_candidates = strategy.ask(n_candidates)
+    except Exception as e:
+        if str(e) == "Not enough experiments available to execute the strategy.":
+            raise HTTPException(status_code=404, detail=str(e))
+        raise HTTPException(
+            status_code=500,
+            detail=f"An error occurred. Details: {e}",
+        )
+    finally:
+        cache.put(key, strategy)
+    return Candidates.from_pandas(df_candidates, campaign.strategy_data.domain)
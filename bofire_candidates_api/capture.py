@@ -0,0 +1,232 @@
+import json
+import os
+import random
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel, Field
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+# requests are only captured if a file is configured
+CAPTURE_PATH = os.environ.get("CAPTURE_PATH")
+CAPTURE_SAMPLE_RATE = float(os.environ.get("CAPTURE_SAMPLE_RATE", 1.0))
+# replace the keys of the features with generic names
+CAPTURE_ANONYMIZE = os.environ.get("CAPTURE_ANONYMIZE", "True") == "True"
+# larger bodies are not captured, so that the capture does not hold them in memory
+CAPTURE_MAX_BODY_BYTES = int(os.environ.get("CAPTURE_MAX_BODY_BYTES", 64 * 2**20))
+
+# the routes which take candidate requests, with a list of requests for batches
+CAPTURED_ROUTES = {
+    "/candidates/generate": False,
+    "/candidates/generate_batch": True,
+    "/proposals": False,
+    "/proposals/batch": True,
+}
+
+
+class CapturedRequest(BaseModel):
+    """A candidate request as captured from the traffic of the API."""
+
+    timestamp: float = Field(
+        description="Arrival of the request in seconds since epoch"
+    )
+    method: str = Field(description="HTTP method")
+    path: str = Field(description="Path of the route")
+    query_string: str = Field(default="", description="Query string of the URL")
+    accept: Optional[str] = Field(default=None, description="Accept header")
+    status_code: int = Field(description="Status code of the response")
+    body: Any = Field(description="Sanitized JSON body")
+
+
+def _rename(value: Any, names: Dict[str, str]) -> Any:
+    if isinstance(value, dict):
+        return {
+            names.get(k, k): v if k == "type" else _rename(v, names)
+            for k, v in value.items()
+            if k != "context"
+        }
+    if isinstance(value, list):
+        return [_rename(v, names) for v in value]
+    if isinstance(value, str):
+        return names.get(value, value)
+    return value
+
+
+def sanitize(request: Any, anonymize: bool = CAPTURE_ANONYMIZE) -> Any:
+    """Remove the descriptive content of a candidate request.
+
+    The free-form `context` of the features is dropped. If anonymized, the keys of
+    the features of the domain are replaced by `input_<i>` and `output_<i>`
+    everywhere in the request, e.g. in the constraints and the experiments, so
+    that the sanitized request can still be replayed.
+
+    Args:
+        request (Any): The JSON body of a candidate request.
+        anonymize (bool, optional): Whether to replace the keys of the features.
+            Defaults to CAPTURE_ANONYMIZE.
+
+    Returns:
+        Any: The sanitized body.
+    """
+    names = {}
+    if anonymize and isinstance(request, dict):
+        domain = (request.get("strategy_data") or {}).get("domain") or {}
+        for kind in ("inputs", "outputs"):
+            features = (domain.get(kind) or {}).get("features") or []
+            for i, feature in enumerate(features):
+                if isinstance(feature, dict) and "key" in feature:
+                    names[feature["key"]] = f"{kind[:-1]}_{i}"
+    return _rename(request, names)
+
+
+class CaptureWriter:
+    """Appends captured requests to a JSONL file, one request per line."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def write(self, request: CapturedRequest) -> None:
+        """Append a captured request.
+
+        Args:
+            request (CapturedRequest): The request.
+        """
+        line = request.model_dump_json() + "\n"
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(line)
+
+
+def read_capture(path: str) -> List[CapturedRequest]:
+    """Read the requests of a capture file in the order of their arrival.
+
+    Args:
+        path (str): The JSONL file written by the `CaptureMiddleware`.
+
+    Returns:
+        List[CapturedRequest]: The requests.
+    """
+    with open(path) as f:
+        requests = [CapturedRequest.model_validate_json(line) for line in f if line]
+    return sorted(requests, key=lambda r: r.timestamp)
+
+
+def _sanitize_body(body: bytes, batch: bool) -> Any:
+    data = json.loads(body)
+    if batch and isinstance(data, list):
+        return [sanitize(item) for item in data]
+    return sanitize(data)
+
+
+class CaptureMiddleware:
+    """Records the candidate requests received by the API for load tests.
+
+    The JSON bodies of the requests to the routes in `CAPTURED_ROUTES` are
+    sanitized and appended with their arrival time and response status to a
+    JSONL file, after the response has been sent. Requests in other formats,
+    e.g. Arrow, and bodies larger than `max_body_bytes` are not captured.
+
+    Args:
+        app (ASGIApp): The wrapped app.
+        path (str): The JSONL file.
+        sample_rate (float, optional): Fraction of the requests which are
+            captured. Defaults to CAPTURE_SAMPLE_RATE.
+        max_body_bytes (int, optional): Maximum size of a captured body. Defaults to
+            CAPTURE_MAX_BODY_BYTES.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        path: str,
+        sample_rate: float = CAPTURE_SAMPLE_RATE,
+        max_body_bytes: int = CAPTURE_MAX_BODY_BYTES,
+    ):
+        self.app = app
+        self.writer = CaptureWriter(path)
+        self.sample_rate = sample_rate
+        self.max_body_bytes = max_body_bytes
+
+    def is_captured(self, scope: Scope) -> bool:
+        """Check whether a request is sampled for the capture.
+
+        Args:
+            scope (Scope): The scope of the request.
+
+        Returns:
+            bool: True for sampled JSON requests to the captured routes.
+        """
+        if scope["type"] != "http" or scope["method"] != "POST":
+            return False
+        if scope["path"].rstrip("/") not in CAPTURED_ROUTES:
+            return False
+        content_type = Headers(scope=scope).get("content-type", "application/json")
+        return "json" in content_type and random.random() < self.sample_rate
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if not self.is_captured(scope):
+            await self.app(scope, receive, send)
+            return
+
+        timestamp = time.time()
+        chunks: Optional[List[bytes]] = []
+        size = 0
+        complete = False
+        status = 500
+
+        async def capture_receive() -> Message:
+            nonlocal chunks, size, complete
+            message = await receive()
+            if message["type"] == "http.request" and chunks is not None:
+                size += len(message.get("body", b""))
+                if size > self.max_body_bytes:
+                    chunks = None
+                else:
+                    chunks.append(message.get("body", b""))
+                    complete = not message.get("more_body", False)
+            return message
+
+        async def capture_send(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, capture_receive, capture_send)
+        finally:
+            if chunks is not None and complete:
+                await run_in_threadpool(
+                    self.record, scope, timestamp, status, b"".join(chunks)
+                )
+
+    def record(self, scope: Scope, timestamp: float, status: int, body: bytes):
+        """Sanitize and write a request, bodies which are no JSON are skipped.
+
+        Args:
+            scope (Scope): The scope of the request.
+            timestamp (float): The arrival of the request in seconds since epoch.
+            status (int): The status code of the response.
+            body (bytes): The body of the request.
+        """
+        path = scope["path"].rstrip("/")
+        try:
+            sanitized = _sanitize_body(body, CAPTURED_ROUTES[path])
+        except ValueError:
+            return
+        self.writer.write(
+            CapturedRequest(
+                timestamp=timestamp,
+                method=scope["method"],
+                path=path,
+                query_string=scope.get("query_string", b"").decode("latin-1"),
+                accept=Headers(scope=scope).get("accept"),
+                status_code=status,
+                body=sanitized,
+            )
+        )
@@ -0,0 +1,264 @@
+import gzip
+import json
+import os
+import zlib
+from typing import Optional
+
+import anyio
+from fastapi import HTTPException
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipResponder, IdentityResponder
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+COMPRESSION_MINIMUM_SIZE = int(os.environ.get("COMPRESSION_MINIMUM_SIZE", 1024))
+COMPRESSION_LEVEL = int(os.environ.get("COMPRESSION_LEVEL", 6))
+# upper bound of a decompressed request body, protects against compression bombs
+DECOMPRESSED_MAX_BYTES = int(os.environ.get("DECOMPRESSED_MAX_BYTES", 512 * 2**20))
+
+ZSTD_INPUT_CHUNK = 1024
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+
+def supported_encodings() -> list[str]:
+    """Get the content encodings which can be read and written, preferred first.
+
+    Returns:
+        list[str]: The encodings, zstd is only supported if zstandard is installed.
+    """
+    return (["zstd"] if _zstandard() is not None else []) + ["gzip"]
+
+
+def accepted_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Choose the encoding of a response from an `Accept-Encoding` header.
+
+    Args:
+        accept_encoding (Optional[str]): The header value.
+
+    Returns:
+        Optional[str]: The preferred supported encoding which is accepted, None if
+            the response is not compressed.
+    """
+    accepted = set()
+    for item in (accept_encoding or "").split(","):
+        coding, _, params = item.partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(coding.strip().lower())
+    for encoding in supported_encodings():
+        if encoding in accepted:
+            return encoding
+    return None
+
+
+def compress(body: bytes, encoding: str, level: int = COMPRESSION_LEVEL) -> bytes:
+    """Compress a body with a content encoding.
+
+    Args:
+        body (bytes): The uncompressed body.
+        encoding (str): The content encoding, `gzip` or `zstd`.
+        level (int, optional): The compression level. Defaults to
+            COMPRESSION_LEVEL.
+
+    Raises:
+        ValueError: If the encoding is not supported.
+
+    Returns:
+        bytes: The compressed body.
+    """
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=level)
+    zstandard = _zstandard()
+    if encoding == "zstd" and zstandard is not None:
+        return zstandard.ZstdCompressor(level=level).compress(body)
+    raise ValueError(f"Unsupported content encoding {encoding}")
+
+
+def decompress(
+    body: bytes, encoding: str, max_size: int = DECOMPRESSED_MAX_BYTES
+) -> bytes:
+    """Decompress a request body.
+
+    Args:
+        body (bytes): The compressed body.
+        encoding (str): The value of the `Content-Encoding` header.
+        max_size (int, optional): The maximum size of the decompressed body.
+            Defaults to DECOMPRESSED_MAX_BYTES.
+
+    Raises:
+        HTTPException: Status code 415 if the encoding is not supported, status
+            code 400 if the body cannot be decompressed and status code 413 if the
+            decompressed body is too large.
+
+    Returns:
+        bytes: The decompressed body.
+    """
+    encoding = encoding.strip().lower()
+    if encoding in ("", "identity"):
+        return body
+    if encoding not in supported_encodings():
+        raise HTTPException(
+            status_code=415,
+            detail=f"Unsupported content encoding {encoding}, "
+            f"supported are {', '.join(supported_encodings())}",
+        )
+    zstandard = _zstandard()
+    errors = (zlib.error, ValueError) + (
+        (zstandard.ZstdError,) if zstandard is not None else ()
+    )
+    try:
+        if encoding == "gzip":
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            data = decompressor.decompress(body, max_size + 1)
+        else:
+            decompressor = zstandard.ZstdDecompressor().decompressobj()
+            # small input chunks bound the output which is held before the check
+            chunks, size = [], 0
+            for i in range(0, len(body), ZSTD_INPUT_CHUNK):
+                chunks.append(decompressor.decompress(body[i : i + ZSTD_INPUT_CHUNK]))
+                size += len(chunks[-1])
+                if size > max_size:
+                    break
+            data = b"".join(chunks)
+        if len(data) <= max_size and not decompressor.eof:
+            raise ValueError("truncated body")
+    except errors as e:
+        raise HTTPException(
+            status_code=400, detail=f"Invalid {encoding} request body: {e}"
+        )
+    if len(data) > max_size:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Decompressed request body exceeds {max_size} bytes",
+        )
+    return data
+
+
+class ZstdResponder(IdentityResponder):
+    """Compresses responses with zstd, the counterpart of starlette's GZipResponder."""
+
+    content_encoding = "zstd"
+
+    def __init__(self, app: ASGIApp, minimum_size: int, level: int):
+        super().__init__(app, minimum_size)
+        self.compressor = _zstandard().ZstdCompressor(level=level).compressobj()
+
+    async def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        zstandard = _zstandard()
+        data = self.compressor.compress(body)
+        if more_body:
+            # flush every chunk, so that streamed responses are not held back
+            return data + self.compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+        return data + self.compressor.flush()
+
+
+class CompressionMiddleware:
+    """Negotiates compressed request and response bodies.
+
+    Request bodies with a `Content-Encoding` of gzip or zstd are decompressed
+    before they reach the routes. Responses of at least `minimum_size` bytes are
+    compressed with the preferred encoding of the client's `Accept-Encoding`
+    header.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = COMPRESSION_MINIMUM_SIZE,
+        level: int = COMPRESSION_LEVEL,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.level = level
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        content_encoding = headers.get("content-encoding")
+        if content_encoding is not None:
+            try:
+                scope, receive = await self.decompress_request(
+                    scope, receive, content_encoding
+                )
+            except HTTPException as e:
+                await self.reject(e, send)
+                return
+
+        encoding = accepted_encoding(headers.get("accept-encoding"))
+        if encoding == "zstd":
+            responder = ZstdResponder(self.app, self.minimum_size, self.level)
+        elif encoding == "gzip":
+            responder = GZipResponder(self.app, self.minimum_size, self.level)
+        else:
+            responder = self.app
+        await responder(scope, receive, send)
+
+    @staticmethod
+    async def decompress_request(
+        scope: Scope, receive: Receive, content_encoding: str
+    ) -> tuple[Scope, Receive]:
+        """Read and decompress the body of a request.
+
+        Args:
+            scope (Scope): The scope of the request.
+            receive (Receive): The receive channel of the request.
+            content_encoding (str): The value of the `Content-Encoding` header.
+
+        Returns:
+            tuple[Scope, Receive]: The scope without the encoding header and a
+                receive channel which yields the decompressed body.
+        """
+        chunks = []
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message["type"] != "http.request":
+                break
+            chunks.append(message.get("body", b""))
+            more_body = message.get("more_body", False)
+        # decompressing a large body takes a while, it must not block the loop
+        body = await anyio.to_thread.run_sync(
+            decompress, b"".join(chunks), content_encoding
+        )
+
+        raw_headers = [
+            (k, v)
+            for k, v in scope["headers"]
+            if k not in (b"content-encoding", b"content-length")
+        ]
+        raw_headers.append((b"content-length", str(len(body)).encode()))
+        sent = False
+
+        async def receive_decompressed() -> Message:
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        return {**scope, "headers": raw_headers}, receive_decompressed
+
+    @staticmethod
+    async def reject(error: HTTPException, send: Send):
+        body = json.dumps({"detail": error.detail}).encode()
+        await send(
+            {
+                "type": "http.response.start",
+                "status": error.status_code,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,98 @@
+from typing import Optional
+
+from bofire.data_models.dataframes.api import Experiments
+from bofire.data_models.domain.api import Domain
+from bofire.data_models.strategies.api import (
+    AnyStrategy,
+    DoEStrategy,
+    MultiobjectiveStrategy,
+    PredictiveStrategy,
+    StepwiseStrategy,
+)
+
+from bofire_candidates_api.data_models import CandidatesRequest
+
+
+# the cost is a rough estimate of the generation time in seconds on a single core
+# time per candidate and input of strategies without a model, e.g. random sampling
+SAMPLING_COST = 0.001
+# time per candidate and squared input of optimal designs
+DOE_COST = 0.01
+# time of fitting a surrogate model per output on EXPERIMENTS_SCALE experiments,
+# grows cubically with the number of experiments like exact Gaussian processes
+FIT_COST = 1.0
+EXPERIMENTS_SCALE = 500
+# time of optimizing the acquisition function per candidate and input
+ACQUISITION_COST = 0.5
+# factor of multi-objective acquisition functions
+MULTIOBJECTIVE_FACTOR = 4.0
+
+
+def _strategy_cost(
+    strategy_data: AnyStrategy,
+    n_candidates: int,
+    experiments: Optional[Experiments],
+) -> float:
+    domain: Domain = strategy_data.domain
+    n_inputs = len(domain.inputs)
+    n_experiments = 0 if experiments is None else len(experiments.rows)
+    if isinstance(strategy_data, StepwiseStrategy):
+        return _stepwise_cost(strategy_data, n_candidates, experiments)
+    if isinstance(strategy_data, PredictiveStrategy):
+        fit = (
+            len(domain.outputs)
+            * FIT_COST
+            * (1 + (n_experiments / EXPERIMENTS_SCALE) ** 3)
+        )
+        acquisition = ACQUISITION_COST * n_candidates * n_inputs
+        if isinstance(strategy_data, MultiobjectiveStrategy):
+            acquisition *= MULTIOBJECTIVE_FACTOR
+        return fit + acquisition
+    if isinstance(strategy_data, DoEStrategy):
+        return DOE_COST * n_candidates * n_inputs**2
+    return SAMPLING_COST * n_candidates * n_inputs
+
+
+def _stepwise_cost(
+    strategy_data: StepwiseStrategy,
+    n_candidates: int,
+    experiments: Optional[Experiments],
+) -> float:
+    # the first step whose condition holds is used, conditions which depend on
+    # the fitted strategy cannot be evaluated, then the most expensive of the
+    # remaining steps is assumed
+    frame = None if experiments is None else experiments.to_pandas()
+    for i, step in enumerate(strategy_data.steps):
+        try:
+            active = step.condition.evaluate(None, strategy_data.domain, frame)
+        except Exception:
+            return max(
+                _strategy_cost(s.strategy_data, n_candidates, experiments)
+                for s in strategy_data.steps[i:]
+            )
+        if active:
+            return _strategy_cost(step.strategy_data, n_candidates, experiments)
+    return _strategy_cost(
+        strategy_data.steps[-1].strategy_data, n_candidates, experiments
+    )
+
+
+def estimate_cost(request: CandidatesRequest) -> float:
+    """Estimate the cost of generating the candidates of a request.
+
+    The estimate depends on the type of the strategy, the number of inputs and
+    outputs of the domain, the number of experiments and `n_candidates`. It is
+    meant to separate cheap from expensive requests, e.g. random sampling from
+    Bayesian optimization on thousands of experiments, not to predict run times.
+    Stepwise strategies are estimated by the step which is active for the
+    experiments of the request.
+
+    Args:
+        request (CandidatesRequest): The request.
+
+    Returns:
+        float: The estimated cost, roughly in seconds on a single core.
+    """
+    return _strategy_cost(
+        request.strategy_data, request.n_candidates, request.experiments
+    )
@@ -1,11 +1,148 @@
 import datetime
+import hashlib
+import os
+import threading
+from collections import OrderedDict
 from enum import Enum
-from typing import Optional
+from typing import Any, Callable, Dict, List, Optional, Type, TypeVar, Union
 
 from bofire.data_models.base import BaseModel
 from bofire.data_models.dataframes.api import Candidates, Experiments
+from bofire.data_models.domain.api import Domain
 from bofire.data_models.strategies.api import AnyStrategy
-from pydantic import Field, model_validator
+from pydantic import Field, ValidationInfo, model_validator
+
+from bofire_candidates_api.metrics import Histogram
+
+
+M = TypeVar("M", bound=BaseModel)
+
+# validation context of records which have already been validated by the server
+TRUSTED = {"trusted": True}
+
+
+def is_trusted(info: ValidationInfo) -> bool:
+    """Check whether a model is validated within the trusted context.
+
+    Args:
+        info (ValidationInfo): The validation info passed to the validator.
+
+    Returns:
+        bool: True if the domain validators can be skipped.
+    """
+    return info.context is not None and info.context.get("trusted", False)
+
+
+def load_trusted(model: Type[M], data: Dict[str, Any]) -> M:
+    """Load a model from a record which has already been validated by the server.
+
+    The records are still parsed into the data models, but the validators which
+    check the experiments, pendings and candidates against the domain are skipped.
+
+    Args:
+        model (Type[M]): The model class.
+        data (Dict[str, Any]): The stored record.
+
+    Returns:
+        M: The loaded model.
+    """
+    return model.model_validate(data, context=TRUSTED)
+
+
+def load_trusted_json(model: Type[M], data: Union[str, bytes]) -> M:
+    """Load a model from a JSON document which has been produced by the server.
+
+    The document is parsed by pydantic directly, without building the intermediate
+    Python objects of `json.loads`, and the domain validators are skipped.
+
+    Args:
+        model (Type[M]): The model class.
+        data (Union[str, bytes]): The JSON document.
+
+    Returns:
+        M: The loaded model.
+    """
+    return model.model_validate_json(data, context=TRUSTED)
+
+
+VALIDATION_SECONDS = Histogram(
+    "bofire_validation_seconds",
+    "Duration of the validation of data against its domain",
+    ("kind",),
+)
+
+
+class ValidationMemo:
+    """Remembers which data has already been validated against which domain.
+
+    The memo is keyed by a hash of the domain and the data, so that the same
+    experiments sent repeatedly, e.g. by retried or deduplicated requests, are
+    only validated once per process. The duration of the validations which are
+    run is recorded in `VALIDATION_SECONDS`.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._keys: OrderedDict[bytes, None] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def validate(
+        self, kind: str, domain: Domain, data: BaseModel, validate: Callable[[], Any]
+    ) -> None:
+        """Validate data against a domain unless it has been validated before.
+
+        Args:
+            kind (str): The kind of validation, e.g. `experiments`.
+            domain (Domain): The domain.
+            data (BaseModel): The data to validate.
+            validate (Callable[[], Any]): Runs the validation, raises on invalid data.
+        """
+        hasher = hashlib.sha256()
+        for part in (kind.encode(), domain.model_dump_json().encode()):
+            hasher.update(part)
+            hasher.update(b"\0")
+        hasher.update(data.model_dump_json().encode())
+        key = hasher.digest()
+        with self._lock:
+            if key in self._keys:
+                self._keys.move_to_end(key)
+                self.hits += 1
+                return
+            self.misses += 1
+        with VALIDATION_SECONDS.time(kind=kind):
+            validate()
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._keys[key] = None
+            while len(self._keys) > self.max_entries:
+                self._keys.popitem(last=False)
+
+
+validation_memo = ValidationMemo(
+    max_entries=int(os.environ.get("VALIDATION_MEMO_MAX_ENTRIES", 1024))
+)
+
+
+class GenerationProfile(BaseModel):
+    """Time and memory profile of a candidate generation."""
+
+    duration: float = Field(description="Wall time of the generation in seconds")
+    summary: str = Field(
+        description="Functions with the largest cumulative time as printed by pstats"
+    )
+    stats: str = Field(
+        description="Base64 encoded pstats data, the content of a `.prof` file"
+    )
+    peak_memory: int = Field(
+        description="Peak of the memory allocated during the generation in bytes"
+    )
+    memory_summary: str = Field(
+        description="Source lines which allocated the most memory still held at "
+        "the end of the generation"
+    )
 
 
 class CandidatesRequest(BaseModel):
@@ -24,20 +161,57 @@ class CandidatesRequest(BaseModel):
     n_restarts: int = Field(
         default=1, ge=0, description="Number of restarts for the strategy on failure."
     )
+    parallel_restarts: bool = Field(
+        default=False,
+        description="Run the restarts concurrently as independent attempts in the "
+        "generation pool and return the first successful one",
+    )
+    profile: bool = Field(
+        default=False,
+        description="Profile the time and memory of the generation, which slows it "
+        "down",
+    )
+    priority: int = Field(
+        default=0,
+        description="Priority class of the proposal, proposals of a higher priority "
+        "are always claimed first",
+    )
+    tenant: Optional[str] = Field(
+        default=None,
+        description="Key of the team or campaign which submitted the request, the "
+        "tenants share the workers within a priority class fairly",
+    )
+    required_tags: List[str] = Field(
+        default_factory=list,
+        description="Capabilities a worker must advertise to claim the proposal, "
+        "e.g. gpu",
+    )
 
     @model_validator(mode="after")
-    def validate_experiments(self):
+    def validate_experiments(self, info: ValidationInfo):
         """Validates the experiments."""
-        if self.experiments is not None:
-            self.strategy_data.domain.validate_experiments(self.experiments.to_pandas())
+        if self.experiments is not None and not is_trusted(info):
+            domain = self.strategy_data.domain
+            validation_memo.validate(
+                "experiments",
+                domain,
+                self.experiments,
+                lambda: domain.validate_experiments(self.experiments.to_pandas()),
+            )
         return self
 
     @model_validator(mode="after")
-    def validate_pendings(self):
+    def validate_pendings(self, info: ValidationInfo):
         """Validates that pendings are None."""
-        if self.pendings is not None:
-            self.strategy_data.domain.validate_candidates(
-                self.pendings.to_pandas(), only_inputs=True
+        if self.pendings is not None and not is_trusted(info):
+            domain = self.strategy_data.domain
+            validation_memo.validate(
+                "pendings",
+                domain,
+                self.pendings,
+                lambda: domain.validate_candidates(
+                    self.pendings.to_pandas(), only_inputs=True
+                ),
             )
         return self
 
@@ -72,17 +246,146 @@ class CandidatesProposal(CandidatesRequest):
     error_message: Optional[str] = Field(
         default=None, description="Error message if the proposal failed"
     )
+    claimed_at: Optional[datetime.datetime] = Field(
+        default=None,
+        description="Timestamp when the proposal was last claimed by a worker",
+    )
+    lease_expires_at: Optional[datetime.datetime] = Field(
+        default=None,
+        description="Timestamp when the claim expires unless it is renewed",
+    )
+    n_claims: int = Field(
+        default=0, ge=0, description="Number of times the proposal was claimed"
+    )
+    idempotency_key: Optional[str] = Field(
+        default=None,
+        description="Key under which duplicates of the request are deduplicated",
+    )
+    request_hash: Optional[str] = Field(
+        default=None, description="Hash of the canonical request"
+    )
+    cost: Optional[float] = Field(
+        default=None,
+        description="Estimated cost of the generation, roughly in seconds on a "
+        "single core",
+    )
+    virtual_start: float = Field(
+        default=0.0,
+        exclude=True,
+        description="Virtual time of the proposal in the fair scheduling of the "
+        "claims, assigned and used by the store only",
+    )
+    generation_profile: Optional[GenerationProfile] = Field(
+        default=None,
+        description="Profile of the generation if it was requested by `profile`",
+    )
 
     @model_validator(mode="after")
-    def validate_candidates(self):
+    def validate_candidates(self, info: ValidationInfo):
         """Validates the candidates."""
         if self.candidates is not None:
-            self.strategy_data.domain.validate_candidates(
-                self.candidates.to_pandas(), only_inputs=True
-            )
+            if not is_trusted(info):
+                domain = self.strategy_data.domain
+                validation_memo.validate(
+                    "candidates",
+                    domain,
+                    self.candidates,
+                    lambda: domain.validate_candidates(
+                        self.candidates.to_pandas(), only_inputs=True
+                    ),
+                )
             if len(self.candidates.rows) != self.n_candidates:
                 raise ValueError(
                     f"Number of candidates ({len(self.candidates.rows)}) does not "
                     "match n_candidates ({self.n_candidates})."
                 )
         return self
+
+
+class BatchError(BaseModel):
+    """Error of a single item of a batch."""
+
+    status_code: int = Field(description="HTTP status code of the error")
+    detail: Any = Field(description="Description of the error")
+
+
+class CandidatesBatchItem(BaseModel):
+    """Result of a single request of a batch candidate generation."""
+
+    index: int = Field(ge=0, description="Position of the request in the batch")
+    candidates: Optional[Candidates] = Field(
+        default=None, description="Generated candidates, None if the request failed"
+    )
+    error: Optional[BatchError] = Field(
+        default=None, description="Error of the request"
+    )
+
+
+class ProposalsBatchItem(BaseModel):
+    """Result of a single request of a batch proposal creation."""
+
+    proposal: Optional[CandidatesProposal] = Field(
+        default=None, description="Created proposal, None if the request failed"
+    )
+    error: Optional[BatchError] = Field(
+        default=None, description="Error of the request"
+    )
+
+
+class ProcessedProposal(BaseModel):
+    """Candidates of a processed proposal, an item of a batch `mark_processed`."""
+
+    id: int = Field(description="Proposal ID")
+    claim: int = Field(
+        description="Claim token, the `n_claims` of the proposal as returned by "
+        "the claim"
+    )
+    candidates: Candidates = Field(description="Candidates generated by the proposal")
+
+
+class MarkProcessedBatchItem(BaseModel):
+    """Result of marking a single proposal of a batch as processed."""
+
+    id: int = Field(description="Proposal ID")
+    state: Optional[ProposalStateEnum] = Field(
+        default=None, description="State of the proposal, None if marking it failed"
+    )
+    error: Optional[BatchError] = Field(default=None, description="Error of the item")
+
+
+class CampaignRequest(BaseModel):
+    """Request model for creating a campaign."""
+
+    strategy_data: AnyStrategy = Field(description="Strategy data model")
+    experiments: Optional[Experiments] = Field(
+        default=None, description="Initial experiments of the campaign"
+    )
+
+    @model_validator(mode="after")
+    def validate_experiments(self):
+        """Validates the experiments."""
+        if self.experiments is not None:
+            self.strategy_data.domain.validate_experiments(self.experiments.to_pandas())
+        return self
+
+
+class Campaign(BaseModel):
+    """Model for a campaign whose experiments are stored server-side."""
+
+    id: Optional[int] = Field(default=None, description="Campaign ID")
+    strategy_data: AnyStrategy = Field(description="Strategy data model")
+    n_experiments: int = Field(
+        default=0, ge=0, description="Number of experiments of the campaign"
+    )
+    pendings: Optional[Candidates] = Field(
+        default=None,
+        description="Candidates which have been generated but not yet been executed",
+    )
+    created_at: datetime.datetime = Field(
+        default_factory=datetime.datetime.now,
+        description="Timestamp when the campaign was created",
+    )
+    last_updated_at: datetime.datetime = Field(
+        default_factory=datetime.datetime.now,
+        description="Timestamp when the campaign was last updated",
+    )
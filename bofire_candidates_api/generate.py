@@ -1,41 +1,92 @@
+from typing import Optional
+
 import bofire.strategies.api as strategies
+import pandas as pd
 from bofire.data_models.dataframes.api import Candidates
 from fastapi import HTTPException
 
+from bofire_candidates_api.cache import (
+    StrategyCache,
+    canonical_hash,
+    frame_hash,
+    strategy_cache,
+)
 from bofire_candidates_api.data_models import CandidatesRequest
+from bofire_candidates_api.metrics import Histogram
+
+
+GENERATE_PHASE_SECONDS = Histogram(
+    "bofire_generate_phase_seconds",
+    "Duration of the phases of the candidate generation",
+    ("phase",),
+)
 
 
 def generate_candidates(
     candidate_request: CandidatesRequest,
     i_start: int = 0,
+    cache: Optional[StrategyCache] = strategy_cache,
+    experiments: Optional[pd.DataFrame] = None,
 ) -> Candidates:
     """Generate candidates using the specified strategy.
 
+    Fitted strategies are kept in a cache keyed by the strategy data and the
+    experiments, so that repeated requests skip mapping and fitting the strategy.
+    If `ask` fails, it is retried up to `n_restarts` times on the fitted strategy.
+    Strategies with a seed are not cached, the random state of a cached strategy
+    has advanced and would not reproduce the candidates of the seed.
+
+    The duration of mapping (`map`), fitting (`tell`), each `ask` and the
+    conversion of the candidates (`from_pandas`) is recorded in
+    `GENERATE_PHASE_SECONDS`.
+
     Args:
         candidate_request (CandidatesRequest): Request model for generating candidates.
         i_start (int, optional): The current restart index. Defaults to 0.
+        cache (Optional[StrategyCache], optional): The cache of fitted strategies,
+            None disables caching. Defaults to the process-local strategy cache.
+        experiments (Optional[pd.DataFrame], optional): Validated experiments which
+            were sent as data frame instead of within the request. Defaults to None.
 
     Returns:
         Candidates: The generated candidates.
     """
-    strategy = strategies.map(candidate_request.strategy_data)
-
-    if candidate_request.experiments is not None:
-        strategy.tell(candidate_request.experiments.to_pandas())
-
-    try:
-        df_candidates = strategy.ask(candidate_request.n_candidates)
-    except Exception as e:
-        if str(e) == "Not enough experiments available to execute the strategy.":
-            raise HTTPException(status_code=404, detail=str(e))
-        if i_start < candidate_request.n_restarts:
-            return generate_candidates(
-                candidate_request=candidate_request,
-                i_start=i_start + 1,
-            )
-        else:
-            raise HTTPException(
-                status_code=500,
-                detail=f"An error occurred. Details: {e}",
-            )
-    return Candidates.from_pandas(df_candidates, candidate_request.strategy_data.domain)
+    if candidate_request.strategy_data.seed is not None:
+        cache = None
+    key = canonical_hash(candidate_request.strategy_data, candidate_request.experiments)
+    if experiments is not None:
+        key = f"{key}-{frame_hash(experiments)}"
+    strategy = None if cache is None else cache.pop(key)
+
+    if strategy is None:
+        with GENERATE_PHASE_SECONDS.time(phase="map"):
+            strategy = strategies.map(candidate_request.strategy_data)
+
+        with GENERATE_PHASE_SECONDS.time(phase="tell"):
+            if experiments is not None:
+                strategy.tell(experiments)
+            elif candidate_request.experiments is not None:
+                strategy.tell(candidate_request.experiments.to_pandas())
+
+    # a failing optimization of the acquisition function is retried on the
+    # fitted strategy, the surrogate is not fitted again
+    n_restarts = max(candidate_request.n_restarts, i_start)
+    for i_restart in range(i_start, n_restarts + 1):
+        try:
+            with GENERATE_PHASE_SECONDS.time(phase="ask"):
+                df_candidates = strategy.ask(candidate_request.n_candidates)
+            break
+        except Exception as e:
+            if str(e) == "Not enough experiments available to execute the strategy.":
+                raise HTTPException(status_code=404, detail=str(e))
+            if i_restart == n_restarts:
+                raise HTTPException(
+                    status_code=500,
+                    detail=f"An error occurred. Details: {e}",
+                )
+    if cache is not None:
+        cache.put(key, strategy)
+    with GENERATE_PHASE_SECONDS.time(phase="from_pandas"):
+        return Candidates.from_pandas(
+            df_candidates, candidate_request.strategy_data.domain
+        )
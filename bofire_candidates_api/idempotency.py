@@ -0,0 +1,169 @@
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import pandas as pd
+from fastapi import HTTPException
+
+from bofire_candidates_api.cache import canonical_hash, frame_hash
+from bofire_candidates_api.data_models import CandidatesRequest
+
+
+IDEMPOTENCY_TTL = float(os.environ.get("IDEMPOTENCY_TTL", 3600.0))
+IDEMPOTENCY_MAX_ENTRIES = int(os.environ.get("IDEMPOTENCY_MAX_ENTRIES", 1024))
+
+
+def request_hash(
+    candidate_request: CandidatesRequest, experiments: Optional[pd.DataFrame] = None
+) -> str:
+    """Compute the hash of the canonical representation of a candidates request.
+
+    The hash covers the whole request including the seed of the strategy, so
+    requests for stochastic strategies are only considered equal if they use
+    the same seed.
+
+    Args:
+        candidate_request (CandidatesRequest): The request.
+        experiments (Optional[pd.DataFrame], optional): Experiments which were sent
+            as data frame. Defaults to None.
+
+    Returns:
+        str: The hex digest of the hash.
+    """
+    digest = canonical_hash(candidate_request)
+    if experiments is None:
+        return digest
+    return hashlib.sha256(f"{digest}-{frame_hash(experiments)}".encode()).hexdigest()
+
+
+def deduplication_key(
+    candidate_request: CandidatesRequest,
+    idempotency_key: Optional[str],
+    dedupe: bool,
+    experiments: Optional[pd.DataFrame] = None,
+) -> Tuple[Optional[str], Optional[str]]:
+    """Get the key under which a request is deduplicated.
+
+    Args:
+        candidate_request (CandidatesRequest): The request.
+        idempotency_key (Optional[str]): The `Idempotency-Key` header of the request.
+        dedupe (bool): Whether requests with the same content are deduplicated.
+        experiments (Optional[pd.DataFrame], optional): Experiments which were sent
+            as data frame. Defaults to None.
+
+    Returns:
+        Tuple[Optional[str], Optional[str]]: The deduplication key and the hash of
+            the request, both are None if the request is not deduplicated.
+    """
+    if idempotency_key is None and not dedupe:
+        return None, None
+    digest = request_hash(candidate_request, experiments)
+    if idempotency_key is not None:
+        return f"key:{idempotency_key}", digest
+    return f"sha256:{digest}", digest
+
+
+class _Entry:
+    def __init__(self, digest: str, expires_at: float):
+        self.digest = digest
+        self.expires_at = expires_at
+        self.future: Future = Future()
+
+
+class ResultCache:
+    """Process-local store of the results of deduplicated requests.
+
+    The first request for a key computes the result, duplicates which arrive
+    while the computation is running wait for it and later duplicates get the
+    stored result. Results expire after a time to live and the least recently
+    used ones are evicted when the store is full. Failed computations are not
+    stored, so a retry after a failure computes again.
+    """
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _expire(self, now: float) -> None:
+        for key in [k for k, e in self._entries.items() if e.expires_at <= now]:
+            del self._entries[key]
+
+    async def run(
+        self, key: str, digest: str, compute: Callable[[], Awaitable[Any]]
+    ) -> Tuple[Any, bool]:
+        """Get the result for a key, computing it if it is not stored yet.
+
+        Args:
+            key (str): The deduplication key.
+            digest (str): The hash of the request, used to detect idempotency keys
+                which are reused for different requests.
+            compute (Callable[[], Awaitable[Any]]): Computes the result.
+
+        Raises:
+            HTTPException: Status code 422 if the key was used for another request.
+
+        Returns:
+            Tuple[Any, bool]: The result and whether it was replayed.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            entry = self._entries.get(key)
+            replayed = entry is not None
+            if replayed:
+                if entry.digest != digest:
+                    raise HTTPException(
+                        status_code=422,
+                        detail="Idempotency-Key was already used for another request",
+                    )
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                entry = _Entry(digest, now + self.ttl)
+                self.misses += 1
+                if self.max_entries > 0:
+                    self._entries[key] = entry
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+        if not replayed:
+            try:
+                entry.future.set_result(await compute())
+            except BaseException as e:
+                entry.future.set_exception(e)
+                with self._lock:
+                    if self._entries.get(key) is entry:
+                        del self._entries[key]
+        return await asyncio.wrap_future(entry.future), replayed
+
+    def clear(self) -> None:
+        """Remove all results from the store."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """Get the statistics of the store.
+
+        Returns:
+            Dict[str, int]: The number of entries and the hit and miss counters.
+        """
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+result_cache = ResultCache(ttl=IDEMPOTENCY_TTL, max_entries=IDEMPOTENCY_MAX_ENTRIES)
@@ -0,0 +1,388 @@
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+METRICS_MEDIA_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# upper bounds in seconds, from fast store operations to slow model fits
+DEFAULT_BUCKETS = (
+    0.001,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    120.0,
+    300.0,
+)
+
+# observations of a histogram by label values: the count per bucket and the sum
+HistogramSnapshot = Dict[Tuple[str, ...], Tuple[List[int], float]]
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(labels: Sequence[Tuple[str, str]]) -> str:
+    if len(labels) == 0:
+        return ""
+    escaped = (
+        (name, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in labels
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+class Registry:
+    """Collects metrics and renders them in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics: Dict[str, "Metric"] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: "Metric") -> None:
+        """Add a metric to the registry.
+
+        Args:
+            metric (Metric): The metric.
+
+        Raises:
+            ValueError: If a metric with the same name is already registered.
+        """
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        """Render all registered metrics.
+
+        Returns:
+            str: The metrics in the Prometheus text exposition format.
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "".join(metric.render() for metric in metrics)
+
+
+registry = Registry()
+
+
+class Metric(ABC):
+    """Base class of metrics with a fixed set of label names."""
+
+    kind = "untyped"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        registry: Optional[Registry] = registry,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        if registry is not None:
+            registry.register(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(
+                f"Metric {self.name} has the labels {list(self.labelnames)}, "
+                f"got {sorted(labels)}"
+            )
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    @abstractmethod
+    def samples(self) -> Iterator[Tuple[str, List[Tuple[str, str]], float]]:
+        """Get the current samples of the metric.
+
+        Yields:
+            Tuple[str, List[Tuple[str, str]], float]: The name, the labels and the
+                value of each sample.
+        """
+
+    def render(self) -> str:
+        """Render the metric in the Prometheus text exposition format.
+
+        Returns:
+            str: The help and type lines followed by one line per sample.
+        """
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        for name, labels, value in self.samples():
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class Counter(Metric):
+    """A value which only increases, e.g. the number of processed proposals."""
+
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        """Increase the counter.
+
+        Args:
+            amount (float, optional): The non-negative increment. Defaults to 1.0.
+            **labels (str): The values of the labels.
+        """
+        if amount < 0:
+            raise ValueError("Counters can only be increased")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        """Get the current value of the counter.
+
+        Args:
+            **labels (str): The values of the labels.
+
+        Returns:
+            float: The value, 0 if the counter was never increased.
+        """
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> Iterator[Tuple[str, List[Tuple[str, str]], float]]:
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            yield self.name, list(zip(self.labelnames, key)), value
+
+
+class Gauge(Counter):
+    """A value which can go up and down, e.g. the number of queued proposals."""
+
+    kind = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        """Set the gauge.
+
+        Args:
+            value (float): The new value.
+            **labels (str): The values of the labels.
+        """
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(Metric):
+    """Counts observations, e.g. durations, in buckets of their value."""
+
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: Sequence[float] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        self._values: HistogramSnapshot = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        """Record an observation.
+
+        Args:
+            value (float): The observed value.
+            **labels (str): The values of the labels.
+        """
+        key = self._key(labels)
+        i_bucket = bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[i_bucket] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Observe the duration of a block in seconds, also if it raises.
+
+        Args:
+            **labels (str): The values of the labels.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels: str) -> int:
+        """Get the number of observations.
+
+        Args:
+            **labels (str): The values of the labels.
+
+        Returns:
+            int: The number of observations, 0 if there are none.
+        """
+        with self._lock:
+            counts, _ = self._values.get(self._key(labels), ([], 0.0))
+            return sum(counts)
+
+    def drain(self) -> HistogramSnapshot:
+        """Take the observations recorded so far and reset the histogram.
+
+        Used to hand the observations of a child process over to its parent, which
+        adds them with `merge`.
+
+        Returns:
+            HistogramSnapshot: The observations since the last drain.
+        """
+        with self._lock:
+            values, self._values = self._values, {}
+        return values
+
+    def merge(self, snapshot: HistogramSnapshot) -> None:
+        """Add the observations of another histogram with the same buckets.
+
+        Args:
+            snapshot (HistogramSnapshot): The observations, see `drain`.
+        """
+        with self._lock:
+            for key, (counts, total) in snapshot.items():
+                own_counts, own_total = self._values.get(
+                    key, ([0] * (len(self.buckets) + 1), 0.0)
+                )
+                self._values[key] = (
+                    [a + b for a, b in zip(own_counts, counts)],
+                    own_total + total,
+                )
+
+    def samples(self) -> Iterator[Tuple[str, List[Tuple[str, str]], float]]:
+        with self._lock:
+            values = sorted((k, (list(c), t)) for k, (c, t) in self._values.items())
+        for key, (counts, total) in values:
+            labels = list(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                yield (
+                    f"{self.name}_bucket",
+                    labels + [("le", _format_value(float(bound)))],
+                    cumulative,
+                )
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, cumulative
+
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "bofire_http_request_seconds",
+    "Duration of the HTTP requests until the response has been sent",
+    ("method", "route", "status"),
+)
+
+
+class MetricsMiddleware:
+    """Records the duration and status code of the HTTP requests.
+
+    The requests are labeled with the path template of their route, e.g.
+    `/proposals/{proposal_id}`, so that the number of series stays bounded.
+    """
+
+    def __init__(self, app: ASGIApp, histogram: Histogram = HTTP_REQUEST_SECONDS):
+        self.app = app
+        self.histogram = histogram
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            self.histogram.observe(
+                time.perf_counter() - start,
+                method=scope["method"],
+                route=getattr(route, "path", ""),
+                status=str(status),
+            )
+
+
+def metrics_handler(registry: Registry) -> type:
+    """Create a handler of the standard library HTTP server serving `/metrics`.
+
+    Args:
+        registry (Registry): The registry to render.
+
+    Returns:
+        type: The request handler class.
+    """
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", METRICS_MEDIA_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return MetricsHandler
+
+
+def start_metrics_server(
+    port: int, host: str = "0.0.0.0", registry: Registry = registry
+) -> ThreadingHTTPServer:
+    """Serve the metrics of a process without an API, e.g. of a worker.
+
+    The server runs in a daemon thread and answers `GET /metrics`.
+
+    Args:
+        port (int): The port to listen on, 0 picks a free port.
+        host (str, optional): The address to listen on. Defaults to "0.0.0.0".
+        registry (Registry, optional): The metrics to serve. Defaults to the
+            default registry.
+
+    Returns:
+        ThreadingHTTPServer: The running server.
+    """
+    server = ThreadingHTTPServer((host, port), metrics_handler(registry))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,71 @@
+import asyncio
+import threading
+from typing import Optional, Set
+
+
+class Notifier:
+    """In-process notification of changes for long-polling requests.
+
+    Every call of `notify` increments a version counter and wakes up all waiting
+    coroutines. Waiters pass the version they have last seen, so that changes
+    which happen between checking the store and starting to wait are not missed.
+    `notify` can be called from any thread, waiting happens in the event loop.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._waiters: Set[asyncio.Future] = set()
+
+    @property
+    def has_waiters(self) -> bool:
+        """Whether coroutines are waiting for a change."""
+        return len(self._waiters) > 0
+
+    def notify(self) -> None:
+        """Increment the version and wake up all waiters."""
+        with self._lock:
+            self.version += 1
+            loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is loop:
+            self._wake()
+        else:
+            loop.call_soon_threadsafe(self._wake)
+
+    def _wake(self) -> None:
+        waiters, self._waiters = self._waiters, set()
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    async def wait(self, version: int, timeout: float) -> bool:
+        """Wait until the version differs from the given one.
+
+        Args:
+            version (int): The version last seen by the caller.
+            timeout (float): Maximum time to wait in seconds.
+
+        Returns:
+            bool: True if a change was notified, False if the timeout was reached.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._loop = loop
+            if self.version != version:
+                return True
+        waiter = loop.create_future()
+        self._waiters.add(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout=timeout)
+        except asyncio.TimeoutError:
+            return self.version != version
+        finally:
+            self._waiters.discard(waiter)
+        return True
@@ -0,0 +1,491 @@
+import asyncio
+import logging
+import multiprocessing as mp
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Union
+
+import pandas as pd
+from bofire.data_models.dataframes.api import Candidates
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+
+from bofire_candidates_api.cache import strategy_cache
+from bofire_candidates_api.data_models import CandidatesRequest, GenerationProfile
+from bofire_candidates_api.generate import GENERATE_PHASE_SECONDS, generate_candidates
+from bofire_candidates_api.metrics import HistogramSnapshot
+from bofire_candidates_api.profiling import Profiler
+
+
+GENERATE_POOL_SIZE = int(os.environ.get("GENERATE_POOL_SIZE", 2))
+GENERATE_QUEUE_SIZE = int(os.environ.get("GENERATE_QUEUE_SIZE", 16))
+GENERATE_TIMEOUT = float(os.environ.get("GENERATE_TIMEOUT", 300.0))
+
+
+def initialize_process(n_threads: int):
+    """Prepare a child process of the pool.
+
+    Imports the strategy stack and limits the number of torch threads, so that
+    the concurrently running children do not oversubscribe the cores.
+
+    Args:
+        n_threads (int): The number of threads each child may use.
+    """
+    import bofire.strategies.api  # noqa: F401
+    import torch
+
+    torch.set_num_threads(n_threads)
+
+
+# the generated candidates or the status code and detail of the error, the process
+# ID, the statistics of its strategy cache, its phase durations and the profile
+GenerationResult = Tuple[
+    Union[Candidates, Tuple[int, Any]],
+    int,
+    Dict[str, int],
+    HistogramSnapshot,
+    Optional[GenerationProfile],
+]
+
+
+def run_generation(
+    candidate_request: CandidatesRequest,
+    experiments: Optional[pd.DataFrame] = None,
+) -> GenerationResult:
+    """Generate candidates within a child process of the pool.
+
+    HTTP errors are returned as status code and detail, as they cannot be
+    pickled. The phase durations recorded by the child are handed over to the
+    parent, which adds them to its `GENERATE_PHASE_SECONDS`. If requested by the
+    request, the generation is profiled.
+
+    Args:
+        candidate_request (CandidatesRequest): Request model for generating candidates.
+        experiments (Optional[pd.DataFrame], optional): Experiments which were sent
+            as data frame. Defaults to None.
+
+    Returns:
+        GenerationResult: The generated candidates or the error, the process ID,
+            the statistics of the strategy cache of the process, the phase
+            durations recorded since the last generation of the process and the
+            profile of the generation.
+    """
+    profiler = Profiler(enabled=candidate_request.profile)
+    try:
+        with profiler:
+            result = generate_candidates(
+                candidate_request=candidate_request, i_start=0, experiments=experiments
+            )
+    except HTTPException as e:
+        result = (e.status_code, e.detail)
+    except Exception as e:
+        result = (500, f"An error occurred. Details: {e}")
+    return (
+        result,
+        os.getpid(),
+        strategy_cache.stats(),
+        GENERATE_PHASE_SECONDS.drain(),
+        profiler.profile,
+    )
+
+
+class GenerationPool:
+    """Runs the direct candidate generation outside of the event loop.
+
+    The generation runs in a dedicated process pool, so that CPU heavy requests
+    do not hold the GIL of the API process. With a size of 0 the generation runs
+    in the threadpool of the API process instead. The number of requests which
+    are waiting or running is bounded, further requests are rejected.
+    """
+
+    def __init__(self, size: int, queue_size: int, timeout: float):
+        self.size = size
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._n_pending = 0
+        self._cache_stats: Dict[int, Dict[str, int]] = {}
+
+    @property
+    def n_pending(self) -> int:
+        """The number of requests which are waiting or running."""
+        return self._n_pending
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        """The process pool, started on first use."""
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.size,
+                mp_context=mp.get_context("spawn"),
+                initializer=initialize_process,
+                initargs=(max(1, (os.cpu_count() or 1) // self.size),),
+            )
+        return self._executor
+
+    def _acquire(self):
+        with self._lock:
+            if self._n_pending >= self.queue_size:
+                raise HTTPException(
+                    status_code=429,
+                    detail="Too many candidate requests, retry later",
+                    headers={"Retry-After": "1"},
+                )
+            self._n_pending += 1
+
+    def _record_stats(self, future: Future):
+        if not future.cancelled() and future.exception() is None:
+            _, pid, stats, phases, _ = future.result()
+            if self.size > 0:
+                self._cache_stats[pid] = stats
+            GENERATE_PHASE_SECONDS.merge(phases)
+
+    def _release(self, future: Optional[Future] = None):
+        with self._lock:
+            self._n_pending -= 1
+        if future is not None:
+            self._record_stats(future)
+
+    def submit(
+        self,
+        candidate_request: CandidatesRequest,
+        experiments: Optional[pd.DataFrame] = None,
+    ) -> Future:
+        """Submit a request to the process pool, restarting a broken pool.
+
+        Args:
+            candidate_request (CandidatesRequest): Request model for generating candidates.
+            experiments (Optional[pd.DataFrame], optional): Experiments which were
+                sent as data frame. Defaults to None.
+
+        Returns:
+            Future: The future of the generation.
+        """
+        try:
+            return self.executor.submit(run_generation, candidate_request, experiments)
+        except BrokenProcessPool:
+            logging.warning("Process pool is broken, restarting it")
+            self._executor.shutdown(wait=False)
+            self._executor = None
+            self._cache_stats.clear()
+            return self.executor.submit(run_generation, candidate_request, experiments)
+
+    def get_timeout(self, timeout: Optional[float] = None) -> float:
+        """Get the timeout of a request, capped by the timeout of the pool.
+
+        Args:
+            timeout (Optional[float], optional): The timeout requested by the
+                client in seconds. Defaults to None which uses the pool timeout.
+
+        Returns:
+            float: The timeout in seconds.
+        """
+        return self.timeout if timeout is None else min(timeout, self.timeout)
+
+    async def generate(
+        self,
+        candidate_request: CandidatesRequest,
+        experiments: Optional[pd.DataFrame] = None,
+        timeout: Optional[float] = None,
+    ) -> Candidates:
+        """Generate candidates without blocking the event loop.
+
+        See `generate_profiled`, the profile is dropped.
+
+        Args:
+            candidate_request (CandidatesRequest): Request model for generating candidates.
+            experiments (Optional[pd.DataFrame], optional): Experiments which were
+                sent as data frame. Defaults to None.
+            timeout (Optional[float], optional): Timeout of the request in seconds,
+                capped by the timeout of the pool. Defaults to None.
+
+        Returns:
+            Candidates: The generated candidates.
+        """
+        candidates, _ = await self.generate_profiled(
+            candidate_request, experiments, timeout
+        )
+        return candidates
+
+    async def generate_profiled(
+        self,
+        candidate_request: CandidatesRequest,
+        experiments: Optional[pd.DataFrame] = None,
+        timeout: Optional[float] = None,
+    ) -> Tuple[Candidates, Optional[GenerationProfile]]:
+        """Generate candidates without blocking the event loop.
+
+        A request that times out is answered immediately. A running generation
+        cannot be interrupted, so its slot in the queue is only released once it
+        has finished. With `parallel_restarts` the restarts run as concurrent
+        attempts on several processes of the pool, the first success is returned.
+        If requested by `profile`, the generation is profiled in the process which
+        runs it.
+
+        Args:
+            candidate_request (CandidatesRequest): Request model for generating candidates.
+            experiments (Optional[pd.DataFrame], optional): Experiments which were
+                sent as data frame. Defaults to None.
+            timeout (Optional[float], optional): Timeout of the request in seconds,
+                capped by the timeout of the pool. Defaults to None.
+
+        Raises:
+            HTTPException: Status code 429 if the queue is full and status code 504
+                if the generation timed out.
+
+        Returns:
+            Tuple[Candidates, Optional[GenerationProfile]]: The generated candidates
+                and their profile, None if no profile was requested.
+        """
+        timeout = self.get_timeout(timeout)
+        n_attempts = self.n_attempts(candidate_request)
+        if n_attempts > 1:
+            candidates = await self._generate_attempts(
+                candidate_request, experiments, n_attempts, timeout
+            )
+            return candidates, None
+        self._acquire()
+
+        if self.size <= 0:
+            task = asyncio.ensure_future(
+                run_in_threadpool(run_generation, candidate_request, experiments)
+            )
+            task.add_done_callback(self._release)
+            # the thread cannot be interrupted, so the task is kept running
+            awaitable = asyncio.shield(task)
+        else:
+            try:
+                future = self.submit(candidate_request, experiments)
+            except Exception:
+                self._release()
+                raise
+            future.add_done_callback(self._release)
+            # on a timeout a request still waiting in the pool is cancelled
+            awaitable = asyncio.wrap_future(future)
+
+        try:
+            result = await asyncio.wait_for(awaitable, timeout=timeout)
+        except asyncio.TimeoutError:
+            raise HTTPException(
+                status_code=504,
+                detail=f"Candidate generation timed out after {timeout} seconds",
+            )
+        candidates, _, _, _, profile = result
+        if isinstance(candidates, tuple):
+            raise HTTPException(status_code=candidates[0], detail=candidates[1])
+        return candidates, profile
+
+    def n_attempts(self, candidate_request: CandidatesRequest) -> int:
+        """Get the number of attempts of a request which run concurrently.
+
+        Restarts only run concurrently if requested by `parallel_restarts` and if
+        the strategy is not seeded, as attempts with the same seed would fail alike.
+        They are bounded by the number of processes of the pool. Profiled requests
+        run as a single attempt, so that the profile covers the whole generation.
+
+        Args:
+            candidate_request (CandidatesRequest): Request model for generating candidates.
+
+        Returns:
+            int: The number of concurrent attempts, 1 for sequential restarts.
+        """
+        if (
+            not candidate_request.parallel_restarts
+            or candidate_request.strategy_data.seed is not None
+            or candidate_request.profile
+        ):
+            return 1
+        return max(1, min(candidate_request.n_restarts + 1, self.size))
+
+    async def _generate_attempts(
+        self,
+        candidate_request: CandidatesRequest,
+        experiments: Optional[pd.DataFrame],
+        n_attempts: int,
+        timeout: float,
+    ) -> Candidates:
+        # the restarts are spread over the attempts, each attempt fits its own
+        # strategy in its process
+        n_restarts = -(-(candidate_request.n_restarts + 1) // n_attempts) - 1
+        attempt = candidate_request.model_copy(
+            update={"n_restarts": n_restarts, "parallel_restarts": False}
+        )
+        results = self.iter_batch([attempt] * n_attempts, experiments, timeout)
+        error = None
+        try:
+            async for _, result in results:
+                if not isinstance(result, tuple):
+                    return result
+                error = result
+        finally:
+            # attempts still waiting in the pool are cancelled
+            await results.aclose()
+        raise HTTPException(status_code=error[0], detail=error[1])
+
+    async def generate_batch(
+        self,
+        candidate_requests: List[CandidatesRequest],
+        timeout: Optional[float] = None,
+    ) -> List[Union[Candidates, Tuple[int, Any]]]:
+        """Generate candidates for several independent requests in parallel.
+
+        The whole batch takes a single slot of the queue, its items are spread
+        over all processes of the pool. Items which have not finished within the
+        timeout fail, the others keep their results. The slot is released once all
+        items have finished.
+
+        Args:
+            candidate_requests (List[CandidatesRequest]): The validated requests.
+            timeout (Optional[float], optional): Timeout of the batch in seconds,
+                capped by the timeout of the pool. Defaults to None.
+
+        Raises:
+            HTTPException: Status code 429 if the queue is full.
+
+        Returns:
+            List[Union[Candidates, Tuple[int, Any]]]: The generated candidates or
+                the status code and detail of the error of each request.
+        """
+        results: List[Union[Candidates, Tuple[int, Any]]] = [
+            None for _ in candidate_requests
+        ]
+        async for i, result in self.iter_batch(candidate_requests, timeout=timeout):
+            results[i] = result
+        return results
+
+    def iter_batch(
+        self,
+        candidate_requests: List[CandidatesRequest],
+        experiments: Optional[pd.DataFrame] = None,
+        timeout: Optional[float] = None,
+    ) -> AsyncIterator[Tuple[int, Union[Candidates, Tuple[int, Any]]]]:
+        """Generate candidates for several requests, yielding them as they finish.
+
+        Works like `generate_batch`, but the results are yielded in the order in
+        which they finish. The requests are submitted immediately, so that a full
+        queue is reported before the iteration starts. If the iteration is closed
+        early, the items still waiting in the pool are cancelled.
+
+        Args:
+            candidate_requests (List[CandidatesRequest]): The validated requests.
+            experiments (Optional[pd.DataFrame], optional): Experiments which were
+                sent as data frame, shared by all requests. Defaults to None.
+            timeout (Optional[float], optional): Timeout of the batch in seconds,
+                capped by the timeout of the pool. Defaults to None.
+
+        Raises:
+            HTTPException: Status code 429 if the queue is full.
+
+        Returns:
+            AsyncIterator[Tuple[int, Union[Candidates, Tuple[int, Any]]]]: The index
+                of the request and its candidates or the status code and detail of
+                its error.
+        """
+        timeout = self.get_timeout(timeout)
+        if len(candidate_requests) == 0:
+            return self._collect([], timeout)
+        self._acquire()
+
+        if self.size <= 0:
+            futures = [
+                asyncio.ensure_future(
+                    run_in_threadpool(run_generation, request, experiments)
+                )
+                for request in candidate_requests
+            ]
+        else:
+            futures = []
+            try:
+                for request in candidate_requests:
+                    futures.append(self.submit(request, experiments))
+            except Exception:
+                for future in futures:
+                    future.cancel()
+                self._release()
+                raise
+
+        n_remaining = len(futures)
+
+        def item_done(future):
+            nonlocal n_remaining
+            self._record_stats(future)
+            with self._lock:
+                n_remaining -= 1
+                if n_remaining > 0:
+                    return
+            self._release()
+
+        for future in futures:
+            future.add_done_callback(item_done)
+        # threads cannot be interrupted, so their tasks are kept running
+        awaitables = [
+            asyncio.shield(future) if self.size <= 0 else asyncio.wrap_future(future)
+            for future in futures
+        ]
+        return self._collect(awaitables, timeout)
+
+    async def _collect(
+        self, awaitables: List[asyncio.Future], timeout: float
+    ) -> AsyncIterator[Tuple[int, Union[Candidates, Tuple[int, Any]]]]:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        index = {awaitable: i for i, awaitable in enumerate(awaitables)}
+        pending = set(awaitables)
+        try:
+            while len(pending) > 0:
+                done, pending = await asyncio.wait(
+                    pending,
+                    timeout=max(deadline - loop.time(), 0),
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if len(done) == 0:
+                    break
+                for awaitable in sorted(done, key=index.get):
+                    if awaitable.exception() is None:
+                        result = awaitable.result()[0]
+                    else:
+                        result = (
+                            500,
+                            f"An error occurred. Details: {awaitable.exception()}",
+                        )
+                    yield index[awaitable], result
+        finally:
+            for awaitable in pending:
+                # items still waiting in the pool are cancelled, running ones finish
+                awaitable.cancel()
+        for awaitable in sorted(pending, key=index.get):
+            yield (
+                index[awaitable],
+                (504, f"Candidate generation timed out after {timeout} seconds"),
+            )
+
+    def cache_stats(self) -> Dict[str, int]:
+        """Get the statistics of the strategy caches of the child processes.
+
+        Returns:
+            Dict[str, int]: The summed statistics as of the last generation of each
+                child, the statistics of this process if no pool is used.
+        """
+        if self.size <= 0:
+            return strategy_cache.stats()
+        totals = {k: 0 for k in strategy_cache.stats()}
+        for stats in list(self._cache_stats.values()):
+            for k, v in stats.items():
+                totals[k] += v
+        return totals
+
+    def shutdown(self):
+        """Stop the process pool."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+generation_pool = GenerationPool(
+    size=GENERATE_POOL_SIZE,
+    queue_size=GENERATE_QUEUE_SIZE,
+    timeout=GENERATE_TIMEOUT,
+)
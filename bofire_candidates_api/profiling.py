@@ -0,0 +1,171 @@
+import base64
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import OrderedDict
+from typing import Optional
+
+from fastapi import Response
+
+from bofire_candidates_api.data_models import GenerationProfile
+
+
+# number of functions and allocation sites listed in the summaries of a profile
+PROFILE_TOP_N = int(os.environ.get("PROFILE_TOP_N", 30))
+PROFILE_MAX_ENTRIES = int(os.environ.get("PROFILE_MAX_ENTRIES", 64))
+# frames stored per allocation by tracemalloc
+TRACEMALLOC_FRAMES = 1
+
+# tracemalloc traces the whole process, it runs while any profiler is active
+_tracing_lock = threading.Lock()
+_n_tracing = 0
+
+
+def load_stats(profile: GenerationProfile) -> pstats.Stats:
+    """Load the stats of a profile for further analysis.
+
+    Args:
+        profile (GenerationProfile): The profile.
+
+    Returns:
+        pstats.Stats: The stats of the profiled functions.
+    """
+    stats = pstats.Stats()
+    stats.stats = marshal.loads(base64.b64decode(profile.stats))
+    stats.get_top_level_stats()
+    return stats
+
+
+def profile_stats_response(profile: GenerationProfile, name: str) -> Response:
+    """Create a response which downloads the pstats data of a profile.
+
+    Args:
+        profile (GenerationProfile): The profile.
+        name (str): The name of the downloaded file without extension.
+
+    Returns:
+        Response: The content of a `.prof` file as attachment.
+    """
+    return Response(
+        content=base64.b64decode(profile.stats),
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": f'attachment; filename="{name}.prof"'},
+    )
+
+
+class Profiler:
+    """Profiles a block with cProfile and tracemalloc.
+
+    The time is profiled for the thread which enters the block, the memory for
+    the whole process, so the memory profiles of blocks which run concurrently in
+    threads of the same process include each other's allocations. The profile is
+    available in `profile` after the block, also if it raised.
+
+    Args:
+        enabled (bool, optional): Whether to profile, a disabled profiler does
+            nothing. Defaults to True.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.profile: Optional[GenerationProfile] = None
+        self._profiler: Optional[cProfile.Profile] = None
+        self._start = 0.0
+
+    def __enter__(self) -> "Profiler":
+        global _n_tracing
+        if not self.enabled:
+            return self
+        with _tracing_lock:
+            if _n_tracing == 0:
+                tracemalloc.start(TRACEMALLOC_FRAMES)
+            else:
+                tracemalloc.reset_peak()
+            _n_tracing += 1
+        self._start = time.perf_counter()
+        self._profiler = cProfile.Profile()
+        self._profiler.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        global _n_tracing
+        if not self.enabled:
+            return
+        self._profiler.disable()
+        duration = time.perf_counter() - self._start
+        with _tracing_lock:
+            _, peak_memory = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot()
+            _n_tracing -= 1
+            if _n_tracing == 0:
+                tracemalloc.stop()
+
+        summary = io.StringIO()
+        stats = pstats.Stats(self._profiler, stream=summary)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(PROFILE_TOP_N)
+        allocations = snapshot.filter_traces(
+            [
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, __file__),
+            ]
+        ).statistics("lineno")[:PROFILE_TOP_N]
+        self.profile = GenerationProfile(
+            duration=duration,
+            summary=summary.getvalue(),
+            stats=base64.b64encode(marshal.dumps(stats.stats)).decode(),
+            peak_memory=peak_memory,
+            memory_summary="\n".join(str(s) for s in allocations),
+        )
+
+
+class ProfileStore:
+    """Process-local store of the profiles of direct generations.
+
+    The least recently stored profiles are evicted when the store is full.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._profiles: OrderedDict[str, GenerationProfile] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._profiles)
+
+    def put(self, profile: GenerationProfile) -> str:
+        """Store a profile.
+
+        Args:
+            profile (GenerationProfile): The profile.
+
+        Returns:
+            str: The ID under which the profile is stored.
+        """
+        profile_id = uuid.uuid4().hex
+        with self._lock:
+            self._profiles[profile_id] = profile
+            while len(self._profiles) > self.max_entries:
+                self._profiles.popitem(last=False)
+        return profile_id
+
+    def get(self, profile_id: str) -> Optional[GenerationProfile]:
+        """Get a stored profile.
+
+        Args:
+            profile_id (str): The ID of the profile.
+
+        Returns:
+            Optional[GenerationProfile]: The profile, None if it is unknown or has
+                been evicted.
+        """
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+
+profile_store = ProfileStore(max_entries=PROFILE_MAX_ENTRIES)
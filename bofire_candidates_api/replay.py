@@ -0,0 +1,244 @@
+import datetime
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import requests
+from pydantic import BaseModel, Field
+
+from bofire_candidates_api.benchmark import LatencySummary, summarize
+from bofire_candidates_api.capture import CapturedRequest
+from bofire_candidates_api.data_models import ProposalStateEnum
+
+
+# number of proposals whose states are polled with a single request
+REPLAY_POLL_BATCH_SIZE = 100
+TERMINAL_STATES = (ProposalStateEnum.FINISHED, ProposalStateEnum.FAILED)
+
+
+class ReplayedRequest(BaseModel):
+    """Timing of a replayed request."""
+
+    path: str = Field(description="Path of the route")
+    status_code: int = Field(description="Status code of the response, 0 on errors")
+    scheduled_at: float = Field(
+        description="Scheduled send time in seconds after the start of the replay"
+    )
+    send_delay: float = Field(
+        description="Delay of the send behind the schedule in seconds, grows when "
+        "the replay cannot keep up with the rate"
+    )
+    latency: float = Field(description="Duration of the request in seconds")
+    proposal_ids: List[int] = Field(
+        default=[], description="IDs of the proposals created by the request"
+    )
+    queue_delay: List[float] = Field(
+        default=[],
+        description="Time from the creation to the claim of each proposal in seconds",
+    )
+    end_to_end: List[float] = Field(
+        default=[],
+        description="Time from the creation until each proposal was finished or "
+        "failed in seconds",
+    )
+
+
+class Replay:
+    """Sends captured requests to an API at the rate they were received.
+
+    The send times of the requests are the offsets of their arrival from the first
+    captured request, divided by `speed`. A speed of 0 sends the requests as fast
+    as possible, limited by `max_in_flight` concurrent requests. The proposals
+    created by the replay are polled until they are finished or failed, their
+    queue delay and end-to-end latency are taken from their timestamps.
+
+    Args:
+        url (str): The URL of the API.
+        speed (float, optional): Factor of the original rate, 0 for maximum speed.
+            Defaults to 1.0.
+        max_in_flight (int, optional): Maximum number of concurrent requests.
+            Defaults to 64.
+        poll_interval (float, optional): Interval of polling the states of the
+            proposals in seconds. Defaults to 1.0.
+        timeout (float, optional): Time to wait for the proposals in seconds after
+            the last request was sent. Defaults to 600.0.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        speed: float = 1.0,
+        max_in_flight: int = 64,
+        poll_interval: float = 1.0,
+        timeout: float = 600.0,
+    ):
+        self.url = url
+        self.speed = speed
+        self.max_in_flight = max_in_flight
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+
+    def send(
+        self, request: CapturedRequest, scheduled_at: float, start: float
+    ) -> ReplayedRequest:
+        """Send a captured request.
+
+        Args:
+            request (CapturedRequest): The request.
+            scheduled_at (float): The scheduled send time after the start.
+            start (float): The start of the replay as `time.perf_counter`.
+
+        Returns:
+            ReplayedRequest: The timing of the request.
+        """
+        sent_at = time.perf_counter()
+        headers = {"Content-Type": "application/json"}
+        if request.accept is not None:
+            headers["Accept"] = request.accept
+        try:
+            response = requests.request(
+                request.method,
+                f"{self.url}{request.path}",
+                params=request.query_string or None,
+                data=json.dumps(request.body),
+                headers=headers,
+            )
+            status_code = response.status_code
+        except requests.RequestException:
+            status_code = 0
+        latency = time.perf_counter() - sent_at
+
+        proposal_ids = []
+        if status_code == 200 and request.path == "/proposals":
+            proposal_ids = [response.json()["id"]]
+        elif status_code == 200 and request.path == "/proposals/batch":
+            proposal_ids = [
+                item["proposal"]["id"]
+                for item in response.json()
+                if item.get("proposal") is not None
+            ]
+        return ReplayedRequest(
+            path=request.path,
+            status_code=status_code,
+            scheduled_at=scheduled_at,
+            send_delay=sent_at - start - scheduled_at,
+            latency=latency,
+            proposal_ids=proposal_ids,
+        )
+
+    def wait_for_proposals(self, proposal_ids: List[int]) -> None:
+        """Poll the states of proposals until all are finished or failed.
+
+        Args:
+            proposal_ids (List[int]): The IDs of the proposals.
+        """
+        pending = list(proposal_ids)
+        deadline = time.monotonic() + self.timeout
+        while len(pending) > 0 and time.monotonic() < deadline:
+            states = {}
+            for i in range(0, len(pending), REPLAY_POLL_BATCH_SIZE):
+                response = requests.get(
+                    f"{self.url}/proposals/states",
+                    params={"ids": pending[i : i + REPLAY_POLL_BATCH_SIZE]},
+                )
+                response.raise_for_status()
+                states.update({int(k): v for k, v in response.json().items()})
+            pending = [id for id in pending if states.get(id) not in TERMINAL_STATES]
+            if len(pending) > 0:
+                time.sleep(self.poll_interval)
+
+    def proposal_timings(self, proposal_id: int) -> Dict[str, Optional[float]]:
+        """Get the queue delay and end-to-end latency of a proposal.
+
+        Args:
+            proposal_id (int): The ID of the proposal.
+
+        Returns:
+            Dict[str, Optional[float]]: The `queue_delay` and `end_to_end` in
+                seconds, None if the proposal was not claimed or is not finished.
+        """
+        response = requests.get(
+            f"{self.url}/proposals",
+            params={
+                "cursor": proposal_id - 1,
+                "limit": 1,
+                "fields": "created_at,claimed_at,last_updated_at,state",
+            },
+        )
+        response.raise_for_status()
+        proposal = response.json()[0]
+        created_at = datetime.datetime.fromisoformat(proposal["created_at"])
+        timings = {"queue_delay": None, "end_to_end": None}
+        if proposal["claimed_at"] is not None:
+            claimed_at = datetime.datetime.fromisoformat(proposal["claimed_at"])
+            timings["queue_delay"] = (claimed_at - created_at).total_seconds()
+        if proposal["state"] in TERMINAL_STATES:
+            updated_at = datetime.datetime.fromisoformat(proposal["last_updated_at"])
+            timings["end_to_end"] = (updated_at - created_at).total_seconds()
+        return timings
+
+    def run(self, captured: List[CapturedRequest]) -> List[ReplayedRequest]:
+        """Replay captured requests.
+
+        Args:
+            captured (List[CapturedRequest]): The requests in the order of their
+                arrival.
+
+        Returns:
+            List[ReplayedRequest]: The timing of each request.
+        """
+        if len(captured) == 0:
+            return []
+        first = captured[0].timestamp
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as executor:
+            futures = []
+            for request in captured:
+                scheduled_at = (
+                    (request.timestamp - first) / self.speed if self.speed > 0 else 0.0
+                )
+                time.sleep(max(0.0, start + scheduled_at - time.perf_counter()))
+                futures.append(executor.submit(self.send, request, scheduled_at, start))
+            replayed = [future.result() for future in futures]
+
+        self.wait_for_proposals([id for r in replayed for id in r.proposal_ids])
+        for r in replayed:
+            for proposal_id in r.proposal_ids:
+                timings = self.proposal_timings(proposal_id)
+                if timings["queue_delay"] is not None:
+                    r.queue_delay.append(timings["queue_delay"])
+                if timings["end_to_end"] is not None:
+                    r.end_to_end.append(timings["end_to_end"])
+        return replayed
+
+
+def summarize_replay(
+    replayed: List[ReplayedRequest], elapsed: float
+) -> Dict[str, Dict[str, LatencySummary]]:
+    """Summarize the timings of a replay by route.
+
+    Args:
+        replayed (List[ReplayedRequest]): The replayed requests.
+        elapsed (float): The duration of the replay in seconds.
+
+    Returns:
+        Dict[str, Dict[str, LatencySummary]]: The summaries of the `latency`,
+            `send_delay`, `queue_delay` and `end_to_end` latency by path, only for
+            the timings which were measured.
+    """
+    summaries = {}
+    for path in sorted({r.path for r in replayed}):
+        requests_of_path = [r for r in replayed if r.path == path]
+        timings = {
+            "latency": [r.latency for r in requests_of_path],
+            "send_delay": [r.send_delay for r in requests_of_path],
+            "queue_delay": [t for r in requests_of_path for t in r.queue_delay],
+            "end_to_end": [t for r in requests_of_path for t in r.end_to_end],
+        }
+        summaries[path] = {
+            name: summarize(values, elapsed)
+            for name, values in timings.items()
+            if len(values) > 0
+        }
+    return summaries
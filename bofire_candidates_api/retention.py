@@ -0,0 +1,385 @@
+import datetime
+import gzip
+import json
+import logging
+import os
+import threading
+import uuid
+import zlib
+from typing import Any, Dict, Iterator, List, Optional
+
+from pydantic import BaseModel, Field, field_validator
+
+from bofire_candidates_api.compression import COMPRESSION_LEVEL
+from bofire_candidates_api.data_models import ProposalStateEnum
+from bofire_candidates_api.metrics import Counter
+from bofire_candidates_api.store import (
+    TERMINAL_STATES,
+    ProposalStore,
+    encode,
+    local_time,
+)
+
+
+# expired proposals are moved to the archive in batches of this size
+COMPACTION_BATCH_SIZE = int(os.environ.get("PROPOSAL_COMPACTION_BATCH_SIZE", 500))
+
+PROPOSALS_ARCHIVED = Counter(
+    "bofire_proposals_archived_total",
+    "Number of proposals moved from the store to the archive",
+)
+
+
+def parse_retention_ttl(value: str) -> Dict[ProposalStateEnum, float]:
+    """Parse the time to live of finished and failed proposals.
+
+    Args:
+        value (str): Comma separated `state=seconds` pairs, e.g.
+            `FINISHED=86400,FAILED=604800`.
+
+    Raises:
+        ValueError: If a pair is malformed, the state is not FINISHED or FAILED or
+            the time to live is negative.
+
+    Returns:
+        Dict[ProposalStateEnum, float]: The time to live in seconds by state.
+    """
+    ttl = {}
+    for pair in value.split(","):
+        if pair.strip() == "":
+            continue
+        state, separator, seconds = pair.partition("=")
+        if (
+            separator == ""
+            or state.strip() not in TERMINAL_STATES
+            or float(seconds) < 0
+        ):
+            raise ValueError(
+                f"Invalid time to live '{pair}', expected FINISHED=seconds or "
+                "FAILED=seconds"
+            )
+        ttl[ProposalStateEnum(state.strip())] = float(seconds)
+    return ttl
+
+
+class RetentionPolicy(BaseModel):
+    """Policy which decides when finished and failed proposals are archived."""
+
+    ttl: Dict[ProposalStateEnum, float] = Field(
+        default_factory=dict,
+        description="Time in seconds after their last update after which proposals "
+        "in a state expire, only FINISHED and FAILED proposals expire",
+    )
+    keep_last: Optional[int] = Field(
+        default=None,
+        ge=0,
+        description="Number of the most recent finished and failed proposals which "
+        "are kept per tenant regardless of their age",
+    )
+
+    @field_validator("ttl")
+    @classmethod
+    def validate_ttl(
+        cls, ttl: Dict[ProposalStateEnum, float]
+    ) -> Dict[ProposalStateEnum, float]:
+        """Validate that only finished and failed proposals expire.
+
+        Raises:
+            ValueError: If a state is not terminal or a time to live is negative.
+        """
+        for state, seconds in ttl.items():
+            if state not in TERMINAL_STATES:
+                raise ValueError(f"Proposals in the state {state.value} do not expire")
+            if seconds < 0:
+                raise ValueError(f"Negative time to live of {state.value} proposals")
+        return ttl
+
+    @property
+    def enabled(self) -> bool:
+        """Whether any proposals expire."""
+        return len(self.ttl) > 0 or self.keep_last is not None
+
+    def cutoffs(
+        self, now: datetime.datetime
+    ) -> Dict[ProposalStateEnum, datetime.datetime]:
+        """Get the times before which proposals in each state have expired.
+
+        Args:
+            now (datetime.datetime): The current time.
+
+        Returns:
+            Dict[ProposalStateEnum, datetime.datetime]: The cutoffs by state.
+        """
+        return {
+            state: now - datetime.timedelta(seconds=seconds)
+            for state, seconds in self.ttl.items()
+        }
+
+
+class ArchiveError(Exception):
+    """Raised if a segment of the archive cannot be read."""
+
+
+class ArchiveSegment(BaseModel):
+    """Entry of the archive index which describes one segment."""
+
+    name: str = Field(description="File name of the segment in the archive")
+    min_id: int = Field(description="Smallest ID of the proposals in the segment")
+    max_id: int = Field(description="Largest ID of the proposals in the segment")
+    min_created_at: str = Field(
+        description="Earliest creation time of the proposals in the segment"
+    )
+    max_created_at: str = Field(
+        description="Latest creation time of the proposals in the segment"
+    )
+    states: List[str] = Field(description="States of the proposals in the segment")
+
+
+class ProposalArchive:
+    """Compressed archive of the proposals which were removed from the store.
+
+    The archive is a directory of segments, gzip files of JSON lines with one
+    proposal per line. Each compaction batch writes a new segment, so archiving
+    never rewrites the archive. The index file `index.jsonl` lists the range of
+    the IDs and creation times and the states of the proposals in each segment,
+    queries only decompress the segments which can contain matching proposals.
+
+    Proposals are archived before they are deleted from the store. A segment is
+    added to the index after it was written completely, so readers never see a
+    partial segment. A proposal which was archived more than once, e.g. by
+    concurrent compactions of several API processes, is returned once.
+
+    Args:
+        path (str): The path of the archive directory.
+        level (int, optional): The gzip compression level. Defaults to
+            COMPRESSION_LEVEL.
+    """
+
+    INDEX = "index.jsonl"
+
+    def __init__(self, path: str, level: int = COMPRESSION_LEVEL):
+        self.path = path
+        self.level = level
+        self._lock = threading.Lock()
+
+    def append(self, documents: List[Dict[str, Any]]) -> None:
+        """Append proposals to the archive as a new segment.
+
+        Args:
+            documents (List[Dict[str, Any]]): The proposals as stored.
+        """
+        if len(documents) == 0:
+            return
+        documents = [encode(d) for d in documents]
+        segment = ArchiveSegment(
+            name=f"{uuid.uuid4().hex}.jsonl.gz",
+            min_id=min(d["id"] for d in documents),
+            max_id=max(d["id"] for d in documents),
+            min_created_at=min(d["created_at"] for d in documents),
+            max_created_at=max(d["created_at"] for d in documents),
+            states=sorted({d["state"] for d in documents}),
+        )
+        lines = "".join(json.dumps(d) + "\n" for d in documents)
+        os.makedirs(self.path, exist_ok=True)
+        with open(os.path.join(self.path, segment.name), "wb") as f:
+            f.write(gzip.compress(lines.encode(), compresslevel=self.level))
+        # a single write in append mode, so the entries appended by several
+        # processes do not interleave
+        with self._lock, open(os.path.join(self.path, self.INDEX), "a") as f:
+            f.write(segment.model_dump_json() + "\n")
+
+    def segments(self) -> List[ArchiveSegment]:
+        """Get the segments of the archive in the order they were archived.
+
+        Malformed entries of the index, e.g. the incomplete end of an entry which
+        is still being appended by another process, are skipped.
+
+        Returns:
+            List[ArchiveSegment]: The segments.
+        """
+        path = os.path.join(self.path, self.INDEX)
+        if not os.path.exists(path):
+            return []
+        segments = []
+        with open(path) as f:
+            for number, line in enumerate(f, start=1):
+                try:
+                    segments.append(ArchiveSegment.model_validate_json(line))
+                except ValueError as e:
+                    logging.warning(f"Skipping entry {number} of {path}: {e}")
+        return segments
+
+    def read(self, segment: ArchiveSegment) -> Iterator[Dict[str, Any]]:
+        """Read the proposals of a segment.
+
+        Malformed lines are logged and skipped, the following proposals are still
+        returned.
+
+        Args:
+            segment (ArchiveSegment): The segment.
+
+        Raises:
+            ArchiveError: If the segment is missing or not a valid gzip file.
+
+        Yields:
+            Dict[str, Any]: The proposals.
+        """
+        path = os.path.join(self.path, segment.name)
+        try:
+            with gzip.open(path, "rt") as f:
+                for number, line in enumerate(f, start=1):
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError as e:
+                        logging.warning(f"Skipping line {number} of {path}: {e}")
+        except (OSError, EOFError, zlib.error) as e:
+            raise ArchiveError(f"Archive segment {path} is unreadable: {e}") from e
+
+    def _read_all(self, segments: List[ArchiveSegment]) -> Iterator[Dict[str, Any]]:
+        """Read the proposals of several segments, each proposal once."""
+        seen = set()
+        for segment in segments:
+            for document in self.read(segment):
+                if document["id"] not in seen:
+                    seen.add(document["id"])
+                    yield document
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        """Iterate over the archived proposals in the order they were archived.
+
+        Raises:
+            ArchiveError: If a segment cannot be read.
+
+        Yields:
+            Dict[str, Any]: The proposals.
+        """
+        return self._read_all(self.segments())
+
+    def get(self, proposal_id: int) -> Optional[Dict[str, Any]]:
+        """Get an archived proposal by its ID.
+
+        Only the segments whose range of IDs contains the ID are read.
+
+        Args:
+            proposal_id (int): The ID of the proposal.
+
+        Raises:
+            ArchiveError: If a segment cannot be read.
+
+        Returns:
+            Optional[Dict[str, Any]]: The proposal or None if it is not archived.
+        """
+        segments = [s for s in self.segments() if s.min_id <= proposal_id <= s.max_id]
+        return next(
+            (d for d in self._read_all(segments) if d["id"] == proposal_id), None
+        )
+
+    def search(
+        self,
+        state: Optional[ProposalStateEnum] = None,
+        created_after: Optional[datetime.datetime] = None,
+        created_before: Optional[datetime.datetime] = None,
+        after_id: Optional[int] = None,
+        limit: Optional[int] = None,
+        fields: Optional[List[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Search the archived proposals, like `ProposalStore.search`.
+
+        Segments which cannot contain matching proposals are not read. The others
+        are read in the order of their smallest ID until no further segment can
+        contain a proposal within the first `limit` matches.
+
+        Args:
+            state (Optional[ProposalStateEnum], optional): Only return proposals in
+                this state. Defaults to None.
+            created_after (Optional[datetime.datetime], optional): Only return
+                proposals created at or after this time. Defaults to None.
+            created_before (Optional[datetime.datetime], optional): Only return
+                proposals created before this time. Defaults to None.
+            after_id (Optional[int], optional): Only return proposals with a larger
+                ID. Defaults to None.
+            limit (Optional[int], optional): Maximum number of proposals to return.
+                Defaults to None.
+            fields (Optional[List[str]], optional): The fields to return besides the
+                ID. Defaults to None which returns all fields.
+
+        Raises:
+            ArchiveError: If a segment cannot be read.
+
+        Returns:
+            List[Dict[str, Any]]: The matching proposals ordered by their ID.
+        """
+        state, created_after, created_before = encode(
+            (state, local_time(created_after), local_time(created_before))
+        )
+        segments = sorted(
+            (
+                s
+                for s in self.segments()
+                if (state is None or state in s.states)
+                and (created_after is None or s.max_created_at >= created_after)
+                and (created_before is None or s.min_created_at < created_before)
+                and (after_id is None or s.max_id > after_id)
+            ),
+            key=lambda s: s.min_id,
+        )
+        matches: Dict[int, Dict[str, Any]] = {}
+        for segment in segments:
+            if limit is not None and len(matches) >= limit:
+                if sorted(matches)[limit - 1] < segment.min_id:
+                    break
+            for d in self.read(segment):
+                if (
+                    (state is None or d["state"] == state)
+                    and (created_after is None or d["created_at"] >= created_after)
+                    and (created_before is None or d["created_at"] < created_before)
+                    and (after_id is None or d["id"] > after_id)
+                ):
+                    matches.setdefault(d["id"], d)
+        documents = [matches[i] for i in sorted(matches)[:limit]]
+        if fields is None:
+            return documents
+        return [
+            {"id": d["id"], **{f: d.get(f) for f in fields if f != "id"}}
+            for d in documents
+        ]
+
+
+def compact(
+    store: ProposalStore,
+    archive: ProposalArchive,
+    policy: RetentionPolicy,
+    now: Optional[datetime.datetime] = None,
+    batch_size: int = COMPACTION_BATCH_SIZE,
+) -> int:
+    """Move the expired proposals from the store to the archive.
+
+    The expired proposals are archived and deleted in batches, after each batch
+    part of the space it occupied in the store is reclaimed.
+
+    Args:
+        store (ProposalStore): The store.
+        archive (ProposalArchive): The archive.
+        policy (RetentionPolicy): The policy which decides which proposals expire.
+        now (Optional[datetime.datetime], optional): The current time. Defaults to
+            None which uses the time of the call.
+        batch_size (int, optional): Number of proposals moved at once. Defaults to
+            COMPACTION_BATCH_SIZE.
+
+    Returns:
+        int: The number of archived proposals.
+    """
+    if not policy.enabled:
+        return 0
+    cutoffs = policy.cutoffs(now or datetime.datetime.now())
+    archived = 0
+    while True:
+        documents = store.search_expired(cutoffs, policy.keep_last, limit=batch_size)
+        if len(documents) == 0:
+            break
+        archive.append(documents)
+        store.delete_many([d["id"] for d in documents])
+        store.vacuum()
+        archived += len(documents)
+        PROPOSALS_ARCHIVED.inc(len(documents))
+    return archived
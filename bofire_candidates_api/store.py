@@ -0,0 +1,1503 @@
+import collections
+import datetime
+import functools
+import json
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic_core import to_jsonable_python
+
+from bofire_candidates_api.data_models import ProposalStateEnum
+from bofire_candidates_api.metrics import Histogram
+
+
+STORE_OPERATION_SECONDS = Histogram(
+    "bofire_store_operation_seconds",
+    "Duration of the operations of the proposal store",
+    ("operation",),
+)
+# number of free pages of the SQLite database which are released per vacuum
+VACUUM_PAGES = int(os.environ.get("PROPOSAL_VACUUM_PAGES", 1000))
+# proposals in these states do not change anymore and can be archived
+TERMINAL_STATES = (ProposalStateEnum.FINISHED, ProposalStateEnum.FAILED)
+
+
+def encode(value: Any) -> Any:
+    """Convert a value into its JSON compatible representation.
+
+    Args:
+        value (Any): The value to convert, e.g. a datetime or an enum member.
+
+    Returns:
+        Any: The JSON compatible representation of the value.
+    """
+    return to_jsonable_python(value)
+
+
+def local_time(value: Optional[datetime.datetime]) -> Optional[datetime.datetime]:
+    """Convert a time to the naive local time in which timestamps are stored.
+
+    Timestamps are stored without time zone, as returned by
+    `datetime.datetime.now()`. Times with a time zone are converted, so that they
+    can be compared with them, naive times are assumed to be local already.
+
+    Args:
+        value (Optional[datetime.datetime]): The time.
+
+    Returns:
+        Optional[datetime.datetime]: The naive local time.
+    """
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone().replace(tzinfo=None)
+
+
+def parse_tenant_weights(value: str) -> Dict[str, float]:
+    """Parse the weights of tenants in the fair scheduling of claims.
+
+    Args:
+        value (str): Comma separated `tenant=weight` pairs, e.g. `team-a=2,team-b=1`.
+
+    Raises:
+        ValueError: If a pair is malformed or a weight is not positive.
+
+    Returns:
+        Dict[str, float]: The weights by tenant.
+    """
+    weights = {}
+    for pair in value.split(","):
+        if pair.strip() == "":
+            continue
+        tenant, separator, weight = pair.rpartition("=")
+        if separator == "" or tenant.strip() == "" or float(weight) <= 0:
+            raise ValueError(f"Invalid tenant weight '{pair}', expected tenant=weight")
+        weights[tenant.strip()] = float(weight)
+    return weights
+
+
+def lease_expiry(
+    now: datetime.datetime, lease_duration: Optional[float]
+) -> Optional[datetime.datetime]:
+    """Get the expiry time of a lease starting now.
+
+    Args:
+        now (datetime.datetime): The start of the lease.
+        lease_duration (Optional[float]): The duration of the lease in seconds.
+
+    Returns:
+        Optional[datetime.datetime]: The expiry time, None if the lease never expires.
+    """
+    if lease_duration is None:
+        return None
+    return now + datetime.timedelta(seconds=lease_duration)
+
+
+class ProposalStore(ABC):
+    """Abstract storage backend for candidate proposals and campaigns.
+
+    Proposals and campaigns are stored as JSON compatible dictionaries, their IDs
+    are assigned by the store on insertion and are part of the returned documents.
+    The experiments of a campaign are stored row by row, so that appending
+    experiments does not rewrite the existing ones.
+
+    Proposals are claimed by strict priority and, within a priority, by weighted
+    fair queuing across their tenants: on insertion a proposal is tagged with the
+    virtual time `max(V, F)` at which its tenant's share of the workers reaches it,
+    where `V` is the tag of the last claimed proposal of the priority and `F` the
+    tag of the previous proposal of the tenant plus `1 / weight`. A tenant which
+    submits many proposals at once therefore does not block the proposals of the
+    others.
+    """
+
+    tenant_weights: Dict[str, float] = {}
+
+    def fair_share_cost(self, tenant: Optional[str]) -> float:
+        """Get the virtual time a proposal of a tenant advances its tenant's tag.
+
+        Args:
+            tenant (Optional[str]): The tenant, None for proposals without tenant.
+
+        Returns:
+            float: The inverse of the weight of the tenant, 1 by default.
+        """
+        return 1.0 / self.tenant_weights.get(tenant or "", 1.0)
+
+    @abstractmethod
+    def insert(self, document: Dict[str, Any]) -> int:
+        """Insert a new proposal into the store.
+
+        Args:
+            document (Dict[str, Any]): The proposal to store.
+
+        Returns:
+            int: The ID assigned to the proposal.
+        """
+
+    @abstractmethod
+    def insert_many(self, documents: List[Dict[str, Any]]) -> List[int]:
+        """Insert several new proposals into the store at once.
+
+        Args:
+            documents (List[Dict[str, Any]]): The proposals to store.
+
+        Returns:
+            List[int]: The IDs assigned to the proposals, in the same order.
+        """
+
+    @abstractmethod
+    def insert_idempotent(
+        self, document: Dict[str, Any], created_after: datetime.datetime
+    ) -> Tuple[int, bool]:
+        """Insert a proposal unless one with the same idempotency key exists.
+
+        Proposals which failed or were created before `created_after` are not
+        considered, so that a retry after a failure or after the time to live
+        creates a new proposal.
+
+        Args:
+            document (Dict[str, Any]): The proposal to store, including its
+                `idempotency_key`.
+            created_after (datetime.datetime): Only consider proposals created at
+                or after this time.
+
+        Returns:
+            Tuple[int, bool]: The ID of the new or the existing proposal and whether
+                the proposal was inserted.
+        """
+
+    @abstractmethod
+    def get(self, proposal_id: int) -> Optional[Dict[str, Any]]:
+        """Get a proposal by its ID.
+
+        Args:
+            proposal_id (int): The ID of the proposal.
+
+        Returns:
+            Optional[Dict[str, Any]]: The stored proposal or None if it does not exist.
+        """
+
+    @abstractmethod
+    def update(self, proposal_id: int, fields: Dict[str, Any]) -> None:
+        """Update fields of a stored proposal.
+
+        Args:
+            proposal_id (int): The ID of the proposal to update.
+            fields (Dict[str, Any]): The fields to overwrite.
+        """
+
+    @abstractmethod
+    def update_claimed(
+        self, proposal_id: int, n_claims: int, fields: Dict[str, Any]
+    ) -> bool:
+        """Update fields of a proposal only while it is held by the given claim.
+
+        Args:
+            proposal_id (int): The ID of the proposal to update.
+            n_claims (int): The number of claims of the proposal when it was
+                claimed, which identifies the claim.
+            fields (Dict[str, Any]): The fields to overwrite.
+
+        Returns:
+            bool: True if the proposal was updated, False if it is not claimed or
+                has been claimed again since.
+        """
+
+    @abstractmethod
+    def all(self) -> List[Dict[str, Any]]:
+        """Get all stored proposals ordered by their ID.
+
+        Returns:
+            List[Dict[str, Any]]: All stored proposals.
+        """
+
+    @abstractmethod
+    def search_state(
+        self, state: ProposalStateEnum, limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Get the proposals in a given state ordered by their ID.
+
+        Args:
+            state (ProposalStateEnum): The state to search for.
+            limit (Optional[int], optional): Maximum number of proposals to return.
+                Defaults to None.
+
+        Returns:
+            List[Dict[str, Any]]: The matching proposals.
+        """
+
+    @abstractmethod
+    def search(
+        self,
+        state: Optional[ProposalStateEnum] = None,
+        created_after: Optional[datetime.datetime] = None,
+        created_before: Optional[datetime.datetime] = None,
+        after_id: Optional[int] = None,
+        limit: Optional[int] = None,
+        fields: Optional[List[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        """Get a page of proposals ordered by their ID.
+
+        Args:
+            state (Optional[ProposalStateEnum], optional): Only return proposals in
+                this state. Defaults to None.
+            created_after (Optional[datetime.datetime], optional): Only return
+                proposals created at or after this time. Defaults to None.
+            created_before (Optional[datetime.datetime], optional): Only return
+                proposals created before this time. Defaults to None.
+            after_id (Optional[int], optional): Only return proposals with a larger
+                ID, used as pagination cursor. Defaults to None.
+            limit (Optional[int], optional): Maximum number of proposals to return.
+                Defaults to None.
+            fields (Optional[List[str]], optional): The fields to return, the ID is
+                always included. Defaults to None which returns all fields.
+
+        Returns:
+            List[Dict[str, Any]]: The matching proposals.
+        """
+
+    @abstractmethod
+    def get_states(self, proposal_ids: List[int]) -> Dict[int, ProposalStateEnum]:
+        """Get the states of several proposals.
+
+        Args:
+            proposal_ids (List[int]): The IDs of the proposals.
+
+        Returns:
+            Dict[int, ProposalStateEnum]: The states by ID, unknown IDs are omitted.
+        """
+
+    @abstractmethod
+    def count_states(self) -> Dict[ProposalStateEnum, int]:
+        """Count the proposals in each state.
+
+        Returns:
+            Dict[ProposalStateEnum, int]: The number of proposals by state, states
+                without proposals are omitted.
+        """
+
+    @abstractmethod
+    def claim(
+        self,
+        limit: int = 1,
+        lease_duration: Optional[float] = None,
+        tags: Optional[List[str]] = None,
+        max_cost: Optional[float] = None,
+    ) -> List[Dict[str, Any]]:
+        """Atomically claim the next proposals in the state CREATED.
+
+        The proposals of the highest priority are claimed first, among them the
+        one with the smallest fair queuing tag, the oldest for equal tags. The
+        claimed proposals are moved to the state CLAIMED and their number of
+        claims is incremented, a proposal is never handed out to more than one
+        caller. Proposals which the caller cannot process are skipped, so that
+        they do not block the proposals behind them in the queue.
+
+        Args:
+            limit (int, optional): Maximum number of proposals to claim. Defaults to 1.
+            lease_duration (Optional[float], optional): Time in seconds after which
+                the claim expires unless it is renewed. Defaults to None which
+                means that the claim never expires.
+            tags (Optional[List[str]], optional): The capabilities of the caller,
+                only proposals whose `required_tags` are all among them are
+                claimed. Defaults to None which means no capabilities.
+            max_cost (Optional[float], optional): Only claim proposals whose
+                estimated cost does not exceed this. Defaults to None which
+                means no limit.
+
+        Returns:
+            List[Dict[str, Any]]: The claimed proposals in the order of the queue.
+        """
+
+    @abstractmethod
+    def renew_lease(
+        self, proposal_id: int, n_claims: int, lease_duration: float
+    ) -> bool:
+        """Extend the lease of a claimed proposal.
+
+        Args:
+            proposal_id (int): The ID of the proposal.
+            n_claims (int): The number of claims of the proposal when it was
+                claimed, which identifies the claim.
+            lease_duration (float): Time in seconds from now until the lease expires.
+
+        Returns:
+            bool: True if the lease was renewed, False if the proposal is not claimed
+                or has been claimed again since.
+        """
+
+    @abstractmethod
+    def requeue_expired(self, max_claims: int) -> List[int]:
+        """Release the claimed proposals whose lease has expired.
+
+        Proposals which have been claimed less than `max_claims` times are moved
+        back to the state CREATED, the others are marked as failed.
+
+        Args:
+            max_claims (int): Maximum number of claims per proposal.
+
+        Returns:
+            List[int]: The IDs of the released proposals.
+        """
+
+    @abstractmethod
+    def search_expired(
+        self,
+        cutoffs: Dict[ProposalStateEnum, datetime.datetime],
+        keep_last: Optional[int] = None,
+        limit: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """Find the finished and failed proposals which have expired.
+
+        A proposal expires if it was last updated before the cutoff of its state,
+        or if its tenant has at least `keep_last` more recent finished or failed
+        proposals. Proposals without tenant count as one tenant.
+
+        Args:
+            cutoffs (Dict[ProposalStateEnum, datetime.datetime]): The cutoffs by
+                state, proposals in states without cutoff only expire by
+                `keep_last`.
+            keep_last (Optional[int], optional): Number of the most recent finished
+                and failed proposals of each tenant which are kept. Defaults to None
+                which keeps all.
+            limit (Optional[int], optional): Maximum number of proposals to return.
+                Defaults to None.
+
+        Returns:
+            List[Dict[str, Any]]: The expired proposals ordered by their ID.
+        """
+
+    @abstractmethod
+    def delete_many(self, proposal_ids: List[int]) -> None:
+        """Delete finished and failed proposals, other proposals are kept.
+
+        Args:
+            proposal_ids (List[int]): The IDs of the proposals.
+        """
+
+    @abstractmethod
+    def vacuum(self) -> None:
+        """Reclaim some of the space of deleted proposals.
+
+        The work done by a call is bounded, so that it does not block the other
+        operations on the store for long. It is meant to be called after each
+        batch of deletions.
+        """
+
+    @abstractmethod
+    def insert_campaign(self, document: Dict[str, Any]) -> int:
+        """Insert a new campaign without experiments into the store.
+
+        Args:
+            document (Dict[str, Any]): The campaign to store.
+
+        Returns:
+            int: The ID assigned to the campaign.
+        """
+
+    @abstractmethod
+    def get_campaign(self, campaign_id: int) -> Optional[Dict[str, Any]]:
+        """Get a campaign by its ID, without its experiments.
+
+        Args:
+            campaign_id (int): The ID of the campaign.
+
+        Returns:
+            Optional[Dict[str, Any]]: The stored campaign including the number of its
+                experiments or None if it does not exist.
+        """
+
+    @abstractmethod
+    def update_campaign(self, campaign_id: int, fields: Dict[str, Any]) -> None:
+        """Update fields of a stored campaign.
+
+        Args:
+            campaign_id (int): The ID of the campaign to update.
+            fields (Dict[str, Any]): The fields to overwrite.
+        """
+
+    @abstractmethod
+    def append_experiments(self, campaign_id: int, rows: List[Dict[str, Any]]) -> int:
+        """Append experiment rows to a campaign.
+
+        Args:
+            campaign_id (int): The ID of the campaign.
+            rows (List[Dict[str, Any]]): The experiment rows to append.
+
+        Returns:
+            int: The number of experiments of the campaign after appending.
+        """
+
+    @abstractmethod
+    def get_experiments(self, campaign_id: int, start: int = 0) -> List[Dict[str, Any]]:
+        """Get the experiment rows of a campaign in the order they were appended.
+
+        Args:
+            campaign_id (int): The ID of the campaign.
+            start (int, optional): Index of the first row to return. Defaults to 0.
+
+        Returns:
+            List[Dict[str, Any]]: The experiment rows.
+        """
+
+    def close(self) -> None:
+        """Release the resources held by the store."""
+
+
+class SqliteProposalStore(ProposalStore):
+    """SQLite based proposal store.
+
+    The state and the timestamps of a proposal are kept in indexed columns, the
+    remaining fields are stored as a JSON document. The database is operated in
+    WAL mode so that several API processes can share it. Each process holds a
+    single connection which is guarded by a lock and reopened after a fork.
+
+    The queue of the claims is served by an index in `QUEUE_ORDER`, the tags of
+    the tenants and the virtual time of the scheduler are kept in small tables,
+    so that inserting and claiming proposals do not depend on the size of the
+    queue. The queue is partitioned by the set of required tags, a claim only
+    reads the partitions whose tags the caller has, so that proposals for other
+    workers are not scanned.
+    """
+
+    COLUMNS = {
+        "state": "TEXT NOT NULL",
+        "created_at": "TEXT NOT NULL",
+        "last_updated_at": "TEXT NOT NULL",
+        "lease_expires_at": "TEXT",
+        "claimed_at": "TEXT",
+        "n_claims": "INTEGER NOT NULL DEFAULT 0",
+        "idempotency_key": "TEXT",
+        "priority": "INTEGER NOT NULL DEFAULT 0",
+        "tenant": "TEXT",
+        "virtual_start": "REAL NOT NULL DEFAULT 0",
+        "cost": "REAL",
+        "required_tags": "TEXT",
+    }
+    # columns which hold sets as sorted JSON arrays, NULL for empty sets
+    JSON_COLUMNS = ("required_tags",)
+    QUEUE_ORDER = "priority DESC, virtual_start, id"
+    # partitions of the queue which are read by a single claim, SQLite allows at
+    # most 500 terms in a compound select
+    MAX_CLAIM_PARTITIONS = 100
+    INDEXES = {
+        "ix_proposals_state": "state, id",
+        "ix_proposals_queue": f"state, {QUEUE_ORDER}",
+        # the cost is part of the index, so that it is checked without reading
+        # the proposals which are too expensive for the caller
+        "ix_proposals_tag_queue": f"state, required_tags, {QUEUE_ORDER}, cost",
+        "ix_proposals_created_at": "created_at",
+        "ix_proposals_lease": "state, lease_expires_at",
+        "ix_proposals_idempotency_key": "idempotency_key, created_at",
+    }
+
+    def __init__(
+        self,
+        path: str,
+        timeout: float = 30.0,
+        tenant_weights: Optional[Dict[str, float]] = None,
+    ):
+        self.path = path
+        self.timeout = timeout
+        self.tenant_weights = tenant_weights or {}
+        self._lock = threading.RLock()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """The connection of the current process, opened on first use."""
+        if self._connection is None or self._pid != os.getpid():
+            self._connection = self._connect()
+            self._pid = os.getpid()
+        return self._connection
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(
+            self.path,
+            timeout=self.timeout,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        connection.row_factory = sqlite3.Row
+        # only takes effect for new databases, databases created by earlier
+        # versions keep their mode until they are vacuumed offline
+        connection.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS proposals ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, document TEXT NOT NULL)"
+        )
+        # add the columns missing in databases created by earlier versions
+        existing = {
+            row["name"] for row in connection.execute("PRAGMA table_info(proposals)")
+        }
+        for column, definition in self.COLUMNS.items():
+            if column not in existing:
+                connection.execute(
+                    f"ALTER TABLE proposals ADD COLUMN {column} {definition}"
+                )
+        for index, columns in self.INDEXES.items():
+            connection.execute(
+                f"CREATE INDEX IF NOT EXISTS {index} ON proposals ({columns})"
+            )
+        connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS scheduler (
+                priority INTEGER PRIMARY KEY,
+                virtual_time REAL NOT NULL
+            )
+            """
+        )
+        connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS tenants (
+                priority INTEGER NOT NULL,
+                tenant TEXT NOT NULL,
+                virtual_finish REAL NOT NULL,
+                PRIMARY KEY (priority, tenant)
+            ) WITHOUT ROWID
+            """
+        )
+        connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS tag_sets (tags TEXT PRIMARY KEY) WITHOUT ROWID
+            """
+        )
+        # register the tag sets of the queued proposals of earlier versions
+        connection.execute(
+            """
+            INSERT OR IGNORE INTO tag_sets (tags)
+            SELECT DISTINCT required_tags FROM proposals
+            WHERE state IN (?, ?) AND required_tags IS NOT NULL
+            """,
+            (encode(ProposalStateEnum.CREATED), encode(ProposalStateEnum.CLAIMED)),
+        )
+        connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS campaigns (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                n_experiments INTEGER NOT NULL DEFAULT 0,
+                document TEXT NOT NULL
+            )
+            """
+        )
+        connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS campaign_experiments (
+                campaign_id INTEGER NOT NULL,
+                position INTEGER NOT NULL,
+                row TEXT NOT NULL,
+                PRIMARY KEY (campaign_id, position)
+            ) WITHOUT ROWID
+            """
+        )
+        return connection
+
+    def _to_document(self, row: sqlite3.Row) -> Dict[str, Any]:
+        document = json.loads(row["document"])
+        document["id"] = row["id"]
+        for column in self.COLUMNS:
+            document[column] = self._decode_column(column, row[column])
+        return document
+
+    def _decode_column(self, column: str, value: Any) -> Any:
+        if column in self.JSON_COLUMNS:
+            return [] if value is None else json.loads(value)
+        return value
+
+    def _split(self, fields: Dict[str, Any]):
+        encoded = encode(fields)
+        columns = {k: v for k, v in encoded.items() if k in self.COLUMNS}
+        for column in self.JSON_COLUMNS:
+            if column in columns:
+                value = columns[column]
+                columns[column] = json.dumps(sorted(set(value))) if value else None
+        document = {
+            k: v for k, v in encoded.items() if k not in self.COLUMNS and k != "id"
+        }
+        return columns, document
+
+    def _insert(self, document: Dict[str, Any]) -> int:
+        # must run in a transaction, which makes the tag of the tenant consistent
+        priority = document.get("priority", 0)
+        tenant = document.get("tenant") or ""
+        virtual_start = self.connection.execute(
+            """
+            SELECT MAX(
+                COALESCE(
+                    (SELECT virtual_time FROM scheduler WHERE priority = ?), 0
+                ),
+                COALESCE(
+                    (
+                        SELECT virtual_finish FROM tenants
+                        WHERE priority = ? AND tenant = ?
+                    ),
+                    0
+                )
+            )
+            """,
+            (priority, priority, tenant),
+        ).fetchone()[0]
+        self.connection.execute(
+            """
+            INSERT INTO tenants (priority, tenant, virtual_finish) VALUES (?, ?, ?)
+            ON CONFLICT (priority, tenant)
+            DO UPDATE SET virtual_finish = excluded.virtual_finish
+            """,
+            (
+                priority,
+                tenant,
+                virtual_start + self.fair_share_cost(document.get("tenant")),
+            ),
+        )
+        columns, rest = self._split({**document, "virtual_start": virtual_start})
+        self._add_tag_set(columns.get("required_tags"))
+        names = ", ".join([*columns, "document"])
+        placeholders = ", ".join("?" for _ in range(len(columns) + 1))
+        cursor = self.connection.execute(
+            f"INSERT INTO proposals ({names}) VALUES ({placeholders})",
+            (*columns.values(), json.dumps(rest)),
+        )
+        return cursor.lastrowid
+
+    def _add_tag_set(self, tags: Optional[str]) -> None:
+        if tags is not None:
+            self.connection.execute(
+                "INSERT OR IGNORE INTO tag_sets (tags) VALUES (?)", (tags,)
+            )
+
+    def insert(self, document: Dict[str, Any]) -> int:
+        return self.insert_many([document])[0]
+
+    def insert_many(self, documents: List[Dict[str, Any]]) -> List[int]:
+        with self._lock:
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                ids = [self._insert(document) for document in documents]
+                self.connection.execute("COMMIT")
+            except Exception:
+                self.connection.execute("ROLLBACK")
+                raise
+        return ids
+
+    def insert_idempotent(
+        self, document: Dict[str, Any], created_after: datetime.datetime
+    ) -> Tuple[int, bool]:
+        with self._lock:
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                row = self.connection.execute(
+                    "SELECT id FROM proposals "
+                    "WHERE idempotency_key = ? AND created_at >= ? AND state != ? "
+                    "ORDER BY id DESC LIMIT 1",
+                    (
+                        document["idempotency_key"],
+                        encode(created_after),
+                        encode(ProposalStateEnum.FAILED),
+                    ),
+                ).fetchone()
+                result = (
+                    (self._insert(document), True)
+                    if row is None
+                    else (row["id"], False)
+                )
+                self.connection.execute("COMMIT")
+            except Exception:
+                self.connection.execute("ROLLBACK")
+                raise
+        return result
+
+    def get(self, proposal_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT * FROM proposals WHERE id = ?", (proposal_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return self._to_document(row)
+
+    def _assignments(self, fields: Dict[str, Any]) -> Tuple[List[str], List[Any]]:
+        columns, document = self._split(fields)
+        assignments = [f"{column} = ?" for column in columns]
+        parameters = list(columns.values())
+        if len(document) > 0:
+            paths = ", ".join("?, json(?)" for _ in document)
+            assignments.append(f"document = json_set(document, {paths})")
+            for key, value in document.items():
+                parameters += [f"$.{key}", json.dumps(value)]
+        return assignments, parameters
+
+    def update(self, proposal_id: int, fields: Dict[str, Any]) -> None:
+        assignments, parameters = self._assignments(fields)
+        if len(assignments) == 0:
+            return
+        with self._lock:
+            if "required_tags" in fields:
+                self._add_tag_set(self._split(fields)[0]["required_tags"])
+            self.connection.execute(
+                f"UPDATE proposals SET {', '.join(assignments)} WHERE id = ?",
+                (*parameters, proposal_id),
+            )
+
+    def update_claimed(
+        self, proposal_id: int, n_claims: int, fields: Dict[str, Any]
+    ) -> bool:
+        assignments, parameters = self._assignments(fields)
+        with self._lock:
+            cursor = self.connection.execute(
+                f"UPDATE proposals SET {', '.join(assignments)} "
+                "WHERE id = ? AND state = ? AND n_claims = ?",
+                (
+                    *parameters,
+                    proposal_id,
+                    encode(ProposalStateEnum.CLAIMED),
+                    n_claims,
+                ),
+            )
+        return cursor.rowcount > 0
+
+    def all(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT * FROM proposals ORDER BY id"
+            ).fetchall()
+        return [self._to_document(row) for row in rows]
+
+    def search_state(
+        self, state: ProposalStateEnum, limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT * FROM proposals WHERE state = ? ORDER BY id LIMIT ?",
+                (encode(state), -1 if limit is None else limit),
+            ).fetchall()
+        return [self._to_document(row) for row in rows]
+
+    @staticmethod
+    def _extract(field: str) -> str:
+        # the field as JSON text, the `->` operator requires SQLite 3.38 and
+        # `json_extract` returns booleans as integers
+        return (
+            f"CASE json_type(document, '$.{field}') "
+            "WHEN 'true' THEN 'true' WHEN 'false' THEN 'false' "
+            f"ELSE json_quote(json_extract(document, '$.{field}')) END AS {field}"
+        )
+
+    def search(
+        self,
+        state: Optional[ProposalStateEnum] = None,
+        created_after: Optional[datetime.datetime] = None,
+        created_before: Optional[datetime.datetime] = None,
+        after_id: Optional[int] = None,
+        limit: Optional[int] = None,
+        fields: Optional[List[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        created_after = local_time(created_after)
+        created_before = local_time(created_before)
+        conditions, parameters = [], []
+        for condition, value in [
+            ("state = ?", state),
+            ("created_at >= ?", created_after),
+            ("created_at < ?", created_before),
+            ("id > ?", after_id),
+        ]:
+            if value is not None:
+                conditions.append(condition)
+                parameters.append(encode(value))
+        where = f"WHERE {' AND '.join(conditions)}" if len(conditions) > 0 else ""
+        if fields is None:
+            selection = "*"
+        else:
+            # only the requested fields are extracted from the JSON documents
+            fields = [f for f in fields if f != "id"]
+            if not all(f.isidentifier() for f in fields):
+                raise ValueError(f"Invalid field names {fields}.")
+            selection = ", ".join(
+                ["id"]
+                + [f"{f}" if f in self.COLUMNS else self._extract(f) for f in fields]
+            )
+        with self._lock:
+            rows = self.connection.execute(
+                f"SELECT {selection} FROM proposals {where} ORDER BY id LIMIT ?",
+                (*parameters, -1 if limit is None else limit),
+            ).fetchall()
+        if fields is None:
+            return [self._to_document(row) for row in rows]
+        return [
+            {
+                "id": row["id"],
+                **{
+                    f: self._decode_column(f, row[f])
+                    if f in self.COLUMNS or row[f] is None
+                    else json.loads(row[f])
+                    for f in fields
+                },
+            }
+            for row in rows
+        ]
+
+    def get_states(self, proposal_ids: List[int]) -> Dict[int, ProposalStateEnum]:
+        if len(proposal_ids) == 0:
+            return {}
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT id, state FROM proposals WHERE id IN "
+                f"({', '.join('?' for _ in proposal_ids)})",
+                proposal_ids,
+            ).fetchall()
+        return {row["id"]: ProposalStateEnum(row["state"]) for row in rows}
+
+    def count_states(self) -> Dict[ProposalStateEnum, int]:
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT state, COUNT(*) AS n FROM proposals GROUP BY state"
+            ).fetchall()
+        return {ProposalStateEnum(row["state"]): row["n"] for row in rows}
+
+    def claim(
+        self,
+        limit: int = 1,
+        lease_duration: Optional[float] = None,
+        tags: Optional[List[str]] = None,
+        max_cost: Optional[float] = None,
+    ) -> List[Dict[str, Any]]:
+        now = datetime.datetime.now()
+        cost = "" if max_cost is None else "AND COALESCE(cost, 0) <= ?"
+        # the transaction holds the database write lock, which makes the claim
+        # atomic across threads and processes
+        with self._lock:
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                partitions: List[Optional[str]] = [None] + [
+                    row["tags"]
+                    for row in self.connection.execute("SELECT tags FROM tag_sets")
+                    if set(json.loads(row["tags"])) <= set(tags or [])
+                ]
+                if len(partitions) <= self.MAX_CLAIM_PARTITIONS:
+                    # the first proposals of each partition the caller may claim
+                    candidates = " UNION ALL ".join(
+                        f"""
+                        SELECT * FROM (
+                            SELECT id, priority, virtual_start FROM proposals
+                            WHERE state = ? AND required_tags IS ? {cost}
+                            ORDER BY {self.QUEUE_ORDER} LIMIT ?
+                        )
+                        """
+                        for _ in partitions
+                    )
+                    parameters = [
+                        p
+                        for tag_set in partitions
+                        for p in [
+                            encode(ProposalStateEnum.CREATED),
+                            tag_set,
+                            *([] if max_cost is None else [max_cost]),
+                            limit,
+                        ]
+                    ]
+                else:
+                    candidates = f"""
+                        SELECT id, priority, virtual_start FROM proposals
+                        WHERE state = ? AND (
+                            required_tags IS NULL
+                            OR required_tags IN (
+                                {", ".join("?" for _ in partitions[1:])}
+                            )
+                        ) {cost}
+                        """
+                    parameters = [
+                        encode(ProposalStateEnum.CREATED),
+                        *partitions[1:],
+                        *([] if max_cost is None else [max_cost]),
+                    ]
+                rows = self.connection.execute(
+                    f"""
+                    UPDATE proposals
+                    SET state = ?, last_updated_at = ?, claimed_at = ?,
+                        lease_expires_at = ?, n_claims = n_claims + 1
+                    WHERE id IN (
+                        SELECT id FROM ({candidates})
+                        ORDER BY {self.QUEUE_ORDER} LIMIT ?
+                    )
+                    RETURNING *
+                    """,
+                    (
+                        encode(ProposalStateEnum.CLAIMED),
+                        encode(now),
+                        encode(now),
+                        encode(lease_expiry(now, lease_duration)),
+                        *parameters,
+                        limit,
+                    ),
+                ).fetchall()
+                virtual_times: Dict[int, float] = {}
+                for row in rows:
+                    virtual_times[row["priority"]] = max(
+                        virtual_times.get(row["priority"], 0.0), row["virtual_start"]
+                    )
+                self.connection.executemany(
+                    """
+                    INSERT INTO scheduler (priority, virtual_time) VALUES (?, ?)
+                    ON CONFLICT (priority)
+                    DO UPDATE SET virtual_time = MAX(virtual_time, excluded.virtual_time)
+                    """,
+                    virtual_times.items(),
+                )
+                self.connection.execute("COMMIT")
+            except Exception:
+                self.connection.execute("ROLLBACK")
+                raise
+        return sorted(
+            (self._to_document(row) for row in rows),
+            key=lambda d: (-d["priority"], d["virtual_start"], d["id"]),
+        )
+
+    def renew_lease(
+        self, proposal_id: int, n_claims: int, lease_duration: float
+    ) -> bool:
+        return self.update_claimed(
+            proposal_id,
+            n_claims,
+            {"lease_expires_at": lease_expiry(datetime.datetime.now(), lease_duration)},
+        )
+
+    def requeue_expired(self, max_claims: int) -> List[int]:
+        now = encode(datetime.datetime.now())
+        claimed = encode(ProposalStateEnum.CLAIMED)
+        with self._lock:
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                failed = self.connection.execute(
+                    """
+                    UPDATE proposals
+                    SET state = ?, last_updated_at = ?, lease_expires_at = NULL,
+                        document = json_set(
+                            document,
+                            '$.error_message',
+                            'Lease expired after ' || n_claims || ' claim(s)'
+                        )
+                    WHERE state = ? AND lease_expires_at < ? AND n_claims >= ?
+                    RETURNING id
+                    """,
+                    (
+                        encode(ProposalStateEnum.FAILED),
+                        now,
+                        claimed,
+                        now,
+                        max_claims,
+                    ),
+                ).fetchall()
+                requeued = self.connection.execute(
+                    """
+                    UPDATE proposals
+                    SET state = ?, last_updated_at = ?, lease_expires_at = NULL
+                    WHERE state = ? AND lease_expires_at < ?
+                    RETURNING id
+                    """,
+                    (encode(ProposalStateEnum.CREATED), now, claimed, now),
+                ).fetchall()
+                self.connection.execute("COMMIT")
+            except Exception:
+                self.connection.execute("ROLLBACK")
+                raise
+        return sorted(row["id"] for row in failed + requeued)
+
+    def search_expired(
+        self,
+        cutoffs: Dict[ProposalStateEnum, datetime.datetime],
+        keep_last: Optional[int] = None,
+        limit: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        conditions, parameters = [], []
+        for state, cutoff in cutoffs.items():
+            conditions.append("(state = ? AND last_updated_at < ?)")
+            parameters += [encode(state), encode(cutoff)]
+        if keep_last is not None:
+            conditions.append("rank > ?")
+            parameters.append(keep_last)
+        if len(conditions) == 0:
+            return []
+        # the documents are only read for the expired proposals
+        with self._lock:
+            rows = self.connection.execute(
+                f"""
+                SELECT * FROM proposals WHERE id IN (
+                    SELECT id FROM (
+                        SELECT id, state, last_updated_at, ROW_NUMBER() OVER (
+                            PARTITION BY COALESCE(tenant, '') ORDER BY id DESC
+                        ) AS rank
+                        FROM proposals WHERE state IN (?, ?)
+                    )
+                    WHERE {" OR ".join(conditions)}
+                    ORDER BY id LIMIT ?
+                )
+                ORDER BY id
+                """,
+                (
+                    *encode(TERMINAL_STATES),
+                    *parameters,
+                    -1 if limit is None else limit,
+                ),
+            ).fetchall()
+        return [self._to_document(row) for row in rows]
+
+    def delete_many(self, proposal_ids: List[int]) -> None:
+        with self._lock:
+            self.connection.execute(
+                "DELETE FROM proposals WHERE state IN (?, ?) "
+                "AND id IN (SELECT value FROM json_each(?))",
+                (*encode(TERMINAL_STATES), json.dumps(proposal_ids)),
+            )
+
+    def vacuum(self) -> None:
+        # frees at most VACUUM_PAGES pages, the WAL is checkpointed by SQLite,
+        # the pragma frees one page per step and runs to completion as a script
+        with self._lock:
+            self.connection.executescript(f"PRAGMA incremental_vacuum({VACUUM_PAGES})")
+
+    def insert_campaign(self, document: Dict[str, Any]) -> int:
+        document = {
+            k: v
+            for k, v in encode(document).items()
+            if k not in ("id", "n_experiments", "experiments")
+        }
+        with self._lock:
+            cursor = self.connection.execute(
+                "INSERT INTO campaigns (document) VALUES (?)", (json.dumps(document),)
+            )
+            return cursor.lastrowid
+
+    def get_campaign(self, campaign_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT * FROM campaigns WHERE id = ?", (campaign_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            **json.loads(row["document"]),
+            "id": row["id"],
+            "n_experiments": row["n_experiments"],
+        }
+
+    def update_campaign(self, campaign_id: int, fields: Dict[str, Any]) -> None:
+        fields = {
+            k: v for k, v in encode(fields).items() if k not in ("id", "n_experiments")
+        }
+        if len(fields) == 0:
+            return
+        paths = ", ".join("?, json(?)" for _ in fields)
+        parameters = []
+        for key, value in fields.items():
+            parameters += [f"$.{key}", json.dumps(value)]
+        with self._lock:
+            self.connection.execute(
+                f"UPDATE campaigns SET document = json_set(document, {paths}) "
+                "WHERE id = ?",
+                (*parameters, campaign_id),
+            )
+
+    def append_experiments(self, campaign_id: int, rows: List[Dict[str, Any]]) -> int:
+        with self._lock:
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                (n_experiments,) = self.connection.execute(
+                    "SELECT n_experiments FROM campaigns WHERE id = ?", (campaign_id,)
+                ).fetchone()
+                self.connection.executemany(
+                    "INSERT INTO campaign_experiments (campaign_id, position, row) "
+                    "VALUES (?, ?, ?)",
+                    [
+                        (campaign_id, n_experiments + i, json.dumps(row))
+                        for i, row in enumerate(encode(rows))
+                    ],
+                )
+                n_experiments += len(rows)
+                self.connection.execute(
+                    "UPDATE campaigns SET n_experiments = ? WHERE id = ?",
+                    (n_experiments, campaign_id),
+                )
+                self.connection.execute("COMMIT")
+            except Exception:
+                self.connection.execute("ROLLBACK")
+                raise
+        return n_experiments
+
+    def get_experiments(self, campaign_id: int, start: int = 0) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT row FROM campaign_experiments "
+                "WHERE campaign_id = ? AND position >= ? ORDER BY position",
+                (campaign_id, start),
+            ).fetchall()
+        return [json.loads(row["row"]) for row in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None and self._pid == os.getpid():
+                self._connection.close()
+            self._connection = None
+
+
+class TinyDBProposalStore(ProposalStore):
+    """Legacy TinyDB based proposal store.
+
+    Every operation reads and writes the whole JSON file, the store is therefore
+    only suited for small databases that are accessed by a single process.
+    """
+
+    def __init__(self, path: str, tenant_weights: Optional[Dict[str, float]] = None):
+        from tinydb import TinyDB
+
+        self.path = path
+        self.tenant_weights = tenant_weights or {}
+        self._lock = threading.RLock()
+        self._db = TinyDB(path, default=str)
+
+    def _scheduler(self) -> Dict[str, Any]:
+        # the virtual time and the tags of the tenants by priority
+        documents = self._db.table("scheduler").all()
+        return {} if len(documents) == 0 else dict(documents[0])
+
+    def _save_scheduler(self, scheduler: Dict[str, Any]) -> None:
+        table = self._db.table("scheduler")
+        table.truncate()
+        table.insert(scheduler)
+
+    def insert(self, document: Dict[str, Any]) -> int:
+        tenant = document.get("tenant") or ""
+        with self._lock:
+            scheduler = self._scheduler()
+            tier = scheduler.setdefault(
+                str(document.get("priority", 0)), {"virtual_time": 0.0, "tenants": {}}
+            )
+            virtual_start = max(tier["virtual_time"], tier["tenants"].get(tenant, 0.0))
+            tier["tenants"][tenant] = virtual_start + self.fair_share_cost(
+                document.get("tenant")
+            )
+            self._save_scheduler(scheduler)
+            id = self._db.insert(encode({**document, "virtual_start": virtual_start}))
+            self._db.update({"id": id}, doc_ids=[id])
+        return id
+
+    def insert_many(self, documents: List[Dict[str, Any]]) -> List[int]:
+        with self._lock:
+            return [self.insert(document) for document in documents]
+
+    def insert_idempotent(
+        self, document: Dict[str, Any], created_after: datetime.datetime
+    ) -> Tuple[int, bool]:
+        with self._lock:
+            for existing in reversed(self.all()):
+                if (
+                    existing.get("idempotency_key") == document["idempotency_key"]
+                    and existing["state"] != ProposalStateEnum.FAILED
+                    and datetime.datetime.fromisoformat(existing["created_at"])
+                    >= created_after
+                ):
+                    return existing["id"], False
+            return self.insert(document), True
+
+    def get(self, proposal_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            document = self._db.get(doc_id=proposal_id)
+        return None if document is None else dict(document)
+
+    def update(self, proposal_id: int, fields: Dict[str, Any]) -> None:
+        with self._lock:
+            self._db.update(encode(fields), doc_ids=[proposal_id])
+
+    def update_claimed(
+        self, proposal_id: int, n_claims: int, fields: Dict[str, Any]
+    ) -> bool:
+        with self._lock:
+            document = self.get(proposal_id)
+            if (
+                document is None
+                or document["state"] != ProposalStateEnum.CLAIMED
+                or document.get("n_claims", 0) != n_claims
+            ):
+                return False
+            self.update(proposal_id, fields)
+        return True
+
+    def all(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [dict(document) for document in self._db.all()]
+
+    def search_state(
+        self, state: ProposalStateEnum, limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        from tinydb import Query
+
+        with self._lock:
+            documents = self._db.search(Query().state == encode(state))
+        documents = sorted(documents, key=lambda d: d.doc_id)
+        return [dict(document) for document in documents[:limit]]
+
+    def search(
+        self,
+        state: Optional[ProposalStateEnum] = None,
+        created_after: Optional[datetime.datetime] = None,
+        created_before: Optional[datetime.datetime] = None,
+        after_id: Optional[int] = None,
+        limit: Optional[int] = None,
+        fields: Optional[List[str]] = None,
+    ) -> List[Dict[str, Any]]:
+        def created_at(document) -> datetime.datetime:
+            return datetime.datetime.fromisoformat(document["created_at"])
+
+        created_after = local_time(created_after)
+        created_before = local_time(created_before)
+
+        with self._lock:
+            documents = sorted(self._db.all(), key=lambda d: d.doc_id)
+        documents = [
+            d
+            for d in documents
+            if (state is None or d["state"] == encode(state))
+            and (created_after is None or created_at(d) >= created_after)
+            and (created_before is None or created_at(d) < created_before)
+            and (after_id is None or d.doc_id > after_id)
+        ][:limit]
+        if fields is None:
+            return [dict(d) for d in documents]
+        return [{"id": d["id"], **{f: d.get(f) for f in fields}} for d in documents]
+
+    def get_states(self, proposal_ids: List[int]) -> Dict[int, ProposalStateEnum]:
+        with self._lock:
+            documents = self._db.get(doc_ids=proposal_ids)
+        return {d.doc_id: ProposalStateEnum(d["state"]) for d in documents}
+
+    def count_states(self) -> Dict[ProposalStateEnum, int]:
+        with self._lock:
+            states = [d["state"] for d in self._db.all()]
+        return {ProposalStateEnum(s): n for s, n in collections.Counter(states).items()}
+
+    def claim(
+        self,
+        limit: int = 1,
+        lease_duration: Optional[float] = None,
+        tags: Optional[List[str]] = None,
+        max_cost: Optional[float] = None,
+    ) -> List[Dict[str, Any]]:
+        now = datetime.datetime.now()
+        tags = set(tags or [])
+        # the lock only protects against concurrent claims within this process
+        with self._lock:
+            documents = sorted(
+                (
+                    d
+                    for d in self.search_state(ProposalStateEnum.CREATED)
+                    if set(d.get("required_tags", [])) <= tags
+                    and (max_cost is None or (d.get("cost") or 0) <= max_cost)
+                ),
+                key=lambda d: (
+                    -d.get("priority", 0),
+                    d.get("virtual_start", 0.0),
+                    d["id"],
+                ),
+            )[:limit]
+            if len(documents) > 0:
+                scheduler = self._scheduler()
+                for document in documents:
+                    tier = scheduler.setdefault(
+                        str(document.get("priority", 0)),
+                        {"virtual_time": 0.0, "tenants": {}},
+                    )
+                    tier["virtual_time"] = max(
+                        tier["virtual_time"], document.get("virtual_start", 0.0)
+                    )
+                self._save_scheduler(scheduler)
+            for document in documents:
+                fields = encode(
+                    {
+                        "state": ProposalStateEnum.CLAIMED,
+                        "last_updated_at": now,
+                        "claimed_at": now,
+                        "lease_expires_at": lease_expiry(now, lease_duration),
+                        "n_claims": document.get("n_claims", 0) + 1,
+                    }
+                )
+                self.update(document["id"], fields)
+                document.update(fields)
+        return documents
+
+    def renew_lease(
+        self, proposal_id: int, n_claims: int, lease_duration: float
+    ) -> bool:
+        return self.update_claimed(
+            proposal_id,
+            n_claims,
+            {"lease_expires_at": lease_expiry(datetime.datetime.now(), lease_duration)},
+        )
+
+    def requeue_expired(self, max_claims: int) -> List[int]:
+        now = datetime.datetime.now()
+        released = []
+        with self._lock:
+            for document in self.search_state(ProposalStateEnum.CLAIMED):
+                lease_expires_at = document.get("lease_expires_at")
+                if (
+                    lease_expires_at is None
+                    or datetime.datetime.fromisoformat(lease_expires_at) >= now
+                ):
+                    continue
+                if document.get("n_claims", 0) >= max_claims:
+                    fields = {
+                        "state": ProposalStateEnum.FAILED,
+                        "error_message": "Lease expired after "
+                        f"{document['n_claims']} claim(s)",
+                    }
+                else:
+                    fields = {"state": ProposalStateEnum.CREATED}
+                self.update(
+                    document["id"],
+                    {**fields, "last_updated_at": now, "lease_expires_at": None},
+                )
+                released.append(document["id"])
+        return released
+
+    def search_expired(
+        self,
+        cutoffs: Dict[ProposalStateEnum, datetime.datetime],
+        keep_last: Optional[int] = None,
+        limit: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        with self._lock:
+            documents = sorted(self.all(), key=lambda d: d["id"])
+        # the newest proposal is kept, TinyDB would reuse its ID otherwise
+        newest = documents[-1]["id"] if len(documents) > 0 else None
+        ranks: Dict[str, int] = collections.Counter()
+        expired = []
+        for document in reversed(documents):
+            state = ProposalStateEnum(document["state"])
+            if state not in TERMINAL_STATES:
+                continue
+            tenant = document.get("tenant") or ""
+            ranks[tenant] += 1
+            cutoff = cutoffs.get(state)
+            if document["id"] != newest and (
+                (
+                    cutoff is not None
+                    and datetime.datetime.fromisoformat(document["last_updated_at"])
+                    < cutoff
+                )
+                or (keep_last is not None and ranks[tenant] > keep_last)
+            ):
+                expired.append(document)
+        return expired[::-1][:limit]
+
+    def delete_many(self, proposal_ids: List[int]) -> None:
+        with self._lock:
+            self._db.remove(
+                doc_ids=[
+                    d.doc_id
+                    for d in self._db.get(doc_ids=proposal_ids)
+                    if d["state"] in TERMINAL_STATES
+                ]
+            )
+
+    def vacuum(self) -> None:
+        # every write rewrites the whole file
+        pass
+
+    def insert_campaign(self, document: Dict[str, Any]) -> int:
+        document = {
+            k: v
+            for k, v in encode(document).items()
+            if k not in ("id", "n_experiments", "experiments")
+        }
+        with self._lock:
+            return self._db.table("campaigns").insert({**document, "experiments": []})
+
+    def get_campaign(self, campaign_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            document = self._db.table("campaigns").get(doc_id=campaign_id)
+        if document is None:
+            return None
+        experiments = document.pop("experiments")
+        return {**document, "id": campaign_id, "n_experiments": len(experiments)}
+
+    def update_campaign(self, campaign_id: int, fields: Dict[str, Any]) -> None:
+        fields = {
+            k: v
+            for k, v in encode(fields).items()
+            if k not in ("id", "n_experiments", "experiments")
+        }
+        with self._lock:
+            self._db.table("campaigns").update(fields, doc_ids=[campaign_id])
+
+    def append_experiments(self, campaign_id: int, rows: List[Dict[str, Any]]) -> int:
+        with self._lock:
+            table = self._db.table("campaigns")
+            experiments = table.get(doc_id=campaign_id)["experiments"] + encode(rows)
+            table.update({"experiments": experiments}, doc_ids=[campaign_id])
+        return len(experiments)
+
+    def get_experiments(self, campaign_id: int, start: int = 0) -> List[Dict[str, Any]]:
+        with self._lock:
+            return self._db.table("campaigns").get(doc_id=campaign_id)["experiments"][
+                start:
+            ]
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+class TimedStore:
+    """Proxy of a proposal store which records the duration of its operations.
+
+    Every public method of the wrapped store is observed in
+    `STORE_OPERATION_SECONDS`, labeled with the name of the method. Apart from
+    that the proxy behaves like the wrapped store.
+    """
+
+    def __init__(self, store: ProposalStore):
+        self.store = store
+
+    def __getattr__(self, name: str) -> Any:
+        attribute = getattr(self.store, name)
+        if name.startswith("_") or not callable(attribute):
+            return attribute
+
+        @functools.wraps(attribute)
+        def timed(*args, **kwargs):
+            with STORE_OPERATION_SECONDS.time(operation=name):
+                return attribute(*args, **kwargs)
+
+        return timed
+
+
+STORES = {"sqlite": SqliteProposalStore, "tinydb": TinyDBProposalStore}
+
+
+def create_store(
+    backend: str, path: str, tenant_weights: Optional[Dict[str, float]] = None
+) -> ProposalStore:
+    """Create a proposal store.
+
+    Args:
+        backend (str): The storage backend, either "sqlite" or "tinydb".
+        path (str): The path of the database file.
+        tenant_weights (Optional[Dict[str, float]], optional): The weights of the
+            tenants in the fair scheduling of claims, 1 for tenants which are not
+            listed. Defaults to None.
+
+    Raises:
+        ValueError: If the backend is unknown.
+
+    Returns:
+        ProposalStore: The created store.
+    """
+    if backend not in STORES:
+        raise ValueError(
+            f"Unknown proposal store backend '{backend}', "
+            f"choose one of {sorted(STORES.keys())}."
+        )
+    return STORES[backend](path, tenant_weights=tenant_weights)
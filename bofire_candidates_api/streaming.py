@@ -0,0 +1,129 @@
+import os
+from typing import Any, AsyncIterable, Iterable, Iterator, Mapping, Optional, Union
+
+from bofire.data_models.dataframes.api import Candidates
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from pydantic_core import to_json
+
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+SSE_MEDIA_TYPE = "text/event-stream"
+# number of candidates per line of a streamed generation result
+NDJSON_CHUNK_SIZE = int(os.environ.get("NDJSON_CHUNK_SIZE", 100))
+
+
+def is_ndjson(media_type: Optional[str]) -> bool:
+    """Check whether an accept header names the newline delimited JSON format.
+
+    Args:
+        media_type (Optional[str]): The header value.
+
+    Returns:
+        bool: True if a stream of JSON lines is requested.
+    """
+    return media_type is not None and NDJSON_MEDIA_TYPE in media_type
+
+
+def encode_line(item: Any) -> bytes:
+    """Serialize an item of a stream as a single JSON line.
+
+    Args:
+        item (Any): A model, a serialized JSON document or any other object which
+            can be serialized by pydantic, e.g. a stored document.
+
+    Returns:
+        bytes: The JSON document terminated by a newline.
+    """
+    if isinstance(item, BaseModel):
+        item = item.model_dump_json().encode()
+    elif not isinstance(item, bytes):
+        item = to_json(item)
+    return item + b"\n"
+
+
+def ndjson_response(
+    items: Union[Iterable[Any], AsyncIterable[Any]],
+    headers: Optional[Mapping[str, str]] = None,
+) -> StreamingResponse:
+    """Create a response which streams items as newline delimited JSON.
+
+    Every item is serialized and sent as soon as it is produced, so that clients
+    can process the first items before the last ones are available. Synchronous
+    iterables are consumed in the threadpool, so they may query the store.
+
+    Args:
+        items (Union[Iterable[Any], AsyncIterable[Any]]): The items of the stream,
+            see `encode_line`.
+        headers (Optional[Mapping[str, str]], optional): Additional headers of the
+            response. Defaults to None.
+
+    Returns:
+        StreamingResponse: The response.
+    """
+    if isinstance(items, AsyncIterable):
+
+        async def lines():
+            async for item in items:
+                yield encode_line(item)
+
+        content = lines()
+    else:
+        content = (encode_line(item) for item in items)
+    response = StreamingResponse(content, media_type=NDJSON_MEDIA_TYPE)
+    for key, value in (headers or {}).items():
+        if key.lower() not in ("content-length", "content-type"):
+            response.headers[key] = value
+    return response
+
+
+def encode_event(event: str, data: Any) -> bytes:
+    """Serialize a Server-Sent Event.
+
+    Args:
+        event (str): The type of the event.
+        data (Any): The data of the event, serialized as a single JSON line, see
+            `encode_line`.
+
+    Returns:
+        bytes: The event terminated by an empty line.
+    """
+    return b"event: " + event.encode() + b"\ndata: " + encode_line(data) + b"\n"
+
+
+def sse_response(events: AsyncIterable[bytes]) -> StreamingResponse:
+    """Create a response which streams Server-Sent Events.
+
+    The response is neither cached nor buffered by proxies and is not compressed,
+    so that every event reaches the client as soon as it is sent.
+
+    Args:
+        events (AsyncIterable[bytes]): The encoded events, see `encode_event`.
+
+    Returns:
+        StreamingResponse: The response.
+    """
+    return StreamingResponse(
+        events,
+        media_type=SSE_MEDIA_TYPE,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def candidate_chunks(
+    candidates: Candidates, chunk_size: int = NDJSON_CHUNK_SIZE
+) -> Iterator[Candidates]:
+    """Split candidates into chunks for streaming.
+
+    Args:
+        candidates (Candidates): The candidates.
+        chunk_size (int, optional): The number of candidates per chunk. Defaults to
+            NDJSON_CHUNK_SIZE.
+
+    Yields:
+        Candidates: The consecutive chunks of the candidates.
+    """
+    for i in range(0, max(len(candidates.rows), 1), chunk_size):
+        yield candidates.model_copy(
+            update={"rows": candidates.rows[i : i + chunk_size]}
+        )
@@ -0,0 +1,119 @@
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+import bofire.surrogates.single_task_gp as single_task_gp
+import torch
+from bofire.data_models.surrogates.api import SingleTaskGPSurrogate as DataModel
+from bofire.surrogates.mapper import SURROGATE_MAP
+from bofire.surrogates.single_task_gp import SingleTaskGPSurrogate
+
+
+# prefixes of the state dict entries which hold the GP hyperparameters, the input
+# and outcome transforms depend on the training data and are not reused
+HYPERPARAMETER_PREFIXES = ("covar_module.", "mean_module.", "likelihood.")
+
+_initial_state = threading.local()
+_enabled = threading.local()
+_install_lock = threading.Lock()
+_fit_gpytorch_mll = single_task_gp.fit_gpytorch_mll
+_default_surrogate = SURROGATE_MAP[DataModel]
+
+
+def hyperparameters(model: torch.nn.Module) -> Dict[str, torch.Tensor]:
+    """Extract the hyperparameters from a fitted GP.
+
+    Args:
+        model (torch.nn.Module): The fitted GP.
+
+    Returns:
+        Dict[str, torch.Tensor]: The hyperparameter entries of the state dict.
+    """
+    return {
+        k: v.detach().clone()
+        for k, v in model.state_dict().items()
+        if k.startswith(HYPERPARAMETER_PREFIXES)
+    }
+
+
+def fit_gpytorch_mll(mll, *args, **kwargs):
+    """Fit a GP starting from the hyperparameters of a previous fit, if available."""
+    state = getattr(_initial_state, "state", None)
+    if state is not None:
+        try:
+            mll.model.load_state_dict(state, strict=False)
+        except Exception as e:
+            logging.debug(f"Could not warm start the GP: {e}")
+    return _fit_gpytorch_mll(mll, *args, **kwargs)
+
+
+class WarmStartSingleTaskGPSurrogate(SingleTaskGPSurrogate):
+    """Single task GP which starts its hyperparameter optimization from the
+    hyperparameters of the previous fit.
+
+    BoFire passes the `re_init_kwargs` of the surrogates to their replacements
+    when a strategy is told new experiments, so the hyperparameters are handed
+    over automatically on every refit of a strategy.
+    """
+
+    def __init__(
+        self,
+        data_model: DataModel,
+        initial_state: Optional[Dict[str, torch.Tensor]] = None,
+        **kwargs,
+    ):
+        self.initial_state = initial_state
+        super().__init__(data_model=data_model, **kwargs)
+
+    @property
+    def re_init_kwargs(self) -> dict:
+        re_init_kwargs = super().re_init_kwargs
+        if self.model is not None:
+            re_init_kwargs["initial_state"] = hyperparameters(self.model)
+        return re_init_kwargs
+
+    def _fit_botorch(self, *args, **kwargs):
+        _initial_state.state = self.initial_state
+        try:
+            super()._fit_botorch(*args, **kwargs)
+        finally:
+            _initial_state.state = None
+
+
+def map_single_task_gp(data_model: DataModel, **kwargs) -> SingleTaskGPSurrogate:
+    """Map a single task GP, warm started only within `warm_started`.
+
+    Args:
+        data_model (DataModel): The data model of the surrogate.
+
+    Returns:
+        SingleTaskGPSurrogate: The surrogate.
+    """
+    if getattr(_enabled, "enabled", False):
+        return WarmStartSingleTaskGPSurrogate(data_model=data_model, **kwargs)
+    kwargs.pop("initial_state", None)
+    return _default_surrogate(data_model=data_model, **kwargs)
+
+
+@contextmanager
+def warm_started() -> Iterator[None]:
+    """Warm start the single task GPs which are mapped in this thread.
+
+    Within the context, strategies which are mapped or told new experiments in
+    the current thread use `WarmStartSingleTaskGPSurrogate`. Other threads and
+    code outside of the context keep using the default surrogate of BoFire.
+
+    Yields:
+        None: The context.
+    """
+    with _install_lock:
+        if SURROGATE_MAP[DataModel] is not map_single_task_gp:
+            single_task_gp.fit_gpytorch_mll = fit_gpytorch_mll
+            SURROGATE_MAP[DataModel] = map_single_task_gp
+    enabled = getattr(_enabled, "enabled", False)
+    _enabled.enabled = True
+    try:
+        yield
+    finally:
+        _enabled.enabled = enabled
@@ -1,21 +1,215 @@
 import json
 import logging
 import multiprocessing as mp
+import os
+import queue
+import threading
 import time
-from typing import Dict, Optional, Type
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Dict, List, Literal, Optional, Tuple, Type, Union
+from urllib.parse import urlencode
 
 import requests
 from bofire.data_models.dataframes.api import Candidates
-from pydantic import BaseModel, model_validator
-
-from bofire_candidates_api.data_models import CandidatesProposal, ProposalStateEnum
-from bofire_candidates_api.generate import generate_candidates
+from pydantic import (
+    BaseModel,
+    Field,
+    PrivateAttr,
+    TypeAdapter,
+    field_validator,
+    model_validator,
+)
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from bofire_candidates_api.compression import (
+    COMPRESSION_MINIMUM_SIZE,
+    compress,
+    supported_encodings,
+)
+from bofire_candidates_api.data_models import (
+    TRUSTED,
+    CandidatesProposal,
+    GenerationProfile,
+    MarkProcessedBatchItem,
+    ProcessedProposal,
+    ProposalStateEnum,
+    load_trusted_json,
+)
+from bofire_candidates_api.generate import GENERATE_PHASE_SECONDS, generate_candidates
+from bofire_candidates_api.metrics import Counter, Gauge, Histogram, HistogramSnapshot
+from bofire_candidates_api.pool import initialize_process
+from bofire_candidates_api.profiling import Profiler
+
+
+# additional time the client waits for the API to answer a long-polling claim
+CLAIM_TIMEOUT_MARGIN = 10.0
+# status codes of transient errors after which idempotent requests are retried
+RETRY_STATUSES = (500, 502, 503, 504)
+
+WORKER_PHASE_SECONDS = Histogram(
+    "bofire_worker_phase_seconds",
+    "Duration of claiming, generating and reporting proposals in the worker",
+    ("phase",),
+)
+WORKER_PROPOSALS = Counter(
+    "bofire_worker_proposals_total",
+    "Number of proposals handled by the worker by outcome",
+    ("outcome",),
+)
+WORKER_BUSY_SECONDS = Counter(
+    "bofire_worker_busy_seconds_total",
+    "Time the slots of the worker spent processing proposals",
+)
+WORKER_SLOTS = Gauge(
+    "bofire_worker_slots", "Number of proposals the worker processes concurrently"
+)
+WORKER_RUNNING = Gauge(
+    "bofire_worker_running", "Number of proposals the worker is processing"
+)
+
+_proposals_adapter = TypeAdapter(List[CandidatesProposal])
+_batch_items_adapter = TypeAdapter(List[MarkProcessedBatchItem])
+
+
+def claim_query(
+    wait: float,
+    tags: Optional[List[str]] = None,
+    max_cost: Optional[float] = None,
+    max: Optional[int] = None,
+) -> str:
+    """Build the query string of a claim.
+
+    Args:
+        wait (float): Time in seconds the API holds the request open.
+        tags (Optional[List[str]], optional): Capabilities of the worker.
+            Defaults to None.
+        max_cost (Optional[float], optional): Largest estimated cost the worker
+            takes on. Defaults to None.
+        max (Optional[int], optional): Maximum number of proposals of a batch
+            claim. Defaults to None.
+
+    Returns:
+        str: The query string.
+    """
+    query = {"max": max, "wait": wait, "tags": tags or None, "max_cost": max_cost}
+    return urlencode({k: v for k, v in query.items() if v is not None}, doseq=True)
+
+
+def generate_proposal(
+    proposal: CandidatesProposal,
+) -> Tuple[
+    Union[Candidates, Exception], HistogramSnapshot, Optional[GenerationProfile]
+]:
+    """Generate the candidates of a proposal within a child process of the worker.
+
+    Args:
+        proposal (CandidatesProposal): The proposal to process.
+
+    Returns:
+        Tuple[Union[Candidates, Exception], HistogramSnapshot, Optional[GenerationProfile]]:
+            The generated candidates or the error, the phase durations recorded by
+            the child since its last proposal and the profile of the generation if
+            it was requested by the proposal.
+    """
+    profiler = Profiler(enabled=proposal.profile)
+    try:
+        with profiler:
+            result = generate_candidates(proposal)
+    except Exception as e:
+        result = Exception(str(e))
+    return result, GENERATE_PHASE_SECONDS.drain(), profiler.profile
+
+
+class ClaimLostError(Exception):
+    """The proposal is no longer held by the claim of this worker.
+
+    This happens if the lease of the claim expired and the proposal was put back
+    into the queue, or if it has already been marked as processed or failed.
+    """
+
+
+def check_claim(response: requests.Response) -> requests.Response:
+    """Raise if the API rejected a request because the claim was lost.
+
+    Args:
+        response (requests.Response): The response to a request with a claim token.
+
+    Raises:
+        ClaimLostError: If the API answered with status code 409.
+
+    Returns:
+        requests.Response: The response.
+    """
+    if response.status_code == 409:
+        raise ClaimLostError(response.json()["detail"])
+    return response
+
+
+def encode_body(
+    request_body: Union[Dict, List, BaseModel], compression: Optional[str]
+) -> Tuple[bytes, Dict[str, str]]:
+    """Serialize and compress the body of a request to the API.
+
+    Models are serialized by pydantic directly. Bodies of at least
+    `COMPRESSION_MINIMUM_SIZE` bytes are compressed with the given encoding.
+
+    Args:
+        request_body (Union[Dict, List, BaseModel]): The body of the request.
+        compression (Optional[str]): The content encoding, None to not compress.
+
+    Returns:
+        Tuple[bytes, Dict[str, str]]: The body and its additional headers.
+    """
+    if isinstance(request_body, BaseModel):
+        data = request_body.model_dump_json().encode()
+    elif isinstance(request_body, list):
+        data = b"[" + b",".join(_encode_item(item) for item in request_body) + b"]"
+    else:
+        data = json.dumps(request_body).encode()
+    if compression is not None and len(data) >= COMPRESSION_MINIMUM_SIZE:
+        return compress(data, compression), {"Content-Encoding": compression}
+    return data, {}
+
+
+def _encode_item(item: Union[Dict, BaseModel]) -> bytes:
+    if isinstance(item, BaseModel):
+        return item.model_dump_json().encode()
+    return json.dumps(item).encode()
 
 
 class Client(BaseModel):
-    """This class is used to interact with the BoFire candidates API."""
+    """This class is used to interact with the BoFire candidates API.
+
+    The requests are sent through a session which keeps the connections to the
+    API alive. Requests which can safely be repeated are retried with
+    exponential backoff after connection errors and the status codes in
+    `RETRY_STATUSES`. Claims are only retried if they could not be sent, so that
+    no proposal is claimed twice.
+    """
 
     url: str = "http://localhost:8000"
+    compression: Optional[Literal["gzip", "zstd"]] = "gzip"
+    retries: int = Field(default=3, ge=0)
+    backoff_factor: float = Field(default=0.5, ge=0)
+    pool_maxsize: int = Field(default=10, gt=0)
+    _session: Optional[requests.Session] = PrivateAttr(default=None)
+
+    @field_validator("compression")
+    @classmethod
+    def validate_compression(cls, compression: Optional[str]) -> Optional[str]:
+        """Validate that the compression of request bodies is available.
+
+        Raises:
+            ValueError: If zstd is chosen but zstandard is not installed.
+        """
+        if compression is not None and compression not in supported_encodings():
+            raise ValueError(
+                f"Compression {compression} requires the `compression` extra"
+            )
+        return compression
 
     @model_validator(mode="after")
     def validate_url(self):
@@ -30,6 +224,53 @@ class Client(BaseModel):
             raise ValueError(f"Could not connect to {self.url}.")
         return self
 
+    def retry(self, idempotent: bool = True) -> Retry:
+        """Get the retry policy of the requests.
+
+        Args:
+            idempotent (bool, optional): Whether the requests can be repeated after
+                they reached the API. Defaults to True.
+
+        Returns:
+            Retry: The policy.
+        """
+        return Retry(
+            total=self.retries,
+            connect=self.retries,
+            read=self.retries if idempotent else 0,
+            status=self.retries if idempotent else 0,
+            other=0,
+            allowed_methods=None,
+            status_forcelist=RETRY_STATUSES,
+            backoff_factor=self.backoff_factor,
+            raise_on_status=False,
+        )
+
+    @property
+    def session(self) -> requests.Session:
+        """The session of the requests, created on first use."""
+        if self._session is None:
+            session = requests.Session()
+            session.mount(
+                self.url,
+                HTTPAdapter(pool_maxsize=self.pool_maxsize, max_retries=self.retry()),
+            )
+            session.mount(
+                f"{self.url}/proposals/claim",
+                HTTPAdapter(
+                    pool_maxsize=self.pool_maxsize,
+                    max_retries=self.retry(idempotent=False),
+                ),
+            )
+            self._session = session
+        return self._session
+
+    def close(self):
+        """Close the connections of the session."""
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
     @property
     def headers(self) -> Dict[str, str]:
         """Get the headers for the API requests.
@@ -39,29 +280,38 @@ class Client(BaseModel):
         """
         return {"accept": "application/json", "Content-Type": "application/json"}
 
-    def get(self, path: str) -> requests.Response:
+    def get(self, path: str, timeout: Optional[float] = None) -> requests.Response:
         """Send a GET request to the API.
 
         Args:
             path (str): The enpoint to send the request to.
+            timeout (Optional[float], optional): Timeout of the request in seconds.
+                Defaults to None.
 
         Returns:
             requests.Response: The response from the API.
         """
-        return requests.get(f"{self.url}{path}", headers=self.headers)
+        return self.session.get(
+            f"{self.url}{path}", headers=self.headers, timeout=timeout
+        )
 
-    def post(self, path: str, request_body: Dict) -> requests.Response:
+    def post(
+        self, path: str, request_body: Union[Dict, List, BaseModel]
+    ) -> requests.Response:
         """Send a POST request to the API.
 
+        The body is serialized and compressed by `encode_body`.
+
         Args:
             path (str): The endpoint to send the request to.
-            request_body (Dict): The body of the request.
+            request_body (Union[Dict, List, BaseModel]): The body of the request.
 
         Returns:
             requests.Response: The response from the API.
         """
-        return requests.post(
-            f"{self.url}{path}", json=request_body, headers=self.headers
+        data, headers = encode_body(request_body, self.compression)
+        return self.session.post(
+            f"{self.url}{path}", data=data, headers={**self.headers, **headers}
         )
 
     def get_version(self) -> str:
@@ -73,58 +323,177 @@ class Client(BaseModel):
         response = self.get("/versions")
         return response.json()
 
-    def claim_proposal(self) -> Optional[CandidatesProposal]:
+    def claim_proposal(
+        self,
+        wait: float = 0,
+        tags: Optional[List[str]] = None,
+        max_cost: Optional[float] = None,
+    ) -> Optional[CandidatesProposal]:
         """Claim a proposal from the API.
 
+        Args:
+            wait (float, optional): Time in seconds the API holds the request open
+                until a proposal becomes available. Defaults to 0.
+            tags (Optional[List[str]], optional): Capabilities of the worker, only
+                proposals which require none but these are claimed. Defaults to None.
+            max_cost (Optional[float], optional): Largest estimated cost the worker
+                takes on. Defaults to None which means no limit.
+
         Returns:
             Optional[CandidatesProposal]: The claimed proposal.
         """
-        response = self.get("/proposals/claim")
+        response = self.get(
+            f"/proposals/claim?{claim_query(wait, tags, max_cost)}",
+            timeout=wait + CLAIM_TIMEOUT_MARGIN,
+        )
         if response.status_code == 404:
             return None
-        loaded_response = json.loads(response.content)
-        return CandidatesProposal(**loaded_response)
+        return load_trusted_json(CandidatesProposal, response.content)
+
+    def claim_proposals(
+        self,
+        max: int,
+        wait: float = 0,
+        tags: Optional[List[str]] = None,
+        max_cost: Optional[float] = None,
+    ) -> List[CandidatesProposal]:
+        """Claim several proposals from the API in one request.
+
+        Args:
+            max (int): The maximum number of proposals to claim.
+            wait (float, optional): Time in seconds the API holds the request open
+                until a proposal becomes available. Defaults to 0.
+            tags (Optional[List[str]], optional): Capabilities of the worker, only
+                proposals which require none but these are claimed. Defaults to None.
+            max_cost (Optional[float], optional): Largest estimated cost the worker
+                takes on. Defaults to None which means no limit.
+
+        Returns:
+            List[CandidatesProposal]: The claimed proposals.
+        """
+        response = self.get(
+            f"/proposals/claim/batch?{claim_query(wait, tags, max_cost, max)}",
+            timeout=wait + CLAIM_TIMEOUT_MARGIN,
+        )
+        return _proposals_adapter.validate_json(response.content, context=TRUSTED)
 
     def mark_processed(
-        self, proposal_id: int, candidates: Candidates
+        self, proposal_id: int, claim: int, candidates: Candidates
     ) -> ProposalStateEnum:
         """Mark a proposal as processed in the API.
 
         Args:
             proposal_id (int): The ID of the proposal to mark as processed.
+            claim (int): The claim token, `n_claims` of the claimed proposal.
             candidates (Candidates): The candidates generated by the proposal.
 
+        Raises:
+            ClaimLostError: If the proposal is no longer held by the claim.
+
         Returns:
             ProposalStateEnum: The state of the proposal after marking it as processed.
         """
         response = self.post(
-            f"/proposals/{proposal_id}/mark_processed",
-            request_body=candidates.model_dump(),
+            f"/proposals/{proposal_id}/mark_processed?claim={claim}",
+            request_body=candidates,
         )
-        return ProposalStateEnum(response.json())
+        return ProposalStateEnum(check_claim(response).json())
+
+    def mark_processed_batch(
+        self, processed: List[ProcessedProposal]
+    ) -> List[MarkProcessedBatchItem]:
+        """Mark several proposals as processed in the API with one request.
 
-    def mark_failed(self, proposal_id: int, error_message: str) -> ProposalStateEnum:
+        Args:
+            processed (List[ProcessedProposal]): The candidates and claim tokens of
+                the proposals.
+
+        Raises:
+            requests.HTTPError: If the API rejected the batch.
+
+        Returns:
+            List[MarkProcessedBatchItem]: The state or the error of each proposal.
+        """
+        response = self.post("/proposals/mark_processed/batch", request_body=processed)
+        response.raise_for_status()
+        return _batch_items_adapter.validate_json(response.content)
+
+    def heartbeat(self, proposal_id: int, claim: int) -> ProposalStateEnum:
+        """Renew the lease of a claimed proposal in the API.
+
+        Args:
+            proposal_id (int): The ID of the proposal which is processed.
+            claim (int): The claim token, `n_claims` of the claimed proposal.
+
+        Raises:
+            ClaimLostError: If the proposal is no longer held by the claim.
+
+        Returns:
+            ProposalStateEnum: The state of the proposal, CLAIMED.
+        """
+        response = self.post(
+            f"/proposals/{proposal_id}/heartbeat?claim={claim}", request_body={}
+        )
+        return ProposalStateEnum(check_claim(response).json())
+
+    def store_profile(
+        self, proposal_id: int, claim: int, profile: GenerationProfile
+    ) -> ProposalStateEnum:
+        """Store the profile of the generation of a proposal in the API.
+
+        Args:
+            proposal_id (int): The ID of the profiled proposal.
+            claim (int): The claim token, `n_claims` of the claimed proposal.
+            profile (GenerationProfile): The profile of the generation.
+
+        Raises:
+            ClaimLostError: If the proposal is no longer held by the claim.
+
+        Returns:
+            ProposalStateEnum: The state of the proposal, CLAIMED.
+        """
+        response = self.post(
+            f"/proposals/{proposal_id}/profile?claim={claim}", request_body=profile
+        )
+        return ProposalStateEnum(check_claim(response).json())
+
+    def mark_failed(
+        self, proposal_id: int, claim: int, error_message: str
+    ) -> ProposalStateEnum:
         """Mark a proposal as failed in the API.
 
         Args:
             proposal_id (int): The ID of the proposal to mark as failed.
+            claim (int): The claim token, `n_claims` of the claimed proposal.
             error_message (str): The error message to store.
 
+        Raises:
+            ClaimLostError: If the proposal is no longer held by the claim.
+
         Returns:
             ProposalStateEnum: The state of the proposal after marking it as failed.
         """
         response = self.post(
-            f"/proposals/{proposal_id}/mark_failed", request_body={"msg": error_message}
+            f"/proposals/{proposal_id}/mark_failed?claim={claim}",
+            request_body={"msg": error_message},
         )
-        return ProposalStateEnum(response.json())
+        return ProposalStateEnum(check_claim(response).json())
 
 
 class Worker(BaseModel):
-    """This class is used to process proposals from the BoFire candidates API."""
+    """This class is used to process proposals from the BoFire candidates API.
+
+    Workers of different classes are routed by `tags`, their capabilities, and
+    `max_cost`, the largest estimated cost of a proposal they take on. At least
+    one worker without `max_cost` is needed to process expensive proposals.
+    """
 
     client: Client
     job_check_interval: float
+    claim_wait: float = 0
     round: int = 0
+    tags: List[str] = Field(default_factory=list)
+    max_cost: Optional[float] = Field(default=None, ge=0)
 
     def sleep(self, sleep_time_sec: float, msg: str = ""):
         """Sleep for a given amount of time.
@@ -141,6 +510,65 @@ class Worker(BaseModel):
         while True:
             self.work_round()
 
+    def claim(self, max: int) -> List[CandidatesProposal]:
+        """Claim up to `max` proposals and record the time it took.
+
+        Args:
+            max (int): The maximum number of proposals to claim.
+
+        Returns:
+            List[CandidatesProposal]: The claimed proposals.
+        """
+        with WORKER_PHASE_SECONDS.time(phase="claim"):
+            if max == 1:
+                proposal = self.client.claim_proposal(
+                    wait=self.claim_wait, tags=self.tags, max_cost=self.max_cost
+                )
+                return [] if proposal is None else [proposal]
+            return self.client.claim_proposals(
+                max=max, wait=self.claim_wait, tags=self.tags, max_cost=self.max_cost
+            )
+
+    def heartbeat(self, proposal: CandidatesProposal):
+        """Renew the lease of a proposal which is processed by this worker.
+
+        Errors are only logged, a single failing heartbeat does not abort the
+        processing of the proposal.
+
+        Args:
+            proposal (CandidatesProposal): The proposal which is processed.
+        """
+        try:
+            self.client.heartbeat(proposal.id, claim=proposal.n_claims)
+        except ClaimLostError as e:
+            logging.warning(f"Proposal {proposal.id} is no longer claimed: {e}")
+        except Exception as e:
+            logging.error(f"Heartbeat for proposal {proposal.id} failed: {e}")
+
+    def store_profile(
+        self, proposal: CandidatesProposal, profile: Optional[GenerationProfile]
+    ):
+        """Send the profile of a proposal to the API, if it was profiled.
+
+        Errors other than a lost claim are only logged, the profile is not worth
+        failing the proposal.
+
+        Args:
+            proposal (CandidatesProposal): The processed proposal.
+            profile (Optional[GenerationProfile]): The profile of its generation.
+
+        Raises:
+            ClaimLostError: If the proposal is no longer held by the claim.
+        """
+        if profile is None:
+            return
+        try:
+            self.client.store_profile(proposal.id, proposal.n_claims, profile)
+        except ClaimLostError:
+            raise
+        except Exception as e:
+            logging.error(f"Could not store the profile of proposal {proposal.id}: {e}")
+
     @staticmethod
     def process_proposal(
         candidate_request: Type[CandidatesProposal],
@@ -150,14 +578,12 @@ class Worker(BaseModel):
 
         Args:
             candidate_request (Type[CandidatesProposal]): The proposal to process.
-            conn_obj (mp.connection.Connection): The connection object to send the results to.
+            conn_obj (mp.connection.Connection): The connection object to send the
+                results, the recorded phase durations and the profile to.
         """
-        try:
-            msg = generate_candidates(candidate_request)
-        except Exception as e:
-            msg = Exception(str(e))
-        finally:
-            conn_obj.send(msg)
+        # observations inherited from the parent are not sent back to it
+        GENERATE_PHASE_SECONDS.drain()
+        conn_obj.send(generate_proposal(candidate_request))
 
     def work_round(self):
         """Worker round of processing proposals.
@@ -167,34 +593,325 @@ class Worker(BaseModel):
         """
         logging.debug(f"Starting round {self.round}")
         self.round += 1
-        proposal = self.client.claim_proposal()
-        if proposal is None:
+        WORKER_SLOTS.set(1)
+        proposals = self.claim(max=1)
+        if len(proposals) == 0:
             logging.debug("No proposal to work on")
-            self.sleep(self.job_check_interval, msg="No proposal to work on.")
+            if self.claim_wait == 0:
+                self.sleep(self.job_check_interval, msg="No proposal to work on.")
             return
 
+        proposal = proposals[0]
         logging.info(f"Claimed proposal {proposal.id}")
-
+        started_at = time.perf_counter()
+        WORKER_RUNNING.set(1)
+
+        receiver, sender = mp.Pipe(False)
+        proc = mp.Process(
+            target=self.process_proposal,
+            args=(
+                proposal,
+                sender,
+            ),
+        )
         try:
-            receiver, sender = mp.Pipe(False)
-            proc = mp.Process(
-                target=self.process_proposal,
-                args=(
-                    proposal,
-                    sender,
-                ),
-            )
             proc.start()
 
             while True:
                 if receiver.poll(timeout=self.job_check_interval):
-                    candidates = receiver.recv()
+                    candidates, phases, profile = receiver.recv()
+                    GENERATE_PHASE_SECONDS.merge(phases)
+                    WORKER_PHASE_SECONDS.observe(
+                        time.perf_counter() - started_at, phase="generate"
+                    )
+                    self.store_profile(proposal, profile)
                     if isinstance(candidates, Exception):
                         raise candidates
                     else:
-                        self.client.mark_processed(proposal.id, candidates=candidates)
+                        with WORKER_PHASE_SECONDS.time(phase="report"):
+                            self.client.mark_processed(
+                                proposal.id,
+                                claim=proposal.n_claims,
+                                candidates=candidates,
+                            )
+                        WORKER_PROPOSALS.inc(outcome="processed")
                         logging.info(f"Proposal {proposal.id} processed successfully")
                         break
+                elif not proc.is_alive():
+                    # the child may have sent its result right before exiting
+                    if receiver.poll():
+                        continue
+                    raise Exception(
+                        f"Worker process died with exit code {proc.exitcode}"
+                    )
+                else:
+                    self.heartbeat(proposal)
+        except ClaimLostError as e:
+            WORKER_PROPOSALS.inc(outcome="discarded")
+            logging.warning(f"Result of proposal {proposal.id} discarded: {e}")
         except Exception as e:
             logging.error(f"Error processing proposal {proposal.id}: {e}")
-            self.client.mark_failed(proposal.id, error_message=str(e))
+            with WORKER_PHASE_SECONDS.time(phase="report"):
+                self.client.mark_failed(
+                    proposal.id, claim=proposal.n_claims, error_message=str(e)
+                )
+            WORKER_PROPOSALS.inc(outcome="failed")
+        finally:
+            WORKER_BUSY_SECONDS.inc(time.perf_counter() - started_at)
+            WORKER_RUNNING.set(0)
+            if proc.pid is not None:
+                proc.join(timeout=self.job_check_interval)
+                if proc.is_alive():
+                    proc.terminate()
+
+
+class PoolWorker(Worker):
+    """Worker which processes several proposals concurrently.
+
+    The proposals are executed in a pool of long-lived child processes which
+    import the strategy stack once. Optionally, child processes are replaced after
+    a given number of proposals to bound their memory growth.
+
+    The processed proposals are queued and reported by a separate thread, so the
+    callbacks of the process pool never wait for the API. It marks all results
+    that finished in the meantime as processed with a single request of up to
+    `report_batch_size` proposals.
+    """
+
+    concurrency: int = Field(default=1, gt=0)
+    max_jobs_per_child: Optional[int] = Field(default=None, gt=0)
+    report_batch_size: int = Field(default=16, gt=0)
+    _executor: Optional[ProcessPoolExecutor] = PrivateAttr(default=None)
+    _running: Dict[Future, CandidatesProposal] = PrivateAttr(default_factory=dict)
+    _heartbeat_thread: Optional[threading.Thread] = PrivateAttr(default=None)
+    _reporter_thread: Optional[threading.Thread] = PrivateAttr(default=None)
+    _reports: "queue.Queue[Tuple[CandidatesProposal, Future]]" = PrivateAttr(
+        default_factory=queue.Queue
+    )
+    _stop: threading.Event = PrivateAttr(default_factory=threading.Event)
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        """The process pool, started on first use."""
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.concurrency,
+                mp_context=mp.get_context("spawn"),
+                initializer=initialize_process,
+                initargs=(max(1, (os.cpu_count() or 1) // self.concurrency),),
+                max_tasks_per_child=self.max_jobs_per_child,
+            )
+        return self._executor
+
+    @property
+    def n_running(self) -> int:
+        """The number of proposals which are currently processed."""
+        self._running = {f: p for f, p in self._running.items() if not f.done()}
+        return len(self._running)
+
+    def report(self, proposal: CandidatesProposal, started_at: float, future: Future):
+        """Queue a processed proposal for the reporter thread.
+
+        Runs as done callback in the thread of the process pool, so it only
+        records the duration of the proposal and does not send any requests.
+
+        Args:
+            proposal (CandidatesProposal): The processed proposal.
+            started_at (float): The `time.perf_counter` at which it was submitted.
+            future (Future): The finished future of the proposal.
+        """
+        WORKER_PHASE_SECONDS.observe(time.perf_counter() - started_at, phase="generate")
+        WORKER_BUSY_SECONDS.inc(time.perf_counter() - started_at)
+        # `n_running` would replace the dict which is used by the main thread
+        WORKER_RUNNING.set(sum(not f.done() for f in list(self._running)))
+        self._reports.put((proposal, future))
+
+    def collect(
+        self, proposal: CandidatesProposal, future: Future
+    ) -> Optional[Tuple[CandidatesProposal, Candidates]]:
+        """Get the candidates of a processed proposal and store its profile.
+
+        Failures are reported right away.
+
+        Args:
+            proposal (CandidatesProposal): The processed proposal.
+            future (Future): The finished future of the proposal.
+
+        Returns:
+            Optional[Tuple[CandidatesProposal, Candidates]]: The proposal and its
+                candidates, or None if it failed or its claim was lost.
+        """
+        try:
+            candidates, phases, profile = future.result()
+            GENERATE_PHASE_SECONDS.merge(phases)
+            self.store_profile(proposal, profile)
+            if isinstance(candidates, Exception):
+                raise candidates
+            return proposal, candidates
+        except ClaimLostError as e:
+            WORKER_PROPOSALS.inc(outcome="discarded")
+            logging.warning(f"Result of proposal {proposal.id} discarded: {e}")
+        except Exception as e:
+            self.fail(proposal, e)
+        return None
+
+    def fail(self, proposal: CandidatesProposal, error: Exception):
+        """Mark a proposal as failed, errors of the API are only logged.
+
+        Args:
+            proposal (CandidatesProposal): The proposal.
+            error (Exception): The error of its processing.
+        """
+        logging.error(f"Error processing proposal {proposal.id}: {error}")
+        WORKER_PROPOSALS.inc(outcome="failed")
+        try:
+            with WORKER_PHASE_SECONDS.time(phase="report"):
+                self.client.mark_failed(
+                    proposal.id, claim=proposal.n_claims, error_message=str(error)
+                )
+        except Exception as e:
+            logging.error(f"Could not mark proposal {proposal.id} as failed: {e}")
+
+    def send_reports(self):
+        """Report the queued proposals until the worker shuts down.
+
+        The queue is drained before the thread exits.
+        """
+        while not (self._stop.is_set() and self._reports.empty()):
+            try:
+                reports = [self._reports.get(timeout=self.job_check_interval)]
+            except queue.Empty:
+                continue
+            while len(reports) < self.report_batch_size:
+                try:
+                    reports.append(self._reports.get_nowait())
+                except queue.Empty:
+                    break
+            processed = [r for r in (self.collect(*r) for r in reports) if r]
+            if len(processed) > 0:
+                self.mark_processed(processed)
+
+    def mark_processed(self, reports: List[Tuple[CandidatesProposal, Candidates]]):
+        """Mark proposals as processed with a single request.
+
+        Proposals whose claim was lost are discarded, all other errors mark the
+        proposal as failed, as if it was reported on its own.
+
+        Args:
+            reports (List[Tuple[CandidatesProposal, Candidates]]): The processed
+                proposals and their candidates.
+        """
+        try:
+            with WORKER_PHASE_SECONDS.time(phase="report"):
+                items = self.client.mark_processed_batch(
+                    [
+                        ProcessedProposal(
+                            id=proposal.id,
+                            claim=proposal.n_claims,
+                            candidates=candidates,
+                        )
+                        for proposal, candidates in reports
+                    ]
+                )
+        except Exception as e:
+            for proposal, _ in reports:
+                self.fail(proposal, e)
+            return
+        for (proposal, _), item in zip(reports, items):
+            if item.error is None:
+                WORKER_PROPOSALS.inc(outcome="processed")
+                logging.info(f"Proposal {proposal.id} processed successfully")
+            elif item.error.status_code == 409:
+                WORKER_PROPOSALS.inc(outcome="discarded")
+                logging.warning(
+                    f"Result of proposal {proposal.id} discarded: {item.error.detail}"
+                )
+            else:
+                self.fail(proposal, Exception(item.error.detail))
+
+    def submit(self, proposal: CandidatesProposal) -> Future:
+        """Submit a proposal to the process pool.
+
+        If a child process died, e.g. because it was killed by the OOM killer, the
+        pool is broken and all its running proposals fail. In this case the pool
+        is restarted before submitting the proposal.
+
+        Args:
+            proposal (CandidatesProposal): The proposal to process.
+
+        Returns:
+            Future: The future of the processed proposal.
+        """
+        try:
+            return self.executor.submit(generate_proposal, proposal)
+        except BrokenProcessPool:
+            logging.warning("Process pool is broken, restarting it")
+            self._executor.shutdown(wait=False)
+            self._executor = None
+            return self.executor.submit(generate_proposal, proposal)
+
+    def send_heartbeats(self):
+        """Renew the leases of the running proposals until the worker shuts down."""
+        while not self._stop.wait(timeout=self.job_check_interval):
+            for proposal in list(self._running.values()):
+                self.heartbeat(proposal)
+
+    def work(self):
+        """Start processing proposals from the API."""
+        try:
+            super().work()
+        finally:
+            self.shutdown()
+
+    def shutdown(self):
+        """Wait for the running proposals, report them and stop the process pool."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self._stop.set()
+        for thread in [self._reporter_thread, self._heartbeat_thread]:
+            if thread is not None:
+                thread.join()
+        self._reporter_thread = None
+        self._heartbeat_thread = None
+        self._stop.clear()
+
+    def work_round(self):
+        """Worker round, claims proposals for all free slots of the pool."""
+        logging.debug(f"Starting round {self.round}")
+        self.round += 1
+        WORKER_SLOTS.set(self.concurrency)
+        n_free = self.concurrency - self.n_running
+        if n_free == 0:
+            wait(
+                list(self._running),
+                timeout=self.job_check_interval,
+                return_when=FIRST_COMPLETED,
+            )
+            return
+
+        proposals = self.claim(max=n_free)
+        if len(proposals) == 0:
+            logging.debug("No proposal to work on")
+            if self.claim_wait == 0:
+                self.sleep(self.job_check_interval, msg="No proposal to work on.")
+            return
+
+        if self._heartbeat_thread is None:
+            self._heartbeat_thread = threading.Thread(
+                target=self.send_heartbeats, daemon=True
+            )
+            self._heartbeat_thread.start()
+        if self._reporter_thread is None:
+            self._reporter_thread = threading.Thread(
+                target=self.send_reports, daemon=True
+            )
+            self._reporter_thread.start()
+        for proposal in proposals:
+            logging.info(f"Claimed proposal {proposal.id}")
+            future = self.submit(proposal)
+            self._running[future] = proposal
+            future.add_done_callback(
+                partial(self.report, proposal, time.perf_counter())
+            )
+        WORKER_RUNNING.set(self.n_running)
@@ -1,4 +1,5 @@
 import os
+from typing import Optional
 
 import requests
 from pytest import fixture
@@ -15,11 +16,18 @@ class Client:
     def get(self, path: str) -> requests.Response:
         return self.requests.get(f"{self.base_url}{path}", headers=HEADERS)
 
-    def post(self, path: str, request_body: str) -> requests.Response:
+    def post(
+        self, path: str, request_body: str, headers: Optional[dict] = None
+    ) -> requests.Response:
         return self.requests.post(
-            f"{self.base_url}{path}", data=request_body, headers=HEADERS
+            f"{self.base_url}{path}",
+            data=request_body,
+            headers=HEADERS if headers is None else {**HEADERS, **headers},
         )
 
+    def delete(self, path: str) -> requests.Response:
+        return self.requests.delete(f"{self.base_url}{path}", headers=HEADERS)
+
 
 @fixture
 def client() -> Client:
@@ -27,6 +35,6 @@ def client() -> Client:
 
 
 def pytest_sessionstart(session):
-    db_file = "db.json"
-    if os.path.exists(db_file):
-        os.remove(db_file)
+    for db_file in ["db.json", "db.sqlite", "db.sqlite-wal", "db.sqlite-shm"]:
+        if os.path.exists(db_file):
+            os.remove(db_file)
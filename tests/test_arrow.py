@@ -0,0 +1,105 @@
+import json
+
+import pandas as pd
+import pytest
+from bofire.benchmarks.api import Himmelblau
+from bofire.data_models.dataframes.api import Candidates, Experiments
+from bofire.data_models.strategies.api import RandomStrategy, SoboStrategy
+
+from bofire_candidates_api.arrow import (
+    ARROW_MEDIA_TYPE,
+    decode_frame,
+    encode_frame,
+    encode_request,
+)
+from bofire_candidates_api.data_models import CandidatesProposal, CandidatesRequest
+from tests.conftest import Client
+
+
+pytest.importorskip("pyarrow")
+
+bench = Himmelblau()
+experiments = Experiments.from_pandas(
+    bench.f(bench.domain.inputs.sample(15), return_complete=True), bench.domain
+).to_pandas()
+
+ARROW_HEADERS = {"Content-Type": ARROW_MEDIA_TYPE, "accept": ARROW_MEDIA_TYPE}
+
+
+def test_encode_decode_frame():
+    frame, document = decode_frame(encode_frame(experiments, {"n_candidates": 1}))
+    pd.testing.assert_frame_equal(frame, experiments, check_dtype=False)
+    assert document == {"n_candidates": 1}
+    assert decode_frame(encode_frame(None)) == (None, None)
+
+
+def test_candidates_generate_arrow(client: Client):
+    cr = CandidatesRequest(
+        strategy_data=SoboStrategy(domain=bench.domain), n_candidates=2
+    )
+    response = client.post(
+        path="/candidates/generate",
+        request_body=encode_request(cr, experiments),
+        headers=ARROW_HEADERS,
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == ARROW_MEDIA_TYPE
+    candidates, _ = decode_frame(response.content)
+    assert candidates.shape[0] == 2
+    assert set(bench.domain.inputs.get_keys()) <= set(candidates.columns)
+
+    # the experiments have to match the domain
+    response = client.post(
+        path="/candidates/generate",
+        request_body=encode_request(cr, experiments.drop(columns=["y"])),
+        headers=ARROW_HEADERS,
+    )
+    assert response.status_code == 422
+    assert response.json()["detail"] == "no col for output feature `y`"
+
+    # the experiments must not be sent twice
+    cr.experiments = Experiments.from_pandas(experiments, bench.domain)
+    response = client.post(
+        path="/candidates/generate",
+        request_body=encode_request(cr, experiments),
+        headers=ARROW_HEADERS,
+    )
+    assert response.status_code == 400
+
+    response = client.post(
+        path="/candidates/generate",
+        request_body=b"no arrow",
+        headers=ARROW_HEADERS,
+    )
+    assert response.status_code == 400
+
+
+def test_proposals_arrow(client: Client):
+    pr = CandidatesRequest(
+        strategy_data=RandomStrategy(domain=bench.domain), n_candidates=2
+    )
+    response = client.post(
+        path="/proposals",
+        request_body=encode_request(pr, experiments),
+        headers={"Content-Type": ARROW_MEDIA_TYPE},
+    )
+    assert response.status_code == 200
+    proposal = CandidatesProposal(**response.json())
+    assert proposal.experiments.to_pandas().shape[0] == 15
+
+    claimed = client.get(path="/proposals/claim").json()
+    assert claimed["id"] == proposal.id
+    candidates = Candidates.from_pandas(bench.domain.inputs.sample(2), bench.domain)
+    client.post(
+        path=f"/proposals/{proposal.id}/mark_processed?claim={claimed['n_claims']}",
+        request_body=candidates.model_dump_json(),
+    )
+    response = client.requests.get(
+        f"{client.base_url}/proposals/{proposal.id}/candidates",
+        headers={"accept": ARROW_MEDIA_TYPE},
+    )
+    assert response.headers["content-type"] == ARROW_MEDIA_TYPE
+    frame, _ = decode_frame(response.content)
+    pd.testing.assert_frame_equal(frame, candidates.to_pandas(), check_dtype=False)
+    response = client.get(path=f"/proposals/{proposal.id}/candidates")
+    assert Candidates(**json.loads(response.content)) == candidates
@@ -0,0 +1,91 @@
+import pytest
+from bofire.benchmarks.api import DTLZ2, Himmelblau
+from bofire.data_models.dataframes.api import Candidates, Experiments
+from bofire.data_models.strategies.api import RandomStrategy
+from fastapi import HTTPException
+
+from bofire_candidates_api.batch import _validate_group, parse_batch
+from bofire_candidates_api.data_models import CandidatesRequest
+
+
+bench = Himmelblau()
+bench2 = DTLZ2(dim=6)
+
+
+def request(domain, benchmark) -> dict:
+    experiments = benchmark.f(benchmark.domain.inputs.sample(5), return_complete=True)
+    return {
+        "strategy_data": RandomStrategy(domain=domain).model_dump(),
+        "experiments": Experiments.from_pandas(
+            experiments, benchmark.domain
+        ).model_dump(),
+    }
+
+
+def test_parse_batch():
+    # pendings outside of the bounds
+    pendings = Candidates.from_pandas(bench.domain.inputs.sample(2) + 100, bench.domain)
+    items = [
+        request(bench.domain, bench),
+        request(bench.domain, bench),
+        # experiments of another domain
+        request(bench.domain, bench2),
+        {
+            "strategy_data": RandomStrategy(domain=bench.domain).model_dump(),
+            "n_candidates": 0,
+        },
+        {
+            **CandidatesRequest(
+                strategy_data=RandomStrategy(domain=bench.domain)
+            ).model_dump(),
+            "pendings": pendings.model_dump(),
+        },
+        request(bench2.domain, bench2),
+    ]
+    parsed = parse_batch(items)
+    assert [isinstance(p, CandidatesRequest) for p in parsed] == [
+        True,
+        True,
+        False,
+        False,
+        False,
+        True,
+    ]
+    assert parsed[2].status_code == 422
+    assert "no col for output feature" in parsed[2].detail
+    assert parsed[3].status_code == 422
+    assert isinstance(parsed[3].detail, list)
+    assert parsed[4].status_code == 422
+    assert parsed[0].experiments == CandidatesRequest(**items[0]).experiments
+
+
+def test_parse_batch_missing_column():
+    items = [request(bench.domain, bench) for _ in range(3)]
+    # experiments without the output column
+    for row in items[1]["experiments"]["rows"]:
+        row["outputs"] = {}
+    # the request fails on its own and therefore within the batch
+    with pytest.raises(ValueError):
+        CandidatesRequest(**items[1])
+    parsed = parse_batch(items)
+    assert [isinstance(p, CandidatesRequest) for p in parsed] == [True, False, True]
+    assert "no col for output feature" in parsed[1].detail
+
+
+def test_validate_group_missing_column():
+    frames = {
+        i: bench.f(bench.domain.inputs.sample(3), return_complete=True)
+        for i in range(3)
+    }
+    frames[1] = frames[1].drop(columns=["y"])
+    # concatenated, the missing column would be filled with NaN and pass
+    errors = _validate_group(frames, bench.domain.validate_experiments)
+    assert list(errors) == [1]
+    assert "no col for output feature" in errors[1].detail
+
+
+def test_parse_batch_max_size(monkeypatch):
+    monkeypatch.setattr("bofire_candidates_api.batch.BATCH_MAX_SIZE", 1)
+    with pytest.raises(HTTPException) as e:
+        parse_batch([{}, {}])
+    assert e.value.status_code == 413
@@ -0,0 +1,76 @@
+import datetime
+
+import pytest
+from bofire.data_models.strategies.api import RandomStrategy
+
+from bofire_candidates_api.benchmark import (
+    WORKLOADS,
+    BenchmarkResult,
+    BenchmarkRun,
+    compare,
+    create_workload,
+    measure,
+    summarize,
+)
+
+
+@pytest.mark.parametrize("name", list(WORKLOADS))
+def test_create_workload(name: str):
+    workload = create_workload(name, n_experiments=12, strategy="random")
+    assert isinstance(workload.request.strategy_data, RandomStrategy)
+    assert len(workload.request.experiments.rows) == 12
+    assert len(workload.candidates.rows) == 1
+    # the experiments are reproducible
+    assert workload == create_workload(name, n_experiments=12, strategy="random")
+
+    with pytest.raises(ValueError, match="Unknown strategy"):
+        create_workload(name, n_experiments=12, strategy="unknown")
+    with pytest.raises(ValueError, match="Unknown workload"):
+        create_workload("unknown", n_experiments=12)
+
+
+def test_summarize():
+    summary = summarize([float(i) for i in range(1, 101)], elapsed=50.0)
+    assert summary.n == 100
+    assert summary.mean == 50.5
+    assert summary.p50 == 50.5
+    assert summary.p90 == pytest.approx(90.1)
+    assert summary.p99 == pytest.approx(99.01)
+    assert summary.max == 100.0
+    assert summary.throughput == 2.0
+
+
+def test_measure():
+    calls = []
+    summary = measure(calls.append, repeats=8, concurrency=4)
+    assert sorted(calls) == list(range(8))
+    assert summary.n == 8
+    assert summary.throughput > 0
+
+
+def test_compare():
+    def run(p50s):
+        return BenchmarkRun(
+            created_at=datetime.datetime.now(tz=datetime.timezone.utc),
+            environment={},
+            config={},
+            results=[
+                BenchmarkResult(
+                    scenario=scenario,
+                    workload="himmelblau",
+                    n_experiments=10,
+                    latency=summarize([p50], elapsed=p50),
+                )
+                for scenario, p50 in p50s.items()
+            ],
+        )
+
+    baseline = run({"generate": 2.0, "list": 0.01})
+    current = run({"generate": 3.0, "roundtrip": 0.1})
+    comparisons = compare(baseline, current)
+    # only the results of both runs are compared
+    assert len(comparisons) == 1
+    assert comparisons[0].scenario == "generate"
+    assert comparisons[0].baseline == 2.0
+    assert comparisons[0].current == 3.0
+    assert comparisons[0].ratio == 1.5
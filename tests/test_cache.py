@@ -0,0 +1,136 @@
+import bofire.strategies.api as strategies
+import pytest
+from bofire.benchmarks.api import Himmelblau
+from bofire.data_models.dataframes.api import Experiments
+from bofire.data_models.strategies.api import RandomStrategy, SoboStrategy
+from fastapi import HTTPException
+
+from bofire_candidates_api.cache import StrategyCache, canonical_hash
+from bofire_candidates_api.data_models import CandidatesRequest
+from bofire_candidates_api.generate import generate_candidates
+
+
+bench = Himmelblau()
+experiments = Experiments.from_pandas(
+    bench.f(bench.domain.inputs.sample(10), return_complete=True), bench.domain
+)
+
+
+def test_canonical_hash():
+    strategy_data = SoboStrategy(domain=bench.domain)
+    assert canonical_hash(strategy_data, experiments) == canonical_hash(
+        SoboStrategy(**strategy_data.model_dump()), experiments
+    )
+    assert canonical_hash(strategy_data, experiments) != canonical_hash(
+        strategy_data, None
+    )
+    assert canonical_hash(strategy_data) != canonical_hash(
+        RandomStrategy(domain=bench.domain)
+    )
+
+
+@pytest.mark.parametrize("max_entries, max_bytes", [(2, None), (10, 4000)])
+def test_strategy_cache_eviction(max_entries, max_bytes):
+    cache = StrategyCache(max_entries=max_entries, max_bytes=max_bytes)
+    fitted_strategies = {
+        key: strategies.map(RandomStrategy(domain=bench.domain, seed=i))
+        for i, key in enumerate(["a", "b", "c"])
+    }
+    for key, strategy in fitted_strategies.items():
+        cache.put(key, strategy)
+    assert len(cache) == 2
+    assert cache.stats()["evictions"] == 1
+    assert cache.pop("a") is None
+    assert cache.pop("c") is fitted_strategies["c"]
+    assert cache.stats() == {
+        "entries": 1,
+        "bytes": cache.n_bytes,
+        "hits": 1,
+        "misses": 1,
+        "evictions": 1,
+    }
+
+
+def test_strategy_cache_disabled():
+    cache = StrategyCache(max_entries=0)
+    cache.put("a", strategies.map(RandomStrategy(domain=bench.domain)))
+    assert cache.pop("a") is None
+
+
+def test_generate_candidates_cache():
+    cache = StrategyCache(max_entries=2)
+    cr = CandidatesRequest(
+        strategy_data=SoboStrategy(domain=bench.domain),
+        n_candidates=1,
+        experiments=experiments,
+    )
+    candidates = generate_candidates(cr, cache=cache)
+    assert len(candidates.rows) == 1
+    assert cache.stats()["misses"] == 1
+    assert len(cache) == 1
+
+    cr.n_candidates = 2
+    candidates = generate_candidates(cr, cache=cache)
+    assert len(candidates.rows) == 2
+    assert cache.stats()["hits"] == 1
+    assert len(cache) == 1
+
+
+def test_strategy_cache_size_once(monkeypatch):
+    cache = StrategyCache(max_entries=2)
+    strategy = strategies.map(RandomStrategy(domain=bench.domain))
+    cache.put("a", strategy)
+    n_bytes = cache.n_bytes
+    assert n_bytes > 0
+
+    def fail(strategy):
+        raise AssertionError("size computed again")
+
+    monkeypatch.setattr("bofire_candidates_api.cache.approximate_size", fail)
+    cache.put("a", cache.pop("a"))
+    assert cache.n_bytes == n_bytes
+
+
+def test_generate_candidates_seeded():
+    cache = StrategyCache(max_entries=2)
+    cr = CandidatesRequest(
+        strategy_data=RandomStrategy(domain=bench.domain, seed=42),
+        n_candidates=2,
+    )
+    candidates = generate_candidates(cr, cache=cache)
+    assert generate_candidates(cr, cache=cache) == candidates
+    assert len(cache) == 0
+
+
+def test_generate_candidates_restart(monkeypatch):
+    mapped = []
+    map_strategy = strategies.map
+
+    def map_failing_once(strategy_data):
+        strategy = map_strategy(strategy_data)
+        ask = strategy.ask
+
+        def fail_once(n_candidates):
+            if len(mapped) == 1 and not hasattr(strategy, "failed"):
+                strategy.failed = True
+                raise ValueError("optimization failed")
+            return ask(n_candidates)
+
+        strategy.ask = fail_once
+        mapped.append(strategy)
+        return strategy
+
+    monkeypatch.setattr(strategies, "map", map_failing_once)
+    cr = CandidatesRequest(
+        strategy_data=RandomStrategy(domain=bench.domain), n_candidates=2
+    )
+    # the restart asks the mapped strategy again
+    candidates = generate_candidates(cr, cache=None)
+    assert len(candidates.rows) == 2
+    assert len(mapped) == 1
+
+    mapped.clear()
+    cr.n_restarts = 0
+    with pytest.raises(HTTPException) as e:
+        generate_candidates(cr, cache=None)
+    assert e.value.status_code == 500
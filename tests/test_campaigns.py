@@ -0,0 +1,119 @@
+import json
+
+import bofire.strategies.api as strategies
+from bofire.benchmarks.api import Himmelblau
+from bofire.data_models.dataframes.api import Candidates, Experiments
+from bofire.data_models.strategies.api import SoboStrategy
+from bofire.surrogates.api import SingleTaskGPSurrogate
+
+from bofire_candidates_api import warm_start
+from bofire_candidates_api.data_models import Campaign, CampaignRequest
+from tests.conftest import Client
+
+
+bench = Himmelblau()
+experiments = bench.f(bench.domain.inputs.sample(15), return_complete=True)
+
+
+def test_campaign(client: Client):
+    cr = CampaignRequest(
+        strategy_data=SoboStrategy(domain=bench.domain),
+        experiments=Experiments.from_pandas(experiments.iloc[:10], bench.domain),
+    )
+    response = client.post(path="/campaigns", request_body=cr.model_dump_json())
+    assert response.status_code == 200
+    campaign = Campaign(**json.loads(response.content))
+    assert campaign.n_experiments == 10
+    assert campaign.pendings is None
+    assert (
+        Campaign(**json.loads(client.get(path=f"/campaigns/{campaign.id}").content))
+        == campaign
+    )
+    assert client.get(path="/campaigns/9999").status_code == 404
+
+    # generate candidates, they become pendings of the campaign
+    response = client.post(
+        path=f"/campaigns/{campaign.id}/candidates?n_candidates=2", request_body=""
+    )
+    assert response.status_code == 200
+    candidates = Candidates(**json.loads(response.content))
+    assert len(candidates.rows) == 2
+    campaign = Campaign(
+        **json.loads(client.get(path=f"/campaigns/{campaign.id}").content)
+    )
+    assert campaign.pendings is not None
+    assert len(campaign.pendings.rows) == 2
+
+    # executing one of the candidates removes it from the pendings
+    executed = bench.f(candidates.to_pandas().iloc[:1], return_complete=True)
+    response = client.post(
+        path=f"/campaigns/{campaign.id}/experiments",
+        request_body=Experiments.from_pandas(executed, bench.domain).model_dump_json(),
+    )
+    assert response.status_code == 200
+    campaign = Campaign(**json.loads(response.content))
+    assert campaign.n_experiments == 11
+    assert campaign.pendings is not None
+    assert len(campaign.pendings.rows) == 1
+
+    # only the new experiments are told to the cached strategy
+    response = client.post(
+        path=f"/campaigns/{campaign.id}/experiments",
+        request_body=Experiments.from_pandas(
+            experiments.iloc[10:], bench.domain
+        ).model_dump_json(),
+    )
+    assert Campaign(**json.loads(response.content)).n_experiments == 16
+    response = client.post(path=f"/campaigns/{campaign.id}/candidates", request_body="")
+    assert response.status_code == 200
+
+    loaded_experiments = Experiments(
+        **json.loads(client.get(path=f"/campaigns/{campaign.id}/experiments").content)
+    ).to_pandas()
+    assert loaded_experiments.shape[0] == 16
+
+    response = client.delete(path=f"/campaigns/{campaign.id}/pendings")
+    assert response.status_code == 200
+    assert Campaign(**json.loads(response.content)).pendings is None
+
+
+def test_campaign_invalid_experiments(client: Client):
+    cr = CampaignRequest(strategy_data=SoboStrategy(domain=bench.domain))
+    response = client.post(path="/campaigns", request_body=cr.model_dump_json())
+    campaign = Campaign(**json.loads(response.content))
+    response = client.post(path=f"/campaigns/{campaign.id}/candidates", request_body="")
+    assert response.status_code == 404
+
+    # the experiments lack the output of the domain
+    rows = Experiments.from_pandas(experiments, bench.domain).model_dump()["rows"]
+    for row in rows:
+        row["outputs"] = {"z": row["outputs"]["y"]}
+    response = client.post(
+        path=f"/campaigns/{campaign.id}/experiments",
+        request_body=json.dumps({"rows": rows}),
+    )
+    assert response.status_code == 422
+    assert response.json()["detail"] == "no col for output feature `y`"
+
+
+def test_warm_start():
+    with warm_start.warm_started():
+        strategy = strategies.map(SoboStrategy(domain=bench.domain))
+        strategy.tell(experiments.iloc[:10])
+    surrogate = strategy.surrogates.surrogates[0]
+    assert isinstance(surrogate, warm_start.WarmStartSingleTaskGPSurrogate)
+    assert surrogate.initial_state is None
+    state = warm_start.hyperparameters(surrogate.model)
+    assert len(state) > 0
+
+    # strategies outside of the context use the default surrogate
+    other = strategies.map(SoboStrategy(domain=bench.domain))
+    other.tell(experiments.iloc[:10])
+    assert type(other.surrogates.surrogates[0]) is SingleTaskGPSurrogate
+
+    # the refit after appending experiments starts from the previous fit
+    with warm_start.warm_started():
+        strategy.tell(experiments.iloc[10:])
+    surrogate = strategy.surrogates.surrogates[0]
+    assert surrogate.initial_state.keys() == state.keys()
+    assert strategy.ask(1).shape[0] == 1
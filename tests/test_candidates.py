@@ -1,4 +1,6 @@
 import json
+import time
+import uuid
 
 from bofire.benchmarks.api import DTLZ2, Himmelblau
 from bofire.data_models.dataframes.api import Candidates, Experiments
@@ -11,7 +13,8 @@ from bofire.data_models.strategies.api import (
     StepwiseStrategy,
 )
 
-from bofire_candidates_api.data_models import CandidatesRequest
+from bofire_candidates_api.data_models import CandidatesBatchItem, CandidatesRequest
+from bofire_candidates_api.streaming import NDJSON_MEDIA_TYPE
 from tests.conftest import Client
 
 
@@ -84,3 +87,138 @@ def test_candidates_generate(client: Client):
     assert sorted(df_candidates.columns.tolist()) == sorted(
         bench.domain.candidate_column_names
     )
+
+
+def test_candidates_generate_timeout(client: Client):
+    cr = CandidatesRequest(
+        strategy_data=SoboStrategy(domain=bench.domain),
+        n_candidates=1,
+        experiments=Experiments.from_pandas(experiments, bench.domain),
+    )
+    response = client.post(
+        path="/candidates/generate?timeout=0.001", request_body=cr.model_dump_json()
+    )
+    assert response.status_code == 504
+    assert json.loads(response.content)["detail"] == (
+        "Candidate generation timed out after 0.001 seconds"
+    )
+    response = client.post(
+        path="/candidates/generate?timeout=0", request_body=cr.model_dump_json()
+    )
+    assert response.status_code == 422
+
+
+def test_cache_stats(client: Client):
+    response = client.get(path="/candidates/cache")
+    assert response.status_code == 200
+    assert sorted(json.loads(response.content).keys()) == sorted(
+        ["entries", "bytes", "hits", "misses", "evictions"]
+    )
+
+
+def test_candidates_idempotency(client: Client):
+    cr = CandidatesRequest(
+        strategy_data=RandomStrategy(domain=bench.domain), n_candidates=2
+    )
+    headers = {"Idempotency-Key": str(uuid.uuid4())}
+    response = client.post(
+        path="/candidates/generate", request_body=cr.model_dump_json(), headers=headers
+    )
+    assert response.status_code == 200
+    assert "Idempotent-Replayed" not in response.headers
+    replayed = client.post(
+        path="/candidates/generate", request_body=cr.model_dump_json(), headers=headers
+    )
+    assert replayed.headers["Idempotent-Replayed"] == "true"
+    assert replayed.json() == response.json()
+
+    # the key must not be reused for another request
+    cr.n_candidates = 1
+    response = client.post(
+        path="/candidates/generate", request_body=cr.model_dump_json(), headers=headers
+    )
+    assert response.status_code == 422
+
+    # content-hash mode
+    cr.strategy_data = RandomStrategy(domain=bench.domain, seed=int(time.time()))
+    responses = [
+        client.post(
+            path="/candidates/generate?dedupe=true", request_body=cr.model_dump_json()
+        )
+        for _ in range(2)
+    ]
+    assert responses[0].json() == responses[1].json()
+    assert responses[1].headers["Idempotent-Replayed"] == "true"
+
+
+def test_candidates_generate_batch(client: Client):
+    requests = [
+        CandidatesRequest(
+            strategy_data=RandomStrategy(domain=bench.domain), n_candidates=2
+        ).model_dump(mode="json"),
+        CandidatesRequest(
+            strategy_data=SoboStrategy(domain=bench.domain),
+            n_candidates=1,
+            experiments=Experiments.from_pandas(experiments, bench.domain),
+        ).model_dump(mode="json"),
+        # not enough experiments
+        CandidatesRequest(
+            strategy_data=SoboStrategy(domain=bench.domain), n_candidates=1
+        ).model_dump(mode="json"),
+        # experiments of another domain
+        {
+            **CandidatesRequest(
+                strategy_data=RandomStrategy(domain=bench.domain)
+            ).model_dump(mode="json"),
+            "experiments": Experiments.from_pandas(
+                experiments2, bench2.domain
+            ).model_dump(mode="json"),
+        },
+    ]
+    response = client.post(
+        path="/candidates/generate_batch", request_body=json.dumps(requests)
+    )
+    assert response.status_code == 200
+    items = response.json()
+    assert len(Candidates(**items[0]["candidates"]).rows) == 2
+    assert len(Candidates(**items[1]["candidates"]).rows) == 1
+    assert items[2]["candidates"] is None
+    assert items[2]["error"]["status_code"] == 404
+    assert items[3]["error"]["status_code"] == 422
+    assert [item["index"] for item in items] == [0, 1, 2, 3]
+
+    # the items are streamed as they finish, invalid requests first
+    response = client.post(
+        path="/candidates/generate_batch",
+        request_body=json.dumps(requests),
+        headers={"Accept": NDJSON_MEDIA_TYPE},
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == NDJSON_MEDIA_TYPE
+    lines = [CandidatesBatchItem(**json.loads(line)) for line in response.iter_lines()]
+    assert lines[0].index == 3
+    assert lines[0].error.status_code == 422
+    assert sorted(line.index for line in lines) == [0, 1, 2, 3]
+    assert next(line for line in lines if line.index == 2).error.status_code == 404
+
+
+def test_candidates_generate_ndjson(client: Client):
+    cr = CandidatesRequest(
+        strategy_data=RandomStrategy(domain=bench.domain), n_candidates=250
+    )
+    response = client.post(
+        path="/candidates/generate",
+        request_body=cr.model_dump_json(),
+        headers={"Accept": NDJSON_MEDIA_TYPE},
+    )
+    assert response.status_code == 200
+    chunks = [Candidates(**json.loads(line)) for line in response.iter_lines()]
+    assert [len(chunk.rows) for chunk in chunks] == [100, 100, 50]
+
+
+def test_candidates_generate_batch_schema(client: Client):
+    schema = client.get(path="/openapi.json").json()
+    body = schema["paths"]["/candidates/generate_batch"]["post"]["requestBody"]
+    items = body["content"]["application/json"]["schema"]["items"]
+    assert items == {"$ref": "#/components/schemas/CandidatesRequest"}
+    assert "CandidatesRequest" in schema["components"]["schemas"]
@@ -0,0 +1,110 @@
+import json
+import os
+
+import pytest
+from bofire.benchmarks.api import Himmelblau
+from bofire.data_models.constraints.api import LinearInequalityConstraint
+from bofire.data_models.dataframes.api import Experiments
+from bofire.data_models.domain.api import Domain
+from bofire.data_models.strategies.api import RandomStrategy
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from bofire_candidates_api.capture import (
+    CapturedRequest,
+    CaptureMiddleware,
+    read_capture,
+    sanitize,
+)
+from bofire_candidates_api.data_models import CandidatesRequest
+from bofire_candidates_api.replay import Replay, summarize_replay
+
+
+bench = Himmelblau()
+domain = Domain(
+    inputs=bench.domain.inputs,
+    outputs=bench.domain.outputs,
+    constraints=[
+        LinearInequalityConstraint(
+            features=["x_1", "x_2"], coefficients=[1.0, 1.0], rhs=4.0
+        )
+    ],
+)
+candidate_request = CandidatesRequest(
+    strategy_data=RandomStrategy(domain=domain),
+    n_candidates=1,
+    experiments=Experiments.from_pandas(
+        bench.f(bench.domain.inputs.sample(4), return_complete=True), domain
+    ),
+)
+
+
+def test_sanitize():
+    body = json.loads(candidate_request.model_dump_json())
+    body["strategy_data"]["domain"]["inputs"]["features"][0]["context"] = "secret"
+    sanitized = sanitize(body)
+    text = json.dumps(sanitized)
+    assert "x_1" not in text and "secret" not in text
+    # the sanitized request is still valid
+    request = CandidatesRequest(**sanitized)
+    assert request.strategy_data.domain.inputs.get_keys() == ["input_0", "input_1"]
+    assert request.strategy_data.domain.constraints[0].features == [
+        "input_0",
+        "input_1",
+    ]
+    assert len(request.experiments.rows) == 4
+
+    assert "x_1" in json.dumps(sanitize(body, anonymize=False))
+
+
+def test_capture_middleware(tmp_path):
+    path = str(tmp_path / "capture.jsonl")
+    app = FastAPI()
+    app.add_middleware(CaptureMiddleware, path=path, max_body_bytes=100_000)
+
+    @app.post("/proposals")
+    def create(request: CandidatesRequest) -> int:
+        return 1
+
+    @app.post("/other")
+    def other(request: CandidatesRequest) -> int:
+        return 1
+
+    body = candidate_request.model_dump_json()
+    with TestClient(app, headers={"Content-Type": "application/json"}) as client:
+        assert client.post("/proposals", content=body).status_code == 200
+        assert client.post("/other", content=body).status_code == 200
+        assert client.post("/proposals?a=1", content="{}").status_code == 422
+        # too large bodies are not captured
+        assert client.post("/proposals", content=" " * 100_001).status_code == 422
+
+    captured = read_capture(path)
+    assert [(r.path, r.query_string, r.status_code) for r in captured] == [
+        ("/proposals", "", 200),
+        ("/proposals", "a=1", 422),
+    ]
+    assert captured[0].timestamp <= captured[1].timestamp
+    assert CandidatesRequest(**captured[0].body).n_candidates == 1
+
+
+def test_replay(tmp_path):
+    url = os.getenv("CANDIDATES_URL", "http://localhost:8000")
+    body = sanitize(json.loads(candidate_request.model_dump_json()))
+    captured = [
+        CapturedRequest(
+            timestamp=1000.0 + 0.2 * i,
+            method="POST",
+            path="/candidates/generate",
+            status_code=200,
+            body=body,
+        )
+        for i in range(3)
+    ]
+    replayed = Replay(url=url, speed=2.0).run(captured)
+    assert [r.status_code for r in replayed] == [200, 200, 200]
+    assert [r.scheduled_at for r in replayed] == pytest.approx([0.0, 0.1, 0.2])
+    assert all(r.proposal_ids == [] for r in replayed)
+
+    summaries = summarize_replay(replayed, elapsed=1.0)
+    assert list(summaries["/candidates/generate"]) == ["latency", "send_delay"]
+    assert summaries["/candidates/generate"]["latency"].n == 3
@@ -0,0 +1,165 @@
+import json
+import os
+
+import fastapi.routing
+import pytest
+from bofire.benchmarks.api import Himmelblau
+from bofire.data_models.dataframes.api import Candidates, Experiments
+from bofire.data_models.strategies.api import RandomStrategy
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from bofire_candidates_api.compression import (
+    accepted_encoding,
+    compress,
+    decompress,
+    supported_encodings,
+)
+from bofire_candidates_api.data_models import CandidatesRequest
+from bofire_candidates_api.worker import Client as WorkerClient
+from tests.conftest import Client
+
+
+bench = Himmelblau()
+
+
+def candidates_request(n_candidates: int = 50) -> CandidatesRequest:
+    return CandidatesRequest(
+        strategy_data=RandomStrategy(domain=bench.domain),
+        n_candidates=n_candidates,
+        experiments=Experiments.from_pandas(
+            bench.f(bench.domain.inputs.sample(50), return_complete=True),
+            bench.domain,
+        ),
+    )
+
+
+@pytest.mark.parametrize("encoding", supported_encodings())
+def test_compress_decompress(encoding):
+    body = json.dumps({"x": list(range(1000))}).encode()
+    compressed = compress(body, encoding)
+    assert len(compressed) < len(body)
+    assert decompress(compressed, encoding) == body
+
+    with pytest.raises(HTTPException) as e:
+        decompress(compressed[: len(compressed) // 2], encoding)
+    assert e.value.status_code == 400
+    with pytest.raises(HTTPException) as e:
+        decompress(compressed, encoding, max_size=100)
+    assert e.value.status_code == 413
+
+
+def test_decompress_unsupported():
+    assert decompress(b"body", "identity") == b"body"
+    with pytest.raises(HTTPException) as e:
+        decompress(b"body", "br")
+    assert e.value.status_code == 415
+
+
+def test_accepted_encoding():
+    assert accepted_encoding(None) is None
+    assert accepted_encoding("br, deflate") is None
+    assert accepted_encoding("gzip, deflate") == "gzip"
+    assert accepted_encoding("zstd;q=0, gzip") == "gzip"
+    assert accepted_encoding("gzip, zstd") == supported_encodings()[0]
+
+
+@pytest.mark.parametrize("encoding", supported_encodings())
+def test_compressed_request(client: Client, encoding):
+    body = compress(candidates_request().model_dump_json().encode(), encoding)
+    response = client.post(
+        path="/candidates/generate",
+        request_body=body,
+        headers={"Content-Encoding": encoding},
+    )
+    assert response.status_code == 200
+    assert len(Candidates(**response.json()).rows) == 50
+
+    response = client.post(
+        path="/candidates/generate",
+        request_body=b"invalid",
+        headers={"Content-Encoding": encoding},
+    )
+    assert response.status_code == 400
+
+
+def test_compressed_request_metrics(client: Client):
+    def request_count(route: str) -> float:
+        text = client.get(path="/metrics").content.decode()
+        line_start = (
+            f'bofire_http_request_seconds_count{{method="POST",route="{route}",'
+            'status="200"}'
+        )
+        return sum(
+            float(line.rsplit(" ", 1)[1])
+            for line in text.splitlines()
+            if line.startswith(line_start)
+        )
+
+    # the decompressed requests are labeled with their route
+    before = request_count("/candidates/generate"), request_count("")
+    response = client.post(
+        path="/candidates/generate",
+        request_body=compress(candidates_request().model_dump_json().encode(), "gzip"),
+        headers={"Content-Encoding": "gzip"},
+    )
+    assert response.status_code == 200
+    after = request_count("/candidates/generate"), request_count("")
+    assert after == (before[0] + 1, before[1])
+
+
+def test_compressed_response(client: Client):
+    body = candidates_request().model_dump_json()
+    response = client.post(
+        path="/candidates/generate",
+        request_body=body,
+        headers={"Accept-Encoding": "gzip"},
+    )
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert len(Candidates(**response.json()).rows) == 50
+
+    # small responses are sent uncompressed
+    response = client.post(
+        path="/candidates/generate",
+        request_body=candidates_request(n_candidates=1).model_dump_json(),
+        headers={"Accept-Encoding": "gzip"},
+    )
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+
+
+def test_worker_client_compression():
+    client = WorkerClient(url=os.getenv("CANDIDATES_URL", "http://localhost:8000"))
+    response = client.post("/candidates/generate", request_body=candidates_request())
+    assert response.request.headers["Content-Encoding"] == "gzip"
+    assert response.status_code == 200
+    assert len(Candidates(**response.json()).rows) == 50
+
+
+def test_worker_client_compression_unavailable(monkeypatch):
+    monkeypatch.setattr(
+        "bofire_candidates_api.worker.supported_encodings", lambda: ["gzip"]
+    )
+    with pytest.raises(ValueError, match="requires the `compression` extra"):
+        WorkerClient(url="http://localhost:8000", compression="zstd")
+
+
+def test_response_serialized_by_pydantic(monkeypatch):
+    # routes with a response model are dumped to JSON bytes by pydantic-core,
+    # without converting the models with the jsonable encoder of FastAPI first
+    def jsonable_encoder(*args, **kwargs):
+        raise AssertionError("jsonable_encoder was called")
+
+    monkeypatch.setattr(fastapi.routing, "jsonable_encoder", jsonable_encoder)
+    request = candidates_request()
+    app = fastapi.FastAPI()
+
+    @app.get("/request", response_model=CandidatesRequest)
+    def get_request() -> CandidatesRequest:
+        return request
+
+    with TestClient(app) as test_client:
+        response = test_client.get("/request")
+    assert response.status_code == 200
+    assert CandidatesRequest.model_validate_json(response.content) == request
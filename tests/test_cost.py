@@ -0,0 +1,75 @@
+import pytest
+from bofire.benchmarks.api import DTLZ2, Himmelblau
+from bofire.data_models.dataframes.api import Experiments
+from bofire.data_models.strategies.api import (
+    AlwaysTrueCondition,
+    MoboStrategy,
+    NumberOfExperimentsCondition,
+    RandomStrategy,
+    SoboStrategy,
+    Step,
+    StepwiseStrategy,
+)
+
+from bofire_candidates_api.cost import estimate_cost
+from bofire_candidates_api.data_models import CandidatesRequest
+
+
+bench = Himmelblau()
+
+
+def experiments(n: int) -> Experiments:
+    return Experiments.from_pandas(
+        bench.f(bench.domain.inputs.sample(n), return_complete=True), bench.domain
+    )
+
+
+def test_estimate_cost():
+    random = CandidatesRequest(
+        strategy_data=RandomStrategy(domain=bench.domain), n_candidates=3
+    )
+    assert estimate_cost(random) == pytest.approx(0.006)
+
+    sobo = CandidatesRequest(
+        strategy_data=SoboStrategy(domain=bench.domain), experiments=experiments(10)
+    )
+    assert estimate_cost(sobo) > 100 * estimate_cost(random)
+    # the cost grows with the candidates and the experiments
+    assert estimate_cost(sobo.model_copy(update={"n_candidates": 4})) > estimate_cost(
+        sobo
+    )
+    assert estimate_cost(
+        sobo.model_copy(update={"experiments": experiments(1000)})
+    ) > estimate_cost(sobo)
+
+    mobo = DTLZ2(dim=6)
+    assert estimate_cost(
+        CandidatesRequest(strategy_data=MoboStrategy(domain=mobo.domain))
+    ) > estimate_cost(sobo)
+
+
+def test_estimate_cost_stepwise():
+    strategy_data = StepwiseStrategy(
+        domain=bench.domain,
+        steps=[
+            Step(
+                strategy_data=RandomStrategy(domain=bench.domain),
+                condition=NumberOfExperimentsCondition(n_experiments=5),
+            ),
+            Step(
+                strategy_data=SoboStrategy(domain=bench.domain),
+                condition=AlwaysTrueCondition(),
+            ),
+        ],
+    )
+    initial = CandidatesRequest(strategy_data=strategy_data)
+    assert estimate_cost(initial) == pytest.approx(0.002)
+    optimizing = CandidatesRequest(
+        strategy_data=strategy_data, experiments=experiments(10)
+    )
+    assert estimate_cost(optimizing) == estimate_cost(
+        CandidatesRequest(
+            strategy_data=SoboStrategy(domain=bench.domain),
+            experiments=experiments(10),
+        )
+    )
@@ -0,0 +1,91 @@
+import asyncio
+import time
+
+import pytest
+from bofire.benchmarks.api import Himmelblau
+from bofire.data_models.strategies.api import RandomStrategy
+from fastapi import HTTPException
+
+from bofire_candidates_api.data_models import CandidatesRequest
+from bofire_candidates_api.idempotency import (
+    ResultCache,
+    deduplication_key,
+    request_hash,
+)
+
+
+bench = Himmelblau()
+
+
+def create_request(seed: int = 42) -> CandidatesRequest:
+    return CandidatesRequest(
+        strategy_data=RandomStrategy(domain=bench.domain, seed=seed), n_candidates=2
+    )
+
+
+def test_request_hash():
+    assert request_hash(create_request()) == request_hash(create_request())
+    assert request_hash(create_request()) != request_hash(create_request(seed=1))
+
+
+def test_deduplication_key():
+    cr = create_request()
+    assert deduplication_key(cr, None, False) == (None, None)
+    assert deduplication_key(cr, "a", False) == ("key:a", request_hash(cr))
+    assert deduplication_key(cr, None, True) == (
+        f"sha256:{request_hash(cr)}",
+        request_hash(cr),
+    )
+
+
+def run(cache: ResultCache, key: str, digest: str, result):
+    async def compute():
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    return asyncio.run(cache.run(key, digest, compute))
+
+
+def test_result_cache():
+    cache = ResultCache(ttl=60, max_entries=2)
+    assert run(cache, "a", "1", 1) == (1, False)
+    assert run(cache, "a", "1", 2) == (1, True)
+    with pytest.raises(HTTPException) as e:
+        run(cache, "a", "2", 2)
+    assert e.value.status_code == 422
+
+    # failed computations are not stored
+    with pytest.raises(ValueError):
+        run(cache, "b", "1", ValueError())
+    assert run(cache, "b", "1", 2) == (2, False)
+
+    # the least recently used result is evicted
+    run(cache, "c", "1", 3)
+    assert len(cache) == 2
+    assert run(cache, "a", "1", 4) == (4, False)
+    assert cache.stats() == {"entries": 2, "hits": 1, "misses": 5}
+
+
+def test_result_cache_ttl():
+    cache = ResultCache(ttl=0.1, max_entries=2)
+    run(cache, "a", "1", 1)
+    time.sleep(0.2)
+    assert run(cache, "a", "1", 2) == (2, False)
+
+
+def test_result_cache_in_flight():
+    cache = ResultCache(ttl=60, max_entries=2)
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.5)
+        return 1
+
+    async def main():
+        return await asyncio.gather(*[cache.run("a", "1", compute) for _ in range(3)])
+
+    results = asyncio.run(main())
+    assert len(calls) == 1
+    assert sorted(results) == [(1, False), (1, True), (1, True)]
@@ -0,0 +1,139 @@
+import os
+
+import pytest
+import requests
+from bofire.benchmarks.api import Himmelblau
+from bofire.data_models.dataframes.api import Experiments
+from bofire.data_models.strategies.api import SoboStrategy
+
+from bofire_candidates_api.data_models import CandidatesRequest
+from bofire_candidates_api.metrics import (
+    Counter,
+    Gauge,
+    Histogram,
+    Metric,
+    Registry,
+    start_metrics_server,
+)
+from tests.conftest import Client
+
+
+def test_counter_gauge():
+    registry = Registry()
+    counter = Counter("test_total", "Test counter", ("kind",), registry=registry)
+    counter.inc(kind="a")
+    counter.inc(2, kind="a")
+    assert counter.value(kind="a") == 3
+    assert counter.value(kind="b") == 0
+    with pytest.raises(ValueError, match="can only be increased"):
+        counter.inc(-1, kind="a")
+    with pytest.raises(ValueError, match="has the labels"):
+        counter.inc(other="a")
+    with pytest.raises(TypeError, match="abstract"):
+        Metric("test_metric", "Test metric", registry=registry)
+
+    gauge = Gauge("test_gauge", "Test gauge", registry=registry)
+    gauge.set(1.5)
+    assert registry.render() == (
+        "# HELP test_total Test counter\n"
+        "# TYPE test_total counter\n"
+        'test_total{kind="a"} 3\n'
+        "# HELP test_gauge Test gauge\n"
+        "# TYPE test_gauge gauge\n"
+        "test_gauge 1.5\n"
+    )
+    with pytest.raises(ValueError, match="already registered"):
+        Gauge("test_gauge", "Test gauge", registry=registry)
+
+
+def test_histogram():
+    histogram = Histogram(
+        "test_seconds", "Test histogram", ("phase",), buckets=(0.1, 1), registry=None
+    )
+    for value in [0.05, 0.1, 0.5, 2]:
+        histogram.observe(value, phase="ask")
+    with histogram.time(phase="tell"):
+        pass
+    assert histogram.count(phase="ask") == 4
+    assert histogram.count(phase="map") == 0
+    assert histogram.render().splitlines()[2:7] == [
+        'test_seconds_bucket{phase="ask",le="0.1"} 2',
+        'test_seconds_bucket{phase="ask",le="1"} 3',
+        'test_seconds_bucket{phase="ask",le="+Inf"} 4',
+        'test_seconds_sum{phase="ask"} 2.65',
+        'test_seconds_count{phase="ask"} 4',
+    ]
+
+    # observations are handed over from child processes by draining and merging
+    snapshot = histogram.drain()
+    assert histogram.count(phase="ask") == 0
+    histogram.observe(0.05, phase="ask")
+    histogram.merge(snapshot)
+    assert histogram.count(phase="ask") == 5
+    assert histogram.count(phase="tell") == 1
+
+
+def test_metrics_server():
+    registry = Registry()
+    Counter("test_total", "Test counter", registry=registry).inc()
+    server = start_metrics_server(0, host="127.0.0.1", registry=registry)
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+        response = requests.get(f"{url}/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert "test_total 1" in response.text
+        assert requests.get(f"{url}/other").status_code == 404
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def sample(text: str, line_start: str) -> float:
+    return sum(
+        float(line.rsplit(" ", 1)[1])
+        for line in text.splitlines()
+        if line.startswith(line_start)
+    )
+
+
+def test_metrics_endpoint(client: Client):
+    bench = Himmelblau()
+    candidate_request = CandidatesRequest(
+        strategy_data=SoboStrategy(domain=bench.domain),
+        n_candidates=1,
+        experiments=Experiments.from_pandas(
+            bench.f(bench.domain.inputs.sample(10), return_complete=True),
+            bench.domain,
+        ),
+    )
+    response = client.post(
+        path="/candidates/generate", request_body=candidate_request.model_dump_json()
+    )
+    assert response.status_code == 200
+
+    response = requests.get(
+        f"{os.getenv('CANDIDATES_URL', 'http://localhost:8000')}/metrics"
+    )
+    assert response.status_code == 200
+    text = response.text
+    for phase in ["map", "tell", "ask", "from_pandas"]:
+        assert (
+            sample(text, f'bofire_generate_phase_seconds_count{{phase="{phase}"}}') > 0
+        )
+    assert sample(text, 'bofire_validation_seconds_count{kind="experiments"}') > 0
+    # the queue depth is read from the store when the metrics are scraped
+    assert (
+        sample(text, 'bofire_store_operation_seconds_count{operation="count_states"}')
+        > 0
+    )
+    for state in ["CREATED", "CLAIMED", "FINISHED", "FAILED"]:
+        assert f'bofire_proposals{{state="{state}"}}' in text
+    assert (
+        sample(
+            text,
+            'bofire_http_request_seconds_count{method="POST",'
+            'route="/candidates/generate",status="200"}',
+        )
+        > 0
+    )
@@ -9,6 +9,8 @@ from bofire_candidates_api.data_models import (
     CandidatesProposal,
     CandidatesRequest,
     ProposalStateEnum,
+    ValidationMemo,
+    load_trusted,
 )
 
 
@@ -71,3 +73,43 @@ def test_invalid_number_of_candidates():
             last_updated_at=datetime.datetime.now(),
             candidates=Candidates.from_pandas(candidates, bench.domain),
         )
+
+
+def test_load_trusted():
+    bench = Himmelblau()
+    bench2 = DTLZ2(dim=6)
+    experiments2 = bench2.f(bench2.domain.inputs.sample(15), return_complete=True)
+    data = {
+        "strategy_data": SoboStrategy(domain=bench.domain).model_dump(),
+        "n_candidates": 1,
+        "experiments": Experiments.from_pandas(
+            experiments2, bench2.domain
+        ).model_dump(),
+    }
+    # the domain validators are skipped for trusted records
+    proposal = load_trusted(CandidatesProposal, data)
+    assert len(proposal.experiments.rows) == 15
+    with pytest.raises(ValueError):
+        CandidatesProposal(**data)
+
+
+def test_validation_memo():
+    bench = Himmelblau()
+    experiments = Experiments.from_pandas(
+        bench.f(bench.domain.inputs.sample(5), return_complete=True), bench.domain
+    )
+    memo = ValidationMemo(max_entries=1)
+    calls = []
+    for _ in range(2):
+        memo.validate("experiments", bench.domain, experiments, lambda: calls.append(1))
+    assert len(calls) == 1
+    assert memo.hits == 1
+
+    # failed validations are not remembered
+    def fail():
+        raise ValueError("invalid")
+
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            memo.validate("pendings", bench.domain, experiments, fail)
+    assert memo.misses == 3
@@ -0,0 +1,56 @@
+import asyncio
+import threading
+
+from bofire_candidates_api.notifications import Notifier
+
+
+def test_notifier_timeout():
+    notifier = Notifier()
+
+    async def wait():
+        return await notifier.wait(notifier.version, timeout=0.1)
+
+    assert asyncio.run(wait()) is False
+
+
+def test_notifier_missed_version():
+    notifier = Notifier()
+    version = notifier.version
+    notifier.notify()
+
+    async def wait():
+        return await notifier.wait(version, timeout=10)
+
+    assert asyncio.run(wait()) is True
+
+
+def test_notifier_notify_from_thread():
+    notifier = Notifier()
+
+    async def wait():
+        version = notifier.version
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        threading.Timer(0.1, notifier.notify).start()
+        notified = await notifier.wait(version, timeout=10)
+        return notified, loop.time() - start
+
+    notified, duration = asyncio.run(wait())
+    assert notified is True
+    assert duration < 5
+
+
+def test_notifier_has_waiters():
+    notifier = Notifier()
+
+    async def wait():
+        waiting = asyncio.ensure_future(notifier.wait(notifier.version, timeout=10))
+        await asyncio.sleep(0.1)
+        has_waiters = notifier.has_waiters
+        notifier.notify()
+        await waiting
+        return has_waiters
+
+    assert notifier.has_waiters is False
+    assert asyncio.run(wait()) is True
+    assert notifier.has_waiters is False
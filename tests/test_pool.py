@@ -0,0 +1,150 @@
+import asyncio
+import time
+
+import pytest
+from bofire.benchmarks.api import Himmelblau
+from bofire.data_models.dataframes.api import Experiments
+from bofire.data_models.strategies.api import RandomStrategy, SoboStrategy
+from fastapi import HTTPException
+
+from bofire_candidates_api.data_models import CandidatesRequest
+from bofire_candidates_api.pool import GenerationPool
+
+
+bench = Himmelblau()
+experiments = bench.f(bench.domain.inputs.sample(10), return_complete=True)
+
+random_request = CandidatesRequest(
+    strategy_data=RandomStrategy(domain=bench.domain), n_candidates=2
+)
+sobo_request = CandidatesRequest(
+    strategy_data=SoboStrategy(domain=bench.domain),
+    n_candidates=1,
+    experiments=Experiments.from_pandas(experiments, bench.domain),
+)
+
+
+def test_generation_pool():
+    pool = GenerationPool(size=1, queue_size=2, timeout=120)
+    try:
+        candidates = asyncio.run(pool.generate(random_request))
+        assert len(candidates.rows) == 2
+        # errors of the child processes are raised as HTTP errors
+        with pytest.raises(HTTPException) as e:
+            asyncio.run(
+                pool.generate(
+                    CandidatesRequest(strategy_data=SoboStrategy(domain=bench.domain))
+                )
+            )
+        assert e.value.status_code == 404
+        for _ in range(100):
+            if pool.n_pending == 0:
+                break
+            time.sleep(0.1)
+        assert pool.n_pending == 0
+        assert pool.cache_stats()["entries"] == 1
+    finally:
+        pool.shutdown()
+
+
+def test_generation_pool_queue_size():
+    pool = GenerationPool(size=0, queue_size=1, timeout=120)
+
+    async def main():
+        return await asyncio.gather(
+            pool.generate(sobo_request),
+            pool.generate(random_request),
+            return_exceptions=True,
+        )
+
+    candidates, error = asyncio.run(main())
+    assert len(candidates.rows) == 1
+    assert isinstance(error, HTTPException)
+    assert error.status_code == 429
+    assert pool.n_pending == 0
+
+
+def test_generation_pool_timeout():
+    pool = GenerationPool(size=0, queue_size=1, timeout=0.01)
+    with pytest.raises(HTTPException) as e:
+        asyncio.run(pool.generate(sobo_request))
+    assert e.value.status_code == 504
+    # the slot is released once the generation has finished
+    for _ in range(100):
+        if pool.n_pending == 0:
+            break
+        time.sleep(0.1)
+    assert pool.n_pending == 0
+
+
+def test_generation_pool_request_timeout():
+    pool = GenerationPool(size=0, queue_size=2, timeout=0.01)
+    # the timeout of a request is capped by the timeout of the pool
+    assert pool.get_timeout() == 0.01
+    assert pool.get_timeout(60) == 0.01
+    assert pool.get_timeout(0.001) == 0.001
+    with pytest.raises(HTTPException) as e:
+        asyncio.run(pool.generate(sobo_request, timeout=60))
+    assert e.value.status_code == 504
+    assert e.value.detail == "Candidate generation timed out after 0.01 seconds"
+
+    pool = GenerationPool(size=0, queue_size=2, timeout=120)
+    results = asyncio.run(pool.generate_batch([sobo_request], timeout=0.01))
+    assert results == [(504, "Candidate generation timed out after 0.01 seconds")]
+    for _ in range(100):
+        if pool.n_pending == 0:
+            break
+        time.sleep(0.1)
+    assert pool.n_pending == 0
+
+
+def test_generation_pool_batch():
+    pool = GenerationPool(size=2, queue_size=1, timeout=120)
+    try:
+        no_experiments = sobo_request.model_copy(update={"experiments": None})
+        results = asyncio.run(
+            pool.generate_batch([random_request, no_experiments, sobo_request])
+        )
+        assert len(results[0].rows) == 2
+        assert results[1][0] == 404
+        assert len(results[2].rows) == 1
+        assert pool.n_pending == 0
+        assert asyncio.run(pool.generate_batch([])) == []
+
+        async def collect():
+            return [i async for i, _ in pool.iter_batch([random_request] * 3)]
+
+        assert sorted(asyncio.run(collect())) == [0, 1, 2]
+        assert pool.n_pending == 0
+    finally:
+        pool.shutdown()
+
+
+def test_generation_pool_parallel_restarts():
+    pool = GenerationPool(size=2, queue_size=2, timeout=120)
+    try:
+        parallel = sobo_request.model_copy(
+            update={"n_restarts": 3, "parallel_restarts": True}
+        )
+        assert pool.n_attempts(parallel) == 2
+        assert pool.n_attempts(sobo_request) == 1
+        seeded = parallel.model_copy(
+            update={"strategy_data": SoboStrategy(domain=bench.domain, seed=1)}
+        )
+        assert pool.n_attempts(seeded) == 1
+
+        # the slot is held until the remaining attempt has finished
+        assert len(asyncio.run(pool.generate(parallel)).rows) == 1
+        # the error is raised if all attempts fail
+        with pytest.raises(HTTPException) as e:
+            asyncio.run(
+                pool.generate(parallel.model_copy(update={"experiments": None}))
+            )
+        assert e.value.status_code == 404
+        for _ in range(100):
+            if pool.n_pending == 0:
+                break
+            time.sleep(0.1)
+        assert pool.n_pending == 0
+    finally:
+        pool.shutdown()
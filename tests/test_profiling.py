@@ -0,0 +1,125 @@
+import base64
+import json
+import pstats
+
+import pytest
+from bofire.benchmarks.api import Himmelblau
+from bofire.data_models.dataframes.api import Candidates, Experiments
+from bofire.data_models.strategies.api import RandomStrategy, SoboStrategy
+
+from bofire_candidates_api.data_models import (
+    CandidatesProposal,
+    CandidatesRequest,
+    GenerationProfile,
+)
+from bofire_candidates_api.profiling import Profiler, ProfileStore, load_stats
+from bofire_candidates_api.worker import Client as WorkerClient
+from bofire_candidates_api.worker import Worker
+from tests.conftest import Client
+
+
+def allocate(n: int) -> list:
+    return [str(i) for i in range(n)]
+
+
+def test_profiler():
+    with Profiler() as profiler:
+        allocate(10000)
+    profile = profiler.profile
+    assert profile.duration > 0
+    assert profile.peak_memory > 10000
+    assert "allocate" in profile.summary
+    assert "test_profiling.py" in profile.memory_summary
+    stats = load_stats(profile)
+    assert any(name == "allocate" for _, _, name in stats.stats)
+
+    with pytest.raises(ValueError):
+        with Profiler() as profiler:
+            raise ValueError("error")
+    assert profiler.profile is not None
+
+    with Profiler(enabled=False) as profiler:
+        allocate(10)
+    assert profiler.profile is None
+
+
+def test_profile_store():
+    with Profiler() as profiler:
+        pass
+    store = ProfileStore(max_entries=2)
+    ids = [store.put(profiler.profile) for _ in range(3)]
+    assert len(store) == 2
+    assert store.get(ids[0]) is None
+    assert store.get(ids[2]) == profiler.profile
+
+
+def test_generate_profiled(client: Client, tmp_path):
+    bench = Himmelblau()
+    candidate_request = CandidatesRequest(
+        strategy_data=SoboStrategy(domain=bench.domain),
+        n_candidates=1,
+        experiments=Experiments.from_pandas(
+            bench.f(bench.domain.inputs.sample(10), return_complete=True),
+            bench.domain,
+        ),
+        profile=True,
+    )
+    response = client.post(
+        path="/candidates/generate", request_body=candidate_request.model_dump_json()
+    )
+    assert response.status_code == 200
+    assert len(Candidates(**response.json()).rows) == 1
+    location = response.headers["Profile-Location"]
+
+    response = client.get(path=location)
+    assert response.status_code == 200
+    profile = GenerationProfile(**response.json())
+    # a new pool process also profiles its imports, which may push the generation
+    # out of the summary
+    assert any(name == "ask" for _, _, name in load_stats(profile).stats)
+
+    response = client.get(path=f"{location}/stats")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/octet-stream"
+    path = tmp_path / "generate.prof"
+    path.write_bytes(response.content)
+    assert len(pstats.Stats(str(path)).stats) > 0
+    assert response.content == base64.b64decode(profile.stats)
+
+    # without profiling no profile is created
+    response = client.post(
+        path="/candidates/generate",
+        request_body=candidate_request.model_copy(
+            update={"profile": False}
+        ).model_dump_json(),
+    )
+    assert response.status_code == 200
+    assert "Profile-Location" not in response.headers
+    assert client.get(path="/candidates/profiles/unknown").status_code == 404
+
+
+def test_worker_profiled(client: Client):
+    bench = Himmelblau()
+    proposal_request = CandidatesRequest(
+        strategy_data=RandomStrategy(domain=bench.domain),
+        n_candidates=2,
+        profile=True,
+    )
+    response = client.post(
+        path="/proposals", request_body=proposal_request.model_dump_json()
+    )
+    id = CandidatesProposal(**json.loads(response.content)).id
+    assert client.get(path=f"/proposals/{id}/profile").status_code == 404
+
+    worker = Worker(client=WorkerClient(), job_check_interval=1)
+    worker.work_round()
+    proposal = CandidatesProposal(**client.get(path=f"/proposals/{id}").json())
+    assert proposal.state == "FINISHED"
+    assert proposal.generation_profile is not None
+
+    response = client.get(path=f"/proposals/{id}/profile")
+    assert response.status_code == 200
+    assert GenerationProfile(**response.json()) == proposal.generation_profile
+    response = client.get(path=f"/proposals/{id}/profile/stats")
+    assert response.status_code == 200
+    assert f'filename="proposal-{id}.prof"' in response.headers["content-disposition"]
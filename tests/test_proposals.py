@@ -1,10 +1,19 @@
+import datetime
 import json
+import threading
+import time
+import uuid
 
+import pytest
 from bofire.benchmarks.api import Himmelblau
+from bofire.data_models.constraints.api import LinearInequalityConstraint
 from bofire.data_models.dataframes.api import Candidates
+from bofire.data_models.domain.api import Domain
+from bofire.data_models.features.api import ContinuousInput, ContinuousOutput
 from bofire.data_models.strategies.api import RandomStrategy
 
 from bofire_candidates_api.data_models import CandidatesProposal, CandidatesRequest
+from bofire_candidates_api.streaming import NDJSON_MEDIA_TYPE, SSE_MEDIA_TYPE
 from tests.conftest import Client
 
 
@@ -51,43 +60,62 @@ def test_proposals(client: Client):
     status = json.loads(client.get(path=f"/proposals/{proposal.id}/state").content)
     assert status == "CLAIMED"
 
-    # mark as failed
-    client.post(
-        path=f"/proposals/{proposal.id}/mark_failed",
-        request_body=json.dumps({"msg": "error"}),
+    # candidates which do not match the domain are rejected
+    invalid_candidates = candidates.rename(columns={"x_1": "x_3"})
+    response = client.post(
+        path=f"/proposals/{proposal.id}/mark_processed?claim={claimed_proposal.n_claims}",
+        request_body=json.dumps(
+            {
+                "rows": [
+                    {"inputs": row, "outputs": {}}
+                    for row in invalid_candidates.to_dict(orient="records")
+                ]
+            }
+        ),
     )
+    assert response.status_code == 422
+    assert response.json()["detail"] == "no col for input feature `x_1`"
 
-    # get the status again
-    status = json.loads(client.get(path=f"/proposals/{proposal.id}/state").content)
-    assert status == "FAILED"
-
-    # mark wrong id as failed
+    # a stale claim can not mark the proposal
     response = client.post(
-        path=f"/proposals/{FAKE_ID}/mark_failed",
+        path=f"/proposals/{proposal.id}/mark_failed?claim={claimed_proposal.n_claims + 1}",
         request_body=json.dumps({"msg": "error"}),
     )
-    assert response.status_code == 404
-
-    # get candidates for the proposal
-    response = client.get(path=f"/proposals/{proposal.id}/candidates")
-    assert response.status_code == 404
-    assert response.json()["detail"] == "Candidates not found"
+    assert response.status_code == 409
+    response = client.post(
+        path=f"/proposals/{proposal.id}/mark_failed",
+        request_body=json.dumps({"msg": "error"}),
+    )
+    assert response.status_code == 422
 
     # mark as procesed
     response = client.post(
-        path=f"/proposals/{proposal.id}/mark_processed",
+        path=f"/proposals/{proposal.id}/mark_processed?claim={claimed_proposal.n_claims}",
         request_body=Candidates.from_pandas(candidates, bench.domain).model_dump_json(),
     )
     # get the status again
     status = json.loads(client.get(path=f"/proposals/{proposal.id}/state").content)
     assert status == "FINISHED"
 
-    # mark wrong id as processed
+    # a finished proposal can not be marked again
     response = client.post(
-        path=f"/proposals/{FAKE_ID}/mark_processed",
+        path=f"/proposals/{proposal.id}/mark_failed?claim={claimed_proposal.n_claims}",
+        request_body=json.dumps({"msg": "error"}),
+    )
+    assert response.status_code == 409
+    assert response.json()["detail"] == "Proposal is FINISHED, claim 1 does not hold it"
+
+    # mark wrong id as processed or failed
+    response = client.post(
+        path=f"/proposals/{FAKE_ID}/mark_processed?claim=1",
         request_body=Candidates.from_pandas(candidates, bench.domain).model_dump_json(),
     )
     assert response.status_code == 404
+    response = client.post(
+        path=f"/proposals/{FAKE_ID}/mark_failed?claim=1",
+        request_body=json.dumps({"msg": "error"}),
+    )
+    assert response.status_code == 404
 
     # get the candidates
     loaded_candidates = Candidates(
@@ -95,6 +123,496 @@ def test_proposals(client: Client):
     ).to_pandas()
     assert len(loaded_candidates) == 5
 
+    # a failed proposal can not be flipped to finished
+    client.post(path="/proposals", request_body=pr.model_dump_json())
+    claimed_proposal = CandidatesProposal(**client.get(path="/proposals/claim").json())
+    response = client.post(
+        path=f"/proposals/{claimed_proposal.id}/mark_failed?claim={claimed_proposal.n_claims}",
+        request_body=json.dumps({"msg": "error"}),
+    )
+    assert json.loads(response.content) == "FAILED"
+    response = client.get(path=f"/proposals/{claimed_proposal.id}/candidates")
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Candidates not found"
+    response = client.post(
+        path=f"/proposals/{claimed_proposal.id}/mark_processed?claim={claimed_proposal.n_claims}",
+        request_body=Candidates.from_pandas(candidates, bench.domain).model_dump_json(),
+    )
+    assert response.status_code == 409
+    status = client.get(path=f"/proposals/{claimed_proposal.id}/state").json()
+    assert status == "FAILED"
+
     # get candidates from wrong id
     response = client.get(path=f"/proposals/{FAKE_ID}/candidates")
     assert response.status_code == 404
+
+
+def test_mark_processed_constraints(client: Client):
+    domain = Domain.from_lists(
+        inputs=[ContinuousInput(key=key, bounds=(0, 1)) for key in ("x_1", "x_2")],
+        outputs=[ContinuousOutput(key="y")],
+        constraints=[
+            LinearInequalityConstraint(
+                features=["x_1", "x_2"], coefficients=[1, 1], rhs=1
+            )
+        ],
+    )
+    pr = CandidatesRequest(strategy_data=RandomStrategy(domain=domain), n_candidates=1)
+    client.post(path="/proposals", request_body=pr.model_dump_json())
+    proposal = CandidatesProposal(**client.get(path="/proposals/claim").json())
+
+    # candidates which violate the constraints are rejected
+    response = client.post(
+        path=f"/proposals/{proposal.id}/mark_processed?claim={proposal.n_claims}",
+        request_body=json.dumps(
+            {"rows": [{"inputs": {"x_1": 0.9, "x_2": 0.9}, "outputs": {}}]}
+        ),
+    )
+    assert response.status_code == 422
+    assert response.json()["detail"].startswith("Constraints not fulfilled")
+
+    response = client.post(
+        path=f"/proposals/{proposal.id}/mark_processed?claim={proposal.n_claims}",
+        request_body=json.dumps(
+            {"rows": [{"inputs": {"x_1": 0.2, "x_2": 0.3}, "outputs": {}}]}
+        ),
+    )
+    assert json.loads(response.content) == "FINISHED"
+
+
+def test_mark_processed_batch(client: Client):
+    bench = Himmelblau()
+    pr = CandidatesRequest(
+        strategy_data=RandomStrategy(domain=bench.domain), n_candidates=1
+    )
+    for _ in range(2):
+        client.post(path="/proposals", request_body=pr.model_dump_json())
+    proposals = [
+        CandidatesProposal(**p)
+        for p in client.get(path="/proposals/claim/batch?max=2").json()
+    ]
+    candidates = Candidates.from_pandas(bench.domain.inputs.sample(1), bench.domain)
+    processed = [
+        {
+            "id": proposals[0].id,
+            "claim": proposals[0].n_claims,
+            "candidates": candidates.model_dump(mode="json"),
+        },
+        {
+            "id": proposals[1].id,
+            "claim": proposals[1].n_claims + 1,
+            "candidates": candidates.model_dump(mode="json"),
+        },
+        {"id": 9999, "claim": 1, "candidates": candidates.model_dump(mode="json")},
+    ]
+    for _ in range(2):
+        # a repeated batch finishes the same proposals
+        response = client.post(
+            path="/proposals/mark_processed/batch", request_body=json.dumps(processed)
+        )
+        assert response.status_code == 200
+        items = response.json()
+        assert [item["id"] for item in items] == [p["id"] for p in processed]
+        assert items[0] == {"id": proposals[0].id, "state": "FINISHED", "error": None}
+        assert [item["error"]["status_code"] for item in items[1:]] == [409, 404]
+
+    # marking a proposal as failed can be repeated as well
+    for _ in range(2):
+        response = client.post(
+            path=f"/proposals/{proposals[1].id}/mark_failed"
+            f"?claim={proposals[1].n_claims}",
+            request_body=json.dumps({"msg": "error"}),
+        )
+        assert response.json() == "FAILED"
+    response = client.post(
+        path=f"/proposals/{proposals[0].id}/mark_failed"
+        f"?claim={proposals[0].n_claims}",
+        request_body=json.dumps({"msg": "error"}),
+    )
+    assert response.status_code == 409
+
+
+def test_claim_priority(client: Client):
+    bench = Himmelblau()
+    pr = CandidatesRequest(
+        strategy_data=RandomStrategy(domain=bench.domain), tenant="flood"
+    )
+    ids = [
+        client.post(path="/proposals", request_body=pr.model_dump_json()).json()["id"]
+        for _ in range(2)
+    ]
+    pr.priority = 1
+    pr.tenant = None
+    urgent = client.post(path="/proposals", request_body=pr.model_dump_json()).json()
+    assert urgent["priority"] == 1
+
+    claimed = [
+        CandidatesProposal(**p)
+        for p in client.get(path="/proposals/claim/batch?max=3").json()
+    ]
+    assert [p.id for p in claimed] == [urgent["id"], *ids]
+    assert [p.tenant for p in claimed] == [None, "flood", "flood"]
+
+
+def test_claim_routing(client: Client):
+    bench = Himmelblau()
+    pr = CandidatesRequest(strategy_data=RandomStrategy(domain=bench.domain))
+    expensive = pr.model_copy(update={"n_candidates": 1000})
+    gpu = pr.model_copy(update={"required_tags": ["gpu"]})
+    ids = [
+        client.post(path="/proposals", request_body=r.model_dump_json()).json()
+        for r in [expensive, gpu, pr]
+    ]
+    assert [p["cost"] for p in ids] == pytest.approx([2.0, 0.002, 0.002])
+    assert ids[1]["required_tags"] == ["gpu"]
+    ids = [p["id"] for p in ids]
+
+    response = client.get(path="/proposals/claim?max_cost=1")
+    assert response.json()["id"] == ids[2]
+    claimed = client.get(path="/proposals/claim/batch?max=3&max_cost=1&tags=gpu")
+    assert [p["id"] for p in claimed.json()] == [ids[1]]
+    claimed = client.get(path="/proposals/claim/batch?max=3&tags=cpu")
+    assert [p["id"] for p in claimed.json()] == [ids[0]]
+    response = client.get(path="/proposals/claim?max_cost=-1")
+    assert response.status_code == 422
+
+
+def test_archive(client: Client):
+    # the test API keeps all proposals, its archive is empty
+    response = client.get(path="/proposals/archive?state=FINISHED&fields=id,state")
+    assert response.status_code == 200
+    assert response.json() == []
+    assert client.get(path="/proposals/archive?fields=unknown").status_code == 400
+    assert client.get(path="/proposals/archive/1").status_code == 404
+
+
+def test_claim_batch(client: Client):
+    bench = Himmelblau()
+    pr = CandidatesRequest(
+        strategy_data=RandomStrategy(domain=bench.domain),
+        n_candidates=1,
+        experiments=None,
+        pendings=None,
+    )
+    ids = [
+        CandidatesProposal(
+            **json.loads(
+                client.post(
+                    path="/proposals", request_body=pr.model_dump_json()
+                ).content
+            )
+        ).id
+        for _ in range(3)
+    ]
+    response = client.get(path="/proposals/claim/batch?max=2")
+    assert response.status_code == 200
+    claimed = [CandidatesProposal(**d) for d in json.loads(response.content)]
+    assert [p.id for p in claimed] == ids[:2]
+    assert all(p.state == "CLAIMED" for p in claimed)
+
+    claimed = json.loads(client.get(path="/proposals/claim/batch?max=2").content)
+    assert [p["id"] for p in claimed] == ids[2:]
+
+    response = client.get(path="/proposals/claim/batch?max=2")
+    assert response.status_code == 200
+    assert json.loads(response.content) == []
+    response = client.get(path="/proposals/claim/batch?max=0")
+    assert response.status_code == 422
+
+
+def test_get_proposals(client: Client):
+    bench = Himmelblau()
+    start = datetime.datetime.now()
+    pr = CandidatesRequest(
+        strategy_data=RandomStrategy(domain=bench.domain),
+        n_candidates=1,
+        experiments=None,
+        pendings=None,
+    )
+    ids = [
+        json.loads(
+            client.post(path="/proposals", request_body=pr.model_dump_json()).content
+        )["id"]
+        for _ in range(3)
+    ]
+    claimed = CandidatesProposal(**client.get(path="/proposals/claim").json())
+    assert claimed.id == ids[0]
+    client.post(
+        path=f"/proposals/{ids[0]}/mark_failed?claim={claimed.n_claims}",
+        request_body=json.dumps({"msg": "error"}),
+    )
+
+    # paginate through the proposals created in this test
+    response = client.get(
+        path=f"/proposals?created_after={start.isoformat()}&limit=2&fields=id,state"
+    )
+    assert response.status_code == 200
+    assert json.loads(response.content) == [
+        {"id": ids[0], "state": "FAILED"},
+        {"id": ids[1], "state": "CREATED"},
+    ]
+    cursor = response.headers["X-Next-Cursor"]
+    response = client.get(
+        path=f"/proposals?created_after={start.isoformat()}&limit=2&cursor={cursor}"
+    )
+    proposals = json.loads(response.content)
+    assert [p["id"] for p in proposals] == ids[2:]
+    assert CandidatesProposal(**proposals[0]).n_candidates == 1
+    assert "X-Next-Cursor" not in response.headers
+
+    # filter by state
+    response = client.get(
+        path=f"/proposals?created_after={start.isoformat()}&state=FAILED&fields=id"
+    )
+    assert json.loads(response.content) == [{"id": ids[0]}]
+
+    # all proposals are streamed, the limit is the page size of the store
+    response = client.requests.get(
+        f"{client.base_url}/proposals?created_after={start.isoformat()}&limit=2"
+        "&fields=id,state",
+        headers={"Accept": NDJSON_MEDIA_TYPE},
+    )
+    assert response.headers["content-type"] == NDJSON_MEDIA_TYPE
+    assert [json.loads(line) for line in response.iter_lines()] == [
+        {"id": ids[0], "state": "FAILED"},
+        {"id": ids[1], "state": "CREATED"},
+        {"id": ids[2], "state": "CREATED"},
+    ]
+
+    # unknown fields
+    response = client.get(path="/proposals?fields=id,foo")
+    assert response.status_code == 400
+
+    # bulk states
+    response = client.get(path=f"/proposals/states?ids={ids[0]}&ids={ids[1]}&ids=9999")
+    assert json.loads(response.content) == {
+        str(ids[0]): "FAILED",
+        str(ids[1]): "CREATED",
+    }
+
+    # claim the remaining proposals of this test
+    client.get(path="/proposals/claim/batch?max=2")
+
+
+def test_claim_wait(client: Client):
+    bench = Himmelblau()
+    pr = CandidatesRequest(
+        strategy_data=RandomStrategy(domain=bench.domain),
+        n_candidates=1,
+        experiments=None,
+        pendings=None,
+    )
+
+    # no proposal is created while waiting
+    start = time.monotonic()
+    response = client.get(path="/proposals/claim?wait=1")
+    assert response.status_code == 404
+    assert time.monotonic() - start >= 1
+
+    # the request returns as soon as a proposal is created
+    timer = threading.Timer(
+        0.5,
+        client.post,
+        kwargs={"path": "/proposals", "request_body": pr.model_dump_json()},
+    )
+    timer.start()
+    start = time.monotonic()
+    response = client.get(path="/proposals/claim?wait=30")
+    assert response.status_code == 200
+    assert time.monotonic() - start < 10
+    assert CandidatesProposal(**json.loads(response.content)).state == "CLAIMED"
+
+    response = client.get(path="/proposals/claim?wait=61")
+    assert response.status_code == 422
+
+
+def test_wait_and_events(client: Client):
+    bench = Himmelblau()
+    pr = CandidatesRequest(
+        strategy_data=RandomStrategy(domain=bench.domain), n_candidates=1
+    )
+    for _ in range(2):
+        client.post(path="/proposals", request_body=pr.model_dump_json())
+    proposals = [
+        CandidatesProposal(**p)
+        for p in client.get(path="/proposals/claim/batch?max=2").json()
+    ]
+    candidates = Candidates.from_pandas(bench.domain.inputs.sample(1), bench.domain)
+
+    response = client.get(path=f"/proposals/{proposals[0].id}/wait?timeout=0")
+    assert response.json() == "CLAIMED"
+    assert client.get(path="/proposals/9999/wait?timeout=0").status_code == 404
+    assert client.get(path="/proposals/9999/events").status_code == 404
+
+    timers = [
+        threading.Timer(
+            0.5,
+            client.post,
+            kwargs={
+                "path": f"/proposals/{proposals[0].id}/mark_processed"
+                f"?claim={proposals[0].n_claims}",
+                "request_body": candidates.model_dump_json(),
+            },
+        ),
+        threading.Timer(
+            1.0,
+            client.post,
+            kwargs={
+                "path": f"/proposals/{proposals[1].id}/mark_failed"
+                f"?claim={proposals[1].n_claims}",
+                "request_body": json.dumps({"msg": "error"}),
+            },
+        ),
+    ]
+    for timer in timers:
+        timer.start()
+    start = time.monotonic()
+    response = client.get(path=f"/proposals/{proposals[0].id}/wait?timeout=30")
+    assert response.json() == "FINISHED"
+    assert time.monotonic() - start < 10
+
+    # the stream ends when all proposals are finished or failed
+    response = client.get(
+        path=f"/proposals/events?ids={proposals[0].id}&ids={proposals[1].id}&ids=9999"
+    )
+    assert time.monotonic() - start < 10
+    assert response.headers["content-type"].startswith(SSE_MEDIA_TYPE)
+    events = [
+        json.loads(line[len("data: ") :])
+        for line in response.text.splitlines()
+        if line.startswith("data: ")
+    ]
+    assert events[0] == {"id": proposals[0].id, "state": "FINISHED"}
+    assert events[-1] == {"id": proposals[1].id, "state": "FAILED"}
+
+    response = client.get(path=f"/proposals/{proposals[1].id}/events")
+    assert response.text == (
+        f'event: state\ndata: {{"id":{proposals[1].id},"state":"FAILED"}}\n\n'
+    )
+    assert client.get(path="/proposals/1/wait?timeout=61").status_code == 422
+
+
+def test_heartbeat(client: Client):
+    bench = Himmelblau()
+    pr = CandidatesRequest(
+        strategy_data=RandomStrategy(domain=bench.domain),
+        n_candidates=1,
+        experiments=None,
+        pendings=None,
+    )
+    client.post(path="/proposals", request_body=pr.model_dump_json())
+    proposal = CandidatesProposal(
+        **json.loads(client.get(path="/proposals/claim").content)
+    )
+    assert proposal.n_claims == 1
+    assert proposal.lease_expires_at is not None
+
+    response = client.post(
+        path=f"/proposals/{proposal.id}/heartbeat?claim={proposal.n_claims}",
+        request_body="",
+    )
+    assert json.loads(response.content) == "CLAIMED"
+    renewed_proposal = CandidatesProposal(
+        **json.loads(client.get(path=f"/proposals/{proposal.id}").content)
+    )
+    assert renewed_proposal.lease_expires_at > proposal.lease_expires_at
+
+    # the claim token is required and must hold the proposal
+    response = client.post(path=f"/proposals/{proposal.id}/heartbeat", request_body="")
+    assert response.status_code == 422
+    response = client.post(
+        path=f"/proposals/{proposal.id}/heartbeat?claim={proposal.n_claims + 1}",
+        request_body="",
+    )
+    assert response.status_code == 409
+
+    client.post(
+        path=f"/proposals/{proposal.id}/mark_failed?claim={proposal.n_claims}",
+        request_body=json.dumps({"msg": "error"}),
+    )
+    response = client.post(
+        path=f"/proposals/{proposal.id}/heartbeat?claim={proposal.n_claims}",
+        request_body="",
+    )
+    assert response.status_code == 409
+    assert response.json()["detail"] == "Proposal is FAILED, claim 1 does not hold it"
+    failed_proposal = CandidatesProposal(
+        **json.loads(client.get(path=f"/proposals/{proposal.id}").content)
+    )
+    assert failed_proposal.lease_expires_at is None
+
+    response = client.post(path="/proposals/9999/heartbeat?claim=1", request_body="")
+    assert response.status_code == 404
+
+
+def test_proposals_idempotency(client: Client):
+    pr = CandidatesRequest(
+        strategy_data=RandomStrategy(domain=Himmelblau().domain), n_candidates=2
+    )
+    headers = {"Idempotency-Key": str(uuid.uuid4())}
+    proposal = CandidatesProposal(
+        **client.post(
+            path="/proposals", request_body=pr.model_dump_json(), headers=headers
+        ).json()
+    )
+    response = client.post(
+        path="/proposals", request_body=pr.model_dump_json(), headers=headers
+    )
+    assert response.headers["Idempotent-Replayed"] == "true"
+    assert CandidatesProposal(**response.json()).id == proposal.id
+
+    pr.n_candidates = 1
+    response = client.post(
+        path="/proposals", request_body=pr.model_dump_json(), headers=headers
+    )
+    assert response.status_code == 422
+
+    # a failed proposal is not reused
+    pr.n_candidates = 2
+    claimed = CandidatesProposal(**client.get(path="/proposals/claim").json())
+    assert claimed.id == proposal.id
+    client.post(
+        path=f"/proposals/{proposal.id}/mark_failed?claim={claimed.n_claims}",
+        request_body=json.dumps({"msg": "error"}),
+    )
+    response = client.post(
+        path="/proposals", request_body=pr.model_dump_json(), headers=headers
+    )
+    assert "Idempotent-Replayed" not in response.headers
+    assert CandidatesProposal(**response.json()).id != proposal.id
+
+    ids = [
+        client.post(
+            path="/proposals?dedupe=true", request_body=pr.model_dump_json()
+        ).json()["id"]
+        for _ in range(2)
+    ]
+    assert ids[0] == ids[1]
+
+    # claim the remaining proposals of this test
+    client.get(path="/proposals/claim/batch?max=2")
+
+
+def test_proposals_batch(client: Client):
+    bench = Himmelblau()
+    pr = CandidatesRequest(
+        strategy_data=RandomStrategy(domain=bench.domain), n_candidates=2
+    )
+    requests = [
+        pr.model_dump(mode="json"),
+        {"n_candidates": 1},
+        pr.model_dump(mode="json"),
+    ]
+    response = client.post(path="/proposals/batch", request_body=json.dumps(requests))
+    assert response.status_code == 200
+    items = response.json()
+    assert items[1]["proposal"] is None
+    assert items[1]["error"]["status_code"] == 422
+    proposals = [CandidatesProposal(**items[i]["proposal"]) for i in (0, 2)]
+    assert proposals[0].id != proposals[1].id
+    for proposal in proposals:
+        response = client.get(path=f"/proposals/{proposal.id}")
+        assert CandidatesProposal(**response.json()) == proposal
+
+    # claim the proposals of this test
+    client.get(path="/proposals/claim/batch?max=2")
@@ -0,0 +1,156 @@
+import datetime
+import gzip
+
+import pytest
+from bofire.benchmarks.api import Himmelblau
+from bofire.data_models.strategies.api import RandomStrategy
+
+from bofire_candidates_api.data_models import CandidatesProposal, ProposalStateEnum
+from bofire_candidates_api.retention import (
+    PROPOSALS_ARCHIVED,
+    ArchiveError,
+    ProposalArchive,
+    RetentionPolicy,
+    compact,
+    parse_retention_ttl,
+)
+from bofire_candidates_api.store import create_store
+
+
+def create_document(id: int, state: ProposalStateEnum) -> dict:
+    bench = Himmelblau()
+    proposal = CandidatesProposal(
+        id=id, strategy_data=RandomStrategy(domain=bench.domain), state=state
+    )
+    return proposal.model_dump(mode="json")
+
+
+def test_parse_retention_ttl():
+    assert parse_retention_ttl("") == {}
+    assert parse_retention_ttl("FINISHED=60, FAILED=3600") == {
+        ProposalStateEnum.FINISHED: 60.0,
+        ProposalStateEnum.FAILED: 3600.0,
+    }
+    for value in ["CREATED=60", "FINISHED", "FINISHED=-1", "FAILED=soon"]:
+        with pytest.raises(ValueError):
+            parse_retention_ttl(value)
+
+
+def test_retention_policy():
+    assert not RetentionPolicy().enabled
+    assert RetentionPolicy(keep_last=0).enabled
+    now = datetime.datetime(2024, 1, 2)
+    assert RetentionPolicy(ttl={"FINISHED": 86400}).cutoffs(now) == {
+        ProposalStateEnum.FINISHED: datetime.datetime(2024, 1, 1)
+    }
+    with pytest.raises(ValueError, match="do not expire"):
+        RetentionPolicy(ttl={"CLAIMED": 60})
+
+
+def test_archive(tmp_path):
+    archive = ProposalArchive(str(tmp_path / "archive"))
+    assert list(archive) == []
+    archive.append([create_document(i, ProposalStateEnum.FINISHED) for i in [3, 1]])
+    archive.append([])
+    # a proposal archived twice is returned once
+    archive.append(
+        [
+            create_document(2, ProposalStateEnum.FAILED),
+            create_document(1, ProposalStateEnum.FINISHED),
+        ]
+    )
+    assert [d["id"] for d in archive] == [3, 1, 2]
+    segments = archive.segments()
+    assert [(s.min_id, s.max_id, s.states) for s in segments] == [
+        (1, 3, ["FINISHED"]),
+        (1, 2, ["FAILED", "FINISHED"]),
+    ]
+
+    assert CandidatesProposal(**archive.get(2)).state == ProposalStateEnum.FAILED
+    assert archive.get(4) is None
+    assert [d["id"] for d in archive.search()] == [1, 2, 3]
+    assert archive.search(state=ProposalStateEnum.FAILED, fields=["state"]) == [
+        {"id": 2, "state": "FAILED"}
+    ]
+    assert [d["id"] for d in archive.search(after_id=1, limit=1)] == [2]
+    future = datetime.datetime.now() + datetime.timedelta(days=1)
+    assert archive.search(created_after=future) == []
+    assert len(archive.search(created_before=future)) == 3
+
+    # the incomplete end of an index entry which is still being written is skipped
+    with open(tmp_path / "archive" / ProposalArchive.INDEX, "a") as f:
+        f.write('{"name": "segment')
+    assert archive.segments() == segments
+
+
+def test_archive_index(tmp_path, monkeypatch):
+    archive = ProposalArchive(str(tmp_path / "archive"))
+    for i in range(0, 100, 10):
+        archive.append(
+            [create_document(i + j, ProposalStateEnum.FINISHED) for j in range(10)]
+        )
+    archive.append([create_document(100, ProposalStateEnum.FAILED)])
+    read = []
+    original = archive.read
+    monkeypatch.setattr(
+        archive, "read", lambda segment: read.append(segment) or original(segment)
+    )
+
+    # only the segments which can contain a proposal are read
+    assert archive.get(42)["id"] == 42
+    assert [(s.min_id, s.max_id) for s in read] == [(40, 49)]
+    read.clear()
+    assert archive.get(1000) is None
+    assert read == []
+    assert [d["id"] for d in archive.search(after_id=25, limit=10)] == list(
+        range(26, 36)
+    )
+    assert [s.min_id for s in read] == [20, 30]
+    read.clear()
+    assert [d["id"] for d in archive.search(state=ProposalStateEnum.FAILED)] == [100]
+    assert [s.min_id for s in read] == [100]
+
+
+def test_archive_corrupt(tmp_path, caplog):
+    archive = ProposalArchive(str(tmp_path / "archive"))
+    archive.append([create_document(i, ProposalStateEnum.FINISHED) for i in [1, 2]])
+    (segment,) = archive.segments()
+    path = tmp_path / "archive" / segment.name
+    with gzip.open(path, "rt") as f:
+        lines = f.readlines()
+    with gzip.open(path, "wt") as f:
+        f.write('{"id": 3, "truncated\n' + "".join(lines))
+
+    # a malformed line is logged and skipped, the following proposals are read
+    assert [d["id"] for d in archive] == [1, 2]
+    assert archive.get(2)["id"] == 2
+    assert f"Skipping line 1 of {path}" in caplog.text
+
+    path.write_bytes(b"not gzip")
+    with pytest.raises(ArchiveError, match="unreadable"):
+        archive.get(1)
+    with pytest.raises(ArchiveError):
+        archive.search()
+
+
+@pytest.mark.parametrize("backend", ["sqlite", "tinydb"])
+def test_compact(tmp_path, backend):
+    store = create_store(backend, str(tmp_path / f"db.{backend}"))
+    archive = ProposalArchive(str(tmp_path / "archive"))
+    documents = [create_document(0, ProposalStateEnum.FINISHED) for _ in range(5)]
+    ids = store.insert_many(documents)
+    store.update(ids[-1], {"state": ProposalStateEnum.CREATED})
+    policy = RetentionPolicy(ttl={"FINISHED": 60}, keep_last=1)
+    assert compact(store, archive, RetentionPolicy()) == 0
+
+    before = PROPOSALS_ARCHIVED.value()
+    assert compact(store, archive, policy, batch_size=2) == 3
+    assert PROPOSALS_ARCHIVED.value() == before + 3
+    assert [d["id"] for d in store.all()] == ids[3:]
+    assert [d["id"] for d in archive] == ids[:3]
+
+    later = datetime.datetime.now() + datetime.timedelta(minutes=2)
+    assert compact(store, archive, policy, now=later) == 1
+    assert [d["id"] for d in store.all()] == ids[4:]
+    assert compact(store, archive, policy, now=later) == 0
+    store.close()
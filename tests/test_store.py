@@ -0,0 +1,431 @@
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import pytest
+from bofire.benchmarks.api import Himmelblau
+from bofire.data_models.dataframes.api import Experiments
+from bofire.data_models.strategies.api import RandomStrategy
+
+from bofire_candidates_api.data_models import (
+    Campaign,
+    CandidatesProposal,
+    ProposalStateEnum,
+)
+from bofire_candidates_api.store import (
+    STORE_OPERATION_SECONDS,
+    ProposalStore,
+    SqliteProposalStore,
+    TimedStore,
+    create_store,
+    parse_tenant_weights,
+)
+
+
+def create_proposal(
+    priority: int = 0, tenant: Optional[str] = None
+) -> CandidatesProposal:
+    bench = Himmelblau()
+    return CandidatesProposal(
+        strategy_data=RandomStrategy(domain=bench.domain),
+        n_candidates=2,
+        experiments=None,
+        pendings=None,
+        priority=priority,
+        tenant=tenant,
+    )
+
+
+@pytest.fixture(params=["sqlite", "tinydb"])
+def store(request, tmp_path) -> ProposalStore:
+    store = create_store(request.param, str(tmp_path / f"db.{request.param}"))
+    yield store
+    store.close()
+
+
+def test_create_store_invalid_backend(tmp_path):
+    with pytest.raises(ValueError, match="Unknown proposal store backend"):
+        create_store("mongo", str(tmp_path / "db"))
+
+
+def test_insert_get(store: ProposalStore):
+    proposal = create_proposal()
+    id = store.insert(proposal.model_dump())
+    assert store.get(id)["id"] == id
+    loaded_proposal = CandidatesProposal(**store.get(id))
+    proposal.id = id
+    assert loaded_proposal == proposal
+    assert store.get(id + 1) is None
+
+
+def test_update(store: ProposalStore):
+    id = store.insert(create_proposal().model_dump())
+    now = datetime.datetime.now()
+    store.update(
+        id,
+        {
+            "state": ProposalStateEnum.FAILED,
+            "last_updated_at": now,
+            "error_message": "error",
+        },
+    )
+    proposal = CandidatesProposal(**store.get(id))
+    assert proposal.state == ProposalStateEnum.FAILED
+    assert proposal.last_updated_at == now
+    assert proposal.error_message == "error"
+    assert proposal.n_candidates == 2
+
+
+def test_all_search_state(store: ProposalStore):
+    ids = [store.insert(create_proposal().model_dump()) for _ in range(3)]
+    store.update(ids[0], {"state": ProposalStateEnum.CLAIMED})
+    assert [d["id"] for d in store.all()] == ids
+    assert [d["id"] for d in store.search_state(ProposalStateEnum.CREATED)] == ids[1:]
+    assert [
+        d["id"] for d in store.search_state(ProposalStateEnum.CREATED, limit=1)
+    ] == ids[1:2]
+    assert store.search_state(ProposalStateEnum.FINISHED) == []
+
+
+def test_claim(store: ProposalStore):
+    ids = [store.insert(create_proposal().model_dump()) for _ in range(3)]
+    claimed = store.claim()
+    assert [d["id"] for d in claimed] == ids[:1]
+    assert claimed[0]["state"] == ProposalStateEnum.CLAIMED
+    assert store.get(ids[0])["state"] == ProposalStateEnum.CLAIMED
+    assert store.get(ids[0])["claimed_at"] == claimed[0]["claimed_at"]
+    assert store.get(ids[1])["claimed_at"] is None
+    assert [d["id"] for d in store.claim(limit=5)] == ids[1:]
+    assert store.claim(limit=5) == []
+
+
+def test_claim_fair(tmp_path):
+    for backend in ["sqlite", "tinydb"]:
+        store = create_store(
+            backend, str(tmp_path / f"db.{backend}"), tenant_weights={"b": 2}
+        )
+        # tenant a floods the queue before b and c submit their proposals
+        a = store.insert_many([create_proposal(tenant="a").model_dump()] * 6)
+        b = [store.insert(create_proposal(tenant="b").model_dump()) for _ in range(4)]
+        c = [store.insert(create_proposal().model_dump()) for _ in range(2)]
+        urgent = store.insert(create_proposal(priority=1, tenant="a").model_dump())
+
+        claimed = [d["id"] for d in store.claim(limit=5)]
+        # the higher priority first, then b with twice the share of a and c
+        assert claimed == [urgent, a[0], b[0], c[0], b[1]]
+        assert [d["id"] for d in store.claim(limit=4)] == [a[1], b[2], c[1], b[3]]
+
+        # a new tenant starts at the virtual time of the last claim
+        late = store.insert(create_proposal(tenant="d").model_dump())
+        assert [d["id"] for d in store.claim(limit=3)] == [late, a[2], a[3]]
+        store.close()
+
+
+def test_claim_routing(store: ProposalStore):
+    cheap = store.insert(
+        create_proposal().model_copy(update={"cost": 0.1}).model_dump()
+    )
+    gpu = store.insert(
+        create_proposal()
+        .model_copy(update={"cost": 0.1, "required_tags": ["gpu"]})
+        .model_dump()
+    )
+    expensive = store.insert(
+        create_proposal().model_copy(update={"cost": 100.0}).model_dump()
+    )
+    assert store.get(gpu)["required_tags"] == ["gpu"]
+    assert store.get(cheap)["required_tags"] == []
+    assert store.search(fields=["required_tags", "cost"])[1] == {
+        "id": gpu,
+        "required_tags": ["gpu"],
+        "cost": 0.1,
+    }
+
+    # proposals the worker cannot process do not block the ones behind them
+    assert [d["id"] for d in store.claim(limit=3, max_cost=1.0)] == [cheap]
+    assert store.claim(max_cost=1.0) == []
+    assert [d["id"] for d in store.claim(tags=["cpu"])] == [expensive]
+    claimed = store.claim(tags=["cpu", "gpu"])
+    assert [d["id"] for d in claimed] == [gpu]
+    assert claimed[0]["required_tags"] == ["gpu"]
+
+
+def test_claim_partitions(store: ProposalStore):
+    gpu = (
+        create_proposal()
+        .model_copy(update={"priority": 1, "required_tags": ["cuda", "gpu"]})
+        .model_dump()
+    )
+    sqlite = isinstance(store, SqliteProposalStore)
+    store.insert_many([gpu] * (2000 if sqlite else 20))
+    cpu = store.insert(create_proposal().model_dump())
+    steps = []
+    if sqlite:
+        # counts every 100 instructions of the SQLite virtual machine
+        store.connection.set_progress_handler(lambda: steps.append(1), 100)
+
+    # the proposals for other workers ahead in the queue are not scanned
+    assert [d["id"] for d in store.claim(tags=["cpu"])] == [cpu]
+    assert len(steps) < 50
+    claimed = store.claim(limit=2, tags=["cuda", "gpu"])
+    assert [d["required_tags"] for d in claimed] == [["cuda", "gpu"]] * 2
+
+
+def test_claim_index(tmp_path):
+    store = create_store("sqlite", str(tmp_path / "db.sqlite"))
+    store.insert(create_proposal().model_dump())
+    plan = " ".join(
+        row["detail"]
+        for row in store.connection.execute(
+            "EXPLAIN QUERY PLAN SELECT id FROM proposals WHERE state = ? "
+            f"ORDER BY {SqliteProposalStore.QUEUE_ORDER} LIMIT 1",
+            ("CREATED",),
+        )
+    )
+    assert "ix_proposals_queue" in plan
+    assert "TEMP B-TREE" not in plan
+    store.close()
+
+
+def test_parse_tenant_weights():
+    assert parse_tenant_weights("") == {}
+    assert parse_tenant_weights("team-a=2, b=0.5") == {"team-a": 2.0, "b": 0.5}
+    for value in ["a", "a=0", "=1", "a=x"]:
+        with pytest.raises(ValueError):
+            parse_tenant_weights(value)
+
+
+def test_claim_concurrent(tmp_path):
+    path = str(tmp_path / "db.sqlite")
+    store = create_store("sqlite", path)
+    ids = [store.insert(create_proposal().model_dump()) for _ in range(20)]
+    # every thread uses its own store and thereby its own connection
+    stores = [create_store("sqlite", path) for _ in range(4)]
+
+    def claim_all(store: ProposalStore):
+        claimed = []
+        while True:
+            documents = store.claim(limit=2)
+            if len(documents) == 0:
+                return claimed
+            claimed += [d["id"] for d in documents]
+
+    with ThreadPoolExecutor(max_workers=len(stores)) as executor:
+        results = list(executor.map(claim_all, stores))
+    assert sorted(id for claimed in results for id in claimed) == ids
+
+
+def test_search(store: ProposalStore):
+    start = datetime.datetime.now()
+    ids = [store.insert(create_proposal().model_dump()) for _ in range(4)]
+    store.update(ids[1], {"state": ProposalStateEnum.FINISHED})
+    assert [d["id"] for d in store.search()] == ids
+    assert [d["id"] for d in store.search(limit=2)] == ids[:2]
+    assert [d["id"] for d in store.search(after_id=ids[1], limit=2)] == ids[2:]
+    assert [d["id"] for d in store.search(state=ProposalStateEnum.FINISHED)] == [ids[1]]
+    assert [d["id"] for d in store.search(created_after=start)] == ids
+    assert store.search(created_before=start) == []
+    # times with a time zone are compared with the stored local times
+    utc = start.astimezone(datetime.timezone.utc)
+    assert [d["id"] for d in store.search(created_after=utc)] == ids
+    assert store.search(created_before=utc) == []
+
+    documents = store.search(fields=["state", "n_candidates", "error_message"])
+    assert documents[1] == {
+        "id": ids[1],
+        "state": ProposalStateEnum.FINISHED,
+        "n_candidates": 2,
+        "error_message": None,
+    }
+    documents = store.search(limit=1, fields=["strategy_data"])
+    assert documents[0]["strategy_data"]["type"] == "RandomStrategy"
+    store.update(ids[0], {"flag": True, "ratio": 0.5, "tags": ["a"]})
+    assert store.search(limit=1, fields=["flag", "ratio", "tags", "missing"]) == [
+        {"id": ids[0], "flag": True, "ratio": 0.5, "tags": ["a"], "missing": None}
+    ]
+
+
+def test_get_states(store: ProposalStore):
+    ids = [store.insert(create_proposal().model_dump()) for _ in range(2)]
+    store.update(ids[1], {"state": ProposalStateEnum.CLAIMED})
+    assert store.get_states(ids + [ids[1] + 1]) == {
+        ids[0]: ProposalStateEnum.CREATED,
+        ids[1]: ProposalStateEnum.CLAIMED,
+    }
+    assert store.get_states([]) == {}
+
+
+def test_count_states(store: ProposalStore):
+    assert store.count_states() == {}
+    ids = [store.insert(create_proposal().model_dump()) for _ in range(3)]
+    store.update(ids[1], {"state": ProposalStateEnum.CLAIMED})
+    assert store.count_states() == {
+        ProposalStateEnum.CREATED: 2,
+        ProposalStateEnum.CLAIMED: 1,
+    }
+
+
+def test_timed_store(store: ProposalStore):
+    timed = TimedStore(store)
+    n_inserts = STORE_OPERATION_SECONDS.count(operation="insert")
+    id = timed.insert(create_proposal().model_dump())
+    assert timed.get(id)["id"] == id
+    assert timed.path == store.path
+    assert STORE_OPERATION_SECONDS.count(operation="insert") == n_inserts + 1
+
+
+def test_claim_lease(store: ProposalStore):
+    id = store.insert(create_proposal().model_dump())
+    start = datetime.datetime.now()
+    proposal = CandidatesProposal(**store.claim(lease_duration=60)[0])
+    assert proposal.n_claims == 1
+    assert proposal.lease_expires_at >= start + datetime.timedelta(seconds=60)
+    assert store.renew_lease(id, 1, lease_duration=120) is True
+    proposal = CandidatesProposal(**store.get(id))
+    assert proposal.lease_expires_at >= start + datetime.timedelta(seconds=120)
+    assert store.renew_lease(id, 2, lease_duration=60) is False
+
+    store.update(id, {"state": ProposalStateEnum.FINISHED})
+    assert store.renew_lease(id, 1, lease_duration=60) is False
+    assert store.renew_lease(id + 1, 1, lease_duration=60) is False
+
+
+def test_update_claimed(store: ProposalStore):
+    id = store.insert(create_proposal().model_dump())
+    store.claim(lease_duration=-1)
+    store.requeue_expired(max_claims=3)
+    assert store.claim(lease_duration=60)[0]["n_claims"] == 2
+
+    # the first claim was lost when the proposal was requeued
+    failed = {"state": ProposalStateEnum.FAILED, "error_message": "error"}
+    assert store.update_claimed(id, 1, failed) is False
+    assert store.get(id)["state"] == ProposalStateEnum.CLAIMED
+    assert store.update_claimed(id, 2, failed) is True
+    assert store.get(id)["error_message"] == "error"
+    finished = {"state": ProposalStateEnum.FINISHED}
+    assert store.update_claimed(id, 2, finished) is False
+    assert store.get(id)["state"] == ProposalStateEnum.FAILED
+    assert store.update_claimed(id + 1, 1, finished) is False
+
+
+def test_requeue_expired(store: ProposalStore):
+    ids = [store.insert(create_proposal().model_dump()) for _ in range(3)]
+    store.claim(limit=1, lease_duration=-1)
+    store.claim(limit=1, lease_duration=60)
+    store.claim(limit=1)
+    # only the expired lease is released
+    assert store.requeue_expired(max_claims=2) == ids[:1]
+    proposal = CandidatesProposal(**store.get(ids[0]))
+    assert proposal.state == ProposalStateEnum.CREATED
+    assert proposal.lease_expires_at is None
+    assert store.get_states(ids[1:]) == {
+        ids[1]: ProposalStateEnum.CLAIMED,
+        ids[2]: ProposalStateEnum.CLAIMED,
+    }
+
+    # the proposal fails when its lease expires for the second time
+    assert [d["id"] for d in store.claim(lease_duration=-1)] == ids[:1]
+    assert store.requeue_expired(max_claims=2) == ids[:1]
+    proposal = CandidatesProposal(**store.get(ids[0]))
+    assert proposal.state == ProposalStateEnum.FAILED
+    assert proposal.n_claims == 2
+    assert proposal.error_message == "Lease expired after 2 claim(s)"
+    assert store.requeue_expired(max_claims=2) == []
+
+
+def test_search_expired(store: ProposalStore):
+    ids = [
+        store.insert(create_proposal(tenant=tenant).model_dump())
+        for tenant in ["a", "a", "a", None, None]
+    ]
+    old = datetime.datetime(2020, 1, 1)
+    for id in ids[:4]:
+        store.update(id, {"state": ProposalStateEnum.FINISHED})
+    store.update(ids[3], {"state": ProposalStateEnum.FAILED, "last_updated_at": old})
+    store.update(ids[4], {"last_updated_at": old})
+    cutoff = old + datetime.timedelta(days=1)
+
+    assert store.search_expired({}) == []
+    expired = store.search_expired({ProposalStateEnum.FAILED: cutoff})
+    assert [d["id"] for d in expired] == [ids[3]]
+    assert expired[0]["tenant"] is None
+    # proposals in the queue never expire
+    assert store.search_expired({ProposalStateEnum.FINISHED: cutoff}) == []
+    assert [d["id"] for d in store.search_expired({}, keep_last=1)] == ids[:2]
+    assert [
+        d["id"]
+        for d in store.search_expired(
+            {ProposalStateEnum.FAILED: cutoff}, keep_last=2, limit=2
+        )
+    ] == [ids[0], ids[3]]
+
+    store.delete_many([ids[0], ids[4]])
+    store.vacuum()
+    assert [d["id"] for d in store.all()] == ids[1:]
+    assert store.get(ids[0]) is None
+
+
+def test_vacuum(tmp_path):
+    store = create_store("sqlite", str(tmp_path / "db.sqlite"))
+    assert store.connection.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+    ids = store.insert_many([create_proposal().model_dump()] * 50)
+    for id in ids:
+        store.update(id, {"state": ProposalStateEnum.FINISHED})
+    store.delete_many(ids[:-1])
+    assert store.connection.execute("PRAGMA freelist_count").fetchone()[0] > 0
+    store.vacuum()
+    assert store.connection.execute("PRAGMA freelist_count").fetchone()[0] == 0
+    store.close()
+
+
+def test_campaign(store: ProposalStore):
+    bench = Himmelblau()
+    experiments = bench.f(bench.domain.inputs.sample(5), return_complete=True)
+    rows = Experiments.from_pandas(experiments, bench.domain).model_dump()["rows"]
+    campaign = Campaign(strategy_data=RandomStrategy(domain=bench.domain))
+    id = store.insert_campaign(campaign.model_dump())
+    campaign.id = id
+    assert Campaign(**store.get_campaign(id)) == campaign
+    assert store.get_campaign(id + 1) is None
+
+    assert store.append_experiments(id, rows[:3]) == 3
+    assert store.append_experiments(id, rows[3:]) == 5
+    assert store.get_campaign(id)["n_experiments"] == 5
+    assert store.get_experiments(id) == rows
+    assert store.get_experiments(id, start=3) == rows[3:]
+    assert store.get_experiments(id, start=5) == []
+
+    now = datetime.datetime.now()
+    store.update_campaign(id, {"last_updated_at": now})
+    loaded_campaign = Campaign(**store.get_campaign(id))
+    assert loaded_campaign.last_updated_at == now
+    assert loaded_campaign.n_experiments == 5
+
+
+def test_insert_many(store: ProposalStore):
+    documents = [create_proposal().model_dump() for _ in range(3)]
+    ids = store.insert_many(documents)
+    assert len(set(ids)) == 3
+    assert [store.get(id)["id"] for id in ids] == ids
+    assert store.insert_many([]) == []
+
+
+def test_insert_idempotent(store: ProposalStore):
+    proposal = create_proposal()
+    proposal.idempotency_key = "key:1"
+    start = proposal.created_at
+    id, created = store.insert_idempotent(proposal.model_dump(), created_after=start)
+    assert created is True
+    assert store.get(id)["idempotency_key"] == "key:1"
+    assert store.insert_idempotent(proposal.model_dump(), created_after=start) == (
+        id,
+        False,
+    )
+    # expired and failed proposals are not reused
+    later = start + datetime.timedelta(seconds=1)
+    new_id, created = store.insert_idempotent(proposal.model_dump(), later)
+    assert created is True
+    store.update(new_id, {"state": ProposalStateEnum.FAILED})
+    assert store.insert_idempotent(proposal.model_dump(), start) == (id, False)
+    store.update(id, {"state": ProposalStateEnum.FAILED})
+    assert store.insert_idempotent(proposal.model_dump(), start)[1] is True
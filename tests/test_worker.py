@@ -1,13 +1,31 @@
+import asyncio
 import json
+import os
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
 import pytest
 from bofire.benchmarks.api import Himmelblau
 from bofire.data_models.dataframes.api import Candidates, Experiments
 from bofire.data_models.strategies.api import RandomStrategy, SoboStrategy
 
-from bofire_candidates_api.data_models import CandidatesProposal, CandidatesRequest
+from bofire_candidates_api.async_client import AsyncClient
+from bofire_candidates_api.data_models import (
+    CandidatesProposal,
+    CandidatesRequest,
+    ProcessedProposal,
+)
+from bofire_candidates_api.generate import GENERATE_PHASE_SECONDS
+from bofire_candidates_api.worker import (
+    WORKER_PHASE_SECONDS,
+    WORKER_PROPOSALS,
+    ClaimLostError,
+    PoolWorker,
+    Worker,
+)
 from bofire_candidates_api.worker import Client as WorkerClient
-from bofire_candidates_api.worker import Worker
 from tests.conftest import Client
 
 
@@ -35,18 +53,157 @@ def test_client(client: Client):
     assert proposal.experiments is None
     assert proposal.pendings is None
 
-    # test mark failed
-    worker_client.mark_failed(proposal_id=proposal.id, error_message="error")
-    status = json.loads(client.get(path=f"/proposals/{proposal.id}/state").content)
-    assert status == "FAILED"
+    # test heartbeat
+    assert (
+        worker_client.heartbeat(proposal_id=proposal.id, claim=proposal.n_claims)
+        == "CLAIMED"
+    )
+    with pytest.raises(ClaimLostError):
+        worker_client.heartbeat(proposal_id=proposal.id, claim=proposal.n_claims + 1)
 
     # test mark processed
     worker_client.mark_processed(
         proposal_id=proposal.id,
+        claim=proposal.n_claims,
         candidates=Candidates.from_pandas(candidates, bench.domain),
     )
     status = json.loads(client.get(path=f"/proposals/{proposal.id}/state").content)
     assert status == "FINISHED"
+    with pytest.raises(ClaimLostError):
+        worker_client.mark_failed(
+            proposal_id=proposal.id, claim=proposal.n_claims, error_message="error"
+        )
+
+    # test claim several proposals
+    for _ in range(2):
+        client.post(path="/proposals", request_body=pr.model_dump_json())
+    proposals = worker_client.claim_proposals(max=3)
+    assert len(proposals) == 2
+    assert proposals[0].id < proposals[1].id
+    # test mark failed
+    for proposal in proposals:
+        worker_client.mark_failed(
+            proposal_id=proposal.id, claim=proposal.n_claims, error_message="error"
+        )
+    status = json.loads(client.get(path=f"/proposals/{proposal.id}/state").content)
+    assert status == "FAILED"
+    assert worker_client.claim_proposals(max=3) == []
+
+    # test mark processed batch, repeated requests succeed
+    client.post(path="/proposals", request_body=pr.model_dump_json())
+    proposal = worker_client.claim_proposal()
+    processed = ProcessedProposal(
+        id=proposal.id,
+        claim=proposal.n_claims,
+        candidates=Candidates.from_pandas(candidates, bench.domain),
+    )
+    for _ in range(2):
+        items = worker_client.mark_processed_batch([processed])
+        assert [(item.id, item.state) for item in items] == [(proposal.id, "FINISHED")]
+    assert (
+        worker_client.mark_processed(
+            proposal_id=proposal.id,
+            claim=proposal.n_claims,
+            candidates=processed.candidates,
+        )
+        == "FINISHED"
+    )
+    # the connections are reused
+    session = worker_client.session
+    worker_client.get_version()
+    assert worker_client.session is session
+    worker_client.close()
+
+
+def test_client_retry():
+    requests = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def respond(self, status: int, body: str):
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body.encode())
+
+        def do_GET(self):
+            requests.append(self.path)
+            if self.path == "/versions":
+                self.respond(200, '"1.0"')
+            else:
+                self.respond(503, '"unavailable"')
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers["Content-Length"]))
+            requests.append(self.path)
+            # every second heartbeat fails
+            if len(requests) % 2 == 0:
+                self.respond(503, '"unavailable"')
+            else:
+                self.respond(200, '"CLAIMED"')
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("localhost", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        url = f"http://localhost:{server.server_address[1]}"
+        worker_client = WorkerClient(url=url, backoff_factor=0)
+        assert worker_client.heartbeat(proposal_id=1, claim=1) == "CLAIMED"
+        assert requests[1:] == ["/proposals/1/heartbeat?claim=1"] * 2
+        # claims are not repeated
+        requests.clear()
+        with pytest.raises(ValueError):
+            worker_client.claim_proposal()
+        assert requests == ["/proposals/claim?wait=0"]
+
+        async_client = AsyncClient(url=url, backoff_factor=0)
+        requests.clear()
+        requests.append("/versions")
+        assert asyncio.run(async_client.heartbeat(proposal_id=1, claim=1)) == "CLAIMED"
+        assert requests[1:] == ["/proposals/1/heartbeat?claim=1"] * 2
+    finally:
+        server.shutdown()
+
+
+def test_async_client():
+    bench = Himmelblau()
+    pr = CandidatesRequest(
+        strategy_data=RandomStrategy(domain=bench.domain), n_candidates=2
+    )
+    candidates = Candidates.from_pandas(bench.domain.inputs.sample(2), bench.domain)
+
+    async def process():
+        async with AsyncClient(
+            url=os.getenv("CANDIDATES_URL", "http://localhost:8000")
+        ) as c:
+            await c.post("/proposals", request_body=pr)
+            await c.post("/proposals", request_body=pr)
+            proposals = await c.claim_proposals(max=2)
+            assert len(proposals) == 2
+            assert (
+                await c.heartbeat(proposals[0].id, proposals[0].n_claims) == "CLAIMED"
+            )
+            with pytest.raises(ClaimLostError):
+                await c.heartbeat(proposals[0].id, proposals[0].n_claims + 1)
+            assert (
+                await c.mark_processed(
+                    proposals[0].id, proposals[0].n_claims, candidates
+                )
+                == "FINISHED"
+            )
+            items = await c.mark_processed_batch(
+                [
+                    ProcessedProposal(id=p.id, claim=p.n_claims, candidates=candidates)
+                    for p in proposals
+                ]
+            )
+            assert [item.state for item in items] == ["FINISHED", "FINISHED"]
+            assert await c.claim_proposal() is None
+
+    asyncio.run(process())
 
 
 def test_worker(client: Client):
@@ -64,10 +221,16 @@ def test_worker(client: Client):
     id = CandidatesProposal(**json.loads(response.content)).id
 
     worker = Worker(client=WorkerClient(), job_check_interval=2)
+    n_processed = WORKER_PROPOSALS.value(outcome="processed")
+    n_asks = GENERATE_PHASE_SECONDS.count(phase="ask")
 
     worker.work_round()
     status = json.loads(client.get(path=f"/proposals/{id}/state").content)
     assert status == "FINISHED"
+    # the phases recorded by the child process are merged into the worker
+    assert WORKER_PROPOSALS.value(outcome="processed") == n_processed + 1
+    assert GENERATE_PHASE_SECONDS.count(phase="ask") == n_asks + 1
+    assert WORKER_PHASE_SECONDS.count(phase="report") > 0
     candidates = Candidates(
         **json.loads(client.get(path=f"/proposals/{id}/candidates").content)
     )
@@ -114,3 +277,117 @@ def test_worker(client: Client):
         **json.loads(client.get(path=f"/proposals/{id}/candidates").content)
     )
     assert len(candidates.rows) == 1
+
+
+def test_worker_claim_wait(client: Client):
+    bench = Himmelblau()
+    worker = Worker(client=WorkerClient(), job_check_interval=60, claim_wait=1)
+
+    # no proposal available, the worker does not sleep for job_check_interval
+    worker.work_round()
+
+    pr = CandidatesRequest(
+        strategy_data=RandomStrategy(domain=bench.domain),
+        n_candidates=2,
+        experiments=None,
+        pendings=None,
+    )
+    response = client.post(path="/proposals", request_body=pr.model_dump_json())
+    id = CandidatesProposal(**json.loads(response.content)).id
+    worker.work_round()
+    status = json.loads(client.get(path=f"/proposals/{id}/state").content)
+    assert status == "FINISHED"
+
+
+def test_pool_worker(client: Client):
+    bench = Himmelblau()
+    pr = CandidatesRequest(
+        strategy_data=RandomStrategy(domain=bench.domain),
+        n_candidates=2,
+        experiments=None,
+        pendings=None,
+    )
+    failing_pr = CandidatesRequest(
+        strategy_data=SoboStrategy(domain=bench.domain),
+        n_candidates=1,
+        experiments=None,
+        pendings=None,
+    )
+    ids = [
+        CandidatesProposal(
+            **json.loads(
+                client.post(path="/proposals", request_body=p.model_dump_json()).content
+            )
+        ).id
+        for p in [pr, pr, failing_pr, pr]
+    ]
+
+    worker = PoolWorker(
+        client=WorkerClient(),
+        job_check_interval=1,
+        concurrency=2,
+        max_jobs_per_child=2,
+    )
+    try:
+        for _ in range(60):
+            worker.work_round()
+            states = json.loads(
+                client.get(
+                    path="/proposals/states?" + "&".join(f"ids={i}" for i in ids)
+                ).content
+            )
+            if all(state in ["FINISHED", "FAILED"] for state in states.values()):
+                break
+        assert worker.n_running <= 2
+    finally:
+        worker.shutdown()
+    assert states == {
+        str(ids[0]): "FINISHED",
+        str(ids[1]): "FINISHED",
+        str(ids[2]): "FAILED",
+        str(ids[3]): "FINISHED",
+    }
+
+
+def test_pool_worker_report(client: Client, monkeypatch):
+    worker = PoolWorker(client=WorkerClient(), job_check_interval=1)
+    proposal = CandidatesProposal(
+        id=0, strategy_data=RandomStrategy(domain=Himmelblau().domain)
+    )
+    failed = []
+    monkeypatch.setattr(
+        PoolWorker, "fail", lambda self, p, e: failed.append((p.id, str(e)))
+    )
+    future = Future()
+    future.set_exception(RuntimeError("boom"))
+
+    # the done callback only queues the result, it does not report the failure
+    worker.report(proposal, time.perf_counter(), future)
+    assert failed == []
+    assert worker._reports.get_nowait() == (proposal, future)
+    assert worker.collect(proposal, future) is None
+    assert failed == [(0, "boom")]
+
+
+def test_worker_dead_process(client: Client, monkeypatch):
+    bench = Himmelblau()
+    pr = CandidatesRequest(
+        strategy_data=RandomStrategy(domain=bench.domain),
+        n_candidates=1,
+        experiments=None,
+        pendings=None,
+    )
+    response = client.post(path="/proposals", request_body=pr.model_dump_json())
+    id = CandidatesProposal(**json.loads(response.content)).id
+
+    def die(candidate_request, conn_obj):
+        os._exit(3)
+
+    monkeypatch.setattr(Worker, "process_proposal", staticmethod(die))
+    worker = Worker(client=WorkerClient(), job_check_interval=0.5)
+    worker.work_round()
+    proposal = CandidatesProposal(
+        **json.loads(client.get(path=f"/proposals/{id}").content)
+    )
+    assert proposal.state == "FAILED"
+    assert proposal.error_message == "Worker process died with exit code 3"
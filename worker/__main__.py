@@ -1,7 +1,8 @@
 import logging
 import os
 
-from bofire_candidates_api.worker import Client, Worker
+from bofire_candidates_api.metrics import start_metrics_server
+from bofire_candidates_api.worker import Client, PoolWorker, Worker
 
 
 LOG_LEVELS = {
@@ -20,7 +21,17 @@ def main():
         datefmt="%Y-%m-%dT%H:%M:%S%z",
     )
     logging.info("config from environment:")
-    for k in ["LOG_LEVEL", "BACKEND_URL"]:
+    for k in [
+        "LOG_LEVEL",
+        "BACKEND_URL",
+        "JOB_CHECK_INTERVAL",
+        "CLAIM_WAIT",
+        "WORKER_CONCURRENCY",
+        "WORKER_MAX_JOBS_PER_CHILD",
+        "WORKER_METRICS_PORT",
+        "WORKER_TAGS",
+        "WORKER_MAX_COST",
+    ]:
         logging.info(f"    {k}: {os.environ.get(k)}")
 
     if os.environ.get("LOG_LEVEL", "INFO") in LOG_LEVELS.keys():
@@ -35,9 +46,38 @@ def main():
     backend_url = os.environ.get("BACKEND_URL", "http://localhost:8000")
     logging.info(f"backend url set to: {backend_url}")
     job_check_interval = float(os.environ.get("JOB_CHECK_INTERVAL", 10))
+    claim_wait = float(os.environ.get("CLAIM_WAIT", 30))
+    # capabilities of the worker as comma separated list, e.g. `gpu,highmem`
+    tags = [
+        t.strip() for t in os.environ.get("WORKER_TAGS", "").split(",") if t.strip()
+    ]
+    max_cost = os.environ.get("WORKER_MAX_COST")
+    routing = {"tags": tags, "max_cost": None if max_cost is None else float(max_cost)}
+
+    if "WORKER_METRICS_PORT" in os.environ:
+        server = start_metrics_server(int(os.environ["WORKER_METRICS_PORT"]))
+        logging.info(f"serving metrics on port {server.server_address[1]}")
 
     client = Client(url=backend_url)
-    worker = Worker(client=client, job_check_interval=job_check_interval)
+    if "WORKER_CONCURRENCY" in os.environ:
+        max_jobs_per_child = os.environ.get("WORKER_MAX_JOBS_PER_CHILD")
+        worker = PoolWorker(
+            client=client,
+            job_check_interval=job_check_interval,
+            claim_wait=claim_wait,
+            concurrency=int(os.environ["WORKER_CONCURRENCY"]),
+            max_jobs_per_child=None
+            if max_jobs_per_child is None
+            else int(max_jobs_per_child),
+            **routing,
+        )
+    else:
+        worker = Worker(
+            client=client,
+            job_check_interval=job_check_interval,
+            claim_wait=claim_wait,
+            **routing,
+        )
     worker.work()
 
 